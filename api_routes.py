@@ -17,6 +17,8 @@ import pytz
 from replit_telegram_sender import send_message, send_test_message, send_price_report, send_system_report
 from telegram_scheduler_service import start_scheduler, stop_scheduler, get_scheduler_status, update_scheduler_settings
 from crypto_bot.price_alert_service import get_price_alerts, set_price_alert, remove_price_alert, check_price_alerts
+from crypto_bot.async_client import async_client, get_prices_async
+from crypto_bot.price_hub import price_hub
 
 # تنظیم لاگر
 logger = logging.getLogger(__name__)
@@ -383,31 +385,16 @@ def stream_updates():
     """
     Server-Sent Events stream for real-time updates (Vercel compatible)
     """
-    def generate():
-        while True:
-            try:
-                # Get current prices
-                symbols = ['BTC-USDT', 'ETH-USDT', 'SOL-USDT', 'XRP-USDT']
-                price_data = {}
-                
-                for symbol in symbols:
-                    try:
-                        from crypto_bot.market_data import get_current_prices
-                        price_info = get_current_prices([symbol])
-                        if price_info and symbol in price_info:
-                            price_data[symbol] = price_info[symbol]
-                    except Exception as e:
-                        logger.error(f"Error getting price for {symbol}: {e}")
-                
-                if price_data:
-                    yield f"data: {json.dumps({'type': 'price_update', 'data': price_data})}\n\n"
-                
-                time.sleep(30)  # Update every 30 seconds
-            except Exception as e:
-                logger.error(f"Error in stream: {e}")
-                break
+    # All viewers share one publisher; each connection only drains its own queue
+    price_hub.start()
+    if not price_hub.get_full_message()['data']:
+        try:
+            async_client.run(get_prices_async(price_hub.symbols))
+        except Exception as e:
+            logger.error(f"Error priming price stream: {e}")
     
-    return Response(generate(), mimetype='text/event-stream')
+    return Response(price_hub.stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @api.route('/ai-advice', methods=['POST'])
 def api_ai_advice():
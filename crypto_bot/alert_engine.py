@@ -0,0 +1,535 @@
+"""
+موتور نمایه‌شده هشدارهای قیمت
+
+برای هر نماد دو آرایه مرتب از قیمت‌های هدف (above و below) نگه‌داری می‌شود. با
+هر قیمت جدید فقط هشدارهایی بررسی می‌شوند که قیمت هدفشان بین قیمت قبلی و قیمت
+فعلی قرار دارد؛ این بازه با جستجوی دودویی پیدا می‌شود، بنابراین هزینه هر بررسی
+O(log n + k) است (k تعداد هشدارهای عبور داده شده)، نه تعداد کل هشدارها.
+
+هشدار فعال شده پس از برگشت قیمت به اندازه REARM_MARGIN از قیمت هدف دوباره
+مسلح می‌شود. هشدارها در جدول PriceAlert ذخیره می‌شوند؛ ستون active مسلح بودن
+هشدار را نشان می‌دهد و حذف هشدار ردیف آن را حذف می‌کند.
+
+هشدار فقط پس از ماندن قیمت در سمت دیگر هدف به مدت ALERT_DEBOUNCE فعال می‌شود و
+هر هشدار حداکثر یک بار در هر ALERT_COOLDOWN فعال می‌شود؛ بنابراین ارزیابی با هر
+تیک قیمت باعث ارسال پیام‌های تکراری نمی‌شود. هشدار در انتظار در زمان مقرر خود
+(next_due) با آخرین قیمت بررسی می‌شود (evaluate_due)، نه فقط با قیمت بعدی.
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from models import db, PriceAlert
+
+logger = logging.getLogger(__name__)
+
+# فاصله بازگشت قیمت از قیمت هدف برای مسلح شدن دوباره هشدار (۱٪)
+REARM_MARGIN = 0.01
+
+# مدتی که قیمت باید پس از عبور از قیمت هدف در همان سمت بماند تا هشدار فعال شود (ثانیه)؛
+# از فعال شدن هشدار با یک تیک گذرا جلوگیری می‌کند
+ALERT_DEBOUNCE = float(os.environ.get("ALERT_DEBOUNCE_SECONDS", "2"))
+
+# حداقل فاصله بین دو بار فعال شدن یک هشدار (ثانیه)، حتی اگر در این فاصله دوباره مسلح شده باشد
+ALERT_COOLDOWN = float(os.environ.get("ALERT_COOLDOWN_SECONDS", "300"))
+
+# حداکثر اختلاف قیمت برای یکسان دانستن دو هشدار
+PRICE_TOLERANCE = 0.001
+
+ALERT_TYPES = ('above', 'below')
+
+
+class Alert:
+    """
+    یک هشدار قیمت
+    """
+
+    __slots__ = ('key', 'db_id', 'symbol', 'price', 'condition', 'armed', 'user_id', 'last_fired', 'due_at')
+
+    def __init__(self, key: int, symbol: str, price: float, condition: str, armed: bool = True,
+                 db_id: Optional[int] = None, user_id: Optional[int] = None):
+        self.key = key
+        self.db_id = db_id
+        self.symbol = symbol
+        self.price = price
+        self.condition = condition
+        self.armed = armed
+        self.user_id = user_id
+        # زمان آخرین فعال شدن و زمان مقرر فعال شدن هشدار در انتظار
+        self.last_fired = float('-inf')
+        self.due_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.db_id,
+            'symbol': self.symbol,
+            'price': self.price,
+            'type': self.condition,
+            'triggered': not self.armed
+        }
+
+
+class ThresholdIndex:
+    """
+    آرایه مرتب قیمت‌های هدف یک نوع هشدار
+    """
+
+    def __init__(self):
+        self.prices: List[float] = []
+        self.alerts: List[Alert] = []
+
+    def add(self, alert: Alert) -> None:
+        index = bisect.bisect_right(self.prices, alert.price)
+        self.prices.insert(index, alert.price)
+        self.alerts.insert(index, alert)
+
+    def remove(self, alert: Alert) -> None:
+        index = bisect.bisect_left(self.prices, alert.price)
+        while index < len(self.alerts) and self.prices[index] == alert.price:
+            if self.alerts[index] is alert:
+                del self.prices[index]
+                del self.alerts[index]
+                return
+            index += 1
+
+    def left(self, price: float) -> int:
+        return bisect.bisect_left(self.prices, price)
+
+    def right(self, price: float) -> int:
+        return bisect.bisect_right(self.prices, price)
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+
+class SymbolBook:
+    """
+    هشدارهای یک نماد به همراه آخرین قیمت بررسی شده
+    """
+
+    def __init__(self):
+        self.above = ThresholdIndex()
+        self.below = ThresholdIndex()
+        self.last_price: Optional[float] = None
+        # هشدارهای جدید یا تغییر یافته که در بررسی بعدی بر اساس وضعیت فعلی قیمت ارزیابی می‌شوند
+        self.pending: Dict[int, Alert] = {}
+        # هشدارهای عبور داده شده که منتظر پایان debounce یا cooldown هستند
+        self.waiting: Dict[int, Alert] = {}
+
+    def index(self, condition: str) -> ThresholdIndex:
+        return self.above if condition == 'above' else self.below
+
+    def __len__(self) -> int:
+        return len(self.above) + len(self.below)
+
+
+class Evaluation:
+    """
+    نتیجه یک دور ارزیابی
+    """
+
+    def __init__(self, now: float):
+        self.now = now
+        self.fired: List[Dict[str, Any]] = []
+        self.changed: List[Alert] = []
+
+
+class AlertEngine:
+    """
+    نگه‌داری و ارزیابی نمایه‌شده هشدارهای قیمت
+    """
+
+    def __init__(self, rearm_margin: float = REARM_MARGIN, debounce: float = ALERT_DEBOUNCE,
+                 cooldown: float = ALERT_COOLDOWN):
+        """
+        مقداردهی اولیه
+
+        Args:
+            rearm_margin: فاصله بازگشت قیمت برای مسلح شدن دوباره هشدار
+            debounce: مدتی که قیمت باید پس از عبور از هدف همان سمت بماند (ثانیه)
+            cooldown: حداقل فاصله بین دو بار فعال شدن یک هشدار (ثانیه)
+        """
+        self.rearm_margin = rearm_margin
+        self.debounce = debounce
+        self.cooldown = cooldown
+        self._books: Dict[str, SymbolBook] = {}
+        self._alerts: Dict[int, Alert] = {}
+        self._next_key = 1
+        self._app = None
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # ذخیره‌سازی در پایگاه داده
+    # ------------------------------------------------------------------
+
+    def init_app(self, app) -> None:
+        """
+        اتصال به پایگاه داده برنامه و بارگذاری هشدارهای ذخیره شده
+
+        هشدارهایی که پیش از اتصال (مثلاً هنگام import) ثبت شده‌اند، در صورت نبود
+        در جدول، ذخیره می‌شوند.
+
+        Args:
+            app: برنامه Flask
+        """
+        with app.app_context():
+            rows = PriceAlert.query.all()
+
+        with self._lock:
+            self._app = app
+            unsaved = list(self._alerts.values())
+            for row in rows:
+                existing = self._find(row.symbol, row.price, row.condition)
+                if existing is not None and existing.db_id is None:
+                    existing.db_id = row.id
+                    existing.armed = bool(row.active)
+                    existing.user_id = row.user_id
+                    self._book(row.symbol).pending[existing.key] = existing
+                elif row.condition in ALERT_TYPES:
+                    self._add(row.symbol, row.price, row.condition, bool(row.active), row.id, row.user_id)
+            unsaved = [alert for alert in unsaved if alert.db_id is None]
+
+        for alert in unsaved:
+            self._save(alert)
+        logger.info(f"Alert engine loaded {len(rows)} price alerts from the database")
+
+    def _save(self, alert: Alert) -> None:
+        """درج یا بروزرسانی ردیف یک هشدار"""
+        if self._app is None:
+            return
+        try:
+            with self._app.app_context():
+                row = db.session.get(PriceAlert, alert.db_id) if alert.db_id else None
+                if row is None:
+                    row = PriceAlert(symbol=alert.symbol, price=alert.price, condition=alert.condition,
+                                     user_id=alert.user_id)
+                    db.session.add(row)
+                row.active = alert.armed
+                db.session.commit()
+                alert.db_id = row.id
+        except Exception as e:
+            logger.error(f"Error saving price alert {alert.symbol} {alert.condition} {alert.price}: {str(e)}")
+
+    def _delete(self, alert: Alert) -> None:
+        """حذف ردیف یک هشدار"""
+        if self._app is None or alert.db_id is None:
+            return
+        try:
+            with self._app.app_context():
+                PriceAlert.query.filter_by(id=alert.db_id).delete()
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Error deleting price alert {alert.db_id}: {str(e)}")
+
+    def _save_states(self, alerts: Iterable[Alert]) -> None:
+        """بروزرسانی دسته‌ای وضعیت مسلح بودن هشدارها"""
+        if self._app is None:
+            return
+        by_state: Dict[bool, List[int]] = {True: [], False: []}
+        for alert in alerts:
+            if alert.db_id is not None:
+                by_state[alert.armed].append(alert.db_id)
+        if not by_state[True] and not by_state[False]:
+            return
+        try:
+            with self._app.app_context():
+                for armed, ids in by_state.items():
+                    if ids:
+                        PriceAlert.query.filter(PriceAlert.id.in_(ids)).update({'active': armed},
+                                                                               synchronize_session=False)
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Error saving price alert states: {str(e)}")
+
+    # ------------------------------------------------------------------
+    # مدیریت هشدارها
+    # ------------------------------------------------------------------
+
+    def _book(self, symbol: str) -> SymbolBook:
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = SymbolBook()
+        return book
+
+    def _find(self, symbol: str, price: float, condition: str) -> Optional[Alert]:
+        book = self._books.get(symbol)
+        if book is None:
+            return None
+        index = book.index(condition)
+        position = index.left(price - PRICE_TOLERANCE)
+        if position < index.right(price + PRICE_TOLERANCE):
+            return index.alerts[position]
+        return None
+
+    def _add(self, symbol: str, price: float, condition: str, armed: bool = True,
+             db_id: Optional[int] = None, user_id: Optional[int] = None) -> Alert:
+        alert = Alert(self._next_key, symbol, price, condition, armed, db_id, user_id)
+        self._next_key += 1
+        self._alerts[alert.key] = alert
+        book = self._book(symbol)
+        book.index(condition).add(alert)
+        book.pending[alert.key] = alert
+        return alert
+
+    def add_alert(self, symbol: str, price: float, condition: str = 'above',
+                  user_id: Optional[int] = None) -> Tuple[Alert, bool]:
+        """
+        افزودن هشدار (یا مسلح کردن دوباره هشدار یکسان موجود)
+
+        Args:
+            symbol: نماد ارز
+            price: قیمت هدف
+            condition: نوع هشدار ("above" یا "below")
+            user_id: شناسه کاربر (اختیاری)
+
+        Returns:
+            Tuple[Alert, bool]: هشدار و اینکه آیا هشدار جدید ساخته شده است
+
+        Raises:
+            ValueError: اگر نوع هشدار نامعتبر باشد
+        """
+        if condition not in ALERT_TYPES:
+            raise ValueError(f"Alert type must be one of {ALERT_TYPES}")
+
+        with self._lock:
+            alert = self._find(symbol, price, condition)
+            created = alert is None
+            if created:
+                alert = self._add(symbol, price, condition, user_id=user_id)
+            else:
+                alert.armed = True
+                alert.last_fired = float('-inf')
+                self._books[symbol].pending[alert.key] = alert
+
+        self._save(alert)
+        return alert, created
+
+    def remove_alert(self, symbol: str, price: float, condition: str = 'above') -> bool:
+        """
+        حذف هشدار
+
+        Args:
+            symbol: نماد ارز
+            price: قیمت هدف
+            condition: نوع هشدار
+
+        Returns:
+            bool: اگر هشدار پیدا و حذف شده باشد
+        """
+        with self._lock:
+            alert = self._find(symbol, price, condition)
+            if alert is None:
+                return False
+            book = self._books[symbol]
+            book.index(condition).remove(alert)
+            book.pending.pop(alert.key, None)
+            book.waiting.pop(alert.key, None)
+            del self._alerts[alert.key]
+            if not len(book):
+                del self._books[symbol]
+
+        self._delete(alert)
+        return True
+
+    def get_alerts(self, symbol: Optional[str] = None) -> Dict[str, List[Alert]]:
+        """
+        دریافت هشدارها به ترتیب قیمت هدف
+
+        Args:
+            symbol: نماد برای فیلتر (اختیاری)
+
+        Returns:
+            Dict[str, List[Alert]]: هشدارها به تفکیک نماد
+        """
+        with self._lock:
+            symbols = [symbol] if symbol else list(self._books)
+            result = {}
+            for s in symbols:
+                book = self._books.get(s)
+                result[s] = (book.above.alerts + book.below.alerts) if book else []
+            return result
+
+    def symbols(self) -> List[str]:
+        """
+        نمادهای دارای هشدار
+
+        Returns:
+            List[str]: لیست نمادها
+        """
+        with self._lock:
+            return list(self._books)
+
+    # ------------------------------------------------------------------
+    # ارزیابی
+    # ------------------------------------------------------------------
+
+    def _fire(self, alert: Alert, book: SymbolBook, price: float, ev: 'Evaluation') -> None:
+        """فعال کردن هشدار مسلح؛ در صورت نیاز تا پایان debounce یا cooldown منتظر می‌ماند"""
+        if not alert.armed:
+            return
+        if alert.due_at is None:
+            due_at = max(ev.now + self.debounce, alert.last_fired + self.cooldown)
+            if due_at > ev.now:
+                alert.due_at = due_at
+                book.waiting[alert.key] = alert
+                return
+        elif alert.due_at > ev.now:
+            return
+
+        alert.due_at = None
+        book.waiting.pop(alert.key, None)
+        alert.armed = False
+        alert.last_fired = ev.now
+        ev.changed.append(alert)
+        ev.fired.append({
+            'id': alert.db_id,
+            'symbol': alert.symbol,
+            'current_price': price,
+            'target_price': alert.price,
+            'alert_type': alert.condition
+        })
+
+    def _rearm(self, alert: Alert, ev: 'Evaluation') -> None:
+        if alert.armed:
+            return
+        alert.armed = True
+        ev.changed.append(alert)
+        logger.info(f"Price alert {alert.symbol} {alert.condition} {alert.price} re-armed")
+
+    @staticmethod
+    def _is_met(alert: Alert, price: float) -> bool:
+        return price >= alert.price if alert.condition == 'above' else price <= alert.price
+
+    def _evaluate_state(self, alert: Alert, book: SymbolBook, price: float, ev: 'Evaluation') -> None:
+        """ارزیابی یک هشدار بر اساس وضعیت فعلی قیمت (بدون در نظر گرفتن قیمت قبلی)"""
+        if self._is_met(alert, price):
+            self._fire(alert, book, price, ev)
+        elif alert.condition == 'above' and price < alert.price * (1 - self.rearm_margin):
+            self._rearm(alert, ev)
+        elif alert.condition == 'below' and price > alert.price * (1 + self.rearm_margin):
+            self._rearm(alert, ev)
+
+    def _evaluate_waiting(self, book: SymbolBook, price: float, ev: 'Evaluation') -> None:
+        """هشدارهای در انتظار debounce یا cooldown: اگر شرط هنوز برقرار باشد و زمانشان رسیده باشد فعال می‌شوند"""
+        for alert in list(book.waiting.values()):
+            if not self._is_met(alert, price):
+                alert.due_at = None
+                del book.waiting[alert.key]
+            elif alert.due_at <= ev.now:
+                self._fire(alert, book, price, ev)
+
+    def _evaluate_book(self, book: SymbolBook, price: float, ev: 'Evaluation') -> None:
+        last = book.last_price
+        book.last_price = price
+        up = 1 + self.rearm_margin
+        down = 1 - self.rearm_margin
+
+        self._evaluate_waiting(book, price, ev)
+
+        if last is None:
+            # اولین قیمت: همه هشدارها بر اساس وضعیت فعلی ارزیابی می‌شوند
+            for alert in book.above.alerts + book.below.alerts:
+                self._evaluate_state(alert, book, price, ev)
+        elif price > last:
+            # هشدارهای above با قیمت هدف در (last, price]
+            above = book.above
+            for position in range(above.right(last), above.right(price)):
+                self._fire(above.alerts[position], book, price, ev)
+            # هشدارهای below که قیمت از ۱٪ بالای هدفشان عبور کرده است
+            below = book.below
+            for position in range(below.left(last / up), below.left(price / up)):
+                self._rearm(below.alerts[position], ev)
+        elif price < last:
+            # هشدارهای below با قیمت هدف در [price, last)
+            below = book.below
+            for position in range(below.left(price), below.left(last)):
+                self._fire(below.alerts[position], book, price, ev)
+            # هشدارهای above که قیمت از ۱٪ پایین هدفشان عبور کرده است
+            above = book.above
+            for position in range(above.right(price / down), above.right(last / down)):
+                self._rearm(above.alerts[position], ev)
+
+        if book.pending:
+            if last is not None:
+                for alert in book.pending.values():
+                    self._evaluate_state(alert, book, price, ev)
+            book.pending.clear()
+
+    def evaluate(self, prices: Dict[str, float], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        ارزیابی همه هشدارها با یک دسته قیمت
+
+        Args:
+            prices: قیمت فعلی به تفکیک نماد
+            now: زمان ارزیابی (پیش‌فرض: زمان فعلی)
+
+        Returns:
+            List[Dict[str, Any]]: هشدارهای فعال شده (symbol، current_price، target_price، alert_type)
+        """
+        ev = Evaluation(time.time() if now is None else now)
+        with self._lock:
+            for symbol, price in prices.items():
+                book = self._books.get(symbol)
+                if book is not None and price is not None:
+                    self._evaluate_book(book, float(price), ev)
+
+        self._save_states(ev.changed)
+        return ev.fired
+
+    def evaluate_due(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        فعال کردن هشدارهای در انتظاری که زمانشان رسیده است، با آخرین قیمت بررسی شده
+
+        بدون این بررسی، هشدار در انتظار فقط با قیمت بعدی ارزیابی می‌شود؛ یعنی با
+        بروزرسانی‌های کند (مثلاً هر ۳۰ ثانیه) دیر فعال می‌شود و عبوری که فقط در یک
+        نمونه قیمت دیده شده از دست می‌رود.
+
+        Args:
+            now: زمان ارزیابی (پیش‌فرض: زمان فعلی)
+
+        Returns:
+            List[Dict[str, Any]]: هشدارهای فعال شده
+        """
+        ev = Evaluation(time.time() if now is None else now)
+        with self._lock:
+            for book in self._books.values():
+                if book.waiting and book.last_price is not None:
+                    self._evaluate_waiting(book, book.last_price, ev)
+
+        self._save_states(ev.changed)
+        return ev.fired
+
+    def next_due(self) -> Optional[float]:
+        """
+        نزدیک‌ترین زمان مقرر هشدارهای در انتظار
+
+        Returns:
+            Optional[float]: زمان (ثانیه) یا None اگر هشداری در انتظار نباشد
+        """
+        with self._lock:
+            return min((alert.due_at for book in self._books.values() for alert in book.waiting.values()),
+                       default=None)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        دریافت وضعیت موتور هشدار
+
+        Returns:
+            Dict[str, Any]: تعداد نمادها و هشدارها
+        """
+        with self._lock:
+            return {
+                'symbols': len(self._books),
+                'alerts': len(self._alerts),
+                'armed': sum(1 for alert in self._alerts.values() if alert.armed),
+                'waiting': sum(len(book.waiting) for book in self._books.values()),
+                'persistent': self._app is not None
+            }
+
+
+# موتور مشترک هشدارهای قیمت برای کل برنامه
+alert_engine = AlertEngine()
@@ -0,0 +1,392 @@
+"""
+لایه ناهمگام (asyncio) برای دریافت قیمت و اخبار
+
+همه درخواست‌ها روی یک event loop مشترک در یک ترد پس‌زمینه و با یک
+aiohttp.ClientSession با اتصال‌های keep-alive اجرا می‌شوند؛ بنابراین ده‌ها درخواست
+همزمان فقط یک ترد مصرف می‌کنند. کدهای همگام (مثلاً handler های Flask و SocketIO)
+با run() کوروتین را روی این loop اجرا کرده و منتظر نتیجه می‌مانند.
+
+ساخت درخواست و تجزیه پاسخ از همان توابع market_data و crypto_news استفاده می‌کند و
+سهمیه ارائه‌دهنده‌ها از طریق quota_manager رعایت می‌شود. اگر aiohttp نصب نباشد،
+درخواست‌ها با http_client در executor همین loop اجرا می‌شوند.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from crypto_bot import market_data
+from crypto_bot.http_client import (http_client, HostMetrics, DEFAULT_HEADERS, HTTP_CONNECT_TIMEOUT,
+                                    HTTP_READ_TIMEOUT, HTTP_POOL_SIZE)
+from crypto_bot.quota_manager import quota_manager
+
+logger = logging.getLogger(__name__)
+
+# کنترل دسترسی به کتابخانه aiohttp
+AIOHTTP_AVAILABLE = False
+_aiohttp = None
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+    _aiohttp = aiohttp
+except ImportError as e:
+    logger.warning(f"aiohttp library not installed ({str(e)}). Async requests will run on the thread pool.")
+
+# مهلت پیش‌فرض انتظار کدهای همگام برای نتیجه (ثانیه)
+ASYNC_RUN_TIMEOUT = 30
+
+
+class AsyncHttpClient:
+    """
+    کلاینت HTTP ناهمگام روی یک event loop مشترک
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE):
+        """
+        مقداردهی اولیه
+
+        Args:
+            pool_size: بیشترین تعداد اتصال همزمان به هر میزبان
+        """
+        self.pool_size = pool_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session = None
+        self._metrics: Dict[str, HostMetrics] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """
+        شروع event loop در ترد پس‌زمینه
+
+        Returns:
+            bool: وضعیت شروع
+        """
+        with self._lock:
+            if self.running:
+                return False
+            ready = threading.Event()
+
+            def run_loop():
+                self._loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self._loop)
+                ready.set()
+                self._loop.run_forever()
+
+            self._thread = threading.Thread(target=run_loop, name="async-client", daemon=True)
+            self._thread.start()
+            ready.wait()
+        logger.info("Async client event loop started")
+        return True
+
+    def stop(self) -> bool:
+        """
+        بستن نشست HTTP و توقف event loop
+
+        Returns:
+            bool: وضعیت توقف
+        """
+        with self._lock:
+            if not self.running:
+                return False
+            loop, thread = self._loop, self._thread
+
+        if self._session is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._session.close(), loop).result(timeout=5)
+            except Exception as e:
+                logger.error(f"Error closing async HTTP session: {str(e)}")
+            self._session = None
+
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        with self._lock:
+            self._thread = None
+            self._loop = None
+        logger.info("Async client event loop stopped")
+        return True
+
+    def submit(self, coro):
+        """
+        اجرای کوروتین روی loop مشترک
+
+        Args:
+            coro: کوروتین
+
+        Returns:
+            concurrent.futures.Future: نتیجه
+        """
+        if not self.running:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro, timeout: Optional[float] = ASYNC_RUN_TIMEOUT):
+        """
+        اجرای کوروتین روی loop مشترک و انتظار برای نتیجه (برای کدهای همگام)
+
+        Args:
+            coro: کوروتین
+            timeout: مهلت انتظار (ثانیه)
+
+        Returns:
+            نتیجه کوروتین
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            future.cancel()
+            raise
+
+    def _host_metrics(self, url: str) -> HostMetrics:
+        host = urlsplit(url).netloc
+        with self._lock:
+            metrics = self._metrics.get(host)
+            if metrics is None:
+                metrics = self._metrics[host] = HostMetrics()
+            return metrics
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = _aiohttp.TCPConnector(limit_per_host=self.pool_size, ttl_dns_cache=300)
+            self._session = _aiohttp.ClientSession(
+                connector=connector,
+                headers=DEFAULT_HEADERS,
+                timeout=_aiohttp.ClientTimeout(sock_connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT)
+            )
+        return self._session
+
+    async def get(self, url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+                  timeout: Optional[float] = None, provider: Optional[str] = None,
+                  as_json: bool = True) -> Tuple[int, Any]:
+        """
+        ارسال درخواست GET
+
+        Args:
+            url: آدرس
+            params: پارامترهای query
+            headers: هدرهای اضافی
+            timeout: مهلت کل درخواست (ثانیه)
+            provider: نام ارائه‌دهنده برای اعمال سهمیه و circuit breaker
+            as_json: تبدیل بدنه پاسخ 200 به JSON (در غیر این صورت متن)
+
+        Returns:
+            Tuple[int, Any]: کد وضعیت و بدنه پاسخ (برای پاسخ‌های غیر 200، None)
+
+        Raises:
+            ProviderUnavailable: اگر سهمیه ارائه‌دهنده تمام شده یا مدار آن باز باشد
+        """
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+
+        if not AIOHTTP_AVAILABLE:
+            # بدون aiohttp همان کلاینت همگام در executor اجرا می‌شود
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, lambda: http_client.get(
+                url, params=params, headers=headers, timeout=timeout or HTTP_READ_TIMEOUT,
+                retries=0, provider=provider))
+            if response.status_code != 200:
+                return response.status_code, None
+            return 200, response.json() if as_json else response.text
+
+        if provider:
+            # انتظار برای توکن، loop را مسدود نمی‌کند
+            quota_manager.acquire(provider, max_wait=0)
+
+        metrics = self._host_metrics(url)
+        session = await self._get_session()
+        started = time.monotonic()
+        try:
+            request_timeout = _aiohttp.ClientTimeout(total=timeout) if timeout else None
+            async with session.get(url, params=params, headers=headers, timeout=request_timeout) as response:
+                status = response.status
+                if status == 200:
+                    body = await response.json(content_type=None) if as_json else await response.text()
+                else:
+                    body = None
+                retry_after = response.headers.get('Retry-After')
+        except (_aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            # ValueError: بدنه پاسخ قابل تبدیل به JSON یا متن نیست
+            with self._lock:
+                metrics.requests += 1
+                metrics.errors += 1
+                metrics.latencies.append(time.monotonic() - started)
+                # متن خطا ممکن است شامل آدرس کامل درخواست (و توکن‌های آن) باشد؛ فقط نوع خطا ثبت می‌شود
+                metrics.last_error = type(e).__name__
+            if provider:
+                quota_manager.record_failure(provider)
+            raise
+        except BaseException:
+            # لغو درخواست (CancelledError) یا خطای غیرمنتظره؛ فرصت درخواست آزمایشی آزاد می‌شود
+            if provider:
+                quota_manager.release(provider)
+            raise
+
+        with self._lock:
+            metrics.requests += 1
+            metrics.latencies.append(time.monotonic() - started)
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            if status >= 400:
+                metrics.errors += 1
+                metrics.last_error = f"HTTP {status}"
+
+        if provider:
+            if status in (418, 429):
+                quota_manager.record_rate_limited(provider, float(retry_after) if retry_after and retry_after.isdigit() else None)
+            elif status >= 500:
+                quota_manager.record_failure(provider)
+            else:
+                quota_manager.record_success(provider)
+
+        return status, body
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        دریافت آمار تاخیر و خطای هر میزبان
+
+        Returns:
+            Dict[str, Dict[str, Any]]: آمار به تفکیک میزبان
+        """
+        with self._lock:
+            return {host: metrics.to_dict() for host, metrics in self._metrics.items()}
+
+
+# کلاینت ناهمگام مشترک برای کل برنامه
+async_client = AsyncHttpClient()
+
+
+async def fetch_prices_async(symbols: Iterable[str], timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    دریافت دسته‌ای قیمت‌ها به ترتیب اولویت ارائه‌دهنده‌ها (معادل ناهمگام market_data._fetch_batch)
+
+    Args:
+        symbols: نمادهای استاندارد ارز
+        timeout: مهلت کل (ثانیه)
+
+    Returns:
+        Dict[str, Dict[str, Any]]: داده‌های قیمت به تفکیک نماد
+    """
+    symbols = list(dict.fromkeys(symbols))
+    fetched = {}
+    deadline = time.monotonic() + (timeout or market_data.REQUEST_TIMEOUT)
+
+    for name, build_request, parse in market_data.BATCH_PRICE_PROVIDERS:
+        missing = [symbol for symbol in symbols if symbol not in fetched]
+        remaining = deadline - time.monotonic()
+        if not missing or remaining <= 0:
+            break
+        if not quota_manager.is_available(name):
+            continue
+
+        request = build_request(missing)
+        if request is None:
+            continue
+        url, params, headers, context = request
+        try:
+            status, data = await async_client.get(url, params=params, headers=headers, timeout=remaining, provider=name)
+        except Exception as e:
+            logger.error(f"Error in async price fetch from {name}: {str(e)}")
+            continue
+        if status != 200:
+            logger.warning(f"{name} API returned status code {status}")
+            continue
+
+        for symbol, price_data in parse(data, context).items():
+            market_data._cache_price_data(symbol, price_data)
+            fetched[symbol] = price_data
+
+    return fetched
+
+
+async def get_prices_async(symbols: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    دریافت قیمت‌ها از snapshot تیکر و دریافت ناهمگام نمادهای موجود نبود
+
+    Args:
+        symbols: نمادهای ارز (با همان فرمت ورودی در نتیجه برگردانده می‌شوند)
+
+    Returns:
+        Dict[str, Dict[str, Any]]: داده‌های قیمت به تفکیک نماد ورودی
+    """
+    from crypto_bot.price_ticker import price_ticker, normalize_symbol
+
+    symbols = list(symbols)
+    result = price_ticker.get_prices(symbols, fetch_missing=False)
+    missing = {symbol: normalize_symbol(symbol) for symbol in symbols if symbol not in result}
+    if not missing:
+        return result
+
+    fetched = await fetch_prices_async(missing.values())
+    if fetched:
+        price_ticker.publish_prices(fetched)
+    for symbol, std_symbol in missing.items():
+        if std_symbol in fetched:
+            result[symbol] = fetched[std_symbol]
+    return result
+
+
+async def fetch_news_async(limit: int = 5) -> List[Dict[str, Any]]:
+    """
+    دریافت همزمان اخبار از CryptoCompare، CoinDesk و CoinTelegraph
+
+    Args:
+        limit: تعداد اخبار هر منبع
+
+    Returns:
+        List[Dict[str, Any]]: اخبار همه منابع (منابع ناموفق نادیده گرفته می‌شوند)
+    """
+    from crypto_bot import crypto_news
+
+    sources = [
+        ("CryptoCompare", async_client.get(crypto_news.CRYPTOCOMPARE_NEWS_URL,
+                                           params={"lang": "EN", "api_key": crypto_news.CRYPTOCOMPARE_API_KEY,
+                                                   "limit": limit},
+                                           timeout=10, provider='cryptocompare'),
+         lambda data: crypto_news._parse_cryptocompare_news(data)[:limit]),
+        ("CoinDesk", async_client.get(crypto_news.COINDESK_URL, headers=crypto_news.BROWSER_HEADERS,
+                                      timeout=15, as_json=False),
+         lambda html: crypto_news._parse_coindesk_html(html, limit)),
+        ("CoinTelegraph", async_client.get(crypto_news.COINTELEGRAPH_URL, headers=crypto_news.BROWSER_HEADERS,
+                                           timeout=15, as_json=False),
+         lambda html: crypto_news._parse_cointelegraph_html(html, limit)),
+    ]
+
+    responses = await asyncio.gather(*(request for _, request, _ in sources), return_exceptions=True)
+    news = []
+    for (name, _, parse), response in zip(sources, responses):
+        if isinstance(response, Exception):
+            logger.error(f"Error getting news from {name}: {str(response)}")
+            continue
+        status, body = response
+        if status != 200:
+            logger.warning(f"Error in {name} request: {status}")
+            continue
+        news.extend(parse(body))
+    return news
+
+
+def start_async_client() -> bool:
+    """
+    شروع event loop کلاینت ناهمگام
+
+    Returns:
+        bool: وضعیت شروع
+    """
+    return async_client.start()
+
+
+def stop_async_client() -> bool:
+    """
+    توقف event loop کلاینت ناهمگام
+
+    Returns:
+        bool: وضعیت توقف
+    """
+    return async_client.stop()
@@ -6,24 +6,54 @@
 """
 
 import logging
+import threading
 import time
+import weakref
+from collections import OrderedDict
 from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
+# فاصله زمانی اجرای پاک‌سازی پس‌زمینه داده‌های منقضی شده (ثانیه)
+SWEEP_INTERVAL = 60
+
+# همه نمونه‌های مدیر حافظه نهان برای پاک‌سازی پس‌زمینه و گزارش آمار
+_registry: "weakref.WeakValueDictionary[str, CacheManager]" = weakref.WeakValueDictionary()
+_sweeper_thread = None
+_sweeper_lock = threading.Lock()
+
 class CacheManager:
-    """مدیریت حافظه نهان برای داده‌های API"""
+    """
+    مدیریت حافظه نهان برای داده‌های API
+    
+    حافظه نهان thread-safe با حداکثر تعداد مدخل، حذف LRU، انقضای TTL و
+    شمارنده‌های O(1) برای hit، miss، eviction و expiration.
+    """
     
-    def __init__(self, default_ttl_seconds: int = 60):
+    def __init__(self, default_ttl_seconds: int = 60, max_entries: Optional[int] = None,
+                 namespace: str = "default", stale_ttl_seconds: int = 0):
         """
         راه‌اندازی مدیریت حافظه نهان
         
         Args:
             default_ttl_seconds: مدت زمان پیش‌فرض اعتبار داده در حافظه نهان (ثانیه)
+            max_entries: حداکثر تعداد مدخل‌ها؛ با رسیدن به آن قدیمی‌ترین مدخل استفاده‌نشده حذف می‌شود
+            namespace: نام فضای نام برای گزارش آمار
+            stale_ttl_seconds: مدتی پس از انقضا که داده قدیمی هنوز از طریق get_stale قابل دریافت است
         """
-        self.cache = {}  # کلید: (مقدار، زمان انقضا)
+        self.cache: "OrderedDict[str, tuple]" = OrderedDict()  # کلید: (مقدار، زمان انقضا) به ترتیب استفاده
         self.default_ttl_seconds = default_ttl_seconds
-        logger.info(f"Cache manager initialized with default TTL of {default_ttl_seconds} seconds")
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.stale_ttl_seconds = stale_ttl_seconds
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _registry[namespace] = self
+        logger.info(f"Cache manager '{namespace}' initialized with default TTL of {default_ttl_seconds} seconds"
+                    f" and max entries {max_entries}")
     
     def get(self, key: str) -> Optional[Any]:
         """
@@ -35,21 +65,53 @@ class CacheManager:
         Returns:
             داده ذخیره شده یا None اگر کلید منقضی شده یا وجود نداشته باشد
         """
-        if key not in self.cache:
-            logger.debug(f"Cache miss for key: {key}")
-            return None
-        
-        value, expire_time = self.cache[key]
-        
-        # بررسی اعتبار داده
-        if expire_time < time.time():
-            logger.debug(f"Cache expired for key: {key}")
-            del self.cache[key]
-            return None
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                logger.debug(f"Cache miss for key: {key}")
+                return None
+            
+            value, expire_time = entry
+            
+            # بررسی اعتبار داده
+            now = time.time()
+            if expire_time < now:
+                # داده قدیمی تا پایان مهلت stale برای get_stale نگه داشته می‌شود
+                if expire_time + self.stale_ttl_seconds < now:
+                    del self.cache[key]
+                    self.expirations += 1
+                self.misses += 1
+                logger.debug(f"Cache expired for key: {key}")
+                return None
+            
+            self.cache.move_to_end(key)
+            self.hits += 1
         
         logger.debug(f"Cache hit for key: {key}")
         return value
     
+    def get_stale(self, key: str) -> Optional[Any]:
+        """
+        دریافت داده منقضی شده‌ای که هنوز در مهلت stale قرار دارد
+        
+        Args:
+            key: کلید داده
+            
+        Returns:
+            داده قدیمی یا None اگر وجود نداشته باشد یا مهلت stale آن گذشته باشد
+        """
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            
+            value, expire_time = entry
+            if expire_time + self.stale_ttl_seconds < time.time():
+                return None
+            
+            return value
+    
     def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
         """
         ذخیره داده در حافظه نهان
@@ -63,7 +125,18 @@ class CacheManager:
             ttl_seconds = self.default_ttl_seconds
         
         expire_time = time.time() + ttl_seconds
-        self.cache[key] = (value, expire_time)
+        with self._lock:
+            self.cache[key] = (value, expire_time)
+            self.cache.move_to_end(key)
+            
+            # حذف قدیمی‌ترین مدخل‌های استفاده‌نشده در صورت عبور از سقف
+            if self.max_entries is not None:
+                while len(self.cache) > self.max_entries:
+                    evicted_key, _ = self.cache.popitem(last=False)
+                    self.evictions += 1
+                    logger.debug(f"Cache evicted key: {evicted_key}")
+        
+        _ensure_sweeper()
         logger.debug(f"Cache set for key: {key}, expires in {ttl_seconds} seconds")
     
     def delete(self, key: str) -> bool:
@@ -76,16 +149,18 @@ class CacheManager:
         Returns:
             آیا داده حذف شد
         """
-        if key in self.cache:
-            del self.cache[key]
-            logger.debug(f"Cache deleted for key: {key}")
-            return True
+        with self._lock:
+            if key in self.cache:
+                del self.cache[key]
+                logger.debug(f"Cache deleted for key: {key}")
+                return True
         return False
     
     def clear(self) -> None:
         """پاک کردن تمام داده‌های حافظه نهان"""
-        self.cache.clear()
-        logger.info("Cache cleared")
+        with self._lock:
+            self.cache.clear()
+        logger.info(f"Cache '{self.namespace}' cleared")
     
     def cleanup(self) -> int:
         """
@@ -95,13 +170,17 @@ class CacheManager:
             تعداد کلیدهای حذف شده
         """
         now = time.time()
-        expired_keys = [k for k, (_, expire_time) in self.cache.items() if expire_time < now]
-        
-        for key in expired_keys:
-            del self.cache[key]
+        with self._lock:
+            expired_keys = [k for k, (_, expire_time) in self.cache.items()
+                            if expire_time + self.stale_ttl_seconds < now]
+            
+            for key in expired_keys:
+                del self.cache[key]
+            
+            self.expirations += len(expired_keys)
         
         if expired_keys:
-            logger.debug(f"Cleaned up {len(expired_keys)} expired cache entries")
+            logger.debug(f"Cleaned up {len(expired_keys)} expired cache entries in '{self.namespace}'")
         
         return len(expired_keys)
     
@@ -113,18 +192,39 @@ class CacheManager:
             آمار مربوط به حافظه نهان
         """
         now = time.time()
-        total = len(self.cache)
-        expired = sum(1 for _, expire_time in self.cache.values() if expire_time < now)
-        valid = total - expired
-        
-        return {
-            'total_entries': total,
-            'valid_entries': valid,
-            'expired_entries': expired,
-            'oldest_entry_ttl': min((expire_time - now for _, expire_time in self.cache.values()), default=0) if self.cache else 0,
-            'newest_entry_ttl': max((expire_time - now for _, expire_time in self.cache.values()), default=0) if self.cache else 0,
-            'average_ttl': sum((expire_time - now for _, expire_time in self.cache.values())) / total if total > 0 else 0
-        }
+        with self._lock:
+            total = len(self.cache)
+            expired = 0
+            oldest_ttl = None
+            newest_ttl = None
+            ttl_sum = 0.0
+            
+            # محاسبه همه آمارهای TTL در یک پیمایش
+            for _, expire_time in self.cache.values():
+                ttl = expire_time - now
+                if ttl < 0:
+                    expired += 1
+                oldest_ttl = ttl if oldest_ttl is None else min(oldest_ttl, ttl)
+                newest_ttl = ttl if newest_ttl is None else max(newest_ttl, ttl)
+                ttl_sum += ttl
+            
+            lookups = self.hits + self.misses
+            
+            return {
+                'namespace': self.namespace,
+                'total_entries': total,
+                'valid_entries': total - expired,
+                'expired_entries': expired,
+                'max_entries': self.max_entries,
+                'oldest_entry_ttl': oldest_ttl or 0,
+                'newest_entry_ttl': newest_ttl or 0,
+                'average_ttl': ttl_sum / total if total > 0 else 0,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
     
     def get_multiple(self, keys: List[str]) -> Dict[str, Any]:
         """
@@ -157,11 +257,47 @@ class CacheManager:
             self.set(key, value, ttl_seconds)
         
         logger.debug(f"Cache set_multiple: {len(items)} items")
+    
+    def __len__(self) -> int:
+        return len(self.cache)
+
+
+def _sweeper_loop() -> None:
+    """حلقه پاک‌سازی پس‌زمینه داده‌های منقضی شده در همه حافظه‌های نهان"""
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        for cache in list(_registry.values()):
+            try:
+                cache.cleanup()
+            except Exception as e:
+                logger.error(f"Error sweeping cache '{cache.namespace}': {str(e)}")
+
+
+def _ensure_sweeper() -> None:
+    """راه‌اندازی ترد پاک‌سازی پس‌زمینه در اولین استفاده"""
+    global _sweeper_thread
+    if _sweeper_thread is not None:
+        return
+    with _sweeper_lock:
+        if _sweeper_thread is None:
+            _sweeper_thread = threading.Thread(target=_sweeper_loop, name="cache-sweeper", daemon=True)
+            _sweeper_thread.start()
+
+
+def get_all_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    دریافت آمار همه حافظه‌های نهان به تفکیک فضای نام
+    
+    Returns:
+        دیکشنری از فضای نام و آمار آن
+    """
+    return {namespace: cache.stats() for namespace, cache in list(_registry.items())}
 
 
 # ایجاد یک نمونه از مدیر حافظه نهان برای استفاده در کل برنامه
 # زمان اعتبار پیش‌فرض 180 ثانیه (3 دقیقه) برای قیمت‌ها
-price_cache = CacheManager(default_ttl_seconds=180)
+# داده‌های قدیمی تا 10 دقیقه پس از انقضا برای stale-while-revalidate نگه داشته می‌شوند
+price_cache = CacheManager(default_ttl_seconds=180, max_entries=2000, namespace="price", stale_ttl_seconds=600)
 
 # زمان اعتبار پیش‌فرض 600 ثانیه (10 دقیقه) برای اخبار و تحلیل‌ها
-news_cache = CacheManager(default_ttl_seconds=600)
\ No newline at end of file
+news_cache = CacheManager(default_ttl_seconds=600, max_entries=500, namespace="news")
@@ -6,19 +6,93 @@ API با حافظه نهان (Cached API) برای بهبود سرعت و کاه
 """
 
 import logging
+import threading
 import time
-from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
 from crypto_bot.cache_manager import price_cache
 from crypto_bot import market_data
 from crypto_bot import market_api
+from crypto_bot.price_ticker import price_ticker
 
 logger = logging.getLogger(__name__)
 
+# حداکثر زمان انتظار درخواست‌های همزمان برای نتیجه درخواست در حال اجرا (ثانیه)
+INFLIGHT_WAIT_TIMEOUT = 15
+
+# درخواست‌های در حال اجرا به تفکیک کلید (single-flight)
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+# ترد پول بازخوانی پس‌زمینه برای stale-while-revalidate
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+
+def _single_flight(key: str, fetch: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    اجرای حداکثر یک درخواست همزمان برای هر کلید
+    
+    اولین فراخواننده درخواست را اجرا می‌کند و بقیه منتظر نتیجه همان درخواست می‌مانند.
+    
+    Args:
+        key: کلید حافظه نهان
+        fetch: تابع دریافت داده
+        
+    Returns:
+        نتیجه درخواست
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = Future()
+            _inflight[key] = future
+    
+    if not is_leader:
+        logger.debug(f"Waiting for in-flight request for {key}")
+        return future.result(timeout=INFLIGHT_WAIT_TIMEOUT)
+    
+    try:
+        result = fetch()
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _refresh_in_background(key: str, fetch: Callable[[], Dict[str, Any]]) -> None:
+    """
+    بازخوانی پس‌زمینه یک کلید در صورتی که درخواستی برای آن در حال اجرا نباشد
+    
+    Args:
+        key: کلید حافظه نهان
+        fetch: تابع دریافت داده
+    """
+    with _inflight_lock:
+        if key in _inflight:
+            return
+    
+    def refresh():
+        try:
+            _single_flight(key, fetch)
+        except Exception as e:
+            logger.error(f"Error refreshing {key} in background: {str(e)}")
+    
+    _refresh_executor.submit(refresh)
+
 def get_cached_price(symbol: str, max_age_seconds: int = 180) -> Tuple[Dict[str, Any], bool]:
     """
     دریافت قیمت از حافظه نهان یا API
     
+    اگر داده منقضی شده ولی هنوز در مهلت stale باشد، بلافاصله برگردانده شده و
+    بازخوانی در پس‌زمینه انجام می‌شود. در صورت نبود داده، فقط یک درخواست
+    همزمان برای هر نماد به API ارسال می‌شود.
+    
     Args:
         symbol: نماد ارز دیجیتال
         max_age_seconds: حداکثر سن مجاز داده در حافظه نهان (ثانیه)
@@ -28,13 +102,49 @@ def get_cached_price(symbol: str, max_age_seconds: int = 180) -> Tuple[Dict[str,
     """
     cache_key = f"price_{symbol.upper()}"
     
+    # بررسی snapshot سرویس بروزرسانی قیمت (بدون درخواست شبکه)
+    ticker_data = price_ticker.get_price(symbol, max_age_seconds)
+    if ticker_data:
+        return {
+            'price': ticker_data['price'],
+            'change_24h': ticker_data.get('change_24h') or 0,
+            'source': ticker_data.get('source', 'api'),
+            'timestamp': ticker_data['updated_at']
+        }, True
+    
     # بررسی حافظه نهان
     cached_data = price_cache.get(cache_key)
     if cached_data:
         logger.debug(f"Using cached price data for {symbol}")
         return cached_data, True
     
-    # دریافت از API
+    fetch = lambda: _fetch_price(symbol, cache_key, max_age_seconds)
+    
+    # stale-while-revalidate
+    stale_data = price_cache.get_stale(cache_key)
+    if stale_data:
+        logger.debug(f"Serving stale price data for {symbol} while refreshing")
+        _refresh_in_background(cache_key, fetch)
+        return stale_data, True
+    
+    try:
+        return _single_flight(cache_key, fetch), False
+    except Exception as e:
+        logger.error(f"Error fetching API price for {symbol}: {str(e)}")
+        return {}, False
+
+def _fetch_price(symbol: str, cache_key: str, max_age_seconds: int) -> Dict[str, Any]:
+    """
+    دریافت قیمت از API و ذخیره آن در حافظه نهان
+    
+    Args:
+        symbol: نماد ارز دیجیتال
+        cache_key: کلید حافظه نهان
+        max_age_seconds: مدت اعتبار داده در حافظه نهان (ثانیه)
+        
+    Returns:
+        داده قیمت یا دیکشنری خالی
+    """
     symbol_formats = []
     
     # فرمت‌های مختلف را امتحان کنید
@@ -76,12 +186,12 @@ def get_cached_price(symbol: str, max_age_seconds: int = 180) -> Tuple[Dict[str,
             # ذخیره در حافظه نهان
             price_cache.set(cache_key, result, ttl_seconds=max_age_seconds)
             
-            return result, False
+            return result
     except Exception as e:
         logger.error(f"Error fetching API price for {symbol}: {str(e)}")
     
     # اگر به اینجا رسیدیم، هیچ داده‌ای نیافتیم
-    return {}, False
+    return {}
 
 def get_cached_prices(symbols: List[str], max_age_seconds: int = 180) -> Dict[str, Any]:
     """
@@ -134,7 +244,33 @@ def get_special_coin_price(coin: str, max_age_seconds: int = 180) -> Tuple[Dict[
         logger.debug(f"Using cached price data for special coin {coin}")
         return cached_data, True
     
-    # دریافت از API
+    fetch = lambda: _fetch_special_coin_price(coin, cache_key, max_age_seconds)
+    
+    # stale-while-revalidate
+    stale_data = price_cache.get_stale(cache_key)
+    if stale_data:
+        logger.debug(f"Serving stale price data for special coin {coin} while refreshing")
+        _refresh_in_background(cache_key, fetch)
+        return stale_data, True
+    
+    try:
+        return _single_flight(cache_key, fetch), False
+    except Exception as e:
+        logger.error(f"Error fetching special coin price for {coin}: {str(e)}")
+        return {}, False
+
+def _fetch_special_coin_price(coin: str, cache_key: str, max_age_seconds: int) -> Dict[str, Any]:
+    """
+    دریافت قیمت ارز خاص از CryptoCompare و ذخیره آن در حافظه نهان
+    
+    Args:
+        coin: نام ارز دیجیتال
+        cache_key: کلید حافظه نهان
+        max_age_seconds: مدت اعتبار داده در حافظه نهان (ثانیه)
+        
+    Returns:
+        داده قیمت یا دیکشنری خالی
+    """
     try:
         result = market_api.get_price_from_cryptocompare(f"{coin}/USDT")
         
@@ -149,9 +285,9 @@ def get_special_coin_price(coin: str, max_age_seconds: int = 180) -> Tuple[Dict[
             # ذخیره در حافظه نهان
             price_cache.set(cache_key, result, ttl_seconds=max_age_seconds)
             
-            return result, False
+            return result
     except Exception as e:
         logger.error(f"Error fetching special coin price for {coin}: {str(e)}")
     
     # اگر به اینجا رسیدیم، هیچ داده‌ای نیافتیم
-    return {}, False
\ No newline at end of file
+    return {}
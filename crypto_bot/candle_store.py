@@ -0,0 +1,359 @@
+"""
+انبار محلی کندل‌ها (OHLCV Candle Store)
+
+کندل‌ها به تفکیک (نماد، بازه زمانی) در یک پایگاه داده SQLite ذخیره می‌شوند و
+درخواست‌های بازه‌ای از همین انبار پاسخ داده می‌شوند. برای هر سری، بازه پوشش
+داده شده (از اولین تا آخرین کندل دریافت شده) نگهداری می‌شود و فقط کندل‌های
+انتهایی که هنوز در انبار نیستند (به همراه کندل در حال تشکیل) از صرافی دریافت
+می‌شوند. بنابراین تحلیل مکرر یک نماد هیچ درخواست شبکه‌ای ندارد.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# مسیر پایگاه داده کندل‌ها
+CANDLE_DB_FILE = os.environ.get("CANDLE_DB_FILE", "data/candles.db")
+
+# مدت اعتبار کندل در حال تشکیل (ثانیه)
+FORMING_CANDLE_TTL = 60
+
+# طول هر بازه زمانی (ثانیه)
+TIMEFRAME_SECONDS = {
+    "1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800,
+    "1h": 3600, "2h": 7200, "4h": 14400, "6h": 21600, "8h": 28800, "12h": 43200,
+    "1d": 86400, "3d": 259200, "1w": 604800
+}
+
+# کندل‌های هفتگی صرافی از دوشنبه شروع می‌شوند (4 روز پس از مبدأ یونیکس)
+_WEEK_OFFSET = 4 * 86400
+
+# بیشترین تعداد کندل پایه برای ساخت یک بازه بزرگ‌تر (یک صفحه درخواست صرافی)
+MAX_BASE_CANDLES = 1000
+
+# کندل: (timestamp به میلی‌ثانیه، open، high، low، close، volume)
+Candle = Tuple[int, float, float, float, float, float]
+
+# تابع دریافت کندل از صرافی: (نماد، بازه زمانی، زمان شروع به میلی‌ثانیه، تعداد) -> کندل‌ها
+Fetcher = Callable[[str, str, int, int], List[Candle]]
+
+
+def candle_open_time(timestamp: float, timeframe: str) -> int:
+    """
+    زمان شروع کندلی که timestamp در آن قرار دارد
+
+    Args:
+        timestamp: زمان (ثانیه)
+        timeframe: بازه زمانی
+
+    Returns:
+        int: زمان شروع کندل (ثانیه)
+    """
+    step = TIMEFRAME_SECONDS[timeframe]
+    offset = _WEEK_OFFSET if timeframe == "1w" else 0
+    return int((timestamp - offset) // step * step + offset)
+
+
+def can_resample(base: str, timeframe: str) -> bool:
+    """
+    آیا کندل‌های timeframe را می‌توان از کندل‌های base ساخت
+
+    Args:
+        base: بازه زمانی پایه
+        timeframe: بازه زمانی مقصد
+
+    Returns:
+        bool: اگر هر کندل مقصد دقیقاً از چند کندل پایه تشکیل شود
+    """
+    if base not in TIMEFRAME_SECONDS or timeframe not in TIMEFRAME_SECONDS or timeframe == "3d":
+        return False
+    return TIMEFRAME_SECONDS[timeframe] % TIMEFRAME_SECONDS[base] == 0
+
+
+def resample_candles(candles: List[Candle], timeframe: str) -> List[Candle]:
+    """
+    تجمیع برداری کندل‌های ریزتر به کندل‌های بازه زمانی بزرگ‌تر
+
+    آخرین کندل خروجی شامل کندل‌های پایه تا این لحظه است، بنابراین کندل در حال
+    تشکیل بازه بزرگ‌تر همیشه بروز است.
+
+    Args:
+        candles: کندل‌های پایه به ترتیب زمانی
+        timeframe: بازه زمانی مقصد
+
+    Returns:
+        List[Candle]: کندل‌های تجمیع شده
+    """
+    if not candles:
+        return []
+
+    data = np.asarray(candles, dtype=float)
+    step = TIMEFRAME_SECONDS[timeframe]
+    offset = _WEEK_OFFSET if timeframe == "1w" else 0
+    keys = ((data[:, 0] // 1000 - offset) // step * step + offset) * 1000
+
+    boundaries = np.flatnonzero(np.diff(keys)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries - 1, [len(data) - 1]))
+
+    opens = data[starts, 1]
+    highs = np.maximum.reduceat(data[:, 2], starts)
+    lows = np.minimum.reduceat(data[:, 3], starts)
+    closes = data[ends, 4]
+    volumes = np.add.reduceat(data[:, 5], starts)
+
+    return [(int(key), float(o), float(h), float(l), float(c), float(v))
+            for key, o, h, l, c, v in zip(keys[starts], opens, highs, lows, closes, volumes)]
+
+
+def plan_bases(timeframes: Iterable[str], limit: int,
+               max_base_candles: int = MAX_BASE_CANDLES) -> Dict[str, List[str]]:
+    """
+    انتخاب بازه‌های پایه‌ای که باید از صرافی دریافت شوند
+
+    هر بازه زمانی از ریزترین پایه‌ای ساخته می‌شود که بر آن بخش‌پذیر است و برای
+    limit کندل حداکثر max_base_candles کندل پایه لازم دارد؛ در غیر این صورت خودش
+    یک پایه جدید می‌شود.
+
+    Args:
+        timeframes: بازه‌های زمانی مورد نیاز
+        limit: تعداد کندل هر بازه
+        max_base_candles: بیشترین تعداد کندل پایه
+
+    Returns:
+        Dict[str, List[str]]: پایه: بازه‌های زمانی ساخته شده از آن
+    """
+    plan: Dict[str, List[str]] = {}
+    for timeframe in sorted(set(timeframes), key=lambda tf: TIMEFRAME_SECONDS[tf]):
+        for base in plan:
+            ratio = TIMEFRAME_SECONDS[timeframe] // TIMEFRAME_SECONDS[base]
+            if can_resample(base, timeframe) and (limit + 1) * ratio <= max_base_candles:
+                plan[base].append(timeframe)
+                break
+        else:
+            plan[timeframe] = [timeframe]
+    return plan
+
+
+class CandleStore:
+    """انبار کندل‌ها با دریافت فقط کندل‌های جاافتاده"""
+
+    def __init__(self, db_path: str = CANDLE_DB_FILE, fetcher: Optional[Fetcher] = None,
+                 page_size: int = 1000):
+        """
+        راه‌اندازی انبار
+
+        Args:
+            db_path: مسیر فایل SQLite (یا :memory:)
+            fetcher: تابع دریافت کندل از صرافی
+            page_size: بیشترین تعداد کندل در هر درخواست صرافی
+        """
+        self.db_path = db_path
+        self.fetcher = fetcher
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self.network_fetches = 0
+
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS candles (
+                symbol TEXT NOT NULL,
+                timeframe TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                volume REAL NOT NULL,
+                PRIMARY KEY (symbol, timeframe, ts)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS series (
+                symbol TEXT NOT NULL,
+                timeframe TEXT NOT NULL,
+                first_ts INTEGER NOT NULL,
+                last_ts INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (symbol, timeframe)
+            );
+        """)
+        self._conn.commit()
+
+    def get_candles(self, symbol: str, timeframe: str, limit: int = 100,
+                    end_time: Optional[float] = None) -> Optional[List[Candle]]:
+        """
+        دریافت آخرین کندل‌های یک نماد
+
+        Args:
+            symbol: نماد ارز (BTC/USDT)
+            timeframe: بازه زمانی
+            limit: تعداد کندل‌ها
+            end_time: زمان پایان بازه (ثانیه، پیش‌فرض: اکنون)
+
+        Returns:
+            Optional[List[Candle]]: کندل‌ها به ترتیب زمانی یا None در صورت نبود داده
+        """
+        if timeframe not in TIMEFRAME_SECONDS:
+            raise ValueError(f"Unsupported timeframe: {timeframe}")
+
+        now = time.time()
+        step_ms = TIMEFRAME_SECONDS[timeframe] * 1000
+        end_ms = candle_open_time(end_time if end_time is not None else now, timeframe) * 1000
+        start_ms = end_ms - (limit - 1) * step_ms
+
+        if self.fetcher is not None:
+            for fetch_from, fetch_to in self._missing_ranges(symbol, timeframe, start_ms, end_ms, now):
+                try:
+                    self._backfill(symbol, timeframe, fetch_from, fetch_to, step_ms, now)
+                except Exception as e:
+                    logger.warning(f"Error fetching candles for {symbol} {timeframe}: {str(e)}")
+                    break
+
+        candles = self.query(symbol, timeframe, start_ms, end_ms)
+        return candles[-limit:] if candles else None
+
+    def get_candles_multi(self, symbol: str, timeframes: Iterable[str], limit: int = 100,
+                          end_time: Optional[float] = None) -> Dict[str, List[Candle]]:
+        """
+        دریافت کندل‌های چند بازه زمانی از یک سری پایه مشترک
+
+        ریزترین بازه لازم یک بار دریافت شده و بازه‌های بزرگ‌تر به صورت محلی از
+        آن ساخته می‌شوند، بنابراین همه بازه‌ها از یک snapshot یکسان می‌آیند.
+
+        Args:
+            symbol: نماد ارز
+            timeframes: بازه‌های زمانی
+            limit: تعداد کندل هر بازه
+            end_time: زمان پایان بازه (ثانیه، پیش‌فرض: اکنون)
+
+        Returns:
+            Dict[str, List[Candle]]: کندل‌ها به تفکیک بازه زمانی (بازه‌های بدون داده حذف می‌شوند)
+        """
+        timeframes = list(timeframes)
+        unsupported = [tf for tf in timeframes if tf not in TIMEFRAME_SECONDS]
+        if unsupported:
+            raise ValueError(f"Unsupported timeframe: {', '.join(unsupported)}")
+
+        now = end_time if end_time is not None else time.time()
+        result = {}
+        for base, derived in plan_bases(timeframes, limit, min(MAX_BASE_CANDLES, self.page_size)).items():
+            base_step = TIMEFRAME_SECONDS[base]
+            base_end = candle_open_time(now, base)
+            # شروع سری پایه از ابتدای قدیمی‌ترین کندل بازه‌های بزرگ‌تر تا کندل اول کامل باشد
+            first_open = min(candle_open_time(now, tf) - (limit - 1) * TIMEFRAME_SECONDS[tf] for tf in derived)
+            base_limit = (base_end - first_open) // base_step + 1
+
+            candles = self.get_candles(symbol, base, base_limit, end_time)
+            if not candles:
+                continue
+
+            for timeframe in derived:
+                series = candles if timeframe == base else resample_candles(candles, timeframe)
+                result[timeframe] = series[-limit:]
+
+        return result
+
+    def query(self, symbol: str, timeframe: str, start_ms: int, end_ms: int) -> List[Candle]:
+        """
+        دریافت کندل‌های یک بازه از انبار (بدون درخواست شبکه)
+
+        Args:
+            symbol: نماد ارز
+            timeframe: بازه زمانی
+            start_ms: زمان شروع (میلی‌ثانیه)
+            end_ms: زمان پایان (میلی‌ثانیه، شامل)
+
+        Returns:
+            List[Candle]: کندل‌ها به ترتیب زمانی
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT ts, open, high, low, close, volume FROM candles "
+                "WHERE symbol = ? AND timeframe = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+                (symbol, timeframe, start_ms, end_ms)
+            ).fetchall()
+
+    def _missing_ranges(self, symbol: str, timeframe: str, start_ms: int, end_ms: int,
+                        now: float) -> List[Tuple[int, int]]:
+        """بازه‌هایی که باید از صرافی دریافت شوند (ابتدای بازه و/یا کندل‌های انتهایی)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT first_ts, last_ts, fetched_at FROM series WHERE symbol = ? AND timeframe = ?",
+                (symbol, timeframe)
+            ).fetchone()
+
+        if row is None:
+            return [(start_ms, end_ms)]
+
+        first_ts, last_ts, fetched_at = row
+        step_ms = TIMEFRAME_SECONDS[timeframe] * 1000
+        if last_ts < start_ms:
+            # داده‌های ذخیره شده کاملاً قدیمی هستند
+            return [(start_ms, end_ms)]
+
+        ranges = []
+        if first_ts > start_ms:
+            ranges.append((start_ms, first_ts - step_ms))
+        # آخرین کندل ذخیره شده ممکن است هنگام دریافت در حال تشکیل بوده باشد
+        if last_ts <= end_ms and now - fetched_at >= FORMING_CANDLE_TTL:
+            ranges.append((last_ts, end_ms))
+        return ranges
+
+    def _backfill(self, symbol: str, timeframe: str, fetch_from: int, fetch_to: int,
+                  step_ms: int, now: float) -> None:
+        """دریافت صفحه‌به‌صفحه کندل‌های بازه [fetch_from, fetch_to] و ذخیره آن‌ها"""
+        candles: List[Candle] = []
+        cursor = fetch_from
+        while cursor <= fetch_to:
+            count = min(self.page_size, (fetch_to - cursor) // step_ms + 1)
+            page = self.fetcher(symbol, timeframe, cursor, count)
+            self.network_fetches += 1
+            if not page:
+                break
+            candles.extend(candle for candle in page if candle[0] <= fetch_to)
+            if len(page) < count:
+                break
+            cursor = page[-1][0] + step_ms
+
+        with self._lock:
+            if candles:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO candles (symbol, timeframe, ts, open, high, low, close, volume) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(symbol, timeframe) + tuple(candle) for candle in candles]
+                )
+
+            row = self._conn.execute(
+                "SELECT first_ts, last_ts, fetched_at FROM series WHERE symbol = ? AND timeframe = ?",
+                (symbol, timeframe)
+            ).fetchone()
+            first_ts, last_ts = fetch_from, max(fetch_to, candles[-1][0] if candles else fetch_to)
+            fetched_at = now
+            if row is not None and row[0] <= last_ts + step_ms and fetch_from <= row[1] + step_ms:
+                # بازه جدید با بازه قبلی همپوشانی دارد یا به آن متصل است
+                first_ts = min(row[0], first_ts)
+                if row[1] > last_ts:
+                    # فقط ابتدای سری دریافت شد؛ زمان دریافت کندل انتهایی تغییر نمی‌کند
+                    last_ts, fetched_at = row[1], row[2]
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO series (symbol, timeframe, first_ts, last_ts, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (symbol, timeframe, first_ts, last_ts, fetched_at)
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """بستن اتصال پایگاه داده"""
+        with self._lock:
+            self._conn.close()
@@ -8,10 +8,7 @@
 نمودارهای کندل استیک را برای ارزهای دیجیتال تولید می کند.
 """
 
-import os
 import pandas as pd
-import matplotlib.pyplot as plt
-import mplfinance as mpf
 import io
 import logging
 import time
@@ -19,13 +16,48 @@ from datetime import datetime, timedelta
 import ccxt
 import tempfile
 
+from crypto_bot.market_data import get_candles, get_candles_multi
+from crypto_bot.candle_store import candle_open_time, TIMEFRAME_SECONDS
+from crypto_bot.chart_renderer import chart_renderer
+
 # تنظیم لاگر
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("chart_generator")
 
-# مسیر ذخیره موقت تصاویر
-CHART_DIR = "static/charts"
-os.makedirs(CHART_DIR, exist_ok=True)
+# نمونه‌های ساخته شده صرافی‌ها (برای استفاده مجدد از اتصال و اطلاعات بازارها)
+_exchanges = {}
+
+def _get_exchange(ex_id):
+    """
+    دریافت نمونه مشترک یک صرافی ccxt
+    
+    Args:
+        ex_id (str): نام صرافی
+        
+    Returns:
+        ccxt.Exchange: نمونه صرافی
+    """
+    exchange = _exchanges.get(ex_id)
+    if exchange is None:
+        exchange_class = getattr(ccxt, ex_id)
+        exchange = exchange_class({
+            'enableRateLimit': True,
+            'timeout': 30000,
+        })
+        _exchanges[ex_id] = exchange
+    return exchange
+
+def _candles_to_dataframe(candles):
+    """تبدیل کندل‌ها به دیتافریم با ایندکس زمانی"""
+    df = pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    
+    # تبدیل timestamp به datetime
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    
+    # تنظیم timestamp به عنوان ایندکس
+    df.set_index('timestamp', inplace=True)
+    
+    return df
 
 def get_ohlcv_data(symbol, timeframe='1d', limit=30, exchange_id='binance'):
     """
@@ -43,6 +75,15 @@ def get_ohlcv_data(symbol, timeframe='1d', limit=30, exchange_id='binance'):
     try:
         logger.info(f"دریافت داده‌های OHLCV برای {symbol} با بازه زمانی {timeframe} از {exchange_id}")
         
+        # کندل‌های Binance از انبار محلی خوانده می‌شوند و فقط کندل‌های جاافتاده دریافت می‌شوند
+        if exchange_id == 'binance':
+            try:
+                candles = get_candles(symbol, timeframe, limit)
+                if candles:
+                    return _candles_to_dataframe(candles)
+            except Exception as e:
+                logger.error(f"خطا در دریافت داده‌های OHLCV از انبار کندل‌ها: {str(e)}")
+        
         # تلاش برای استفاده از صرافی‌های مختلف در صورت خطا
         exchanges = ['kucoin', 'binance', 'coinex', 'kraken']
         
@@ -56,12 +97,8 @@ def get_ohlcv_data(symbol, timeframe='1d', limit=30, exchange_id='binance'):
         
         for ex_id in exchanges:
             try:
-                # ساخت نمونه از صرافی
-                exchange_class = getattr(ccxt, ex_id)
-                exchange = exchange_class({
-                    'enableRateLimit': True,
-                    'timeout': 30000,
-                })
+                # نمونه مشترک صرافی
+                exchange = _get_exchange(ex_id)
                 
                 # دریافت داده های OHLCV
                 ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
@@ -72,13 +109,7 @@ def get_ohlcv_data(symbol, timeframe='1d', limit=30, exchange_id='binance'):
                     continue
                     
                 # تبدیل به دیتافریم
-                df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-                
-                # تبدیل timestamp به datetime
-                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-                
-                # تنظیم timestamp به عنوان ایندکس
-                df.set_index('timestamp', inplace=True)
+                df = _candles_to_dataframe(ohlcv)
                 
                 logger.info(f"داده‌های OHLCV با موفقیت از {ex_id} دریافت شدند. تعداد کندل‌ها: {len(df)}")
                 
@@ -95,7 +126,7 @@ def get_ohlcv_data(symbol, timeframe='1d', limit=30, exchange_id='binance'):
         logger.error(f"خطا در دریافت داده‌های OHLCV: {str(e)}")
         return None
 
-def generate_candlestick_chart(symbol, timeframe='1d', limit=30, title=None, filename=None):
+def generate_candlestick_chart(symbol, timeframe='1d', limit=30, title=None, filename=None, df=None):
     """
     تولید نمودار کندل استیک
     
@@ -105,6 +136,7 @@ def generate_candlestick_chart(symbol, timeframe='1d', limit=30, title=None, fil
         limit (int): تعداد کندل‌ها
         title (str): عنوان نمودار
         filename (str): نام فایل خروجی
+        df (pandas.DataFrame): داده‌های OHLCV از پیش دریافت شده (اختیاری)
         
     Returns:
         str: مسیر فایل تصویر یا None در صورت خطا
@@ -113,7 +145,8 @@ def generate_candlestick_chart(symbol, timeframe='1d', limit=30, title=None, fil
         logger.info(f"تولید نمودار کندل استیک برای {symbol} با بازه زمانی {timeframe}")
         
         # دریافت داده‌های OHLCV
-        df = get_ohlcv_data(symbol, timeframe, limit)
+        if df is None:
+            df = get_ohlcv_data(symbol, timeframe, limit)
         
         if df is None or len(df) < 2:
             logger.error(f"داده‌های OHLCV برای {symbol} کافی نیستند.")
@@ -122,49 +155,9 @@ def generate_candlestick_chart(symbol, timeframe='1d', limit=30, title=None, fil
         # اگر عنوان تعیین نشده باشد، به صورت خودکار می‌سازیم
         if title is None:
             title = f"نمودار {timeframe} {symbol}"
-            
-        # اگر نام فایل تعیین نشده باشد، به صورت خودکار می‌سازیم
-        if filename is None:
-            timestamp = int(time.time())
-            filename = f"{symbol.replace('/', '_')}_{timeframe}_{timestamp}.png"
-            filename = filename.replace('/', '_')
-            
-        # مسیر کامل فایل
-        filepath = os.path.join(CHART_DIR, filename)
-        
-        # تنظیمات استایل نمودار
-        s = mpf.make_mpf_style(
-            base_mpf_style='yahoo',
-            gridstyle='--',
-            y_on_right=False,
-            marketcolors=mpf.make_marketcolors(
-                up='green',
-                down='red',
-                edge='inherit',
-                wick='inherit',
-                volume='inherit',
-            )
-        )
-        
-        # تولید نمودار کندل استیک با حجم و میانگین متحرک
-        fig, axes = mpf.plot(
-            df,
-            type='candle',
-            title=title,
-            style=s,
-            volume=True,
-            figsize=(12, 8),
-            returnfig=True,
-            mav=(7, 25),  # میانگین‌های متحرک 7 و 25 روزه
-            tight_layout=True
-        )
-        
-        # تنظیم فونت‌های فارسی (اگر فونت فارسی در سیستم نصب شده باشد)
-        plt.rcParams['font.family'] = 'sans-serif'
-        
-        # ذخیره نمودار
-        fig.savefig(filepath, dpi=100)
-        plt.close(fig)
+        
+        # نمودار تکراری در یک دوره کندل از کش برگردانده می‌شود
+        filepath = chart_renderer.get_chart(df, symbol, timeframe, limit, title, filename=filename)
         
         logger.info(f"نمودار کندل استیک با موفقیت در {filepath} ذخیره شد.")
         
@@ -191,8 +184,16 @@ def generate_multi_timeframe_charts(symbol, timeframes=['1d', '4h', '1h'], limit
         
         result = []
         
+        # ریزترین بازه یک بار دریافت و بازه‌های بزرگ‌تر از آن ساخته می‌شوند
+        try:
+            candles = get_candles_multi(symbol, timeframes, limit)
+        except Exception as e:
+            logger.error(f"خطا در دریافت کندل‌های چند بازه زمانی: {str(e)}")
+            candles = {}
+        
         for timeframe in timeframes:
-            filepath = generate_candlestick_chart(symbol, timeframe, limit)
+            df = _candles_to_dataframe(candles[timeframe]) if candles.get(timeframe) else None
+            filepath = generate_candlestick_chart(symbol, timeframe, limit, df=df)
             if filepath:
                 result.append(filepath)
         
@@ -204,29 +205,65 @@ def generate_multi_timeframe_charts(symbol, timeframes=['1d', '4h', '1h'], limit
         logger.error(f"خطا در تولید نمودارهای کندل استیک در بازه‌های زمانی مختلف: {str(e)}")
         return []
 
+def generate_chart_bytes(symbol, timeframe='1d', limit=30, title=None, style='thumbnail', fmt='png'):
+    """
+    تولید نمودار کندل استیک در حافظه بدون نوشتن روی دیسک
+    
+    Args:
+        symbol (str): نماد ارز دیجیتال مانند BTC/USDT
+        timeframe (str): بازه زمانی، مثلا 1d, 4h, 1h, 15m
+        limit (int): تعداد کندل‌ها
+        title (str): عنوان نمودار
+        style (str): نام استایل ('thumbnail' برای تلگرام یا 'default')
+        fmt (str): فرمت تصویر ('png' یا 'webp')
+        
+    Returns:
+        bytes: محتوای تصویر یا None در صورت خطا
+    """
+    try:
+        logger.info(f"تولید نمودار کندل استیک در حافظه برای {symbol} با بازه زمانی {timeframe}")
+        
+        df = get_ohlcv_data(symbol, timeframe, limit)
+        
+        if df is None or len(df) < 2:
+            logger.error(f"داده‌های OHLCV برای {symbol} کافی نیستند.")
+            return None
+        
+        if title is None:
+            title = f"نمودار {timeframe} {symbol}"
+        
+        return chart_renderer.get_chart_bytes(df, symbol, timeframe, limit, title, style=style, fmt=fmt)
+        
+    except Exception as e:
+        logger.error(f"خطا در تولید نمودار کندل استیک در حافظه: {str(e)}")
+        return None
+
 def generate_chart_for_telegram(symbol, timeframe='1d', limit=30):
     """
     تولید نمودار کندل استیک برای ارسال در تلگرام
     
+    نمودار با اندازه کوچک‌تر و مستقیماً در حافظه ساخته می‌شود و می‌تواند بدون فایل
+    موقت به send_telegram_photo داده شود.
+    
     Args:
         symbol (str): نماد ارز دیجیتال مانند BTC/USDT
         timeframe (str): بازه زمانی، مثلا 1d, 4h, 1h, 15m
         limit (int): تعداد کندل‌ها
         
     Returns:
-        str: مسیر فایل تصویر یا None در صورت خطا
+        bytes: محتوای تصویر PNG یا None در صورت خطا
     """
     try:
         logger.info(f"تولید نمودار کندل استیک برای ارسال در تلگرام: {symbol} ({timeframe})")
         
-        # عنوان نمودار را به همراه تاریخ و زمان می‌سازیم
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
-        title = f"نمودار {symbol} - {timeframe} - {current_time}"
+        # عنوان نمودار را به همراه زمان کندل جاری می‌سازیم تا گزارش‌های یک دوره کندل از یک تصویر استفاده کنند
+        now = time.time()
+        candle_time = candle_open_time(now, timeframe) if timeframe in TIMEFRAME_SECONDS else now
+        candle_time = datetime.fromtimestamp(candle_time).strftime("%Y-%m-%d %H:%M")
+        title = f"نمودار {symbol} - {timeframe} - {candle_time}"
         
         # تولید نمودار
-        filepath = generate_candlestick_chart(symbol, timeframe, limit, title=title)
-        
-        return filepath
+        return generate_chart_bytes(symbol, timeframe, limit, title=title, style='thumbnail')
         
     except Exception as e:
         logger.error(f"خطا در تولید نمودار برای تلگرام: {str(e)}")
@@ -235,9 +272,9 @@ def generate_chart_for_telegram(symbol, timeframe='1d', limit=30):
 # آزمایش تابع
 if __name__ == "__main__":
     # تست تولید نمودار برای بیت‌کوین
-    filepath = generate_chart_for_telegram("BTC/USDT", "1d", 30)
+    filepath = generate_candlestick_chart("BTC/USDT", "1d", 30)
     print(f"نمودار در مسیر زیر ذخیره شد: {filepath}")
     
-    # تست تولید نمودار برای اتریوم
-    filepath = generate_chart_for_telegram("ETH/USDT", "1d", 30)
-    print(f"نمودار در مسیر زیر ذخیره شد: {filepath}")
\ No newline at end of file
+    # تست تولید نمودار در حافظه برای اتریوم
+    photo = generate_chart_for_telegram("ETH/USDT", "1d", 30)
+    print(f"حجم نمودار تلگرام: {len(photo) if photo else 0} بایت")
@@ -0,0 +1,413 @@
+"""
+سرویس رندر نمودارهای کندل استیک با کش و پروسس پول جداگانه
+
+هر نمودار با کلیدی از (نماد، بازه زمانی، تعداد کندل، زمان آخرین کندل، استایل و
+عنوان) نام‌گذاری می‌شود؛ بنابراین درخواست‌های تکراری در یک دوره کندل همان تصویر
+قبلی را برمی‌گردانند. نمودارها می‌توانند مستقیماً به صورت bytes (بدون دیسک) نیز
+رندر شوند. رندر matplotlib در پروسس‌های جداگانه انجام می‌شود تا ترد‌های
+وب مسدود نشوند و حجم پوشه نمودارها با حذف قدیمی‌ترین تصاویر (LRU) محدود می‌ماند.
+
+این ماژول عمداً به ماژول‌های داده وابسته نیست تا پروسس‌های رندر سبک بمانند.
+"""
+
+import atexit
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Dict, Any, Optional
+
+import matplotlib.pyplot as plt
+import mplfinance as mpf
+
+logger = logging.getLogger(__name__)
+
+# مسیر ذخیره تصاویر
+CHART_DIR = "static/charts"
+
+# بیشترین حجم پوشه نمودارها (مگابایت)
+CHART_CACHE_MAX_MB = float(os.environ.get("CHART_CACHE_MAX_MB", "100"))
+
+# تعداد پروسس‌های رندر
+CHART_RENDER_WORKERS = int(os.environ.get("CHART_RENDER_WORKERS", "2"))
+
+# بیشترین زمان انتظار برای رندر یک نمودار (ثانیه)
+CHART_RENDER_TIMEOUT = 60
+
+# تعداد تصاویر نگه‌داری شده در کش حافظه (برای رندر بدون دیسک)
+CHART_MEMORY_CACHE_SIZE = int(os.environ.get("CHART_MEMORY_CACHE_SIZE", "32"))
+
+# فرمت‌های خروجی پشتیبانی شده
+CHART_FORMATS = ('png', 'webp')
+
+# استایل‌های نمودار: رنگ‌ها، اندازه (اینچ) و وضوح
+CHART_STYLES = {
+    'default': {
+        'base_mpf_style': 'yahoo',
+        'up': 'green',
+        'down': 'red',
+        'figsize': (12, 8),
+        'dpi': 100,
+        'mav': (7, 25)
+    },
+    # اندازه کوچک‌تر برای تلگرام (تلگرام تصاویر را حداکثر با عرض 1280 پیکسل نمایش می‌دهد)
+    'thumbnail': {
+        'base_mpf_style': 'yahoo',
+        'up': 'green',
+        'down': 'red',
+        'figsize': (8, 5),
+        'dpi': 90,
+        'mav': (7, 25)
+    }
+}
+
+
+@lru_cache(maxsize=None)
+def _get_mpf_style(style: str):
+    """ساخت استایل mplfinance (یک بار برای هر پروسس)"""
+    spec = CHART_STYLES[style]
+    return mpf.make_mpf_style(
+        base_mpf_style=spec['base_mpf_style'],
+        gridstyle='--',
+        y_on_right=False,
+        marketcolors=mpf.make_marketcolors(
+            up=spec['up'],
+            down=spec['down'],
+            edge='inherit',
+            wick='inherit',
+            volume='inherit',
+        )
+    )
+
+
+def render_chart_bytes(df, title: str, style: str = 'default', fmt: str = 'png') -> bytes:
+    """
+    رندر نمودار کندل استیک در حافظه (در پروسس رندر اجرا می‌شود)
+
+    Args:
+        df: داده‌های OHLCV با ایندکس زمانی
+        title: عنوان نمودار
+        style: نام استایل
+        fmt: فرمت تصویر (png یا webp)
+
+    Returns:
+        bytes: محتوای تصویر
+    """
+    spec = CHART_STYLES[style]
+
+    # تولید نمودار کندل استیک با حجم و میانگین متحرک
+    fig, axes = mpf.plot(
+        df,
+        type='candle',
+        title=title,
+        style=_get_mpf_style(style),
+        volume=True,
+        figsize=spec['figsize'],
+        returnfig=True,
+        mav=spec['mav'],  # میانگین‌های متحرک 7 و 25 روزه
+        tight_layout=True
+    )
+
+    # تنظیم فونت‌های فارسی (اگر فونت فارسی در سیستم نصب شده باشد)
+    plt.rcParams['font.family'] = 'sans-serif'
+
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, dpi=spec['dpi'], format=fmt)
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+def render_chart_file(df, title: str, filepath: str, style: str = 'default') -> str:
+    """
+    رندر نمودار کندل استیک در فایل (در پروسس رندر اجرا می‌شود)
+
+    Args:
+        df: داده‌های OHLCV با ایندکس زمانی
+        title: عنوان نمودار
+        filepath: مسیر فایل خروجی
+        style: نام استایل
+
+    Returns:
+        str: مسیر فایل تصویر
+    """
+    data = render_chart_bytes(df, title, style, 'png')
+
+    # ذخیره در فایل موقت و جایگزینی اتمیک تا تصویر نیمه‌کاره خوانده نشود
+    temp_path = f"{filepath}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, filepath)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return filepath
+
+
+def chart_key(symbol: str, timeframe: str, limit: int, last_candle: Any,
+              style: str = 'default', title: str = "") -> str:
+    """
+    کلید محتوایی یک نمودار
+
+    Args:
+        symbol: نماد ارز
+        timeframe: بازه زمانی
+        limit: تعداد کندل‌ها
+        last_candle: زمان آخرین کندل
+        style: نام استایل
+        title: عنوان نمودار
+
+    Returns:
+        str: کلید هگز
+    """
+    raw = "|".join(str(part) for part in (symbol, timeframe, limit, last_candle, style, title))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+class ChartRenderer:
+    """
+    کش نمودارها با رندر در پروسس پول و پاکسازی LRU پوشه نمودارها
+    """
+
+    def __init__(self, chart_dir: str = CHART_DIR, max_bytes: int = int(CHART_CACHE_MAX_MB * 1024 * 1024),
+                 workers: int = CHART_RENDER_WORKERS):
+        """
+        مقداردهی اولیه
+
+        Args:
+            chart_dir: مسیر پوشه نمودارها
+            max_bytes: بیشترین حجم پوشه نمودارها
+            workers: تعداد پروسس‌های رندر (0 یعنی رندر در همین پروسس)
+        """
+        self.chart_dir = chart_dir
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._pool = None
+        self._inflight: Dict[str, Future] = {}
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+        self.evictions = 0
+        os.makedirs(chart_dir, exist_ok=True)
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        """ایجاد تنبل پروسس پول رندر"""
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._pool is None:
+                # spawn از کپی شدن ترد‌ها و قفل‌های پروسس وب جلوگیری می‌کند
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _run(self, func, *args):
+        """اجرای رندر در پروسس پول و در صورت خرابی پول، در همین پروسس"""
+        pool = self._get_pool()
+        if pool is not None:
+            try:
+                return pool.submit(func, *args).result(timeout=CHART_RENDER_TIMEOUT)
+            except BrokenProcessPool:
+                logger.warning("Chart render pool is broken, rendering in-process")
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = None
+        return func(*args)
+
+    def _render(self, df, title: str, filepath: str, style: str) -> str:
+        """رندر نمودار در فایل"""
+        return self._run(render_chart_file, df, title, filepath, style)
+
+    def _single_flight(self, key: str, produce):
+        """درخواست‌های همزمان یک کلید منتظر همان رندر می‌مانند"""
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            return future.result(timeout=CHART_RENDER_TIMEOUT)
+
+        try:
+            result = produce()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get_chart_bytes(self, df, symbol: str, timeframe: str, limit: int, title: str,
+                        style: str = 'thumbnail', fmt: str = 'png') -> bytes:
+        """
+        دریافت محتوای تصویر نمودار بدون نوشتن روی دیسک
+
+        Args:
+            df: داده‌های OHLCV با ایندکس زمانی
+            symbol: نماد ارز
+            timeframe: بازه زمانی
+            limit: تعداد کندل‌ها
+            title: عنوان نمودار
+            style: نام استایل
+            fmt: فرمت تصویر (png یا webp)
+
+        Returns:
+            bytes: محتوای تصویر
+        """
+        if style not in CHART_STYLES:
+            raise ValueError(f"Unknown chart style: {style}")
+        if fmt not in CHART_FORMATS:
+            raise ValueError(f"Unsupported chart format: {fmt}")
+
+        key = chart_key(symbol, timeframe, limit, df.index[-1], f"{style}.{fmt}", title)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+
+        def produce():
+            data = self._run(render_chart_bytes, df, title, style, fmt)
+            self.renders += 1
+            with self._lock:
+                self._memory[key] = data
+                while len(self._memory) > CHART_MEMORY_CACHE_SIZE:
+                    self._memory.popitem(last=False)
+            return data
+
+        return self._single_flight(key, produce)
+
+    def get_chart(self, df, symbol: str, timeframe: str, limit: int, title: str,
+                  style: str = 'default', filename: Optional[str] = None) -> str:
+        """
+        دریافت مسیر نمودار از کش یا رندر آن
+
+        Args:
+            df: داده‌های OHLCV با ایندکس زمانی
+            symbol: نماد ارز
+            timeframe: بازه زمانی
+            limit: تعداد کندل‌ها
+            title: عنوان نمودار
+            style: نام استایل
+            filename: نام فایل خروجی (اختیاری؛ بدون کش)
+
+        Returns:
+            str: مسیر فایل تصویر
+        """
+        if style not in CHART_STYLES:
+            raise ValueError(f"Unknown chart style: {style}")
+
+        if filename is not None:
+            filepath = self._render(df, title, os.path.join(self.chart_dir, filename), style)
+            self.cleanup()
+            return filepath
+
+        key = chart_key(symbol, timeframe, limit, df.index[-1], style, title)
+        filepath = os.path.join(self.chart_dir, f"{symbol.replace('/', '_')}_{timeframe}_{key}.png")
+
+        if os.path.exists(filepath):
+            # بروزرسانی زمان دسترسی برای ترتیب LRU
+            os.utime(filepath)
+            self.hits += 1
+            return filepath
+
+        def produce():
+            self._render(df, title, filepath, style)
+            self.renders += 1
+            self.cleanup()
+            return filepath
+
+        return self._single_flight(key, produce)
+
+    def cleanup(self) -> int:
+        """
+        حذف قدیمی‌ترین تصاویر تا حجم پوشه از حد مجاز کمتر شود
+
+        Returns:
+            int: تعداد فایل‌های حذف شده
+        """
+        files = []
+        total = 0
+        try:
+            with os.scandir(self.chart_dir) as entries:
+                for entry in entries:
+                    if not entry.is_file() or not entry.name.endswith('.png'):
+                        continue
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        except OSError as e:
+            logger.error(f"Error scanning chart directory: {str(e)}")
+            return 0
+
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        self.evictions += removed
+        return removed
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        دریافت وضعیت کش نمودارها
+
+        Returns:
+            Dict[str, Any]: آمار کش و تنظیمات
+        """
+        return {
+            'chart_dir': self.chart_dir,
+            'max_bytes': self.max_bytes,
+            'workers': self.workers,
+            'hits': self.hits,
+            'memory_items': len(self._memory),
+            'renders': self.renders,
+            'evictions': self.evictions
+        }
+
+    def shutdown(self) -> None:
+        """توقف پروسس پول رندر"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def create_chart_renderer(chart_dir: str = CHART_DIR) -> ChartRenderer:
+    """
+    ایجاد سرویس رندر نمودار و ثبت توقف آن هنگام خروج
+
+    Args:
+        chart_dir: مسیر پوشه نمودارها
+
+    Returns:
+        ChartRenderer: سرویس رندر
+    """
+    renderer = ChartRenderer(chart_dir)
+    atexit.register(renderer.shutdown)
+    return renderer
+
+
+# سرویس مشترک رندر نمودار برای کل برنامه
+chart_renderer = create_chart_renderer()
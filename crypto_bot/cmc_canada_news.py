@@ -6,10 +6,10 @@ including CMC Markets Canada and other Canadian crypto news sources.
 """
 import time
 import logging
-import requests
 from bs4 import BeautifulSoup
 from trafilatura import fetch_url, extract
 from crypto_bot.cache_manager import news_cache
+from crypto_bot.http_client import http_client
 
 # تنظیم لاگر
 logger = logging.getLogger(__name__)
@@ -60,7 +60,7 @@ def get_cmc_canada_news(max_items=5, use_cache=True):
     
     try:
         # دریافت صفحه اخبار
-        response = requests.get(CMC_CANADA_NEWS_URL, timeout=10)
+        response = http_client.get(CMC_CANADA_NEWS_URL, timeout=10)
         if response.status_code != 200:
             logger.error(f"Error fetching CMC Markets Canada news: {response.status_code}")
             return news_items
@@ -156,7 +156,7 @@ def get_cmc_canada_crypto_analysis(max_items=3, use_cache=True):
     
     try:
         # دریافت صفحه تحلیل‌های ارز دیجیتال
-        response = requests.get(CMC_CANADA_CRYPTO_URL, timeout=10)
+        response = http_client.get(CMC_CANADA_CRYPTO_URL, timeout=10)
         if response.status_code != 200:
             logger.error(f"Error fetching CMC Markets Canada crypto analysis: {response.status_code}")
             return analysis_items
@@ -309,7 +309,7 @@ def get_ndax_blog_news(max_items=5, use_cache=True):
     
     try:
         # Get blog page
-        response = requests.get(NDAX_BLOG_URL, timeout=10)
+        response = http_client.get(NDAX_BLOG_URL, timeout=10)
         if response.status_code != 200:
             logger.error(f"Error fetching NDAX blog: {response.status_code}")
             return news_items
@@ -402,7 +402,7 @@ def get_bitbuy_blog_news(max_items=5, use_cache=True):
     
     try:
         # Get blog page
-        response = requests.get(BITBUY_BLOG_URL, timeout=10)
+        response = http_client.get(BITBUY_BLOG_URL, timeout=10)
         if response.status_code != 200:
             logger.error(f"Error fetching Bitbuy blog: {response.status_code}")
             return news_items
@@ -495,7 +495,7 @@ def get_newton_learn_articles(max_items=5, use_cache=True):
     
     try:
         # Get learn page
-        response = requests.get(NEWTON_LEARN_URL, timeout=10)
+        response = http_client.get(NEWTON_LEARN_URL, timeout=10)
         if response.status_code != 200:
             logger.error(f"Error fetching Newton learn articles: {response.status_code}")
             return articles
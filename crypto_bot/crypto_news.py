@@ -7,7 +7,6 @@ and provides functionality for categorizing, translating, and sentiment analysis
 
 import os
 import logging
-import requests
 import json
 import time
 from datetime import datetime, timedelta
@@ -17,6 +16,10 @@ import trafilatura
 from openai import OpenAI
 from typing import List, Dict, Any, Optional
 
+from crypto_bot.http_client import http_client
+from crypto_bot.openai_service import create_chat_completion
+from crypto_bot.quota_manager import quota_manager
+
 # Add access to the new cryptocurrency news API
 try:
     from crypto_bot.crypto_news_api import (
@@ -72,10 +75,121 @@ logger = logging.getLogger(__name__)
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 CRYPTOCOMPARE_API_KEY = os.environ.get("CRYPTOCOMPARE_API_KEY")
 
+# News sources (shared with the async client in crypto_bot.async_client)
+CRYPTOCOMPARE_NEWS_URL = "https://min-api.cryptocompare.com/data/v2/news/"
+COINDESK_URL = "https://www.coindesk.com/"
+COINTELEGRAPH_URL = "https://cointelegraph.com/"
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
 # Set Toronto timezone
 toronto_tz = pytz.timezone('America/Toronto')
 
 
+def _parse_cryptocompare_news(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Extract news items from a CryptoCompare news response
+    
+    Args:
+        data (Dict[str, Any]): JSON response
+        
+    Returns:
+        List[Dict[str, Any]]: List of news items
+    """
+    if data.get("Response") == "Success" or data.get("Type") == 100:
+        return data.get("Data", [])
+    logger.warning(f"Error in CryptoCompare response: {data.get('Message')}")
+    return []
+
+
+def _parse_coindesk_html(html: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Extract news items from the CoinDesk home page
+    
+    Args:
+        html (str): Page HTML
+        limit (int): Number of news items needed
+        
+    Returns:
+        List[Dict[str, Any]]: List of news items
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    articles = []
+    
+    for article in soup.select('article')[:limit]:
+        try:
+            title_elem = article.select_one('h6') or article.select_one('h5') or article.select_one('h4')
+            link_elem = article.select_one('a')
+            
+            if title_elem and link_elem:
+                title = title_elem.text.strip()
+                link = link_elem.get('href', '')
+                if not link.startswith('http'):
+                    link = f"https://www.coindesk.com{link}"
+                
+                # Get image if available
+                img_elem = article.select_one('img')
+                image_url = img_elem.get('src', '') if img_elem else ''
+                
+                articles.append({
+                    "title": title,
+                    "url": link,
+                    "imageurl": image_url,
+                    "source": "CoinDesk",
+                    "published_on": int(time.time())
+                })
+        except Exception as e:
+            logger.error(f"Error processing CoinDesk article: {str(e)}")
+            continue
+    
+    return articles
+
+
+def _parse_cointelegraph_html(html: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    استخراج اخبار از صفحه اصلی CoinTelegraph
+    
+    Args:
+        html (str): HTML صفحه
+        limit (int): تعداد اخبار مورد نیاز
+        
+    Returns:
+        List[Dict[str, Any]]: لیست اخبار
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    articles = []
+    
+    # مقالات اصلی
+    for article in soup.select('.post-card')[:limit]:
+        try:
+            title_elem = article.select_one('.post-card__title')
+            link_elem = article.select_one('a.post-card__link')
+            
+            if title_elem and link_elem:
+                title = title_elem.text.strip()
+                link = link_elem.get('href', '')
+                if not link.startswith('http'):
+                    link = f"https://cointelegraph.com{link}"
+                
+                # دریافت تصویر اگر موجود باشد
+                img_elem = article.select_one('img')
+                image_url = img_elem.get('src', '') if img_elem else ''
+                
+                articles.append({
+                    "title": title,
+                    "url": link,
+                    "imageurl": image_url,
+                    "source": "CoinTelegraph",
+                    "published_on": int(time.time())
+                })
+        except Exception as e:
+            logger.error(f"Error processing CoinTelegraph article: {str(e)}")
+            continue
+    
+    return articles
+
+
 def get_cryptocompare_news(limit: int = 10, lang: str = "EN") -> List[Dict[str, Any]]:
     """
     Get news from CryptoCompare API
@@ -88,16 +202,11 @@ def get_cryptocompare_news(limit: int = 10, lang: str = "EN") -> List[Dict[str,
         List[Dict[str, Any]]: List of retrieved news items
     """
     try:
-        url = f"https://min-api.cryptocompare.com/data/v2/news/?lang={lang}&api_key={CRYPTOCOMPARE_API_KEY}&limit={limit}"
-        response = requests.get(url, timeout=10)
+        params = {"lang": lang, "api_key": CRYPTOCOMPARE_API_KEY, "limit": limit}
+        response = http_client.get(CRYPTOCOMPARE_NEWS_URL, params=params, timeout=10)
         
         if response.status_code == 200:
-            data = response.json()
-            if data.get("Response") == "Success" or data.get("Type") == 100:
-                return data.get("Data", [])
-            else:
-                logger.warning(f"Error in CryptoCompare response: {data.get('Message')}")
-                return []
+            return _parse_cryptocompare_news(response.json())
         else:
             logger.warning(f"Error in CryptoCompare request: {response.status_code}")
             return []
@@ -117,43 +226,10 @@ def get_coindesk_news(limit: int = 5) -> List[Dict[str, Any]]:
         List[Dict[str, Any]]: List of retrieved news items
     """
     try:
-        url = "https://www.coindesk.com/"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=15)
+        response = http_client.get(COINDESK_URL, headers=BROWSER_HEADERS, timeout=15)
         
         if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            articles = []
-            
-            for article in soup.select('article')[:limit]:
-                try:
-                    title_elem = article.select_one('h6') or article.select_one('h5') or article.select_one('h4')
-                    link_elem = article.select_one('a')
-                    
-                    if title_elem and link_elem:
-                        title = title_elem.text.strip()
-                        link = link_elem.get('href', '')
-                        if not link.startswith('http'):
-                            link = f"https://www.coindesk.com{link}"
-                        
-                        # Get image if available
-                        img_elem = article.select_one('img')
-                        image_url = img_elem.get('src', '') if img_elem else ''
-                        
-                        articles.append({
-                            "title": title,
-                            "url": link,
-                            "imageurl": image_url,
-                            "source": "CoinDesk",
-                            "published_on": int(time.time())
-                        })
-                except Exception as e:
-                    logger.error(f"Error processing CoinDesk article: {str(e)}")
-                    continue
-            
-            return articles
+            return _parse_coindesk_html(response.text, limit)
         else:
             logger.warning(f"Error in CoinDesk request: {response.status_code}")
             return []
@@ -173,44 +249,10 @@ def get_cointelegraph_news(limit: int = 5) -> List[Dict[str, Any]]:
         List[Dict[str, Any]]: لیست اخبار دریافت شده
     """
     try:
-        url = "https://cointelegraph.com/"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=15)
+        response = http_client.get(COINTELEGRAPH_URL, headers=BROWSER_HEADERS, timeout=15)
         
         if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            articles = []
-            
-            # مقالات اصلی
-            for article in soup.select('.post-card')[:limit]:
-                try:
-                    title_elem = article.select_one('.post-card__title')
-                    link_elem = article.select_one('a.post-card__link')
-                    
-                    if title_elem and link_elem:
-                        title = title_elem.text.strip()
-                        link = link_elem.get('href', '')
-                        if not link.startswith('http'):
-                            link = f"https://cointelegraph.com{link}"
-                        
-                        # دریافت تصویر اگر موجود باشد
-                        img_elem = article.select_one('img')
-                        image_url = img_elem.get('src', '') if img_elem else ''
-                        
-                        articles.append({
-                            "title": title,
-                            "url": link,
-                            "imageurl": image_url,
-                            "source": "CoinTelegraph",
-                            "published_on": int(time.time())
-                        })
-                except Exception as e:
-                    logger.error(f"Error processing CoinTelegraph article: {str(e)}")
-                    continue
-            
-            return articles
+            return _parse_cointelegraph_html(response.text, limit)
         else:
             logger.warning(f"Error in CoinTelegraph request: {response.status_code}")
             return []
@@ -240,7 +282,7 @@ def extract_article_content(url: str) -> str:
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
-        response = requests.get(url, headers=headers, timeout=15)
+        response = http_client.get(url, headers=headers, timeout=15)
         
         if response.status_code == 200:
             soup = BeautifulSoup(response.text, 'html.parser')
@@ -281,24 +323,12 @@ def translate_news(news_items: List[Dict[str, Any]], target_language: str = "fa"
             item['title_fa'] = item['title']
         return news_items
     
-    # Check if we should attempt translation
-    translation_cache_path = os.path.join(os.path.dirname(__file__), "translation_status.json")
-    try:
-        if os.path.exists(translation_cache_path):
-            with open(translation_cache_path, 'r') as f:
-                translation_status = json.load(f)
-                
-            # If we hit rate limits recently, skip translation for a while
-            if translation_status.get('rate_limited', False):
-                last_error_time = translation_status.get('last_error_time', 0)
-                if time.time() - last_error_time < 3600:  # Wait 1 hour after rate limit
-                    logger.warning("Translation skipped: Rate limit cooldown period (1 hour)")
-                    # Set English title as the default for all items
-                    for item in news_items:
-                        item['title_fa'] = item['title']
-                    return news_items
-    except Exception as cache_err:
-        logger.error(f"Error reading translation status cache: {str(cache_err)}")
+    # If OpenAI is rate limited or failing, skip translation until its cooldown ends
+    if not quota_manager.is_available('openai'):
+        logger.warning("Translation skipped: OpenAI is cooling down after rate limit or errors")
+        for item in news_items:
+            item['title_fa'] = item['title']
+        return news_items
     
     try:
         client = OpenAI(api_key=OPENAI_API_KEY)
@@ -314,7 +344,8 @@ def translate_news(news_items: List[Dict[str, Any]], target_language: str = "fa"
             prompt = "Translate the following titles from English to Persian naturally and fluently:\n\n" + titles_formatted + "\n\nRespond with just the translated titles with numbers, no explanations or introductions."
             
             try:
-                response = client.chat.completions.create(
+                response = create_chat_completion(
+                    client,
                     model="gpt-4o",
                     messages=[{"role": "user", "content": prompt}],
                     temperature=0.2,
@@ -347,43 +378,18 @@ def translate_news(news_items: List[Dict[str, Any]], target_language: str = "fa"
                     item['title_fa'] = item['title']
                     translated_items.append(item)
                 
-                # If it's a rate limit error, store this information
-                error_str = str(batch_error).lower()
-                if "429" in error_str or "rate" in error_str or "limit" in error_str or "quota" in error_str:
-                    try:
-                        # Create translation status cache
-                        with open(translation_cache_path, 'w') as f:
-                            json.dump({
-                                "rate_limited": True,
-                                "last_error_time": time.time(),
-                                "error": str(batch_error)
-                            }, f)
-                        logger.warning("Rate limit detected. Translation will be disabled for 1 hour.")
-                    except Exception as cache_err:
-                        logger.error(f"Error writing translation status cache: {str(cache_err)}")
-                    
-                    # Stop processing more batches if we hit rate limits
+                # Stop processing more batches once OpenAI is rate limited or failing
+                if not quota_manager.is_available('openai'):
+                    logger.warning("OpenAI unavailable, remaining titles are left untranslated")
+                    for item in news_items[i + 4:]:
+                        item['title_fa'] = item['title']
+                        translated_items.append(item)
                     break
         
         return translated_items
     except Exception as e:
         logger.error(f"Error translating news: {str(e)}")
         
-        # If it's a rate limit error, store this information
-        error_str = str(e).lower()
-        if "429" in error_str or "rate" in error_str or "limit" in error_str or "quota" in error_str:
-            try:
-                # Create translation status cache
-                with open(translation_cache_path, 'w') as f:
-                    json.dump({
-                        "rate_limited": True,
-                        "last_error_time": time.time(),
-                        "error": str(e)
-                    }, f)
-                logger.warning("Rate limit detected. Translation will be disabled for 1 hour.")
-            except Exception as cache_err:
-                logger.error(f"Error writing translation status cache: {str(cache_err)}")
-        
         # If translation fails, return the original news
         for item in news_items:
             item['title_fa'] = item['title']
@@ -471,16 +477,16 @@ def get_crypto_news(limit: int = 10, translate: bool = False, include_canada: bo
     source_count = 4 if include_canada else 3
     per_source = limit // source_count + 1
     
-    # دریافت اخبار از منابع مختلف
-    cryptocompare_news = get_cryptocompare_news(limit=per_source)
-    coindesk_news = get_coindesk_news(limit=per_source)
-    cointelegraph_news = get_cointelegraph_news(limit=per_source)
-    
-    # ترکیب اخبار
+    # دریافت همزمان اخبار از منابع مختلف روی event loop مشترک کلاینت ناهمگام
     all_news = []
-    all_news.extend(cryptocompare_news)
-    all_news.extend(coindesk_news)
-    all_news.extend(cointelegraph_news)
+    try:
+        from crypto_bot.async_client import async_client, fetch_news_async
+        all_news.extend(async_client.run(fetch_news_async(per_source)))
+    except Exception as e:
+        logger.error(f"Error getting news with the async client: {str(e)}")
+        all_news.extend(get_cryptocompare_news(limit=per_source))
+        all_news.extend(get_coindesk_news(limit=per_source))
+        all_news.extend(get_cointelegraph_news(limit=per_source))
     
     # اضافه کردن اخبار CMC Markets Canada
     if include_canada:
@@ -628,7 +634,8 @@ def get_crypto_sentiment_analysis() -> Dict[str, Any]:
 """
         prompt = prompt_first_part + news_titles + prompt_second_part
         
-        response = client.chat.completions.create(
+        response = create_chat_completion(
+            client,
             model="gpt-4o",
             messages=[{"role": "user", "content": prompt}],
             response_format={"type": "json_object"},
@@ -685,7 +692,7 @@ def get_fear_greed_index() -> Dict[str, Any]:
     """
     try:
         url = "https://api.alternative.me/fng/"
-        response = requests.get(url, timeout=10)
+        response = http_client.get(url, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
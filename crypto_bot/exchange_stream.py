@@ -0,0 +1,520 @@
+"""
+دریافت جریانی قیمت‌ها از صرافی (WebSocket)
+
+این ماژول به جریان تیکر 24 ساعته Binance متصل شده و برای هر نماد آخرین قیمت و
+دفتر 24 ساعته (باز، بیشترین، کمترین، حجم و درصد تغییر) را در حافظه نگه می‌دارد.
+بروزرسانی‌ها به صورت دسته‌ای در snapshot سرویس price_ticker منتشر می‌شوند، بنابراین
+تأخیر قیمت به کمتر از یک ثانیه می‌رسد و نمادهای تحت پوشش جریان دیگر با REST
+دریافت نمی‌شوند. در صورت قطع اتصال، اتصال مجدد با تأخیر نمایی انجام می‌شود.
+
+برای توسعه و آزمایش بدون دسترسی به صرافی، کلاس LocalTickerServer یک سرور
+WebSocket محلی با داده‌های ساختگی در قالب Binance فراهم می‌کند:
+
+    python -m crypto_bot.exchange_stream --local
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import socketserver
+import threading
+import time
+from typing import Callable, Dict, Any, Iterable, List, Optional
+
+from crypto_bot.price_ticker import price_ticker, normalize_symbol
+
+logger = logging.getLogger(__name__)
+
+# کنترل دسترسی به کتابخانه websocket-client
+WEBSOCKET_AVAILABLE = False
+_websocket = None
+
+try:
+    import websocket
+    WEBSOCKET_AVAILABLE = True
+    _websocket = websocket
+except ImportError as e:
+    logger.warning(f"websocket-client library not installed ({str(e)}). Exchange streaming will be disabled.")
+
+# آدرس جریان ترکیبی Binance (قابل تغییر برای سرور محلی)
+BINANCE_WS_URL = os.environ.get("BINANCE_WS_URL", "wss://stream.binance.com:9443/stream")
+
+# فعال‌سازی دریافت جریانی هنگام شروع برنامه
+STREAM_ENABLED = os.environ.get("PRICE_STREAM_ENABLED", "0") == "1"
+
+# حداقل فاصله انتشار بروزرسانی‌ها در snapshot (ثانیه)
+PUBLISH_INTERVAL = 0.5
+
+# مهلت دریافت پیام؛ پس از آن اتصال مرده فرض شده و دوباره برقرار می‌شود (ثانیه)
+RECV_TIMEOUT = 30
+
+# بیشترین تأخیر بین تلاش‌های اتصال مجدد (ثانیه)
+MAX_RECONNECT_DELAY = 30
+
+# فاصله بررسی تغییر نمادهای تحت نظر (ثانیه)
+SYMBOLS_CHECK_INTERVAL = 10
+
+
+def _stream_name(symbol: str) -> Optional[str]:
+    """
+    تبدیل نماد به نام جریان تیکر Binance (BTC/USDT -> btcusdt@ticker)
+
+    Args:
+        symbol: نماد ارز
+
+    Returns:
+        Optional[str]: نام جریان یا None
+    """
+    parts = normalize_symbol(symbol).split('/')
+    if len(parts) != 2 or not parts[0] or not parts[1]:
+        return None
+    return f"{parts[0]}{parts[1]}".lower() + "@ticker"
+
+
+def parse_ticker_message(message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    تبدیل پیام تیکر 24 ساعته Binance به داده قیمت
+
+    Args:
+        message: پیام دریافتی (ترکیبی یا تکی)
+
+    Returns:
+        Optional[Dict[str, Any]]: شامل exchange_symbol و داده‌های دفتر 24 ساعته یا None
+    """
+    data = message.get('data', message)
+    if not isinstance(data, dict) or data.get('e') != '24hrTicker':
+        return None
+
+    try:
+        price = float(data['c'])
+        return {
+            'exchange_symbol': data['s'],
+            'price': price,
+            'open_24h': float(data['o']),
+            'high_24h': float(data['h']),
+            'low_24h': float(data['l']),
+            'change_24h': float(data['P']),
+            'volume_24h': float(data['q']),
+            'event_time': int(data['E']) / 1000.0,
+            'source': 'Binance Stream'
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class ExchangeStream:
+    """دریافت جریانی تیکر صرافی با اتصال مجدد خودکار"""
+
+    def __init__(self, url: str = BINANCE_WS_URL,
+                 symbols_provider: Optional[Callable[[], Iterable[str]]] = None,
+                 publish: Optional[Callable[[Dict[str, Dict[str, Any]]], Any]] = None,
+                 publish_interval: float = PUBLISH_INTERVAL):
+        """
+        راه‌اندازی جریان
+
+        Args:
+            url: آدرس پایه جریان ترکیبی
+            symbols_provider: تابع برگرداننده نمادهای تحت نظر (پیش‌فرض: price_ticker)
+            publish: تابع انتشار بروزرسانی‌ها (پیش‌فرض: price_ticker.publish_prices)
+            publish_interval: حداقل فاصله انتشار (ثانیه)
+        """
+        self.url = url
+        self.symbols_provider = symbols_provider or price_ticker.watched_symbols
+        self.publish = publish or price_ticker.publish_prices
+        self.publish_interval = publish_interval
+        self._books: Dict[str, Dict[str, Any]] = {}  # نماد: آخرین قیمت و دفتر 24 ساعته
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._symbol_map: Dict[str, str] = {}  # BTCUSDT: BTC/USDT
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._ws = None
+        self._thread = None
+        self.running = False
+        self.connected = False
+        self.reconnects = 0
+        self.messages = 0
+
+    def get_book(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        دریافت آخرین قیمت و دفتر 24 ساعته یک نماد
+
+        Args:
+            symbol: نماد ارز
+
+        Returns:
+            Optional[Dict[str, Any]]: داده قیمت یا None
+        """
+        book = self._books.get(normalize_symbol(symbol))
+        return dict(book) if book else None
+
+    def get_books(self) -> Dict[str, Dict[str, Any]]:
+        """
+        دریافت دفتر همه نمادها
+
+        Returns:
+            Dict[str, Dict[str, Any]]: داده‌های قیمت به تفکیک نماد
+        """
+        with self._lock:
+            return {symbol: dict(book) for symbol, book in self._books.items()}
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        دریافت وضعیت جریان
+
+        Returns:
+            Dict[str, Any]: وضعیت اتصال و آمار پیام‌ها
+        """
+        return {
+            'running': self.running,
+            'connected': self.connected,
+            'url': self.url,
+            'symbols': len(self._symbol_map),
+            'messages': self.messages,
+            'reconnects': self.reconnects
+        }
+
+    def _build_url(self, symbols: List[str]) -> Optional[str]:
+        """ساخت آدرس جریان ترکیبی برای نمادها"""
+        symbol_map = {}
+        streams = []
+        for symbol in symbols:
+            name = _stream_name(symbol)
+            if name:
+                symbol_map[name.split('@')[0].upper()] = normalize_symbol(symbol)
+                streams.append(name)
+
+        if not streams:
+            return None
+
+        self._symbol_map = symbol_map
+        return f"{self.url}?streams={'/'.join(streams)}"
+
+    def handle_message(self, raw: str) -> None:
+        """
+        پردازش یک پیام دریافتی از جریان
+
+        Args:
+            raw: متن JSON پیام
+        """
+        try:
+            message = json.loads(raw)
+        except (TypeError, ValueError):
+            return
+
+        parsed = parse_ticker_message(message)
+        if parsed is None:
+            return
+
+        symbol = self._symbol_map.get(parsed.pop('exchange_symbol'))
+        if symbol is None:
+            return
+
+        parsed['updated_at'] = time.time()
+        with self._lock:
+            self._books[symbol] = parsed
+            self._pending[symbol] = parsed
+        self.messages += 1
+
+    def flush(self) -> int:
+        """
+        انتشار بروزرسانی‌های در انتظار
+
+        Returns:
+            int: تعداد نمادهای منتشر شده
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            try:
+                self.publish(pending)
+            except Exception as e:
+                logger.error(f"Error publishing streamed prices: {str(e)}")
+        return len(pending)
+
+    def start(self) -> bool:
+        """
+        شروع دریافت جریانی
+
+        Returns:
+            bool: وضعیت شروع
+        """
+        if not WEBSOCKET_AVAILABLE:
+            logger.warning("Exchange stream not started: websocket-client is not installed")
+            return False
+
+        with self._lock:
+            if self.running:
+                return False
+            self.running = True
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="exchange-stream", daemon=True)
+            self._thread.start()
+        logger.info(f"Exchange stream started ({self.url})")
+        return True
+
+    def stop(self) -> bool:
+        """
+        توقف دریافت جریانی
+
+        Returns:
+            bool: وضعیت توقف
+        """
+        if not self.running:
+            return False
+        self.running = False
+        self._stop_event.set()
+        self._close()
+        logger.info("Exchange stream stopped")
+        return True
+
+    def _close(self) -> None:
+        ws = self._ws
+        self._ws = None
+        self.connected = False
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def _run(self) -> None:
+        """حلقه اتصال با تأخیر نمایی بین تلاش‌ها"""
+        delay = 1
+        while self.running:
+            symbols = sorted(self.symbols_provider())
+            url = self._build_url(symbols)
+            if url is None:
+                self._stop_event.wait(SYMBOLS_CHECK_INTERVAL)
+                continue
+
+            try:
+                self._ws = _websocket.create_connection(url, timeout=RECV_TIMEOUT)
+                self.connected = True
+                delay = 1
+                logger.info(f"Exchange stream connected for {len(symbols)} symbols")
+                self._receive(symbols)
+            except Exception as e:
+                if self.running:
+                    logger.warning(f"Exchange stream disconnected: {str(e)}")
+            finally:
+                self.flush()
+                self._close()
+
+            if not self.running:
+                break
+
+            self.reconnects += 1
+            self._stop_event.wait(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def _receive(self, symbols: List[str]) -> None:
+        """دریافت پیام‌ها تا قطع اتصال یا تغییر نمادهای تحت نظر"""
+        last_flush = time.monotonic()
+        last_check = last_flush
+        while self.running:
+            raw = self._ws.recv()
+            if not raw:
+                raise ConnectionError("connection closed by server")
+            self.handle_message(raw)
+
+            now = time.monotonic()
+            if now - last_flush >= self.publish_interval:
+                self.flush()
+                last_flush = now
+
+            # اتصال مجدد با فهرست جدید در صورت تغییر نمادهای تحت نظر
+            if now - last_check >= SYMBOLS_CHECK_INTERVAL:
+                last_check = now
+                if sorted(self.symbols_provider()) != symbols:
+                    logger.info("Watched symbols changed, resubscribing exchange stream")
+                    return
+
+
+class LocalTickerServer:
+    """
+    سرور WebSocket محلی با پیام‌های تیکر ساختگی در قالب Binance
+
+    فقط برای توسعه و آزمایش؛ فقط فریم‌های متنی بدون فشرده‌سازی ارسال می‌شوند.
+    """
+
+    _GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, interval: float = 0.2):
+        """
+        راه‌اندازی سرور
+
+        Args:
+            host: آدرس شنود
+            port: پورت شنود (0 برای انتخاب خودکار)
+            interval: فاصله ارسال پیام‌ها (ثانیه)
+        """
+        self.interval = interval
+        self.prices: Dict[str, float] = {}
+        self._connections = set()
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                server._handle(self.request)
+
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"ws://{host}:{port}/stream"
+
+    def start(self) -> str:
+        """
+        شروع سرور در ترد پس‌زمینه
+
+        Returns:
+            str: آدرس جریان
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name="local-ticker-server", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        """توقف سرور و قطع اتصال‌های باز"""
+        self._server.shutdown()
+        self._server.server_close()
+        self.disconnect_all()
+
+    def disconnect_all(self) -> None:
+        """قطع همه اتصال‌های باز (برای آزمایش اتصال مجدد)"""
+        for conn in list(self._connections):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _handle(self, conn: socket.socket) -> None:
+        self._connections.add(conn)
+        try:
+            self._serve(conn)
+        finally:
+            self._connections.discard(conn)
+
+    def _serve(self, conn: socket.socket) -> None:
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = conn.recv(4096)
+            if not chunk:
+                return
+            request += chunk
+
+        lines = request.decode('latin-1').split("\r\n")
+        path = lines[0].split(" ")[1]
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        accept = base64.b64encode(
+            hashlib.sha1((headers.get('sec-websocket-key', '') + self._GUID).encode()).digest()
+        ).decode()
+        conn.sendall((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+
+        streams = []
+        if "streams=" in path:
+            streams = [s for s in path.split("streams=", 1)[1].split("/") if s.endswith("@ticker")]
+
+        try:
+            while True:
+                for stream in streams:
+                    conn.sendall(self._frame(json.dumps(self._ticker(stream))))
+                time.sleep(self.interval)
+        except OSError:
+            pass
+
+    def _ticker(self, stream: str) -> Dict[str, Any]:
+        exchange_symbol = stream.split('@')[0].upper()
+        last = self.prices.get(exchange_symbol, random.uniform(1, 50000))
+        price = last * (1 + random.uniform(-0.001, 0.001))
+        self.prices[exchange_symbol] = price
+        open_price = price / (1 + random.uniform(-0.05, 0.05))
+        return {
+            'stream': stream,
+            'data': {
+                'e': '24hrTicker',
+                'E': int(time.time() * 1000),
+                's': exchange_symbol,
+                'c': f"{price:.8f}",
+                'o': f"{open_price:.8f}",
+                'h': f"{max(price, open_price) * 1.01:.8f}",
+                'l': f"{min(price, open_price) * 0.99:.8f}",
+                'P': f"{(price - open_price) / open_price * 100:.3f}",
+                'v': "1000.0",
+                'q': f"{1000.0 * price:.2f}"
+            }
+        }
+
+    @staticmethod
+    def _frame(text: str) -> bytes:
+        payload = text.encode('utf-8')
+        length = len(payload)
+        if length < 126:
+            header = bytes([0x81, length])
+        elif length < 65536:
+            header = bytes([0x81, 126]) + length.to_bytes(2, 'big')
+        else:
+            header = bytes([0x81, 127]) + length.to_bytes(8, 'big')
+        return header + payload
+
+
+# نمونه مشترک جریان برای کل برنامه
+exchange_stream = ExchangeStream()
+
+
+def start_exchange_stream() -> bool:
+    """
+    شروع دریافت جریانی قیمت‌ها در صورت فعال بودن در تنظیمات
+
+    Returns:
+        bool: وضعیت شروع
+    """
+    if not STREAM_ENABLED:
+        return False
+    return exchange_stream.start()
+
+
+def stop_exchange_stream() -> bool:
+    """
+    توقف دریافت جریانی قیمت‌ها
+
+    Returns:
+        bool: وضعیت توقف
+    """
+    return exchange_stream.stop()
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+
+    if "--local" in sys.argv:
+        local_server = LocalTickerServer()
+        exchange_stream.url = local_server.start()
+
+    exchange_stream.start()
+    try:
+        while True:
+            time.sleep(5)
+            for name, book in sorted(exchange_stream.get_books().items()):
+                print(f"{name}: {book['price']:.4f} ({book['change_24h']:+.2f}%)")
+    except KeyboardInterrupt:
+        exchange_stream.stop()
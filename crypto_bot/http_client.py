@@ -0,0 +1,271 @@
+"""
+لایه مشترک HTTP برای همه کلاینت‌های API خارجی
+
+همه درخواست‌های خروجی از یک requests.Session مشترک عبور می‌کنند که برای هر میزبان
+یک pool اتصال keep-alive نگه می‌دارد؛ بنابراین handshake TCP و TLS فقط یک بار برای
+هر اتصال انجام می‌شود. این لایه timeout پیش‌فرض، فشرده‌سازی gzip، تلاش مجدد با
+تاخیر تصادفی (jitter) و آمار تاخیر و خطای هر میزبان را فراهم می‌کند.
+"""
+
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from crypto_bot.quota_manager import quota_manager
+
+logger = logging.getLogger(__name__)
+
+# timeout پیش‌فرض (اتصال، خواندن) به ثانیه
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "15"))
+
+# تعداد تلاش مجدد پیش‌فرض برای خطاهای گذرا
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))
+
+# تاخیر پایه و بیشینه تلاش مجدد (ثانیه)
+HTTP_BACKOFF = 0.3
+HTTP_MAX_BACKOFF = 5.0
+
+# تعداد اتصال‌های نگه‌داری شده برای هر میزبان
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "16"))
+
+# کدهای وضعیتی که تلاش مجدد دارند (429 عمداً تلاش مجدد ندارد)
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+# متدهایی که تکرار آن‌ها بی‌خطر است
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+# تعداد نمونه‌های تاخیر نگه‌داری شده برای هر میزبان
+LATENCY_SAMPLES = 200
+
+# الگوی اطلاعات محرمانه در آدرس‌ها: توکن بات تلگرام در مسیر (/bot<token>/) و کلیدهای API در query
+_SECRET_PATTERNS = (
+    (re.compile(r'/bot\d+:[\w-]+'), '/bot***'),
+    (re.compile(r'([?&](?:api_?key|apikey|key|token|access_token|secret)=)[^&\s\'"]+', re.IGNORECASE), r'\1***'),
+)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; BarzinCryptoBot/1.0)',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive'
+}
+
+
+def redact_secrets(text: str) -> str:
+    """
+    حذف توکن‌ها و کلیدهای API از متن (مثلاً پیام خطایی که آدرس درخواست را دارد)
+
+    Args:
+        text: متن
+
+    Returns:
+        str: متن بدون اطلاعات محرمانه
+    """
+    for pattern, replacement in _SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class HostMetrics:
+    """
+    آمار درخواست‌های یک میزبان
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.statuses: Dict[int, int] = {}
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.last_error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        خلاصه آمار
+
+        Returns:
+            Dict[str, Any]: تعداد درخواست‌ها، خطاها و تاخیرها (میلی‌ثانیه)
+        """
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 1)
+
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'error_rate': round(self.errors / self.requests, 3) if self.requests else 0.0,
+            'statuses': dict(self.statuses),
+            'latency_p50_ms': percentile(0.5),
+            'latency_p95_ms': percentile(0.95),
+            'last_error': self.last_error
+        }
+
+
+class HttpClient:
+    """
+    کلاینت HTTP مشترک با pool اتصال برای هر میزبان، تلاش مجدد و آمار
+    """
+
+    def __init__(self, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), retries: int = HTTP_RETRIES,
+                 pool_size: int = HTTP_POOL_SIZE):
+        """
+        مقداردهی اولیه
+
+        Args:
+            timeout: timeout پیش‌فرض (اتصال، خواندن) یا یک عدد
+            retries: تعداد تلاش مجدد پیش‌فرض
+            pool_size: تعداد اتصال‌های نگه‌داری شده برای هر میزبان
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+
+        # urllib3 برای هر میزبان pool جداگانه‌ای از اتصال‌های keep-alive می‌سازد
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._metrics: Dict[str, HostMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _host_metrics(self, host: str) -> HostMetrics:
+        with self._lock:
+            metrics = self._metrics.get(host)
+            if metrics is None:
+                metrics = self._metrics[host] = HostMetrics()
+            return metrics
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """تاخیر تلاش مجدد: نمایی با jitter یا مقدار Retry-After سرور"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), HTTP_MAX_BACKOFF)
+        delay = min(HTTP_BACKOFF * (2 ** attempt), HTTP_MAX_BACKOFF)
+        return delay * random.uniform(0.5, 1.5)
+
+    def request(self, method: str, url: str, retries: Optional[int] = None, provider: Optional[str] = None,
+                **kwargs) -> requests.Response:
+        """
+        ارسال درخواست HTTP
+
+        Args:
+            method: متد HTTP
+            url: آدرس
+            retries: تعداد تلاش مجدد (پیش‌فرض: تنظیم کلاینت؛ فقط برای متدهای idempotent)
+            provider: نام ارائه‌دهنده برای اعمال سهمیه و circuit breaker (اختیاری)
+            **kwargs: پارامترهای requests (params، headers، json، timeout و ...)
+
+        Returns:
+            requests.Response: پاسخ آخرین تلاش
+
+        Raises:
+            requests.RequestException: در صورت خطای شبکه پس از همه تلاش‌ها
+            ProviderUnavailable: اگر سهمیه ارائه‌دهنده تمام شده یا مدار آن باز باشد
+        """
+        method = method.upper()
+        kwargs.setdefault('timeout', self.timeout)
+        if retries is None:
+            retries = self.retries
+        if method not in IDEMPOTENT_METHODS:
+            retries = 0
+
+        metrics = self._host_metrics(urlsplit(url).netloc)
+        attempt = 0
+        while True:
+            if provider:
+                quota_manager.acquire(provider)
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    metrics.requests += 1
+                    metrics.errors += 1
+                    metrics.latencies.append(elapsed)
+                    # متن خطای urllib3 شامل آدرس کامل درخواست (و توکن‌های آن) است؛ فقط نوع خطا ثبت می‌شود
+                    metrics.last_error = type(e).__name__
+                if provider:
+                    quota_manager.record_failure(provider)
+                # فقط خطاهای اتصال و timeout تلاش مجدد دارند
+                if attempt >= retries or not isinstance(e, (requests.ConnectionError, requests.Timeout)):
+                    raise
+                delay = self._backoff(attempt)
+            except BaseException:
+                # درخواست بدون نتیجه پایان یافت؛ فرصت درخواست آزمایشی circuit breaker آزاد می‌شود
+                if provider:
+                    quota_manager.release(provider)
+                raise
+            else:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    metrics.requests += 1
+                    metrics.latencies.append(elapsed)
+                    metrics.statuses[response.status_code] = metrics.statuses.get(response.status_code, 0) + 1
+                    if response.status_code >= 400:
+                        metrics.errors += 1
+                        metrics.last_error = f"HTTP {response.status_code}"
+                if provider:
+                    self._record_quota(provider, response)
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                response.close()
+
+            attempt += 1
+            with self._lock:
+                metrics.retries += 1
+            logger.debug(f"Retrying {method} {redact_secrets(url)} in {delay:.2f} seconds (attempt {attempt}/{retries})")
+            time.sleep(delay)
+
+    def _record_quota(self, provider: str, response: requests.Response) -> None:
+        """ثبت نتیجه پاسخ در سهمیه ارائه‌دهنده"""
+        if response.status_code in (418, 429):
+            # Binance برای IP های مسدود شده 418 برمی‌گرداند
+            retry_after = response.headers.get('Retry-After')
+            quota_manager.record_rate_limited(provider, float(retry_after) if retry_after and retry_after.isdigit() else None)
+        elif response.status_code >= 500:
+            quota_manager.record_failure(provider)
+        else:
+            quota_manager.record_success(provider)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """ارسال درخواست GET"""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """ارسال درخواست POST"""
+        return self.request('POST', url, **kwargs)
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        دریافت آمار تاخیر و خطای هر میزبان
+
+        Returns:
+            Dict[str, Dict[str, Any]]: آمار به تفکیک میزبان
+        """
+        with self._lock:
+            return {host: metrics.to_dict() for host, metrics in self._metrics.items()}
+
+    def close(self) -> None:
+        """بستن اتصال‌های باز"""
+        self.session.close()
+
+
+# کلاینت مشترک HTTP برای کل برنامه
+http_client = HttpClient()
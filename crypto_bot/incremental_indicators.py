@@ -0,0 +1,564 @@
+"""
+اندیکاتورهای افزایشی (Incremental Indicators)
+
+در این ماژول هر اندیکاتور یک شیء دارای وضعیت است که کندل‌ها را یکی‌یکی دریافت
+می‌کند و هزینه هر بروزرسانی O(1) است: میانگین و انحراف معیار متحرک با جمع‌های
+جاری، EMA و MACD به صورت بازگشتی، و کمینه/بیشینه استوکاستیک با صف‌های یکنوا.
+تعریف‌ها با calculate_indicators_batch یکسان است، بنابراین وضعیتی که با همان
+کندل‌ها مقداردهی شود همان اعداد را برمی‌گرداند.
+
+کندل در حال تشکیل (با timestamp برابر آخرین کندل) جایگزین کندل قبلی می‌شود.
+وضعیت هر (نماد، بازه زمانی) به صورت دوره‌ای در پس‌زمینه روی دیسک ذخیره شده و
+پس از راه‌اندازی مجدد بازیابی می‌شود.
+"""
+
+import atexit
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# مسیر فایل ذخیره وضعیت اندیکاتورها
+INDICATOR_STATE_FILE = "data/indicator_state.json"
+
+# فاصله زمانی ذخیره تغییرات وضعیت روی دیسک (ثانیه)؛ با توقف ناگهانی فقط تغییرات همین بازه از دست می‌رود
+INDICATOR_SAVE_INTERVAL = float(os.environ.get("INDICATOR_SAVE_INTERVAL", "60"))
+
+# هر چند بروزرسانی یک بار جمع‌های جاری از نو محاسبه می‌شوند تا خطای ممیز شناور انباشته نشود
+RESYNC_INTERVAL = 1000
+
+NAN = float('nan')
+
+
+class RollingWindow:
+    """
+    میانگین و انحراف معیار متحرک با جمع‌های جاری
+
+    مقادیر NaN در جمع‌ها وارد نمی‌شوند و فقط شمرده می‌شوند؛ تا زمانی که NaN در پنجره
+    باشد نتیجه NaN است (مانند rolling در pandas) و با خروج آن از پنجره نتیجه درست می‌شود.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self._shift = None  # برای کاهش خطای تفریق در واریانس
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._nans = 0
+        self._updates = 0
+
+    def update(self, value: float) -> None:
+        if self._shift is None and not math.isnan(value):
+            self._shift = value
+        if len(self.values) == self.window:
+            self._remove(self.values[0])
+        self.values.append(value)
+        self._add(value)
+        self._updates += 1
+        if self._updates % RESYNC_INTERVAL == 0:
+            self._resync()
+
+    def replace(self, value: float) -> None:
+        """جایگزینی آخرین مقدار"""
+        if not self.values:
+            self.update(value)
+            return
+        self._remove(self.values[-1])
+        self.values[-1] = value
+        self._add(value)
+
+    def _add(self, value: float) -> None:
+        if math.isnan(value):
+            self._nans += 1
+            return
+        if self._shift is None:
+            self._shift = value
+        shifted = value - self._shift
+        self._sum += shifted
+        self._sum_sq += shifted * shifted
+
+    def _remove(self, value: float) -> None:
+        if math.isnan(value):
+            self._nans -= 1
+            return
+        shifted = value - self._shift
+        self._sum -= shifted
+        self._sum_sq -= shifted * shifted
+
+    def _resync(self) -> None:
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._nans = 0
+        for value in self.values:
+            self._add(value)
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.window
+
+    def mean(self) -> float:
+        if not self.full or self._nans:
+            return NAN
+        return self._sum / self.window + self._shift
+
+    def std(self) -> float:
+        """انحراف معیار نمونه (ddof=1)"""
+        if not self.full or self._nans or self.window < 2:
+            return NAN
+        variance = (self._sum_sq - self._sum * self._sum / self.window) / (self.window - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'window': self.window, 'values': list(self.values)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RollingWindow':
+        rolling = cls(data['window'])
+        for value in data['values']:
+            rolling.update(value)
+        return rolling
+
+
+class RollingExtreme:
+    """کمینه یا بیشینه متحرک با صف یکنوا"""
+
+    def __init__(self, window: int, mode: str = 'max'):
+        self.window = window
+        self.mode = mode
+        self.values = deque(maxlen=window)
+        self._deque: deque = deque()  # (شماره کندل، مقدار)
+        self._index = 0
+
+    def _dominates(self, new: float, old: float) -> bool:
+        return new >= old if self.mode == 'max' else new <= old
+
+    def update(self, value: float) -> None:
+        self.values.append(value)
+        while self._deque and self._dominates(value, self._deque[-1][1]):
+            self._deque.pop()
+        self._deque.append((self._index, value))
+        if self._deque[0][0] <= self._index - self.window:
+            self._deque.popleft()
+        self._index += 1
+
+    def replace(self, value: float) -> None:
+        """جایگزینی آخرین مقدار (بازسازی صف از پنجره با اندازه ثابت)"""
+        if not self.values:
+            self.update(value)
+            return
+        self.values[-1] = value
+        values = list(self.values)
+        start = self._index - len(values)
+        self._deque.clear()
+        self._index = start
+        for item in values:
+            self.values.popleft()
+            self.update(item)
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.window
+
+    def value(self) -> float:
+        if not self.full:
+            return NAN
+        return self._deque[0][1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'window': self.window, 'mode': self.mode, 'values': list(self.values)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RollingExtreme':
+        extreme = cls(data['window'], data['mode'])
+        for value in data['values']:
+            extreme.update(value)
+        return extreme
+
+
+class EMA:
+    """میانگین متحرک نمایی (معادل ewm(span, adjust=False))"""
+
+    def __init__(self, span: int):
+        self.span = span
+        self.alpha = 2.0 / (span + 1)
+        self.value: Optional[float] = None
+        self._previous: Optional[float] = None
+
+    def update(self, value: float) -> float:
+        self._previous = self.value
+        self.value = value if self._previous is None else self.alpha * value + (1 - self.alpha) * self._previous
+        return self.value
+
+    def replace(self, value: float) -> float:
+        """جایگزینی آخرین مقدار"""
+        self.value = value if self._previous is None else self.alpha * value + (1 - self.alpha) * self._previous
+        return self.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'span': self.span, 'value': self.value, 'previous': self._previous}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'EMA':
+        ema = cls(data['span'])
+        ema.value = data['value']
+        ema._previous = data['previous']
+        return ema
+
+
+class IndicatorState:
+    """وضعیت همه اندیکاتورهای یک (نماد، بازه زمانی)"""
+
+    def __init__(self):
+        self.last_timestamp: Optional[float] = None
+        self.bars = 0
+        self._previous_close: Optional[float] = None  # بسته شدن کندل قبل از آخرین کندل
+        self._last_close: Optional[float] = None
+        self.gains = RollingWindow(14)
+        self.losses = RollingWindow(14)
+        self.ma20 = RollingWindow(20)
+        self.ma50 = RollingWindow(50)
+        self.ma200 = RollingWindow(200)
+        self.ema12 = EMA(12)
+        self.ema26 = EMA(26)
+        self.macd_signal = EMA(9)
+        self.volume_ema = EMA(20)
+        self.low_min = RollingExtreme(14, 'min')
+        self.high_max = RollingExtreme(14, 'max')
+        self.stoch_k = RollingWindow(3)
+        self.stoch_d = RollingWindow(3)
+        self.closes = deque(maxlen=10)
+
+    def update(self, bar: Dict[str, Any]) -> bool:
+        """
+        افزودن یک کندل
+
+        کندل با timestamp برابر آخرین کندل جایگزین آن می‌شود و کندل‌های قدیمی‌تر
+        نادیده گرفته می‌شوند.
+
+        Args:
+            bar: کندل با کلیدهای timestamp، high، low، close و volume
+
+        Returns:
+            bool: آیا وضعیت تغییر کرد
+        """
+        timestamp = float(bar['timestamp'])
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            return False
+
+        replace = self.last_timestamp is not None and timestamp == self.last_timestamp
+        close = float(bar['close'])
+        high = float(bar['high'])
+        low = float(bar['low'])
+        volume = float(bar['volume'])
+
+        if replace:
+            op = 'replace'
+        else:
+            op = 'update'
+            self._previous_close = self._last_close
+            self.bars += 1
+        self._last_close = close
+        self.last_timestamp = timestamp
+
+        # RSI
+        if self._previous_close is not None:
+            change = close - self._previous_close
+            getattr(self.gains, op)(max(change, 0.0))
+            getattr(self.losses, op)(max(-change, 0.0))
+
+        # میانگین‌های متحرک و بولینگر
+        getattr(self.ma20, op)(close)
+        getattr(self.ma50, op)(close)
+        getattr(self.ma200, op)(close)
+
+        # MACD
+        macd = getattr(self.ema12, op)(close) - getattr(self.ema26, op)(close)
+        getattr(self.macd_signal, op)(macd)
+
+        # استوکاستیک
+        getattr(self.low_min, op)(low)
+        getattr(self.high_max, op)(high)
+        if self.low_min.full:
+            low_min = self.low_min.value()
+            high_max = self.high_max.value()
+            k = 100 * ((close - low_min) / (high_max - low_min)) if high_max != low_min else NAN
+            getattr(self.stoch_k, op)(k)
+            if self.stoch_k.full:
+                getattr(self.stoch_d, op)(self.stoch_k.mean())
+
+        getattr(self.volume_ema, op)(volume)
+
+        if replace and self.closes:
+            self.closes[-1] = close
+        else:
+            self.closes.append(close)
+
+        return True
+
+    def values(self) -> Dict[str, float]:
+        """
+        مقادیر فعلی اندیکاتورها
+
+        Returns:
+            Dict[str, float]: اندیکاتورها با همان کلیدهای calculate_technical_indicators
+        """
+        avg_gain = self.gains.mean()
+        avg_loss = self.losses.mean()
+        if math.isnan(avg_loss):
+            rsi = NAN
+        else:
+            rs = 100 if avg_loss == 0 else avg_gain / avg_loss
+            rsi = 100 - (100 / (1 + rs))
+
+        ma20 = self.ma20.mean()
+        std20 = self.ma20.std()
+        bb_upper = ma20 + std20 * 2
+        bb_lower = ma20 - std20 * 2
+        macd = (self.ema12.value - self.ema26.value) if self.ema12.value is not None else NAN
+        macd_signal = self.macd_signal.value if self.macd_signal.value is not None else NAN
+
+        if len(self.closes) == 10 and self.closes[0] != 0:
+            trend = (self.closes[-1] - self.closes[0]) / self.closes[0] * 100
+        else:
+            trend = NAN
+
+        return {
+            'rsi': rsi,
+            'ma20': ma20,
+            'ma50': self.ma50.mean(),
+            'ma200': self.ma200.mean(),
+            'macd': macd,
+            'macd_signal': macd_signal,
+            'macd_histogram': macd - macd_signal,
+            'bb_upper': bb_upper,
+            'bb_middle': ma20,
+            'bb_lower': bb_lower,
+            'bb_width': (bb_upper - bb_lower) / ma20 if ma20 else NAN,
+            'stoch_k': self.stoch_k.mean(),
+            'stoch_d': self.stoch_d.mean(),
+            'volume_ema': self.volume_ema.value if self.volume_ema.value is not None else NAN,
+            'price_trend_10d': trend
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'last_timestamp': self.last_timestamp,
+            'bars': self.bars,
+            'previous_close': self._previous_close,
+            'last_close': self._last_close,
+            'rolling': {name: getattr(self, name).to_dict()
+                        for name in ('gains', 'losses', 'ma20', 'ma50', 'ma200', 'stoch_k', 'stoch_d')},
+            'extremes': {name: getattr(self, name).to_dict() for name in ('low_min', 'high_max')},
+            'ema': {name: getattr(self, name).to_dict()
+                    for name in ('ema12', 'ema26', 'macd_signal', 'volume_ema')},
+            'closes': list(self.closes)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'IndicatorState':
+        state = cls()
+        state.last_timestamp = data['last_timestamp']
+        state.bars = data['bars']
+        state._previous_close = data['previous_close']
+        state._last_close = data['last_close']
+        for name, value in data['rolling'].items():
+            setattr(state, name, RollingWindow.from_dict(value))
+        for name, value in data['extremes'].items():
+            setattr(state, name, RollingExtreme.from_dict(value))
+        for name, value in data['ema'].items():
+            setattr(state, name, EMA.from_dict(value))
+        state.closes = deque(data['closes'], maxlen=10)
+        return state
+
+
+class IndicatorStateStore:
+    """نگهداری وضعیت اندیکاتورها به تفکیک (نماد، بازه زمانی) با ذخیره روی دیسک"""
+
+    def __init__(self, state_file: str = INDICATOR_STATE_FILE, save_interval: float = INDICATOR_SAVE_INTERVAL):
+        """
+        راه‌اندازی انبار وضعیت
+
+        Args:
+            state_file: مسیر فایل ذخیره‌سازی
+            save_interval: فاصله زمانی ذخیره تغییرات روی دیسک (ثانیه)
+        """
+        self.state_file = state_file
+        self.save_interval = save_interval
+        self._states: Dict[Tuple[str, str], IndicatorState] = {}
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._writer_thread = None
+        self._stop_event = threading.Event()
+        self._load()
+
+    @staticmethod
+    def _key(symbol: str, timeframe: str) -> Tuple[str, str]:
+        return symbol.upper().replace('-', '/'), timeframe
+
+    def _load(self) -> None:
+        """بارگذاری وضعیت‌های ذخیره شده"""
+        try:
+            if not os.path.exists(self.state_file):
+                return
+            with open(self.state_file, 'r') as f:
+                raw = json.load(f)
+            states = {}
+            for key, data in raw.items():
+                symbol, timeframe = key.rsplit('|', 1)
+                states[(symbol, timeframe)] = IndicatorState.from_dict(data)
+            with self._lock:
+                self._states.update(states)
+            logger.info(f"Loaded {len(states)} indicator states from {self.state_file}")
+        except Exception as e:
+            logger.error(f"Error loading indicator states from {self.state_file}: {str(e)}")
+
+    def get_state(self, symbol: str, timeframe: str) -> Optional[IndicatorState]:
+        """
+        دریافت وضعیت یک (نماد، بازه زمانی)
+
+        Returns:
+            Optional[IndicatorState]: وضعیت یا None
+        """
+        return self._states.get(self._key(symbol, timeframe))
+
+    def update(self, symbol: str, timeframe: str, bar: Dict[str, Any]) -> Dict[str, float]:
+        """
+        افزودن یک کندل جدید به وضعیت
+
+        Args:
+            symbol: نماد ارز
+            timeframe: بازه زمانی
+            bar: کندل جدید
+
+        Returns:
+            Dict[str, float]: مقادیر بروز اندیکاتورها
+        """
+        with self._lock:
+            state = self._states.setdefault(self._key(symbol, timeframe), IndicatorState())
+            if state.update(bar):
+                self._dirty = True
+                self._ensure_writer()
+            return state.values()
+
+    def sync(self, symbol: str, timeframe: str, bars: List[Dict[str, Any]]) -> Dict[str, float]:
+        """
+        همگام‌سازی وضعیت با داده‌های تاریخی
+
+        فقط کندل‌های جدیدتر از آخرین کندل وضعیت اعمال می‌شوند. اگر وضعیتی وجود
+        نداشته باشد یا فاصله آن با داده‌ها بیش از بازه داده‌ها باشد، وضعیت از نو
+        با همه کندل‌ها ساخته می‌شود.
+
+        Args:
+            symbol: نماد ارز
+            timeframe: بازه زمانی
+            bars: کندل‌ها به ترتیب زمانی (با کلید timestamp)
+
+        Returns:
+            Dict[str, float]: مقادیر بروز اندیکاتورها
+        """
+        key = self._key(symbol, timeframe)
+        with self._lock:
+            state = self._states.get(key)
+            if not bars:
+                return state.values() if state else {}
+
+            if state is None or state.last_timestamp is None or state.last_timestamp < float(bars[0]['timestamp']):
+                state = IndicatorState()
+                self._states[key] = state
+                new_bars = bars
+            else:
+                new_bars = [bar for bar in bars if float(bar['timestamp']) >= state.last_timestamp]
+
+            for bar in new_bars:
+                state.update(bar)
+            if new_bars:
+                self._dirty = True
+                self._ensure_writer()
+            return state.values()
+
+    def reset(self, symbol: str, timeframe: str) -> None:
+        """حذف وضعیت یک (نماد، بازه زمانی)"""
+        with self._lock:
+            if self._states.pop(self._key(symbol, timeframe), None) is not None:
+                self._dirty = True
+
+    def save(self) -> bool:
+        """
+        ذخیره اتمیک وضعیت‌ها روی دیسک
+
+        Returns:
+            bool: آیا ذخیره‌سازی انجام شد
+        """
+        with self._lock:
+            if not self._dirty:
+                return False
+            raw = {f"{symbol}|{timeframe}": state.to_dict()
+                   for (symbol, timeframe), state in self._states.items()}
+            self._dirty = False
+
+        try:
+            directory = os.path.dirname(self.state_file) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.indicator_state.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(raw, f, separators=(',', ':'))
+                os.replace(tmp_path, self.state_file)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            return True
+        except Exception as e:
+            logger.error(f"Error writing indicator states to {self.state_file}: {str(e)}")
+            with self._lock:
+                self._dirty = True
+            return False
+
+    def _ensure_writer(self) -> None:
+        """راه‌اندازی ترد ذخیره‌سازی پس‌زمینه در صورت نیاز (با نگه داشتن قفل)"""
+        if self._writer_thread is None:
+            self._writer_thread = threading.Thread(target=self._writer_loop, name="indicator-state-writer",
+                                                   daemon=True)
+            self._writer_thread.start()
+
+    def _writer_loop(self) -> None:
+        """حلقه ذخیره دوره‌ای تغییرات روی دیسک"""
+        while not self._stop_event.wait(self.save_interval):
+            self.save()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+def _save_on_exit(store: IndicatorStateStore) -> None:
+    """ذخیره تغییرات باقی‌مانده هنگام خروج برنامه"""
+    store._stop_event.set()
+    store.save()
+
+
+def create_indicator_state_store(state_file: str = INDICATOR_STATE_FILE,
+                                 save_interval: float = INDICATOR_SAVE_INTERVAL) -> IndicatorStateStore:
+    """
+    ایجاد انبار وضعیت و ثبت ذخیره‌سازی نهایی هنگام خروج
+
+    Args:
+        state_file: مسیر فایل ذخیره‌سازی
+        save_interval: فاصله زمانی ذخیره تغییرات (ثانیه)
+
+    Returns:
+        IndicatorStateStore: انبار وضعیت
+    """
+    store = IndicatorStateStore(state_file, save_interval)
+    atexit.register(_save_on_exit, store)
+    return store
+
+
+# انبار مشترک وضعیت اندیکاتورها برای کل برنامه
+indicator_states = create_indicator_state_store()
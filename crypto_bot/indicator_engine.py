@@ -0,0 +1,277 @@
+"""
+موتور برداری محاسبه اندیکاتورها برای چند ارز به صورت همزمان
+
+این ماژول اندیکاتورهای تکنیکال (RSI، میانگین‌های متحرک، MACD، بولینگر،
+استوکاستیک و ...) را روی آرایه‌های دوبعدی NumPy با شکل (نماد × کندل) و با چند
+عملیات برداری برای همه نمادها محاسبه می‌کند. نتایج با calculate_technical_indicators
+در ماژول technical_analysis یکسان است (همان پنجره‌ها و همان تعریف‌ها).
+"""
+
+import logging
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+# حداقل تعداد کندل لازم برای محاسبه اندیکاتورها
+MIN_BARS = 14
+
+# ستون‌های جدول نتیجه (به همان ترتیب خروجی calculate_technical_indicators)
+INDICATOR_COLUMNS = [
+    'rsi', 'ma20', 'ma50', 'ma200',
+    'macd', 'macd_signal', 'macd_histogram',
+    'bb_upper', 'bb_middle', 'bb_lower', 'bb_width',
+    'stoch_k', 'stoch_d',
+    'volume_ema', 'price_trend_10d'
+]
+
+# تعداد کندل لازم برای معتبر بودن هر اندیکاتور (دوره گرم شدن)
+INDICATOR_WARMUP = {
+    'rsi': 15,              # 14 تغییر قیمت
+    'ma20': 20,
+    'ma50': 50,
+    'ma200': 200,
+    'macd': 35,             # EMA26 به همراه خط سیگنال 9 دوره‌ای
+    'macd_signal': 35,
+    'macd_histogram': 35,
+    'bb_upper': 20,
+    'bb_middle': 20,
+    'bb_lower': 20,
+    'bb_width': 20,
+    'stoch_k': 16,          # پنجره 14 و میانگین 3 تایی %K
+    'stoch_d': 18,          # میانگین 3 تایی %K هموار شده
+    'volume_ema': 20,
+    'price_trend_10d': 10
+}
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def history_required(indicators: Optional[Iterable[str]] = None) -> int:
+    """
+    تعداد کندل تاریخی لازم برای محاسبه معتبر اندیکاتورها
+
+    Args:
+        indicators: نام اندیکاتورهای مورد نیاز (پیش‌فرض: همه)
+
+    Returns:
+        int: بیشترین دوره گرم شدن اندیکاتورهای خواسته شده
+    """
+    names = list(indicators) if indicators is not None else INDICATOR_COLUMNS
+    unknown = [name for name in names if name not in INDICATOR_WARMUP]
+    if unknown:
+        raise ValueError(f"Unknown indicators: {', '.join(unknown)}")
+    return max([MIN_BARS] + [INDICATOR_WARMUP[name] for name in names])
+
+
+@lru_cache(maxsize=32)
+def _ema_weights(span: int, length: int) -> np.ndarray:
+    """
+    ماتریس وزن‌های EMA (معادل ewm(span, adjust=False))
+
+    ستون t وزن هر کندل در مقدار EMA کندل t است، بنابراین ضرب X @ W کل سری EMA
+    همه نمادها را در یک عملیات ماتریسی محاسبه می‌کند.
+    """
+    alpha = 2.0 / (span + 1)
+    decay = 1.0 - alpha
+    j = np.arange(length)[:, None]
+    t = np.arange(length)[None, :]
+    weights = np.where(j <= t, alpha * decay ** np.maximum(t - j, 0), 0.0)
+    # اولین کندل مقدار اولیه EMA است
+    weights[0, :] = decay ** np.arange(length)
+    weights.setflags(write=False)
+    return weights
+
+
+def _ema(values: np.ndarray, span: int) -> np.ndarray:
+    """سری کامل EMA برای همه ردیف‌ها"""
+    return values @ _ema_weights(span, values.shape[1])
+
+
+def _last_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """میانگین پنجره آخر هر ردیف (NaN در صورت کمبود داده)"""
+    if values.shape[1] < window:
+        return np.full(values.shape[0], np.nan)
+    return values[:, -window:].mean(axis=1)
+
+
+def calculate_indicators_batch(close: np.ndarray, high: np.ndarray, low: np.ndarray,
+                               volume: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    محاسبه همه اندیکاتورها برای همه نمادها
+
+    Args:
+        close: قیمت‌های بسته شدن با شکل (نماد × کندل)
+        high: بیشترین قیمت‌ها با همان شکل
+        low: کمترین قیمت‌ها با همان شکل
+        volume: حجم معاملات با همان شکل
+
+    Returns:
+        Dict[str, np.ndarray]: جدول نتیجه؛ هر ستون آرایه‌ای به طول تعداد نمادها
+    """
+    close = np.asarray(close, dtype=float)
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+
+    n_symbols, n_bars = close.shape
+    if n_bars < MIN_BARS:
+        raise ValueError(f"at least {MIN_BARS} bars are required, got {n_bars}")
+
+    table = {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # RSI (میانگین ساده 14 تغییر آخر)
+        diff = np.diff(close, axis=1)
+        avg_gain = _last_mean(np.where(diff > 0, diff, 0.0), 14)
+        avg_loss = _last_mean(np.where(diff < 0, -diff, 0.0), 14)
+        rs = np.where(avg_loss == 0, 100.0, avg_gain / avg_loss)
+        table['rsi'] = 100 - (100 / (1 + rs))
+
+        # میانگین‌های متحرک
+        table['ma20'] = _last_mean(close, 20)
+        table['ma50'] = _last_mean(close, 50)
+        table['ma200'] = _last_mean(close, 200)
+
+        # MACD
+        macd_line = _ema(close, 12) - _ema(close, 26)
+        signal_line = _ema(macd_line, 9)
+        table['macd'] = macd_line[:, -1]
+        table['macd_signal'] = signal_line[:, -1]
+        table['macd_histogram'] = macd_line[:, -1] - signal_line[:, -1]
+
+        # باندهای بولینگر
+        if n_bars >= 20:
+            std20 = close[:, -20:].std(axis=1, ddof=1)
+        else:
+            std20 = np.full(n_symbols, np.nan)
+        ma20 = table['ma20']
+        table['bb_upper'] = ma20 + std20 * 2
+        table['bb_middle'] = ma20
+        table['bb_lower'] = ma20 - std20 * 2
+        table['bb_width'] = (table['bb_upper'] - table['bb_lower']) / ma20
+
+        # استوکاستیک: %K هموار شده 3 تایی و %D؛ فقط 5 پنجره آخر لازم است
+        tail = min(n_bars, 14 + 4)
+        low_min = sliding_window_view(low[:, -tail:], 14, axis=1).min(axis=2)
+        high_max = sliding_window_view(high[:, -tail:], 14, axis=1).max(axis=2)
+        k = 100 * ((close[:, -low_min.shape[1]:] - low_min) / (high_max - low_min))
+        table['stoch_k'] = _last_mean(k, 3)
+        if k.shape[1] >= 5:
+            table['stoch_d'] = (k[:, -5:-2].mean(axis=1) + k[:, -4:-1].mean(axis=1) + k[:, -3:].mean(axis=1)) / 3
+        else:
+            table['stoch_d'] = np.full(n_symbols, np.nan)
+
+        # حجم میانگین معاملات
+        table['volume_ema'] = volume @ _ema_weights(20, n_bars)[:, -1]
+
+        # روند قیمت 10 کندل اخیر
+        table['price_trend_10d'] = (close[:, -1] - close[:, -10]) / close[:, -10] * 100
+
+    return table
+
+
+def _to_ohlcv_frame(historical_data: Any) -> Optional[pd.DataFrame]:
+    """تبدیل داده تاریخی (list یا DataFrame) به DataFrame تمیز عددی"""
+    if historical_data is None:
+        return None
+    if isinstance(historical_data, list):
+        if not historical_data:
+            return None
+        historical_data = pd.DataFrame(historical_data)
+    if not isinstance(historical_data, pd.DataFrame) or historical_data.empty:
+        return None
+    if any(column not in historical_data.columns for column in OHLCV_COLUMNS):
+        return None
+
+    df = historical_data[OHLCV_COLUMNS].apply(pd.to_numeric, errors='coerce').dropna()
+    if len(df) < MIN_BARS:
+        return None
+    return df
+
+
+def table_row(table: Dict[str, np.ndarray], index: int) -> Dict[str, float]:
+    """
+    استخراج اندیکاتورهای یک نماد از جدول نتیجه
+
+    Args:
+        table: جدول نتیجه calculate_indicators_batch
+        index: ردیف نماد
+
+    Returns:
+        Dict[str, float]: اندیکاتورهای نماد
+    """
+    return {column: float(table[column][index]) for column in INDICATOR_COLUMNS}
+
+
+def prepare_ohlcv(historical_data: Any, symbol: str = "") -> Optional[np.ndarray]:
+    """
+    تبدیل داده تاریخی یک نماد به آرایه OHLCV برای موتور برداری
+
+    Args:
+        historical_data: داده‌های تاریخی (list یا DataFrame)
+        symbol: نماد ارز (برای گزارش خطا)
+
+    Returns:
+        Optional[np.ndarray]: آرایه (کندل × [open, high, low, close, volume]) یا None
+    """
+    try:
+        df = _to_ohlcv_frame(historical_data)
+    except Exception as e:
+        logger.error(f"خطا در آماده‌سازی داده‌های تاریخی {symbol}: {str(e)}")
+        return None
+    if df is None:
+        logger.warning(f"داده‌های تاریخی برای {symbol} کافی نیست")
+        return None
+    return df.to_numpy(dtype=float)
+
+
+def calculate_indicators_for_arrays(arrays: Dict[str, np.ndarray]) -> Dict[str, Dict[str, float]]:
+    """
+    محاسبه دسته‌ای اندیکاتورها برای آرایه‌های آماده شده با prepare_ohlcv
+
+    نمادهایی که تعداد کندل برابر دارند در یک آرایه دوبعدی قرار گرفته و با یک
+    فراخوانی calculate_indicators_batch محاسبه می‌شوند.
+
+    Args:
+        arrays: آرایه‌های OHLCV به تفکیک نماد
+
+    Returns:
+        Dict[str, Dict[str, float]]: اندیکاتورها به تفکیک نماد
+    """
+    groups: Dict[int, List] = {}
+    for symbol, values in arrays.items():
+        groups.setdefault(len(values), []).append((symbol, values))
+
+    results = {}
+    for members in groups.values():
+        stacked = np.stack([values for _, values in members])
+        # ترتیب ستون‌ها: open, high, low, close, volume
+        table = calculate_indicators_batch(stacked[:, :, 3], stacked[:, :, 1],
+                                           stacked[:, :, 2], stacked[:, :, 4])
+        for index, (symbol, _) in enumerate(members):
+            results[symbol] = table_row(table, index)
+
+    return results
+
+
+def calculate_indicators_for_symbols(histories: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """
+    محاسبه دسته‌ای اندیکاتورها برای چند نماد
+
+    Args:
+        histories: داده‌های تاریخی به تفکیک نماد (list یا DataFrame)
+
+    Returns:
+        Dict[str, Dict[str, float]]: اندیکاتورها به تفکیک نماد (نمادهای فاقد داده کافی حذف می‌شوند)
+    """
+    arrays = {}
+    for symbol, historical_data in histories.items():
+        values = prepare_ohlcv(historical_data, symbol)
+        if values is not None:
+            arrays[symbol] = values
+    return calculate_indicators_for_arrays(arrays)
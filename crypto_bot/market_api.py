@@ -2,11 +2,12 @@
 ماژول اتصال به API بازار ارزهای دیجیتال برای دریافت اطلاعات لحظه‌ای بازار
 """
 import os
-import requests
 import logging
 import json
 from datetime import datetime
 
+from crypto_bot.http_client import http_client
+
 # تنظیم لاگینگ
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -54,7 +55,7 @@ def get_price_change(fsym, tsym):
         
         url = f"{COINGECKO_URL}/coins/{coin_id}"
         
-        response = requests.get(url)
+        response = http_client.get(url, provider='coingecko')
         
         if response.status_code == 200:
             data = response.json()
@@ -118,7 +119,7 @@ def get_price_from_cryptocompare(symbol):
             "api_key": CRYPTOCOMPARE_API_KEY
         }
         
-        response = requests.get(CRYPTOCOMPARE_URL, params=params)
+        response = http_client.get(CRYPTOCOMPARE_URL, params=params, provider='cryptocompare')
         
         # بررسی پاسخ
         if response.status_code == 200:
@@ -191,7 +192,7 @@ def get_price_from_coingecko(symbol):
         
         # ارسال درخواست به API
         url = f"{COINGECKO_URL}/coins/{coin_id}"
-        response = requests.get(url)
+        response = http_client.get(url, provider='coingecko')
         
         # بررسی پاسخ
         if response.status_code == 200:
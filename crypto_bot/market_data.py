@@ -8,10 +8,14 @@ import json
 import os
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 
-import requests
+from crypto_bot.http_client import http_client
+from crypto_bot.quota_manager import quota_manager
+from crypto_bot.price_store import create_price_store
+from crypto_bot.candle_store import CandleStore, CANDLE_DB_FILE, TIMEFRAME_SECONDS
 
 # تنظیم لاگر
 logging.basicConfig(level=logging.INFO)
@@ -23,9 +27,30 @@ CRYPTOCOMPARE_API_KEY = os.environ.get("CRYPTOCOMPARE_API_KEY", "")
 # زمان منقضی شدن کش (۳ دقیقه)
 CACHE_EXPIRY = 180
 
+# مهلت پیش‌فرض کل یک درخواست قیمت (ثانیه)
+REQUEST_TIMEOUT = 10
+
+# تاخیر پیش از ارسال درخواست پشتیبان به ارائه‌دهنده بعدی (ثانیه)
+HEDGE_DELAY = float(os.environ.get("PRICE_HEDGE_DELAY", "0.75"))
+
+# مدت اعتبار فهرست نمادهای فعال Binance (ثانیه)؛ پس از آن یک بار تیکر همه بازارها دریافت می‌شود
+BINANCE_SYMBOLS_TTL = int(os.environ.get("BINANCE_SYMBOLS_TTL", "3600"))
+
+# بیشترین تعداد نماد در پارامتر symbols؛ بیش از این وزن درخواست با تیکر همه بازارها برابر است
+BINANCE_SYMBOLS_MAX = 100
+
+# فهرست نمادهای فعال Binance به صورت (زمان دریافت، نمادها)
+_binance_listed_symbols: Tuple[float, frozenset] = (0.0, frozenset())
+
+# ترد پول مشترک برای درخواست‌های موازی ارائه‌دهنده‌ها
+_provider_executor = ThreadPoolExecutor(max_workers=12, thread_name_prefix="price-provider")
+
 # فایل کش
 PRICE_CACHE_FILE = "data/price_cache.json"
 
+# انبار قیمت درون‌حافظه‌ای (یک بار از فایل بارگذاری و در پس‌زمینه ذخیره می‌شود)
+_price_store = create_price_store(PRICE_CACHE_FILE)
+
 # نگاشت سمبل‌های استاندارد به سمبل‌های CoinGecko
 COINGECKO_MAPPINGS = {
     "BTC/USDT": "bitcoin",
@@ -54,13 +79,14 @@ COINGECKO_MAPPINGS = {
     "UNI-USDT": "uniswap"
 }
 
-def get_crypto_price(symbol: str, timeout: Optional[int] = None) -> Optional[Dict[str, Any]]:
+def get_crypto_price(symbol: str, timeout: Optional[int] = None, hedge_delay: Optional[float] = None) -> Optional[Dict[str, Any]]:
     """
     دریافت قیمت ارز دیجیتال
     
     Args:
         symbol (str): نماد ارز دیجیتال (مثال: BTC/USDT)
         timeout (Optional[int]): مهلت زمانی (به ثانیه) برای درخواست‌های API
+        hedge_delay (Optional[float]): تاخیر ارسال درخواست پشتیبان (پیش‌فرض HEDGE_DELAY)
         
     Returns:
         Optional[Dict[str, Any]]: داده‌های قیمت یا None در صورت خطا
@@ -75,16 +101,8 @@ def get_crypto_price(symbol: str, timeout: Optional[int] = None) -> Optional[Dic
             logger.info(f"Using cached price data for {std_symbol}")
             return cached_data
         
-        # دریافت قیمت از CoinGecko
-        price_data = _fetch_from_coingecko(std_symbol)
-        
-        # اگر از CoinGecko دریافت نشد، از CryptoCompare استفاده کن
-        if not price_data:
-            price_data = _fetch_from_cryptocompare(std_symbol)
-        
-        # اگر از CryptoCompare هم دریافت نشد، از Binance استفاده کن
-        if not price_data:
-            price_data = _fetch_from_binance(std_symbol)
+        # دریافت قیمت از CoinGecko، CryptoCompare و Binance به صورت hedged
+        price_data = _fetch_hedged(std_symbol, timeout=timeout, hedge_delay=hedge_delay)
         
         # ذخیره در کش
         if price_data:
@@ -118,39 +136,153 @@ def get_crypto_price(symbol: str, timeout: Optional[int] = None) -> Optional[Dic
         
         return None
 
-def get_multiple_prices(symbols: List[str], timeout: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+def _fetch_hedged(symbol: str, timeout: Optional[float] = None, hedge_delay: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    دریافت قیمت با درخواست‌های hedged
+    
+    ابتدا از ارائه‌دهنده اصلی درخواست می‌شود. اگر تا hedge_delay پاسخی نیامد
+    یا درخواست شکست خورد، ارائه‌دهنده بعدی هم شروع می‌شود. اولین پاسخ معتبر
+    برگردانده شده و بقیه لغو یا نادیده گرفته می‌شوند. همه درخواست‌ها از یک
+    مهلت مشترک پیروی می‌کنند.
+    
+    Args:
+        symbol (str): نماد استاندارد ارز دیجیتال
+        timeout (Optional[float]): مهلت کل (ثانیه)
+        hedge_delay (Optional[float]): تاخیر ارسال درخواست پشتیبان (ثانیه)
+        
+    Returns:
+        Optional[Dict[str, Any]]: اولین داده قیمت معتبر یا None
+    """
+    # ارائه‌دهنده‌هایی که مدارشان باز است بدون اتلاف زمان کنار گذاشته می‌شوند
+    providers = [fetcher for name, fetcher in (("coingecko", _fetch_from_coingecko),
+                                               ("cryptocompare", _fetch_from_cryptocompare),
+                                               ("binance", _fetch_from_binance))
+                 if quota_manager.is_available(name)]
+    if hedge_delay is None:
+        hedge_delay = HEDGE_DELAY
+    deadline = time.monotonic() + (timeout or REQUEST_TIMEOUT)
+    
+    pending = set()
+    next_provider = 0
+    
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"Price request deadline exceeded for {symbol}")
+                return None
+            
+            # شروع ارائه‌دهنده بعدی (در ابتدا، پس از تاخیر، یا پس از شکست قبلی)
+            if next_provider < len(providers):
+                pending.add(_provider_executor.submit(providers[next_provider], symbol, timeout=remaining))
+                next_provider += 1
+            elif not pending:
+                return None
+            
+            wait_for = min(hedge_delay, remaining) if next_provider < len(providers) else remaining
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                price_data = future.result()
+                if price_data:
+                    return price_data
+    finally:
+        # درخواست‌های شروع نشده لغو می‌شوند؛ درخواست‌های در حال اجرا با مهلت خود پایان می‌یابند
+        for future in pending:
+            future.cancel()
+
+def get_multiple_prices(symbols: List[str], timeout: Optional[int] = None, force_refresh: bool = False) -> Dict[str, Dict[str, Any]]:
     """
     دریافت قیمت چندین ارز دیجیتال
     
+    نمادهایی که در کش معتبر نیستند به صورت دسته‌ای و با یک درخواست برای هر
+    ارائه‌دهنده دریافت می‌شوند و فقط نمادهای ناموفق به ارائه‌دهنده بعدی می‌روند.
+    
     Args:
         symbols (List[str]): لیست نمادهای ارز دیجیتال
         timeout (Optional[int]): مهلت زمانی (به ثانیه) برای درخواست‌های API
+        force_refresh (bool): نادیده گرفتن کش معتبر و دریافت قیمت تازه از API
         
     Returns:
         Dict[str, Dict[str, Any]]: دیکشنری از داده‌های قیمت
     """
     result = {}
+    pending = {}  # نماد ورودی -> نماد استاندارد
     
     for symbol in symbols:
+        std_symbol = symbol.upper()
+        cached_data = None if force_refresh else _get_cached_price(std_symbol)
+        if cached_data:
+            result[symbol] = cached_data
+        else:
+            pending[symbol] = std_symbol
+    
+    if not pending:
+        return result
+    
+    try:
+        fetched = _fetch_batch(list(dict.fromkeys(pending.values())), timeout=timeout)
+    except Exception as e:
+        logger.error(f"Error in batched price fetch: {str(e)}")
+        fetched = {}
+    
+    for symbol, std_symbol in pending.items():
+        if std_symbol in fetched:
+            result[symbol] = fetched[std_symbol]
+            continue
+        
+        # تلاش برای استفاده از داده منقضی شده کش در صورت خطا
         try:
-            price_data = get_crypto_price(symbol, timeout=timeout)
-            if price_data:
-                result[symbol] = price_data
-        except Exception as e:
-            logger.error(f"Error in get_multiple_prices for {symbol}: {str(e)}")
-            # تلاش برای استفاده از داده منقضی شده کش در صورت خطا
-            try:
-                expired_data = _get_cached_price(symbol.upper(), ignore_expiry=True)
-                if expired_data:
-                    logger.info(f"Using expired cached data for {symbol} in multiple prices request")
-                    expired_data["is_stale"] = True
-                    expired_data["timestamp"] = time.time()
-                    result[symbol] = expired_data
-            except:
-                pass
+            expired_data = _get_cached_price(std_symbol, ignore_expiry=True)
+            if expired_data:
+                logger.info(f"Using expired cached data for {symbol} in multiple prices request")
+                expired_data["is_stale"] = True
+                expired_data["timestamp"] = time.time()
+                result[symbol] = expired_data
+        except:
+            pass
     
     return result
 
+def _fetch_batch(symbols: List[str], timeout: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    دریافت دسته‌ای قیمت‌ها از ارائه‌دهنده‌ها به ترتیب اولویت
+    
+    Args:
+        symbols (List[str]): لیست نمادهای استاندارد (حروف بزرگ)
+        timeout (Optional[int]): مهلت زمانی هر درخواست (ثانیه)
+        
+    Returns:
+        Dict[str, Dict[str, Any]]: داده‌های قیمت دریافت شده به تفکیک نماد
+    """
+    fetched = {}
+    deadline = time.monotonic() + (timeout or REQUEST_TIMEOUT)
+    
+    for name, _, _ in BATCH_PRICE_PROVIDERS:
+        if not quota_manager.is_available(name):
+            continue
+        
+        missing = [s for s in symbols if s not in fetched]
+        if not missing:
+            break
+        
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.warning(f"Batched price request deadline exceeded, {len(missing)} symbols left")
+            break
+        
+        try:
+            batch = _fetch_batch_from_provider(name, missing, timeout=remaining)
+        except Exception as e:
+            logger.error(f"Error in batched price fetch from {name}: {str(e)}")
+            continue
+        
+        for symbol, price_data in batch.items():
+            _cache_price_data(symbol, price_data)
+            fetched[symbol] = price_data
+    
+    return fetched
+
 def get_current_prices(symbols_list=None, include_favorites=True, timeout=None):
     """
     دریافت قیمت‌های فعلی ارزهای دیجیتال
@@ -196,28 +328,13 @@ def _get_cached_price(symbol: str, ignore_expiry: bool = False) -> Optional[Dict
         Optional[Dict[str, Any]]: داده‌های کش شده یا None
     """
     try:
-        # بررسی وجود فایل کش
-        if not os.path.exists(PRICE_CACHE_FILE):
-            return None
-        
-        # خواندن فایل کش
-        with open(PRICE_CACHE_FILE, 'r') as f:
-            cache = json.load(f)
-        
-        # بررسی وجود داده برای نماد موردنظر
-        if symbol not in cache:
+        entry = _price_store.get(symbol)
+        if entry is None:
             return None
         
-        # بررسی اعتبار داده کش شده
-        cached_time = cache[symbol]['cached_at']
-        current_time = time.time()
-        
-        # اضافه کردن وضعیت منقضی شدن به داده
-        data = cache[symbol]['data']
+        data, cached_time = entry
         
-        if current_time - cached_time > CACHE_EXPIRY and not ignore_expiry:
-            # داده منقضی شده است اما در صورت درخواست، آن را برمی‌گردانیم
-            logger.info(f"Using cached price data for {symbol}")
+        if time.time() - cached_time > CACHE_EXPIRY and not ignore_expiry:
             return None
         
         # اگر داده هنوز معتبر است یا کاربر خواسته انقضا نادیده گرفته شود
@@ -236,62 +353,73 @@ def _cache_price_data(symbol: str, data: Dict[str, Any]) -> None:
         data (Dict[str, Any]): داده‌های قیمت
     """
     try:
-        # ایجاد دایرکتوری کش اگر وجود ندارد
-        os.makedirs(os.path.dirname(PRICE_CACHE_FILE), exist_ok=True)
-        
-        # بارگیری داده‌های کش فعلی یا ایجاد کش جدید
-        cache = {}
-        if os.path.exists(PRICE_CACHE_FILE):
-            with open(PRICE_CACHE_FILE, 'r') as f:
-                cache = json.load(f)
-        
-        # اضافه کردن داده جدید به کش
-        cache[symbol] = {
-            'data': data,
-            'cached_at': time.time()
-        }
-        
-        # ذخیره کش به‌روزرسانی شده
-        with open(PRICE_CACHE_FILE, 'w') as f:
-            json.dump(cache, f, ensure_ascii=False, indent=2)
-    
+        _price_store.put(symbol, data)
     except Exception as e:
         logger.error(f"Error caching price data for {symbol}: {str(e)}")
 
-def _fetch_from_coingecko(symbol: str) -> Optional[Dict[str, Any]]:
+def _split_symbol(symbol: str) -> Optional[List[str]]:
+    """
+    تفکیک نماد به ارز پایه و ارز مقصد
+    
+    Args:
+        symbol (str): نماد ارز دیجیتال (BTC/USDT یا BTC-USDT)
+        
+    Returns:
+        Optional[List[str]]: [ارز پایه، ارز مقصد] یا None
+    """
+    parts = symbol.split('/')
+    if len(parts) != 2:
+        parts = symbol.split('-')
+        if len(parts) != 2:
+            return None
+    return parts
+
+def _get_coingecko_id(symbol: str) -> Optional[str]:
+    """
+    تبدیل نماد به شناسه CoinGecko
+    
+    Args:
+        symbol (str): نماد ارز دیجیتال
+        
+    Returns:
+        Optional[str]: شناسه CoinGecko یا None
+    """
+    if symbol in COINGECKO_MAPPINGS:
+        return COINGECKO_MAPPINGS[symbol]
+    
+    # تلاش برای تبدیل خودکار
+    parts = symbol.split('/')
+    if len(parts) == 2 and parts[1] == "USDT":
+        # بررسی در نگاشت
+        for key, value in COINGECKO_MAPPINGS.items():
+            if key.startswith(parts[0]):
+                return value
+        # اگر پیدا نشد، از نام ارز استفاده کن
+        return parts[0].lower()
+    
+    return None
+
+def _fetch_from_coingecko(symbol: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
     """
     دریافت قیمت از CoinGecko
     
     Args:
         symbol (str): نماد ارز دیجیتال
+        timeout (Optional[float]): مهلت زمانی درخواست (ثانیه)
         
     Returns:
         Optional[Dict[str, Any]]: داده‌های قیمت یا None
     """
     try:
         # تبدیل نماد به فرمت CoinGecko
-        if symbol in COINGECKO_MAPPINGS:
-            coin_id = COINGECKO_MAPPINGS[symbol]
-        else:
-            # تلاش برای تبدیل خودکار
-            parts = symbol.split('/')
-            if len(parts) == 2 and parts[1] == "USDT":
-                coin_name = parts[0].lower()
-                # بررسی در نگاشت
-                for key, value in COINGECKO_MAPPINGS.items():
-                    if key.startswith(parts[0]):
-                        coin_id = value
-                        break
-                else:
-                    # اگر پیدا نشد، از نام ارز استفاده کن
-                    coin_id = coin_name
-            else:
-                return None
+        coin_id = _get_coingecko_id(symbol)
+        if not coin_id:
+            return None
         
         # درخواست به API
         url = f"https://api.coingecko.com/api/v3/coins/{coin_id}"
         headers = {"accept": "application/json"}
-        response = requests.get(url, headers=headers, timeout=10)
+        response = http_client.get(url, headers=headers, timeout=timeout or REQUEST_TIMEOUT, retries=0, provider='coingecko')
         
         if response.status_code != 200:
             logger.warning(f"CoinGecko API returned status code {response.status_code}")
@@ -317,12 +445,13 @@ def _fetch_from_coingecko(symbol: str) -> Optional[Dict[str, Any]]:
         logger.error(f"Error fetching from CoinGecko for {symbol}: {str(e)}")
         return None
 
-def _fetch_from_cryptocompare(symbol: str) -> Optional[Dict[str, Any]]:
+def _fetch_from_cryptocompare(symbol: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
     """
     دریافت قیمت از CryptoCompare
     
     Args:
         symbol (str): نماد ارز دیجیتال
+        timeout (Optional[float]): مهلت زمانی درخواست (ثانیه)
         
     Returns:
         Optional[Dict[str, Any]]: داده‌های قیمت یا None
@@ -345,7 +474,7 @@ def _fetch_from_cryptocompare(symbol: str) -> Optional[Dict[str, Any]]:
         if CRYPTOCOMPARE_API_KEY:
             headers["authorization"] = f"Apikey {CRYPTOCOMPARE_API_KEY}"
         
-        response = requests.get(url, headers=headers, timeout=10)
+        response = http_client.get(url, headers=headers, timeout=timeout or REQUEST_TIMEOUT, retries=0, provider='cryptocompare')
         
         if response.status_code != 200:
             logger.warning(f"CryptoCompare API returned status code {response.status_code}")
@@ -378,12 +507,13 @@ def _fetch_from_cryptocompare(symbol: str) -> Optional[Dict[str, Any]]:
         logger.error(f"Error fetching from CryptoCompare for {symbol}: {str(e)}")
         return None
 
-def _fetch_from_binance(symbol: str) -> Optional[Dict[str, Any]]:
+def _fetch_from_binance(symbol: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
     """
     دریافت قیمت از Binance
     
     Args:
         symbol (str): نماد ارز دیجیتال
+        timeout (Optional[float]): مهلت زمانی درخواست (ثانیه)
         
     Returns:
         Optional[Dict[str, Any]]: داده‌های قیمت یا None
@@ -400,7 +530,7 @@ def _fetch_from_binance(symbol: str) -> Optional[Dict[str, Any]]:
         
         # درخواست به API
         url = f"https://api.binance.com/api/v3/ticker/24hr?symbol={binance_symbol}"
-        response = requests.get(url, timeout=10)
+        response = http_client.get(url, timeout=timeout or REQUEST_TIMEOUT, retries=0, provider='binance')
         
         if response.status_code != 200:
             logger.warning(f"Binance API returned status code {response.status_code}")
@@ -424,7 +554,307 @@ def _fetch_from_binance(symbol: str) -> Optional[Dict[str, Any]]:
         logger.error(f"Error fetching from Binance for {symbol}: {str(e)}")
         return None
 
-def get_historical_data(symbol: str, timeframe: str = "1d", limit: int = 100) -> Optional[List[Dict[str, Any]]]:
+def _coingecko_batch_request(symbols: List[str]) -> Optional[Tuple[str, Dict[str, Any], Dict[str, str], Any]]:
+    """
+    ساخت درخواست دسته‌ای CoinGecko (/simple/price)
+    
+    Args:
+        symbols (List[str]): لیست نمادهای ارز دیجیتال
+        
+    Returns:
+        Optional[Tuple]: (آدرس، پارامترها، هدرها، زمینه تجزیه پاسخ) یا None اگر نمادی پشتیبانی نشود
+    """
+    # چند نماد ممکن است به یک شناسه CoinGecko نگاشت شوند
+    ids: Dict[str, List[str]] = {}
+    for symbol in symbols:
+        coin_id = _get_coingecko_id(symbol)
+        if coin_id:
+            ids.setdefault(coin_id, []).append(symbol)
+    
+    if not ids:
+        return None
+    
+    url = "https://api.coingecko.com/api/v3/simple/price"
+    params = {
+        "ids": ",".join(ids),
+        "vs_currencies": "usd",
+        "include_market_cap": "true",
+        "include_24hr_vol": "true",
+        "include_24hr_change": "true"
+    }
+    headers = {"accept": "application/json"}
+    return url, params, headers, ids
+
+def _coingecko_batch_parse(data: Any, ids: Dict[str, List[str]]) -> Dict[str, Dict[str, Any]]:
+    """
+    تبدیل پاسخ دسته‌ای CoinGecko به داده‌های قیمت
+    
+    Args:
+        data (Any): پاسخ JSON
+        ids (Dict[str, List[str]]): شناسه CoinGecko -> نمادها
+        
+    Returns:
+        Dict[str, Dict[str, Any]]: داده‌های قیمت به تفکیک نماد
+    """
+    result = {}
+    
+    for coin_id, coin_symbols in ids.items():
+        coin_data = data.get(coin_id)
+        if not coin_data or coin_data.get("usd") is None:
+            continue
+        
+        price_data = {
+            "price": coin_data["usd"],
+            "change_24h": coin_data.get("usd_24h_change"),
+            "market_cap": coin_data.get("usd_market_cap"),
+            "volume_24h": coin_data.get("usd_24h_vol"),
+            "source": "CoinGecko"
+        }
+        for symbol in coin_symbols:
+            result[symbol] = dict(price_data)
+    
+    return result
+
+def _cryptocompare_batch_request(symbols: List[str]) -> Optional[Tuple[str, Dict[str, Any], Dict[str, str], Any]]:
+    """
+    ساخت درخواست دسته‌ای CryptoCompare (pricemultifull)
+    
+    Args:
+        symbols (List[str]): لیست نمادهای ارز دیجیتال
+        
+    Returns:
+        Optional[Tuple]: (آدرس، پارامترها، هدرها، زمینه تجزیه پاسخ) یا None اگر نمادی پشتیبانی نشود
+    """
+    pairs = {}
+    for symbol in symbols:
+        parts = _split_symbol(symbol)
+        if parts:
+            pairs[symbol] = parts
+    
+    if not pairs:
+        return None
+    
+    base_coins = list(dict.fromkeys(base for base, _ in pairs.values()))
+    quote_coins = list(dict.fromkeys(quote for _, quote in pairs.values()))
+    
+    url = "https://min-api.cryptocompare.com/data/pricemultifull"
+    params = {"fsyms": ",".join(base_coins), "tsyms": ",".join(quote_coins)}
+    
+    headers = {}
+    if CRYPTOCOMPARE_API_KEY:
+        headers["authorization"] = f"Apikey {CRYPTOCOMPARE_API_KEY}"
+    
+    return url, params, headers, pairs
+
+def _cryptocompare_batch_parse(data: Any, pairs: Dict[str, List[str]]) -> Dict[str, Dict[str, Any]]:
+    """
+    تبدیل پاسخ دسته‌ای CryptoCompare به داده‌های قیمت
+    
+    Args:
+        data (Any): پاسخ JSON
+        pairs (Dict[str, List[str]]): نماد -> [ارز پایه، ارز مقصد]
+        
+    Returns:
+        Dict[str, Dict[str, Any]]: داده‌های قیمت به تفکیک نماد
+    """
+    raw = data.get("RAW", {})
+    result = {}
+    
+    for symbol, (base_coin, quote_coin) in pairs.items():
+        raw_data = raw.get(base_coin, {}).get(quote_coin)
+        if not raw_data or "PRICE" not in raw_data:
+            continue
+        
+        result[symbol] = {
+            "price": raw_data["PRICE"],
+            "change_24h": raw_data.get("CHANGEPCT24HOUR"),
+            "market_cap": raw_data.get("MKTCAP"),
+            "volume_24h": raw_data.get("VOLUME24HOUR"),
+            "source": "CryptoCompare"
+        }
+    
+    return result
+
+def _binance_batch_request(symbols: List[str]) -> Optional[Tuple[str, Dict[str, Any], Dict[str, str], Any]]:
+    """
+    ساخت درخواست دسته‌ای Binance (ticker/24hr فقط برای نمادهای درخواستی)
+    
+    Binance برای یک نماد نامعتبر در پارامتر symbols کل درخواست را با خطای 400 رد می‌کند؛
+    بنابراین فقط نمادهای موجود در فهرست نمادهای فعال درخواست می‌شوند. اگر این فهرست
+    هنوز دریافت نشده یا منقضی شده باشد، یک بار تیکر همه بازارها دریافت می‌شود.
+    
+    Args:
+        symbols (List[str]): لیست نمادهای ارز دیجیتال
+        
+    Returns:
+        Optional[Tuple]: (آدرس، پارامترها، هدرها، زمینه تجزیه پاسخ) یا None اگر نمادی پشتیبانی نشود
+    """
+    binance_symbols = {}
+    for symbol in symbols:
+        parts = _split_symbol(symbol)
+        if parts:
+            binance_symbols.setdefault(f"{parts[0]}{parts[1]}", []).append(symbol)
+    
+    if not binance_symbols:
+        return None
+    
+    url = "https://api.binance.com/api/v3/ticker/24hr"
+    fetched_at, listed = _binance_listed_symbols
+    if time.time() - fetched_at > BINANCE_SYMBOLS_TTL or len(binance_symbols) > BINANCE_SYMBOLS_MAX:
+        # بدون پارامتر symbol، Binance تیکر همه بازارها را در یک پاسخ برمی‌گرداند (وزن 80)
+        return url, {}, {}, (binance_symbols, True)
+    
+    binance_symbols = {name: requested for name, requested in binance_symbols.items() if name in listed}
+    if not binance_symbols:
+        return None
+    
+    # پارامتر symbols به صورت آرایه JSON فشرده (وزن 2 تا 40)
+    params = {"symbols": json.dumps(sorted(binance_symbols), separators=(',', ':'))}
+    return url, params, {}, (binance_symbols, False)
+
+def _binance_batch_parse(data: Any, context: Tuple[Dict[str, List[str]], bool]) -> Dict[str, Dict[str, Any]]:
+    """
+    تبدیل پاسخ ticker/24hr بایننس به داده‌های قیمت
+    
+    Args:
+        data (Any): پاسخ JSON
+        context (Tuple): (نماد بایننس -> نمادها، آیا پاسخ شامل همه بازارهاست)
+        
+    Returns:
+        Dict[str, Dict[str, Any]]: داده‌های قیمت به تفکیک نماد
+    """
+    global _binance_listed_symbols
+    binance_symbols, all_markets = context
+    if all_markets:
+        _binance_listed_symbols = (time.time(), frozenset(ticker.get("symbol") for ticker in data))
+    
+    result = {}
+    
+    for ticker in data:
+        requested = binance_symbols.get(ticker.get("symbol"))
+        if not requested:
+            continue
+        
+        price = float(ticker["lastPrice"])
+        price_data = {
+            "price": price,
+            "change_24h": float(ticker["priceChangePercent"]),
+            "volume_24h": float(ticker["volume"]) * price,
+            "source": "Binance"
+        }
+        for symbol in requested:
+            result[symbol] = dict(price_data)
+    
+    return result
+
+# ارائه‌دهنده‌های قیمت دسته‌ای به ترتیب اولویت: (نام، ساخت درخواست، تجزیه پاسخ)
+# کلاینت همگام و ناهمگام (async_client) هر دو از همین تعریف‌ها استفاده می‌کنند
+BATCH_PRICE_PROVIDERS = [
+    ("coingecko", _coingecko_batch_request, _coingecko_batch_parse),
+    ("cryptocompare", _cryptocompare_batch_request, _cryptocompare_batch_parse),
+    ("binance", _binance_batch_request, _binance_batch_parse),
+]
+
+def _fetch_batch_from_provider(provider: str, symbols: List[str], timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    دریافت دسته‌ای قیمت از یک ارائه‌دهنده
+    
+    Args:
+        provider (str): نام ارائه‌دهنده در BATCH_PRICE_PROVIDERS
+        symbols (List[str]): لیست نمادهای ارز دیجیتال
+        timeout (Optional[float]): مهلت زمانی درخواست (ثانیه)
+        
+    Returns:
+        Dict[str, Dict[str, Any]]: داده‌های قیمت به تفکیک نماد
+    """
+    _, build_request, parse = next(entry for entry in BATCH_PRICE_PROVIDERS if entry[0] == provider)
+    request = build_request(symbols)
+    if request is None:
+        return {}
+    
+    url, params, headers, context = request
+    response = http_client.get(url, params=params, headers=headers, timeout=timeout or REQUEST_TIMEOUT,
+                               retries=0, provider=provider)
+    
+    if response.status_code != 200:
+        logger.warning(f"{provider} API returned status code {response.status_code}")
+        return {}
+    
+    return parse(response.json(), context)
+
+def _fetch_binance_klines(symbol: str, timeframe: str, start_ms: int, limit: int) -> List[tuple]:
+    """
+    دریافت کندل‌ها از Binance از زمان مشخص
+    
+    Args:
+        symbol (str): نماد ارز دیجیتال
+        timeframe (str): بازه زمانی
+        start_ms (int): زمان شروع (میلی‌ثانیه)
+        limit (int): تعداد کندل‌ها (حداکثر 1000)
+        
+    Returns:
+        List[tuple]: کندل‌ها به صورت (timestamp، open، high، low، close، volume)
+    """
+    request = _binance_klines_request(symbol, timeframe, start_ms, limit)
+    if request is None:
+        return []
+    
+    url, params = request
+    response = http_client.get(url, params=params, timeout=REQUEST_TIMEOUT, provider='binance')
+    
+    if response.status_code != 200:
+        raise ValueError(f"Binance API returned status code {response.status_code}")
+    
+    return _parse_binance_klines(response.json())
+
+def _binance_klines_request(symbol: str, timeframe: str, start_ms: int, limit: int) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """ساخت آدرس و پارامترهای درخواست کندل Binance (None برای نماد نامعتبر)"""
+    parts = _split_symbol(symbol)
+    if not parts:
+        return None
+    
+    url = "https://api.binance.com/api/v3/klines"
+    params = {
+        "symbol": f"{parts[0]}{parts[1]}",
+        "interval": timeframe,
+        "startTime": start_ms,
+        "limit": limit
+    }
+    return url, params
+
+def _parse_binance_klines(data: Any) -> List[tuple]:
+    """تبدیل پاسخ کندل Binance به (timestamp، open، high، low، close، volume)"""
+    return [
+        (int(candle[0]), float(candle[1]), float(candle[2]), float(candle[3]), float(candle[4]), float(candle[5]))
+        for candle in data
+    ]
+
+# انبار محلی کندل‌ها؛ فقط کندل‌های جاافتاده از Binance دریافت می‌شوند
+_candle_store = CandleStore(CANDLE_DB_FILE, fetcher=_fetch_binance_klines)
+
+def get_candles(symbol: str, timeframe: str = "1d", limit: int = 100) -> Optional[List[tuple]]:
+    """
+    دریافت کندل‌ها از انبار محلی (با دریافت کندل‌های جاافتاده از صرافی)
+    
+    Args:
+        symbol (str): نماد ارز دیجیتال
+        timeframe (str): بازه زمانی
+        limit (int): تعداد کندل‌ها
+        
+    Returns:
+        Optional[List[tuple]]: کندل‌ها به صورت (timestamp میلی‌ثانیه، open، high، low، close، volume) یا None
+    """
+    if timeframe not in TIMEFRAME_SECONDS:
+        return None
+    
+    symbol = symbol.upper().replace('-', '/')
+    if not _split_symbol(symbol):
+        return None
+    
+    return _candle_store.get_candles(symbol, timeframe, limit)
+
+def get_historical_data(symbol: str, timeframe: str = "1d", limit: int = 100,
+                        sample_fallback: bool = True) -> Optional[List[Dict[str, Any]]]:
     """
     دریافت داده‌های تاریخی ارز دیجیتال
     
@@ -432,6 +862,7 @@ def get_historical_data(symbol: str, timeframe: str = "1d", limit: int = 100) ->
         symbol (str): نماد ارز دیجیتال
         timeframe (str): بازه زمانی. مقادیر مجاز: "1m", "5m", "15m", "30m", "1h", "4h", "1d", "1w"
         limit (int): تعداد داده‌های درخواستی
+        sample_fallback (bool): تولید داده تست در صورت نبود کندل (در غیر این صورت None برمی‌گردد)
         
     Returns:
         Optional[List[Dict[str, Any]]]: لیست داده‌های تاریخی یا None در صورت خطا
@@ -444,58 +875,108 @@ def get_historical_data(symbol: str, timeframe: str = "1d", limit: int = 100) ->
             if len(parts) != 2:
                 return None
         
-        binance_symbol = f"{parts[0]}{parts[1]}"
-        
-        # تبدیل timeframe به فرمت Binance
-        timeframe_map = {
-            "1m": "1m", "5m": "5m", "15m": "15m", "30m": "30m",
-            "1h": "1h", "4h": "4h", "1d": "1d", "1w": "1w"
-        }
+        timeframes = ["1m", "5m", "15m", "30m", "1h", "4h", "1d", "1w"]
         
-        if timeframe not in timeframe_map:
+        if timeframe not in timeframes:
             logger.warning(f"Invalid timeframe: {timeframe}")
             timeframe = "1d"  # استفاده از مقدار پیش‌فرض
         
-        # درخواست به API
-        url = f"https://api.binance.com/api/v3/klines?symbol={binance_symbol}&interval={timeframe_map[timeframe]}&limit={limit}"
-        response = requests.get(url, timeout=10)
+        # دریافت از انبار محلی کندل‌ها
+        candles = get_candles(f"{parts[0]}/{parts[1]}", timeframe, limit)
         
-        if response.status_code != 200:
-            logger.warning(f"Binance API returned status code {response.status_code}")
+        if not candles:
+            logger.warning(f"No candles available for {symbol} {timeframe}")
             # ساخت داده تست به عنوان جایگزین
-            return _generate_sample_data(limit)
-        
-        data = response.json()
+            return generate_sample_data(limit) if sample_fallback else None
         
-        # تبدیل داده‌ها به ساختار مناسب
-        historical_data = []
-        
-        for candle in data:
-            timestamp = candle[0] / 1000  # تبدیل به ثانیه
-            open_price = float(candle[1])
-            high_price = float(candle[2])
-            low_price = float(candle[3])
-            close_price = float(candle[4])
-            volume = float(candle[5])
-            
-            historical_data.append({
-                "timestamp": timestamp,
-                "datetime": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
-                "open": open_price,
-                "high": high_price,
-                "low": low_price,
-                "close": close_price,
-                "volume": volume
-            })
-        
-        return historical_data
+        return _candles_to_records(candles)
     
     except Exception as e:
         logger.error(f"Error fetching historical data for {symbol}: {str(e)}")
         # در صورت خطا، داده تست تولید کن
-        return _generate_sample_data(limit)
+        return generate_sample_data(limit) if sample_fallback else None
+
+def get_candles_multi(symbol: str, timeframes: List[str], limit: int = 100) -> Dict[str, List[tuple]]:
+    """
+    دریافت کندل‌های چند بازه زمانی از یک سری پایه مشترک
+    
+    ریزترین بازه لازم یک بار از انبار محلی (و در صورت نیاز از صرافی) خوانده شده
+    و بازه‌های بزرگ‌تر از آن ساخته می‌شوند.
+    
+    Args:
+        symbol (str): نماد ارز دیجیتال
+        timeframes (List[str]): بازه‌های زمانی
+        limit (int): تعداد کندل‌های هر بازه
+        
+    Returns:
+        Dict[str, List[tuple]]: کندل‌ها به تفکیک بازه زمانی (بازه‌های نامعتبر یا بدون داده حذف می‌شوند)
+    """
+    timeframes = [tf for tf in dict.fromkeys(timeframes) if tf in TIMEFRAME_SECONDS]
+    
+    symbol = symbol.upper().replace('-', '/')
+    if not timeframes or not _split_symbol(symbol):
+        return {}
+    
+    return _candle_store.get_candles_multi(symbol, timeframes, limit)
+
+def get_historical_data_multi(symbol: str, timeframes: List[str], limit: int = 100,
+                              sample_fallback: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    دریافت داده‌های تاریخی چند بازه زمانی با یک دریافت مشترک از صرافی
+    
+    Args:
+        symbol (str): نماد ارز دیجیتال
+        timeframes (List[str]): بازه‌های زمانی
+        limit (int): تعداد داده‌های هر بازه
+        sample_fallback (bool): تولید داده تست برای بازه‌های بدون کندل (در غیر این صورت حذف می‌شوند)
+        
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: داده‌های تاریخی به تفکیک بازه زمانی
+    """
+    try:
+        candles = get_candles_multi(symbol, timeframes, limit)
+    except Exception as e:
+        logger.error(f"Error fetching multi-timeframe data for {symbol}: {str(e)}")
+        candles = {}
+    
+    result = {}
+    for timeframe in timeframes:
+        if candles.get(timeframe):
+            result[timeframe] = _candles_to_records(candles[timeframe])
+        else:
+            logger.warning(f"No candles available for {symbol} {timeframe}")
+            if sample_fallback:
+                result[timeframe] = generate_sample_data(limit)
+    return result
+
+def _candles_to_records(candles: List[tuple]) -> List[Dict[str, Any]]:
+    """
+    تبدیل کندل‌های انبار محلی به ساختار داده‌های تاریخی
+    
+    Args:
+        candles (List[tuple]): کندل‌ها به صورت (timestamp میلی‌ثانیه، open، high، low، close، volume)
+        
+    Returns:
+        List[Dict[str, Any]]: لیست داده‌های تاریخی
+    """
+    historical_data = []
+    
+    for candle in candles:
+        timestamp = candle[0] / 1000  # تبدیل به ثانیه
+        
+        historical_data.append({
+            "timestamp": timestamp,
+            "datetime": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+            "open": candle[1],
+            "high": candle[2],
+            "low": candle[3],
+            "close": candle[4],
+            "volume": candle[5]
+        })
+    
+    return historical_data
 
-def _generate_sample_data(limit: int = 100) -> List[Dict[str, Any]]:
+def generate_sample_data(limit: int = 100) -> List[Dict[str, Any]]:
     """
     تولید داده تست برای تحلیل تکنیکال
     
@@ -8,7 +8,7 @@ import random  # برای داده‌های نمونه، در نسخه نهای
 import pandas as pd
 
 from crypto_bot.market_data import get_current_prices, get_historical_data
-from crypto_bot.technical_analysis import get_technical_indicators
+from crypto_bot.technical_analysis import get_technical_indicators, get_technical_indicators_batch
 from crypto_bot.news_analyzer import get_latest_news, analyze_sentiment
 
 # تنظیم لاگر
@@ -58,10 +58,15 @@ def detect_buy_sell_opportunities(symbols, sensitivity="medium"):
         # دریافت اخبار اخیر
         news = get_latest_news(limit=10)
         
+        # محاسبه برداری شاخص‌های فنی همه ارزها
+        all_technical = get_technical_indicators_batch(
+            symbols, indicators=['rsi', 'macd_histogram', 'bb_upper', 'bb_lower']
+        )
+        
         for symbol in symbols:
             try:
                 # دریافت تحلیل فنی
-                technical = get_technical_indicators(symbol)
+                technical = all_technical[symbol]
                 
                 # تشخیص فرصت‌ها بر اساس شاخص‌های فنی
                 price_data = {}
@@ -268,7 +273,7 @@ def _analyze_technical_indicators(symbol, technical, price_data, sensitivity_fac
     
     # استخراج شاخص‌های کلیدی
     rsi = technical.get('rsi', 50)
-    macd = technical.get('macd', {}).get('histogram', 0)
+    macd = technical.get('macd_histogram', 0)
     current_price = price_data.get('price', 0)
     
     # بررسی وضعیت اشباع خرید/فروش (RSI)
@@ -294,8 +299,8 @@ def _analyze_technical_indicators(symbol, technical, price_data, sensitivity_fac
             signal_strength += 0.3
     
     # بررسی باندهای بولینگر
-    upper_band = technical.get('bollinger_bands', {}).get('upper', current_price * 1.05)
-    lower_band = technical.get('bollinger_bands', {}).get('lower', current_price * 0.95)
+    upper_band = technical.get('bb_upper', current_price * 1.05)
+    lower_band = technical.get('bb_lower', current_price * 0.95)
     
     # نزدیکی به خط پایین باند بولینگر: سیگنال خرید
     if current_price <= lower_band * (1 + 0.01 * sensitivity_factor):
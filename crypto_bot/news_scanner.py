@@ -17,6 +17,8 @@ import requests
 import trafilatura
 from bs4 import BeautifulSoup
 
+from crypto_bot.http_client import http_client
+
 # اضافه کردن ماژول جدید API اخبار
 try:
     from crypto_bot.crypto_news_api import (
@@ -213,7 +215,7 @@ def fetch_web_news(source, max_items=5):
         
         # افزایش تایم‌اوت و مدیریت خطاهای اتصال
         try:
-            response = requests.get(
+            response = http_client.get(
                 source["url"], 
                 headers=headers, 
                 timeout=15,  # افزایش تایم‌اوت
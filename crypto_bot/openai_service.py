@@ -7,6 +7,8 @@ import json
 import logging
 from openai import OpenAI
 
+from crypto_bot.quota_manager import quota_manager
+
 # تنظیم لاگر
 logger = logging.getLogger(__name__)
 
@@ -16,6 +18,9 @@ OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 # مقداردهی اولیه کلاینت OpenAI
 openai_client = None
 
+# بیشترین زمان انتظار برای سهمیه OpenAI (ثانیه)؛ پاسخ‌های OpenAI خودشان چند ثانیه طول می‌کشند
+OPENAI_QUOTA_WAIT = 5
+
 def initialize_openai():
     """
     راه‌اندازی کلاینت OpenAI
@@ -35,6 +40,33 @@ def initialize_openai():
         return False
 
 
+def create_chat_completion(client, **kwargs):
+    """
+    ارسال درخواست chat completion با رعایت سهمیه OpenAI
+    
+    در صورت محدودیت نرخ یا خطاهای پشت سر هم، درخواست‌های بعدی تا پایان مدت
+    انتظار بدون تماس با OpenAI رد می‌شوند.
+    
+    Args:
+        client (OpenAI): کلاینت OpenAI
+        **kwargs: پارامترهای chat.completions.create
+        
+    Returns:
+        پاسخ OpenAI
+        
+    Raises:
+        ProviderUnavailable: اگر سهمیه OpenAI تمام شده یا مدار آن باز باشد
+    """
+    quota_manager.acquire('openai', max_wait=OPENAI_QUOTA_WAIT)
+    try:
+        response = client.chat.completions.create(**kwargs)
+    except Exception as e:
+        quota_manager.record_error('openai', e)
+        raise
+    quota_manager.record_success('openai')
+    return response
+
+
 def analyze_market_data(symbol, price_data, news_data=None, timeframe="24h"):
     """
     تحلیل داده‌های بازار با استفاده از هوش مصنوعی OpenAI
@@ -83,7 +115,7 @@ def analyze_market_data(symbol, price_data, news_data=None, timeframe="24h"):
         """
         
         # ارسال درخواست به OpenAI
-        response = openai_client.chat.completions.create(
+        response = create_chat_completion(openai_client,
             model="gpt-4o",  # استفاده از مدل پیشرفته OpenAI - نسخه جدید است، تغییر ندهید
             messages=[
                 {"role": "system", "content": "شما یک تحلیلگر حرفه‌ای بازار ارزهای دیجیتال هستید. لطفاً تحلیل‌های دقیق و عمیق ارائه دهید."},
@@ -150,7 +182,7 @@ def analyze_news_sentiment(news_items):
         """
         
         # ارسال درخواست به OpenAI
-        response = openai_client.chat.completions.create(
+        response = create_chat_completion(openai_client,
             model="gpt-4o",  # استفاده از مدل پیشرفته OpenAI - نسخه جدید است، تغییر ندهید
             messages=[
                 {"role": "system", "content": "شما یک تحلیلگر احساسات اخبار ارزهای دیجیتال هستید. لطفاً تحلیل‌های دقیق و موجز ارائه دهید."},
@@ -218,7 +250,7 @@ def suggest_trading_strategy(symbol, price_data, technical_indicators, risk_leve
         """
         
         # ارسال درخواست به OpenAI
-        response = openai_client.chat.completions.create(
+        response = create_chat_completion(openai_client,
             model="gpt-4o",  # استفاده از مدل پیشرفته OpenAI - نسخه جدید است، تغییر ندهید
             messages=[
                 {"role": "system", "content": "شما یک استراتژیست معاملاتی حرفه‌ای در بازار ارزهای دیجیتال هستید. لطفاً استراتژی‌های دقیق و کاربردی ارائه دهید."},
@@ -292,7 +324,7 @@ def detect_price_patterns(symbol, price_data, timeframe="1d"):
         """
         
         # ارسال درخواست به OpenAI
-        response = openai_client.chat.completions.create(
+        response = create_chat_completion(openai_client,
             model="gpt-4o",  # استفاده از مدل پیشرفته OpenAI - نسخه جدید است، تغییر ندهید
             messages=[
                 {"role": "system", "content": "شما یک متخصص تحلیل تکنیکال و شناسایی الگوهای قیمت در بازار ارزهای دیجیتال هستید. لطفاً الگوهای قیمت را با دقت شناسایی کنید."},
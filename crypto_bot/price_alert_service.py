@@ -8,10 +8,14 @@ and sending alerts when prices reach specific thresholds.
 
 import logging
 import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pytz
 from typing import Dict, List, Optional, Tuple, Any
 
-from crypto_bot import market_data
+from crypto_bot.alert_engine import alert_engine
+from crypto_bot.price_ticker import price_ticker, normalize_symbol
 import replit_telegram_sender
 
 # Setup logger
@@ -24,10 +28,25 @@ logger = logging.getLogger("price_alert")
 # Toronto timezone
 toronto_tz = pytz.timezone('America/Toronto')
 
-# List of price ranges for alerts
-# Structure: {symbol: [(price, type, triggered)]}
-# type can be "above" or "below"
-price_alerts: Dict[str, List[Tuple[float, str, bool]]] = {}
+# Alert notifications are sent off the price publisher's thread, in order
+_notify_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="price-alert-notify")
+_watcher_running = False
+
+# Timer that re-checks debounced alerts when they fall due, even if no new price arrives
+_due_timer: Optional[threading.Timer] = None
+_due_timer_at: Optional[float] = None
+_due_lock = threading.Lock()
+
+
+def init_price_alerts(app) -> None:
+    """
+    بارگذاری هشدارهای ذخیره شده از پایگاه داده و ذخیره هشدارهای جدید در آن
+    
+    Args:
+        app: برنامه Flask
+    """
+    alert_engine.init_app(app)
+    price_ticker.watch('price_alerts', alert_engine.symbols())
 
 
 def set_price_alert(symbol: str, price: float, alert_type: str = "above") -> bool:
@@ -42,19 +61,14 @@ def set_price_alert(symbol: str, price: float, alert_type: str = "above") -> boo
     Returns:
         bool: وضعیت تنظیم هشدار
     """
-    if symbol not in price_alerts:
-        price_alerts[symbol] = []
-    
-    # If a similar alert already exists, update it
-    for i, (old_price, old_type, _) in enumerate(price_alerts[symbol]):
-        if abs(old_price - price) < 0.001 and old_type == alert_type:
-            price_alerts[symbol][i] = (price, alert_type, False)
-            logger.info(f"Price alert for {symbol} updated: {alert_type} {price}")
-            return True
+    try:
+        _, created = alert_engine.add_alert(symbol, price, alert_type)
+    except ValueError as e:
+        logger.error(f"Invalid price alert for {symbol}: {str(e)}")
+        return False
     
-    # Add a new alert
-    price_alerts[symbol].append((price, alert_type, False))
-    logger.info(f"Price alert for {symbol} set: {alert_type} {price}")
+    price_ticker.watch('price_alerts', alert_engine.symbols())
+    logger.info(f"Price alert for {symbol} {'set' if created else 'updated'}: {alert_type} {price}")
     return True
 
 
@@ -70,18 +84,13 @@ def remove_price_alert(symbol: str, price: float, alert_type: str = "above") ->
     Returns:
         bool: وضعیت حذف هشدار
     """
-    if symbol not in price_alerts:
-        logger.warning(f"No alerts exist for {symbol}")
+    if not alert_engine.remove_alert(symbol, price, alert_type):
+        logger.warning(f"Price alert for {symbol} not found: {alert_type} {price}")
         return False
     
-    for i, (old_price, old_type, _) in enumerate(price_alerts[symbol]):
-        if abs(old_price - price) < 0.001 and old_type == alert_type:
-            price_alerts[symbol].pop(i)
-            logger.info(f"Price alert for {symbol} removed: {alert_type} {price}")
-            return True
-    
-    logger.warning(f"Price alert for {symbol} not found: {alert_type} {price}")
-    return False
+    price_ticker.watch('price_alerts', alert_engine.symbols())
+    logger.info(f"Price alert for {symbol} removed: {alert_type} {price}")
+    return True
 
 
 def get_price_alerts(symbol: Optional[str] = None) -> Dict[str, List[Tuple[float, str, bool]]]:
@@ -92,11 +101,12 @@ def get_price_alerts(symbol: Optional[str] = None) -> Dict[str, List[Tuple[float
         symbol (Optional[str]): نماد ارز برای فیلتر (اگر None باشد همه هشدارها برگردانده می‌شوند)
         
     Returns:
-        Dict[str, List[Tuple[float, str, bool]]]: دیکشنری هشدارهای قیمت
+        Dict[str, List[Tuple[float, str, bool]]]: دیکشنری هشدارهای قیمت (قیمت، نوع، فعال شده)
     """
-    if symbol:
-        return {symbol: price_alerts.get(symbol, [])}
-    return price_alerts
+    return {
+        s: [(alert.price, alert.condition, not alert.armed) for alert in alerts]
+        for s, alerts in alert_engine.get_alerts(symbol).items()
+    }
 
 
 def _format_price_for_message(price: float) -> str:
@@ -124,68 +134,160 @@ def check_price_alerts() -> List[Dict[str, Any]]:
     Returns:
         List[Dict[str, Any]]: لیست هشدارهای فعال شده
     """
-    triggered_alerts = []
+    # دریافت قیمت همه نمادها از snapshot مشترک در یک مرحله
+    try:
+        snapshot_prices = price_ticker.get_prices(alert_engine.symbols())
+    except Exception as e:
+        logger.error(f"خطا در دریافت قیمت‌ها: {str(e)}")
+        return []
+    
+    prices = {}
+    for symbol, data in snapshot_prices.items():
+        if data and data.get("price") is not None:
+            prices[symbol] = data["price"]
+        else:
+            logger.warning(f"امکان دریافت قیمت برای {symbol} وجود ندارد")
+    
+    # فقط هشدارهایی که قیمت از هدفشان عبور کرده بررسی می‌شوند
+    triggered_alerts = alert_engine.evaluate(prices)
+    _send_alerts(triggered_alerts)
+    _schedule_due_check()
     
-    for symbol, alerts in price_alerts.items():
-        # دریافت قیمت فعلی
+    return triggered_alerts
+
+
+def _send_alerts(triggered_alerts: List[Dict[str, Any]]) -> None:
+    """
+    ارسال پیام تلگرام برای هشدارهای فعال شده
+    
+    Args:
+        triggered_alerts (List[Dict[str, Any]]): هشدارهای فعال شده
+    """
+    for alert_info in triggered_alerts:
+        alert_info.setdefault("time", datetime.datetime.now(toronto_tz))
+        
+        # ارسال هشدار تلگرام
+        alert_message = generate_alert_message(alert_info)
         try:
-            prices_data = market_data.get_current_prices([symbol])
-            if symbol not in prices_data or "price" not in prices_data[symbol]:
-                logger.warning(f"امکان دریافت قیمت برای {symbol} وجود ندارد")
-                continue
-            current_price = prices_data[symbol]["price"]
+            replit_telegram_sender.send_message(alert_message, parse_mode="HTML")
+            logger.info(f"هشدار قیمت برای {alert_info['symbol']} ارسال شد: {alert_info['alert_type']} {alert_info['target_price']}")
         except Exception as e:
-            logger.error(f"خطا در دریافت قیمت {symbol}: {str(e)}")
-            continue
-        
-        # بررسی هشدارها
-        for i, (target_price, alert_type, triggered) in enumerate(alerts):
-            # اگر هشدار قبلاً فعال شده باید دوباره بررسی کنیم که آیا باید مجدد فعال شود یا خیر
-            if triggered:
-                # هشدار "above": اگر قیمت به پایین برگشته و حداقل ۱٪ پایین‌تر از قیمت هدف باشد، بازنشانی شود
-                if alert_type == "above" and current_price < target_price * 0.99:
-                    alerts[i] = (target_price, alert_type, False)
-                    logger.info(f"هشدار {symbol} از نوع {alert_type} در قیمت {target_price} بازنشانی شد")
-                
-                # هشدار "below": اگر قیمت به بالا برگشته و حداقل ۱٪ بالاتر از قیمت هدف باشد، بازنشانی شود
-                elif alert_type == "below" and current_price > target_price * 1.01:
-                    alerts[i] = (target_price, alert_type, False)
-                    logger.info(f"هشدار {symbol} از نوع {alert_type} در قیمت {target_price} بازنشانی شد")
-                
-                continue
-            
-            # بررسی شرایط فعال‌سازی هشدار
-            alert_triggered = False
-            
-            if alert_type == "above" and current_price >= target_price:
-                alert_triggered = True
-            elif alert_type == "below" and current_price <= target_price:
-                alert_triggered = True
-            
-            if alert_triggered:
-                # هشدار فعال شد
-                alerts[i] = (target_price, alert_type, True)
-                
-                # پیام هشدار را تولید می‌کنیم
-                alert_info = {
-                    "symbol": symbol,
-                    "current_price": current_price,
-                    "target_price": target_price,
-                    "alert_type": alert_type,
-                    "time": datetime.datetime.now(toronto_tz)
-                }
-                
-                triggered_alerts.append(alert_info)
-                
-                # ارسال هشدار تلگرام
-                alert_message = generate_alert_message(alert_info)
-                try:
-                    replit_telegram_sender.send_message(alert_message, parse_mode="HTML")
-                    logger.info(f"هشدار قیمت برای {symbol} ارسال شد: {alert_type} {target_price}")
-                except Exception as e:
-                    logger.error(f"خطا در ارسال هشدار قیمت به تلگرام: {str(e)}")
+            logger.error(f"خطا در ارسال هشدار قیمت به تلگرام: {str(e)}")
+
+
+def _on_price_snapshot(snapshot: Dict[str, Any]) -> None:
+    """
+    ارزیابی هشدارها با هر snapshot جدید price_ticker (بروزرسانی دوره‌ای یا تیک WebSocket)
     
-    return triggered_alerts
+    Args:
+        snapshot (Dict[str, Any]): snapshot منتشر شده
+    """
+    snapshot_prices = snapshot.get("prices", {})
+    prices = {}
+    for symbol in alert_engine.symbols():
+        entry = snapshot_prices.get(normalize_symbol(symbol))
+        if entry and entry.get("price") is not None:
+            prices[symbol] = entry["price"]
+    
+    _dispatch_alerts(alert_engine.evaluate(prices))
+    _schedule_due_check()
+
+
+def _dispatch_alerts(triggered_alerts: List[Dict[str, Any]]) -> None:
+    """
+    ارسال هشدارهای فعال شده در ترد اطلاع‌رسانی
+    
+    Args:
+        triggered_alerts (List[Dict[str, Any]]): هشدارهای فعال شده
+    """
+    if triggered_alerts:
+        now = datetime.datetime.now(toronto_tz)
+        for alert_info in triggered_alerts:
+            alert_info["time"] = now
+        # ارسال پیام در ترد جداگانه تا ناشر قیمت (مثلاً جریان WebSocket) منتظر تلگرام نماند
+        _notify_executor.submit(_send_alerts, triggered_alerts)
+
+
+def _schedule_due_check() -> None:
+    """
+    زمان‌بندی بررسی هشدارهای در انتظار در نزدیک‌ترین زمان مقرر آن‌ها
+    """
+    global _due_timer, _due_timer_at
+    due_at = alert_engine.next_due()
+    with _due_lock:
+        if due_at is None or not _watcher_running:
+            return
+        if _due_timer is not None and _due_timer.is_alive() and _due_timer_at <= due_at:
+            return
+        if _due_timer is not None:
+            _due_timer.cancel()
+        _due_timer = threading.Timer(max(due_at - time.time(), 0), _on_alerts_due)
+        _due_timer.daemon = True
+        _due_timer_at = due_at
+        _due_timer.start()
+
+
+def _on_alerts_due() -> None:
+    """
+    فعال کردن هشدارهای در انتظاری که زمانشان رسیده است
+    """
+    global _due_timer
+    with _due_lock:
+        if _due_timer is threading.current_thread():
+            _due_timer = None
+    try:
+        _dispatch_alerts(alert_engine.evaluate_due())
+    except Exception as e:
+        logger.error(f"خطا در بررسی هشدارهای در انتظار: {str(e)}")
+    _schedule_due_check()
+
+
+def start_alert_watcher() -> bool:
+    """
+    شروع ارزیابی هشدارها با هر بروزرسانی قیمت
+    
+    Returns:
+        bool: وضعیت شروع
+    """
+    global _watcher_running
+    if _watcher_running:
+        return False
+    _watcher_running = True
+    price_ticker.subscribe(_on_price_snapshot)
+    # هشدارها به جریان قیمت وابسته‌اند؛ اگر سرویس قیمت اجرا نشده باشد شروع می‌شود
+    price_ticker.start()
+    _on_price_snapshot(price_ticker.get_snapshot())
+    logger.info("Price alert watcher started")
+    return True
+
+
+def stop_alert_watcher() -> bool:
+    """
+    توقف ارزیابی هشدارها با بروزرسانی قیمت
+    
+    Returns:
+        bool: وضعیت توقف
+    """
+    global _watcher_running
+    if not _watcher_running:
+        return False
+    _watcher_running = False
+    price_ticker.unsubscribe(_on_price_snapshot)
+    with _due_lock:
+        if _due_timer is not None:
+            _due_timer.cancel()
+    logger.info("Price alert watcher stopped")
+    return True
+
+
+def is_alert_watcher_running() -> bool:
+    """
+    آیا هشدارها با هر بروزرسانی قیمت ارزیابی می‌شوند
+    
+    Returns:
+        bool: وضعیت اجرا
+    """
+    return _watcher_running
 
 
 def generate_alert_message(alert_info: Dict[str, Any]) -> str:
@@ -0,0 +1,312 @@
+"""
+مرکز پخش قیمت‌ها برای بینندگان داشبورد (SSE و SocketIO)
+
+به ازای هر snapshot جدید price_ticker فقط یک بار تغییرات (delta) نمادهای داشبورد
+محاسبه و سریال‌سازی می‌شود و همان پیام برای همه مشترکین ارسال می‌شود؛ بنابراین
+هزینه درخواست‌های API و محاسبه به تعداد بینندگان وابسته نیست.
+
+هر مشترک SSE یک صف محدود دارد. اگر مشترکی کند باشد و صف آن پر شود، پیام‌های
+قدیمی دور ریخته شده و یک snapshot کامل جای آن‌ها را می‌گیرد؛ به این ترتیب یک
+بیننده کند نه حافظه را پر می‌کند و نه ناشر را متوقف می‌کند.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Any, Iterator, List, Optional
+
+from crypto_bot.price_ticker import price_ticker, normalize_symbol
+
+logger = logging.getLogger(__name__)
+
+# نمادهای نمایش داده شده در داشبورد
+HUB_SYMBOLS = [s.strip() for s in os.environ.get("PRICE_HUB_SYMBOLS", "BTC-USDT,ETH-USDT,SOL-USDT,XRP-USDT").split(",")
+               if s.strip()]
+
+# ظرفیت صف هر مشترک (تعداد پیام)
+HUB_QUEUE_SIZE = int(os.environ.get("PRICE_HUB_QUEUE_SIZE", "16"))
+
+# فاصله ارسال پیام keep-alive برای اتصال‌های بدون تغییر (ثانیه)
+HUB_HEARTBEAT = 15
+
+# فیلدهایی که تغییر آن‌ها باعث ارسال نماد در delta می‌شود
+DELTA_FIELDS = ('price', 'change_24h', 'volume_24h')
+
+
+class HubSubscription:
+    """
+    اشتراک یک بیننده با صف محدود
+    """
+
+    def __init__(self, maxsize: int = HUB_QUEUE_SIZE):
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.connected_at = time.time()
+        self.delivered = 0
+        self.resyncs = 0
+
+    def offer(self, message: str) -> bool:
+        """
+        افزودن پیام به صف بدون انتظار
+
+        Args:
+            message: پیام سریال‌سازی شده
+
+        Returns:
+            bool: False اگر صف پر باشد
+        """
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except queue.Full:
+            return False
+
+    def reset(self, message: str) -> None:
+        """
+        جایگزینی همه پیام‌های در انتظار با یک پیام (snapshot کامل)
+
+        Args:
+            message: پیام سریال‌سازی شده
+        """
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self.resyncs += 1
+        self.offer(message)
+
+
+class PriceHub:
+    """
+    ناشر واحد قیمت‌ها برای همه مشترکین SSE و SocketIO
+    """
+
+    def __init__(self, symbols: Optional[List[str]] = None, queue_size: int = HUB_QUEUE_SIZE):
+        """
+        مقداردهی اولیه
+
+        Args:
+            symbols: نمادهای داشبورد (با همان فرمت در پیام‌ها ارسال می‌شوند)
+            queue_size: ظرفیت صف هر مشترک
+        """
+        self.symbols = list(symbols if symbols is not None else HUB_SYMBOLS)
+        self.queue_size = queue_size
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._seq = 0
+        self._full_message: Optional[str] = None
+        self._subscriptions: List[HubSubscription] = []
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+        self.running = False
+
+    @staticmethod
+    def _encode(message: Dict[str, Any], seq: int) -> str:
+        return f"id: {seq}\ndata: {json.dumps(message, default=str)}\n\n"
+
+    def _full_message_locked(self) -> str:
+        if self._full_message is None:
+            message = {'type': 'price_update', 'full': True, 'seq': self._seq, 'data': dict(self._state)}
+            self._full_message = self._encode(message, self._seq)
+        return self._full_message
+
+    def publish(self, snapshot: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        محاسبه delta از snapshot جدید و ارسال آن به همه مشترکین
+
+        Args:
+            snapshot: snapshot منتشر شده توسط price_ticker
+
+        Returns:
+            Optional[Dict[str, Any]]: پیام ارسال شده، یا None اگر تغییری نبوده باشد
+        """
+        prices = snapshot.get('prices', {})
+        with self._lock:
+            delta = {}
+            for symbol in self.symbols:
+                entry = prices.get(normalize_symbol(symbol))
+                if entry is None:
+                    continue
+                previous = self._state.get(symbol)
+                if previous is None or any(previous.get(f) != entry.get(f) for f in DELTA_FIELDS):
+                    delta[symbol] = entry
+            if not delta:
+                return None
+
+            self._state.update(delta)
+            self._seq += 1
+            self._full_message = None
+            message = {'type': 'price_update', 'full': False, 'seq': self._seq, 'data': delta}
+            # پیام فقط یک بار برای همه مشترکین سریال‌سازی می‌شود
+            encoded = self._encode(message, self._seq)
+            subscriptions = list(self._subscriptions)
+            listeners = list(self._listeners)
+
+            for subscription in subscriptions:
+                if not subscription.offer(encoded):
+                    subscription.reset(self._full_message_locked())
+
+        for listener in listeners:
+            try:
+                listener(message)
+            except Exception as e:
+                logger.error(f"Error in price hub listener: {str(e)}")
+
+        return message
+
+    def get_full_message(self) -> Dict[str, Any]:
+        """
+        دریافت آخرین وضعیت کامل نمادهای داشبورد
+
+        Returns:
+            Dict[str, Any]: پیام price_update کامل
+        """
+        with self._lock:
+            return {'type': 'price_update', 'full': True, 'seq': self._seq, 'data': dict(self._state)}
+
+    def subscribe(self) -> HubSubscription:
+        """
+        ثبت مشترک SSE جدید؛ اولین پیام صف، snapshot کامل است
+
+        Returns:
+            HubSubscription: اشتراک ساخته شده
+        """
+        subscription = HubSubscription(self.queue_size)
+        with self._lock:
+            if self._state:
+                subscription.offer(self._full_message_locked())
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: HubSubscription) -> None:
+        """
+        حذف مشترک
+
+        Args:
+            subscription: اشتراک
+        """
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def stream(self, heartbeat: float = HUB_HEARTBEAT) -> Iterator[str]:
+        """
+        جریان پیام‌های SSE برای یک بیننده (با بسته شدن اتصال، اشتراک حذف می‌شود)
+
+        Args:
+            heartbeat: فاصله ارسال keep-alive (ثانیه)
+
+        Yields:
+            str: پیام‌های SSE
+        """
+        subscription = self.subscribe()
+        try:
+            while True:
+                try:
+                    message = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                subscription.delivered += 1
+                yield message
+        finally:
+            self.unsubscribe(subscription)
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        ثبت تابعی که به ازای هر پیام یک بار فراخوانی می‌شود (مثلاً socketio.emit همگانی)
+
+        Args:
+            callback: تابع دریافت‌کننده پیام
+        """
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        حذف تابع ثبت شده
+
+        Args:
+            callback: تابع دریافت‌کننده پیام
+        """
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def start(self) -> bool:
+        """
+        اتصال به price_ticker و انتشار وضعیت فعلی
+
+        Returns:
+            bool: وضعیت شروع
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self.running = True
+        price_ticker.add_symbols('price_hub', self.symbols)
+        price_ticker.subscribe(self.publish)
+        self.publish(price_ticker.get_snapshot())
+        logger.info(f"Price hub started for {len(self.symbols)} symbols")
+        return True
+
+    def stop(self) -> bool:
+        """
+        قطع اتصال از price_ticker
+
+        Returns:
+            bool: وضعیت توقف
+        """
+        with self._lock:
+            if not self.running:
+                return False
+            self.running = False
+        price_ticker.unsubscribe(self.publish)
+        logger.info("Price hub stopped")
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        دریافت وضعیت مرکز پخش
+
+        Returns:
+            Dict[str, Any]: تعداد مشترکین، شماره آخرین پیام و آمار صف‌ها
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            return {
+                'running': self.running,
+                'seq': self._seq,
+                'symbols': list(self.symbols),
+                'sse_subscribers': len(subscriptions),
+                'listeners': len(self._listeners),
+                'queued_messages': sum(s.queue.qsize() for s in subscriptions),
+                'resyncs': sum(s.resyncs for s in subscriptions)
+            }
+
+
+# مرکز پخش مشترک برای کل برنامه
+price_hub = PriceHub()
+
+
+def start_price_hub() -> bool:
+    """
+    شروع مرکز پخش قیمت‌ها
+
+    Returns:
+        bool: وضعیت شروع
+    """
+    return price_hub.start()
+
+
+def stop_price_hub() -> bool:
+    """
+    توقف مرکز پخش قیمت‌ها
+
+    Returns:
+        bool: وضعیت توقف
+    """
+    return price_hub.stop()
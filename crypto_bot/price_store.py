@@ -0,0 +1,166 @@
+"""
+انبار قیمت درون‌حافظه‌ای (Price Store)
+
+این ماژول یک انبار قیمت مشترک برای کل فرایند فراهم می‌کند. خواندن و نوشتن
+قیمت‌ها فقط در حافظه و با هزینه O(1) انجام می‌شود و یک ترد پس‌زمینه تغییرات را
+به صورت اتمیک و فشرده روی دیسک ذخیره می‌کند. فایل فقط یک بار در شروع برنامه
+بارگذاری می‌شود.
+"""
+
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PriceStore:
+    """انبار قیمت thread-safe با ذخیره‌سازی پس‌زمینه روی دیسک"""
+
+    def __init__(self, cache_file: str, flush_interval: float = 5.0):
+        """
+        راه‌اندازی انبار قیمت
+
+        Args:
+            cache_file: مسیر فایل ذخیره‌سازی
+            flush_interval: فاصله زمانی ذخیره تغییرات روی دیسک (ثانیه)
+        """
+        self.cache_file = cache_file
+        self.flush_interval = flush_interval
+        self._entries: Dict[str, Tuple[Dict[str, Any], float]] = {}  # نماد: (داده، زمان ذخیره)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._writer_thread = None
+        self._stop_event = threading.Event()
+        self._load()
+
+    def _load(self) -> None:
+        """بارگذاری یک‌باره داده‌ها از فایل"""
+        try:
+            if not os.path.exists(self.cache_file):
+                return
+
+            with open(self.cache_file, 'r') as f:
+                cache = json.load(f)
+
+            entries = {}
+            for symbol, entry in cache.items():
+                if isinstance(entry, dict) and 'data' in entry and 'cached_at' in entry:
+                    entries[symbol] = (entry['data'], float(entry['cached_at']))
+
+            with self._lock:
+                self._entries.update(entries)
+
+            logger.info(f"Loaded {len(entries)} cached prices from {self.cache_file}")
+        except Exception as e:
+            logger.error(f"Error loading price store from {self.cache_file}: {str(e)}")
+
+    def get(self, symbol: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        دریافت داده قیمت از انبار
+
+        Args:
+            symbol: نماد ارز دیجیتال
+
+        Returns:
+            کپی داده و زمان ذخیره یا None
+        """
+        entry = self._entries.get(symbol)
+        if entry is None:
+            return None
+        data, cached_at = entry
+        return dict(data), cached_at
+
+    def put(self, symbol: str, data: Dict[str, Any], cached_at: Optional[float] = None) -> None:
+        """
+        ذخیره داده قیمت در انبار
+
+        Args:
+            symbol: نماد ارز دیجیتال
+            data: داده‌های قیمت
+            cached_at: زمان ذخیره (پیش‌فرض: اکنون)
+        """
+        with self._lock:
+            self._entries[symbol] = (dict(data), cached_at if cached_at is not None else time.time())
+            self._dirty = True
+        self._ensure_writer()
+
+    def flush(self) -> bool:
+        """
+        ذخیره اتمیک داده‌ها روی دیسک
+
+        Returns:
+            آیا ذخیره‌سازی انجام شد
+        """
+        with self._lock:
+            if not self._dirty:
+                return False
+            snapshot = {symbol: {'data': data, 'cached_at': cached_at}
+                        for symbol, (data, cached_at) in self._entries.items()}
+            self._dirty = False
+
+        try:
+            directory = os.path.dirname(self.cache_file) or '.'
+            os.makedirs(directory, exist_ok=True)
+
+            # نوشتن در فایل موقت و جایگزینی اتمیک
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.price_cache.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+                os.replace(tmp_path, self.cache_file)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            return True
+        except Exception as e:
+            logger.error(f"Error writing price store to {self.cache_file}: {str(e)}")
+            with self._lock:
+                self._dirty = True
+            return False
+
+    def _ensure_writer(self) -> None:
+        """راه‌اندازی ترد ذخیره‌سازی پس‌زمینه در صورت نیاز"""
+        if self._writer_thread is not None:
+            return
+        with self._lock:
+            if self._writer_thread is not None:
+                return
+            self._writer_thread = threading.Thread(target=self._writer_loop, name="price-store-writer", daemon=True)
+            self._writer_thread.start()
+
+    def _writer_loop(self) -> None:
+        """حلقه ذخیره دوره‌ای تغییرات روی دیسک"""
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _flush_on_exit(store: PriceStore) -> None:
+    """ذخیره تغییرات باقی‌مانده هنگام خروج برنامه"""
+    store._stop_event.set()
+    store.flush()
+
+
+def create_price_store(cache_file: str, flush_interval: float = 5.0) -> PriceStore:
+    """
+    ایجاد انبار قیمت و ثبت ذخیره‌سازی نهایی هنگام خروج
+
+    Args:
+        cache_file: مسیر فایل ذخیره‌سازی
+        flush_interval: فاصله زمانی ذخیره تغییرات (ثانیه)
+
+    Returns:
+        PriceStore: انبار قیمت
+    """
+    store = PriceStore(cache_file, flush_interval)
+    atexit.register(_flush_on_exit, store)
+    return store
@@ -0,0 +1,389 @@
+"""
+سرویس پس‌زمینه بروزرسانی قیمت‌ها (Price Ticker)
+
+این ماژول مجموعه همه نمادهای تحت نظر (ارزهای پیش‌فرض، لیست‌های کاربران،
+هشدارهای قیمت و ارزهای مهم زمان‌بند تلگرام) را در فواصل ثابت به صورت
+دسته‌ای دریافت کرده و یک snapshot واحد منتشر می‌کند که همه مصرف‌کننده‌ها از آن
+می‌خوانند. به این ترتیب تعداد درخواست‌های API به تعداد نمادها وابسته است، نه
+تعداد بینندگان.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set
+
+from crypto_bot import market_data
+from crypto_bot.config import DEFAULT_CURRENCIES
+
+logger = logging.getLogger(__name__)
+
+# فاصله زمانی بروزرسانی قیمت‌ها (ثانیه)
+TICKER_INTERVAL = int(os.environ.get("PRICE_TICKER_INTERVAL", "30"))
+
+# حداکثر سن قابل قبول قیمت در snapshot (ثانیه)
+MAX_SNAPSHOT_AGE = 180
+
+# مدت نگه‌داری نمادهای درخواستی خارج از لیست‌ها پس از آخرین درخواست (ثانیه)
+ON_DEMAND_TTL = int(os.environ.get("PRICE_ON_DEMAND_TTL", "600"))
+
+# بیشترین تعداد نمادهای درخواستی خارج از لیست‌ها؛ قدیمی‌ترین درخواست کنار گذاشته می‌شود
+ON_DEMAND_MAX = int(os.environ.get("PRICE_ON_DEMAND_MAX", "50"))
+
+# الگوی نماد معتبر (پس از استانداردسازی)
+_SYMBOL_PATTERN = re.compile(r'^[A-Z0-9]{2,15}/[A-Z0-9]{2,10}$')
+
+
+def normalize_symbol(symbol: str) -> str:
+    """
+    تبدیل نماد به فرمت استاندارد (BTC/USDT)
+
+    Args:
+        symbol: نماد ارز (BTC-USDT، btc/usdt یا BTC)
+
+    Returns:
+        str: نماد استاندارد
+    """
+    symbol = symbol.strip().upper().replace('-', '/')
+    if '/' not in symbol:
+        symbol = f"{symbol}/USDT"
+    return symbol
+
+
+class PriceTicker:
+    """سرویس بروزرسانی دوره‌ای قیمت همه نمادهای تحت نظر"""
+
+    def __init__(self, interval: int = TICKER_INTERVAL):
+        """
+        راه‌اندازی سرویس
+
+        Args:
+            interval: فاصله زمانی بروزرسانی (ثانیه)
+        """
+        self.interval = interval
+        self._sources: Dict[str, Set[str]] = {}  # منبع: مجموعه نمادها
+        self._on_demand: Dict[str, float] = {}  # نماد درخواستی: زمان آخرین درخواست
+        self._snapshot: Dict[str, Any] = {'version': 0, 'timestamp': 0, 'prices': {}}
+        self._subscribers: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.running = False
+
+    def watch(self, source: str, symbols: Iterable[str]) -> None:
+        """
+        جایگزینی نمادهای تحت نظر یک منبع
+
+        Args:
+            source: نام منبع (مثلاً price_alerts)
+            symbols: نمادهای تحت نظر
+        """
+        normalized = {normalize_symbol(s) for s in symbols if s}
+        with self._lock:
+            new_symbols = normalized - self._all_symbols_locked()
+            self._sources[source] = normalized
+        if new_symbols and self.running:
+            self._wakeup.set()
+
+    def add_symbols(self, source: str, symbols: Iterable[str]) -> None:
+        """
+        افزودن نمادها به نمادهای تحت نظر یک منبع
+
+        Args:
+            source: نام منبع (مثلاً sessions)
+            symbols: نمادهای جدید
+        """
+        normalized = {normalize_symbol(s) for s in symbols if s}
+        with self._lock:
+            current = self._sources.setdefault(source, set())
+            if normalized <= current:
+                return
+            new_symbols = normalized - self._all_symbols_locked()
+            current.update(normalized)
+        if new_symbols and self.running:
+            self._wakeup.set()
+
+    def request_symbols(self, symbols: Iterable[str]) -> None:
+        """
+        ثبت نمادهای درخواستی که در هیچ لیستی نیستند (مثلاً نماد آدرس یک صفحه)
+
+        این نمادها تا ON_DEMAND_TTL ثانیه پس از آخرین درخواست در بروزرسانی‌ها دریافت
+        می‌شوند. نمادهای نامعتبر پذیرفته نمی‌شوند و نمادی که هیچ ارائه‌دهنده‌ای قیمت آن
+        را برنگرداند در اولین بروزرسانی کنار گذاشته می‌شود.
+
+        Args:
+            symbols: نمادهای درخواستی
+        """
+        now = time.time()
+        normalized = {normalize_symbol(s) for s in symbols if s}
+        with self._lock:
+            listed = set()
+            for source_symbols in self._sources.values():
+                listed.update(source_symbols)
+            new_symbols = set()
+            for symbol in normalized - listed:
+                if not _SYMBOL_PATTERN.match(symbol):
+                    continue
+                if symbol not in self._on_demand:
+                    new_symbols.add(symbol)
+                self._on_demand[symbol] = now
+            if len(self._on_demand) > ON_DEMAND_MAX:
+                for symbol in sorted(self._on_demand, key=self._on_demand.get)[:len(self._on_demand) - ON_DEMAND_MAX]:
+                    del self._on_demand[symbol]
+                    new_symbols.discard(symbol)
+        if new_symbols and self.running:
+            self._wakeup.set()
+
+    def _all_symbols_locked(self) -> Set[str]:
+        # نمادهای درخواستی که مدتی درخواست نشده‌اند کنار گذاشته می‌شوند
+        expired_before = time.time() - ON_DEMAND_TTL
+        for symbol in [s for s, requested_at in self._on_demand.items() if requested_at < expired_before]:
+            del self._on_demand[symbol]
+
+        symbols = set(self._on_demand)
+        for source_symbols in self._sources.values():
+            symbols.update(source_symbols)
+        return symbols
+
+    def watched_symbols(self) -> List[str]:
+        """
+        دریافت اجتماع همه نمادهای تحت نظر
+
+        Returns:
+            List[str]: لیست مرتب نمادها
+        """
+        with self._lock:
+            return sorted(self._all_symbols_locked())
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """
+        دریافت آخرین snapshot منتشر شده
+
+        Returns:
+            Dict[str, Any]: شامل version، timestamp و prices
+        """
+        return self._snapshot
+
+    def get_price(self, symbol: str, max_age_seconds: int = MAX_SNAPSHOT_AGE) -> Optional[Dict[str, Any]]:
+        """
+        دریافت قیمت یک نماد از snapshot بدون درخواست شبکه
+
+        Args:
+            symbol: نماد ارز
+            max_age_seconds: حداکثر سن قابل قبول داده (ثانیه)
+
+        Returns:
+            Optional[Dict[str, Any]]: داده قیمت یا None
+        """
+        entry = self._snapshot['prices'].get(normalize_symbol(symbol))
+        if entry is None or time.time() - entry['updated_at'] > max_age_seconds:
+            return None
+        return entry
+
+    def get_prices(self, symbols: Iterable[str], fetch_missing: bool = False,
+                   max_age_seconds: int = MAX_SNAPSHOT_AGE) -> Dict[str, Dict[str, Any]]:
+        """
+        دریافت قیمت چند نماد از snapshot
+
+        نمادهایی که هنوز در snapshot نیستند به عنوان نماد درخواستی ثبت شده و در
+        بروزرسانی بعدی دریافت می‌شوند؛ فقط در صورت درخواست صریح (fetch_missing)
+        همین حالا به صورت دسته‌ای از API دریافت می‌شوند. مسیرهای درخواست وب باید
+        فقط از snapshot بخوانند.
+
+        Args:
+            symbols: نمادهای ارز (با همان فرمت ورودی در نتیجه برگردانده می‌شوند)
+            fetch_missing: دریافت نمادهای موجود نبود از API
+            max_age_seconds: حداکثر سن قابل قبول داده (ثانیه)
+
+        Returns:
+            Dict[str, Dict[str, Any]]: داده‌های قیمت به تفکیک نماد ورودی
+        """
+        result = {}
+        missing = []
+        for symbol in symbols:
+            entry = self.get_price(symbol, max_age_seconds)
+            if entry is not None:
+                result[symbol] = entry
+            else:
+                missing.append(symbol)
+
+        if missing:
+            self.request_symbols(missing)
+            if fetch_missing:
+                fetched = market_data.get_multiple_prices(missing)
+                result.update(fetched)
+
+        return result
+
+    def publish_prices(self, updates: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        ادغام قیمت‌های دریافتی از منابع خارجی (مثلاً جریان WebSocket) در snapshot
+
+        Args:
+            updates: داده‌های قیمت به تفکیک نماد
+
+        Returns:
+            Dict[str, Any]: snapshot منتشر شده
+        """
+        now = time.time()
+        entries = {}
+        for symbol, data in updates.items():
+            entry = dict(data)
+            entry['symbol'] = normalize_symbol(symbol)
+            entry.setdefault('updated_at', now)
+            entries[entry['symbol']] = entry
+        return self._publish(entries, now)
+
+    def _publish(self, entries: Dict[str, Dict[str, Any]], now: float) -> Dict[str, Any]:
+        """ادغام قیمت‌های جدید در snapshot، انتشار آن و اطلاع‌رسانی به مشترکین"""
+        with self._lock:
+            # کپی، ادغام و جایگزینی زیر یک قفل انجام می‌شود تا انتشارهای همزمان
+            # (REST و WebSocket) بروزرسانی‌های یکدیگر را بازنویسی نکنند
+            prices = dict(self._snapshot['prices'])
+            prices.update(entries)
+            snapshot = {
+                'version': self._snapshot['version'] + 1,
+                'timestamp': now,
+                'prices': prices
+            }
+            # جایگزینی اتمیک؛ خوانندگان همیشه یک snapshot کامل می‌بینند
+            self._snapshot = snapshot
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"Error in price ticker subscriber: {str(e)}")
+
+        return snapshot
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        ثبت تابعی که پس از هر بروزرسانی با snapshot جدید فراخوانی می‌شود
+
+        Args:
+            callback: تابع دریافت‌کننده snapshot
+        """
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        حذف تابع ثبت شده
+
+        Args:
+            callback: تابع دریافت‌کننده snapshot
+        """
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def refresh(self) -> Dict[str, Any]:
+        """
+        دریافت قیمت همه نمادهای تحت نظر و انتشار snapshot جدید
+
+        Returns:
+            Dict[str, Any]: snapshot منتشر شده
+        """
+        # نمادهایی که در همین دوره از منبع دیگری (جریان WebSocket) بروز شده‌اند
+        # دوباره با REST دریافت نمی‌شوند
+        fresh_after = time.time() - self.interval
+        prices = self._snapshot['prices']
+        symbols = [s for s in self.watched_symbols()
+                   if s not in prices or prices[s]['updated_at'] < fresh_after]
+        if not symbols:
+            return self._snapshot
+
+        fetched = market_data.get_multiple_prices(symbols, force_refresh=True)
+        now = time.time()
+
+        # قیمت‌های قبلی نمادهایی که این بار دریافت نشدند حفظ می‌شوند
+        entries = {}
+        for symbol, data in fetched.items():
+            entry = dict(data)
+            entry['symbol'] = symbol
+            entry['updated_at'] = now
+            entries[symbol] = entry
+
+        # نماد درخواستی که هیچ ارائه‌دهنده‌ای قیمت آن را برنگرداند دوباره دریافت نمی‌شود
+        unresolved = [s for s in symbols if s not in fetched]
+        if unresolved:
+            with self._lock:
+                for symbol in unresolved:
+                    self._on_demand.pop(symbol, None)
+
+        snapshot = self._publish(entries, now)
+        logger.debug(f"Price snapshot v{snapshot['version']} published: {len(fetched)}/{len(symbols)} symbols")
+        return snapshot
+
+    def start(self) -> bool:
+        """
+        شروع سرویس بروزرسانی
+
+        Returns:
+            bool: وضعیت شروع سرویس
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self.running = True
+            self._thread = threading.Thread(target=self._loop, name="price-ticker", daemon=True)
+            self._thread.start()
+        logger.info(f"Price ticker started with interval {self.interval} seconds")
+        return True
+
+    def stop(self) -> bool:
+        """
+        توقف سرویس بروزرسانی
+
+        Returns:
+            bool: وضعیت توقف سرویس
+        """
+        if not self.running:
+            return False
+        self.running = False
+        self._wakeup.set()
+        logger.info("Price ticker stopped")
+        return True
+
+    def _loop(self) -> None:
+        """حلقه اصلی بروزرسانی دوره‌ای"""
+        while self.running:
+            started = time.monotonic()
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing price snapshot: {str(e)}")
+
+            # انتظار تا دوره بعد؛ افزودن نماد جدید باعث بیدار شدن زودتر می‌شود
+            self._wakeup.wait(max(self.interval - (time.monotonic() - started), 0))
+            self._wakeup.clear()
+
+
+# نمونه مشترک سرویس برای کل برنامه
+price_ticker = PriceTicker()
+price_ticker.watch('defaults', DEFAULT_CURRENCIES)
+
+
+def start_price_ticker() -> bool:
+    """
+    شروع سرویس بروزرسانی قیمت
+
+    Returns:
+        bool: وضعیت شروع سرویس
+    """
+    return price_ticker.start()
+
+
+def stop_price_ticker() -> bool:
+    """
+    توقف سرویس بروزرسانی قیمت
+
+    Returns:
+        bool: وضعیت توقف سرویس
+    """
+    return price_ticker.stop()
@@ -0,0 +1,381 @@
+"""
+مدیریت مرکزی سهمیه درخواست ارائه‌دهنده‌های API
+
+برای هر ارائه‌دهنده (CoinGecko، CryptoCompare، Binance، OpenAI) یک token bucket
+نرخ درخواست‌ها را محدود می‌کند و یک circuit breaker پس از چند خطای پشت سر هم
+(یا بلافاصله پس از HTTP 429) درخواست‌ها را برای مدتی رد می‌کند. پس از این مدت
+فقط یک درخواست آزمایشی (half-open) عبور می‌کند و نتیجه آن باز یا بسته شدن مدار
+را تعیین می‌کند. به این ترتیب درخواست‌های محکوم به شکست زمان نمی‌گیرند و در
+زمان اوج درخواست‌ها از محدودیت ارائه‌دهنده عبور نمی‌کنیم.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# بیشترین زمان انتظار برای توکن (ثانیه)؛ در صورت نیاز به انتظار بیشتر، درخواست رد می‌شود
+QUOTA_MAX_WAIT = 0.5
+
+# تنظیمات هر ارائه‌دهنده:
+# rate: توکن در ثانیه، burst: ظرفیت bucket، failures: تعداد خطای پشت سر هم برای باز شدن مدار،
+# reset: مدت باز ماندن مدار پس از خطا (ثانیه)، cooldown: مدت باز ماندن مدار پس از 429 (ثانیه)
+PROVIDER_LIMITS = {
+    'coingecko': {'rate': 0.4, 'burst': 5, 'failures': 3, 'reset': 30, 'cooldown': 60},
+    'cryptocompare': {'rate': 5, 'burst': 10, 'failures': 3, 'reset': 30, 'cooldown': 60},
+    'binance': {'rate': 15, 'burst': 30, 'failures': 5, 'reset': 15, 'cooldown': 60},
+    'openai': {'rate': 1, 'burst': 3, 'failures': 3, 'reset': 60, 'cooldown': 3600}
+}
+
+DEFAULT_LIMITS = {'rate': 2, 'burst': 5, 'failures': 5, 'reset': 30, 'cooldown': 60}
+
+# بیشترین مدت انتظار برای نتیجه درخواست آزمایشی half-open (ثانیه)؛ اگر نتیجه‌ای ثبت نشود
+# (مثلاً ترد درخواست از بین رفته باشد) پس از این مدت درخواست آزمایشی دیگری مجاز می‌شود
+PROBE_TIMEOUT = 60
+
+
+class ProviderUnavailable(Exception):
+    """درخواست به دلیل باز بودن مدار یا تمام شدن سهمیه ارسال نشد"""
+
+    def __init__(self, provider: str, reason: str):
+        super().__init__(f"{provider} unavailable: {reason}")
+        self.provider = provider
+        self.reason = reason
+
+
+class TokenBucket:
+    """
+    token bucket برای محدود کردن نرخ درخواست‌ها
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        مقداردهی اولیه
+
+        Args:
+            rate: تعداد توکن اضافه شده در هر ثانیه
+            capacity: ظرفیت bucket (بیشترین درخواست پشت سر هم)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, max_wait: float = 0.0) -> Optional[float]:
+        """
+        رزرو یک توکن
+
+        Args:
+            max_wait: بیشترین زمان انتظار قابل قبول (ثانیه)
+
+        Returns:
+            Optional[float]: زمان انتظار لازم تا آماده شدن توکن، یا None اگر بیش از max_wait باشد
+        """
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """
+        خالی کردن bucket تا توکن بعدی حداقل پس از seconds ثانیه آماده شود
+
+        Args:
+            seconds: مدت توقف (ثانیه)
+        """
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class CircuitBreaker:
+    """
+    circuit breaker با حالت‌های closed، open و half_open
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, probe_timeout: float = PROBE_TIMEOUT):
+        """
+        مقداردهی اولیه
+
+        Args:
+            failure_threshold: تعداد خطای پشت سر هم برای باز شدن مدار
+            reset_timeout: مدت باز ماندن مدار (ثانیه)
+            probe_timeout: بیشترین مدت انتظار برای نتیجه درخواست آزمایشی (ثانیه)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_until = 0.0
+        self.probing = False
+        self.probe_started = 0.0
+
+    def allow(self) -> bool:
+        """
+        آیا درخواست مجاز است (در حالت half_open فقط یک درخواست آزمایشی)
+
+        Returns:
+            bool: مجاز بودن درخواست
+        """
+        if self.state == self.OPEN:
+            if time.monotonic() < self.opened_until:
+                return False
+            self.state = self.HALF_OPEN
+            self.probing = False
+        if self.state == self.HALF_OPEN:
+            now = time.monotonic()
+            if self.probing and now - self.probe_started < self.probe_timeout:
+                return False
+            self.probing = True
+            self.probe_started = now
+        return True
+
+    def release_probe(self) -> None:
+        """آزاد کردن فرصت درخواست آزمایشی بدون ثبت نتیجه (درخواست ارسال نشد یا لغو شد)"""
+        self.probing = False
+
+    def record_success(self) -> None:
+        """ثبت درخواست موفق"""
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self) -> bool:
+        """
+        ثبت درخواست ناموفق
+
+        Returns:
+            bool: اگر مدار در این لحظه باز شده باشد
+        """
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.trip(self.reset_timeout)
+            return True
+        return False
+
+    def trip(self, duration: float) -> None:
+        """
+        باز کردن مدار برای مدت مشخص
+
+        Args:
+            duration: مدت باز ماندن مدار (ثانیه)
+        """
+        self.state = self.OPEN
+        self.probing = False
+        self.opened_until = max(self.opened_until, time.monotonic() + duration)
+
+
+class ProviderQuota:
+    """
+    سهمیه و وضعیت سلامت یک ارائه‌دهنده
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, failures: int, reset: float, cooldown: float):
+        self.name = name
+        self.cooldown = cooldown
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failures, reset)
+        self.allowed = 0
+        self.rejected = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait: float = QUOTA_MAX_WAIT) -> None:
+        """
+        گرفتن اجازه ارسال یک درخواست
+
+        Args:
+            max_wait: بیشترین زمان انتظار برای توکن (ثانیه)
+
+        Raises:
+            ProviderUnavailable: اگر مدار باز باشد یا سهمیه در max_wait آزاد نشود
+        """
+        with self._lock:
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise ProviderUnavailable(self.name, "circuit open")
+            wait = self.bucket.reserve(max_wait)
+            if wait is None:
+                # درخواست آزمایشی ارسال نشد؛ فرصت آزمایش به درخواست بعدی می‌رسد
+                self.breaker.release_probe()
+                self.rejected += 1
+                raise ProviderUnavailable(self.name, "rate limit")
+            self.allowed += 1
+        if wait > 0:
+            time.sleep(wait)
+
+    def record_success(self) -> None:
+        """ثبت پاسخ موفق"""
+        with self._lock:
+            self.breaker.record_success()
+
+    def release(self) -> None:
+        """ثبت درخواستی که بدون نتیجه پایان یافت (مثلاً لغو شد)"""
+        with self._lock:
+            self.breaker.release_probe()
+
+    def record_failure(self) -> None:
+        """ثبت خطای شبکه یا خطای سرور"""
+        with self._lock:
+            if self.breaker.record_failure():
+                logger.warning(f"Circuit opened for {self.name} for {self.breaker.reset_timeout} seconds")
+
+    def record_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """
+        ثبت پاسخ 429 و باز کردن فوری مدار
+
+        Args:
+            retry_after: مدت اعلام شده توسط سرور (ثانیه)
+        """
+        duration = max(retry_after or 0, self.cooldown)
+        with self._lock:
+            self.rate_limited += 1
+            # سهمیه خالی شده است؛ bucket هم خالی می‌شود تا پس از باز شدن مدار به آرامی پر شود
+            self.bucket.tokens = 0
+            self.breaker.trip(duration)
+        logger.warning(f"{self.name} rate limited, skipping it for {duration:.0f} seconds")
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        دریافت وضعیت ارائه‌دهنده
+
+        Returns:
+            Dict[str, Any]: وضعیت مدار، توکن‌های باقی‌مانده و آمار
+        """
+        with self._lock:
+            state = self.breaker.state
+            if state == CircuitBreaker.OPEN and time.monotonic() >= self.breaker.opened_until:
+                state = CircuitBreaker.HALF_OPEN
+            return {
+                'state': state,
+                'open_for': round(max(0.0, self.breaker.opened_until - time.monotonic()), 1),
+                'tokens': round(min(self.bucket.capacity, self.bucket.tokens +
+                                    (time.monotonic() - self.bucket.updated) * self.bucket.rate), 2),
+                'consecutive_failures': self.breaker.failures,
+                'allowed': self.allowed,
+                'rejected': self.rejected,
+                'rate_limited': self.rate_limited
+            }
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    تشخیص خطای محدودیت نرخ در خطاهای SDK ها (مثلاً OpenAI)
+
+    Args:
+        error: خطا
+
+    Returns:
+        bool: اگر خطا ناشی از محدودیت نرخ یا سهمیه باشد
+    """
+    if getattr(error, 'status_code', None) == 429:
+        return True
+    error_str = str(error).lower()
+    return "429" in error_str or "rate limit" in error_str or "quota" in error_str
+
+
+class QuotaManager:
+    """
+    مدیریت سهمیه همه ارائه‌دهنده‌ها
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            limits: تنظیمات هر ارائه‌دهنده (پیش‌فرض: PROVIDER_LIMITS)
+        """
+        self.limits = dict(limits if limits is not None else PROVIDER_LIMITS)
+        self._providers: Dict[str, ProviderQuota] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str) -> ProviderQuota:
+        """
+        دریافت سهمیه یک ارائه‌دهنده
+
+        Args:
+            provider: نام ارائه‌دهنده
+
+        Returns:
+            ProviderQuota: سهمیه ارائه‌دهنده
+        """
+        with self._lock:
+            quota = self._providers.get(provider)
+            if quota is None:
+                quota = ProviderQuota(provider, **self.limits.get(provider, DEFAULT_LIMITS))
+                self._providers[provider] = quota
+            return quota
+
+    def acquire(self, provider: str, max_wait: float = QUOTA_MAX_WAIT) -> None:
+        """گرفتن اجازه ارسال درخواست (در صورت عدم امکان ProviderUnavailable)"""
+        self.get(provider).acquire(max_wait)
+
+    def is_available(self, provider: str) -> bool:
+        """
+        آیا ارائه‌دهنده در حال حاضر درخواست می‌پذیرد (بدون مصرف توکن)
+
+        Args:
+            provider: نام ارائه‌دهنده
+
+        Returns:
+            bool: اگر مدار بسته یا آماده آزمایش باشد
+        """
+        return self.get(provider).get_status()['state'] != CircuitBreaker.OPEN
+
+    def record_success(self, provider: str) -> None:
+        """ثبت پاسخ موفق"""
+        self.get(provider).record_success()
+
+    def release(self, provider: str) -> None:
+        """ثبت درخواستی که بدون نتیجه پایان یافت"""
+        self.get(provider).release()
+
+    def record_failure(self, provider: str) -> None:
+        """ثبت خطای شبکه یا خطای سرور"""
+        self.get(provider).record_failure()
+
+    def record_rate_limited(self, provider: str, retry_after: Optional[float] = None) -> None:
+        """ثبت پاسخ 429"""
+        self.get(provider).record_rate_limited(retry_after)
+
+    def record_error(self, provider: str, error: Exception) -> None:
+        """
+        ثبت خطای یک SDK با تشخیص خطای محدودیت نرخ
+
+        Args:
+            provider: نام ارائه‌دهنده
+            error: خطای رخ داده
+        """
+        if is_rate_limit_error(error):
+            self.record_rate_limited(provider)
+        else:
+            self.record_failure(provider)
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """
+        دریافت وضعیت همه ارائه‌دهنده‌ها
+
+        Returns:
+            Dict[str, Dict[str, Any]]: وضعیت به تفکیک ارائه‌دهنده
+        """
+        with self._lock:
+            providers = list(self._providers.values())
+        return {quota.name: quota.get_status() for quota in providers}
+
+
+# مدیر مشترک سهمیه برای کل برنامه
+quota_manager = QuotaManager()
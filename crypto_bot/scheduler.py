@@ -13,7 +13,7 @@ from datetime import datetime
 
 from crypto_bot.signal_generator import generate_signals, get_signals_summary
 from crypto_bot.telegram_service import send_telegram_message
-from crypto_bot.market_data import get_current_prices
+from crypto_bot.price_ticker import price_ticker
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +27,7 @@ def send_price_updates():
     """
     try:
         symbols = ["BTC/USDT", "ETH/USDT", "XRP/USDT", "SOL/USDT", "BNB/USDT"]
-        prices = get_current_prices(symbols=symbols)
+        prices = price_ticker.get_prices(symbols)
         
         message = "💰 *قیمت‌های لحظه‌ای ارزهای دیجیتال*\n\n"
         
@@ -94,7 +94,7 @@ def send_market_overview():
         
         # اضافه کردن روند کلی بازار (در اینجا به صورت ساده)
         symbols = ["BTC/USDT", "ETH/USDT"]
-        prices = get_current_prices(symbols=symbols)
+        prices = price_ticker.get_prices(symbols)
         
         # بررسی روند کلی بازار بر اساس بیت‌کوین و اتریوم
         btc_change = prices.get("BTC/USDT", {}).get("change_24h", 0)
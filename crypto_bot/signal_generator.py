@@ -7,17 +7,21 @@
 import logging
 from typing import Dict, List, Any, Optional
 
-from crypto_bot.technical_analysis import get_technical_analysis
+from crypto_bot.technical_analysis import get_technical_analysis_batch
 
 logger = logging.getLogger(__name__)
 
-def generate_signals(symbols: List[str], timeframe: str = "1d") -> Dict[str, List[Dict[str, Any]]]:
+def generate_signals(symbols: List[str], timeframe: str = "1d", timeout: Optional[float] = None) -> Dict[str, List[Dict[str, Any]]]:
     """
     تولید سیگنال‌های معاملاتی برای مجموعه‌ای از ارزها
     
+    داده‌های همه ارزها به صورت همزمان دریافت می‌شوند؛ ارزهایی که در مهلت
+    مقرر دریافت نشوند در نتیجه حضور ندارند.
+    
     Args:
         symbols (List[str]): لیست نمادهای ارزهای دیجیتال
         timeframe (str): بازه زمانی
+        timeout (Optional[float]): مهلت کل پویش (ثانیه)
         
     Returns:
         Dict[str, List[Dict[str, Any]]]: دیکشنری شامل لیست سیگنال‌های خرید و فروش
@@ -26,9 +30,11 @@ def generate_signals(symbols: List[str], timeframe: str = "1d") -> Dict[str, Lis
         buy_signals = []
         sell_signals = []
         
+        # تحلیل تکنیکال همه ارزها با یک محاسبه برداری اندیکاتورها
+        analyses = get_technical_analysis_batch(symbols, timeframe, timeout=timeout)
+        
         for symbol in symbols:
-            # تحلیل تکنیکال ارز
-            analysis = get_technical_analysis(symbol, timeframe)
+            analysis = analyses[symbol]
             
             # اگر تحلیل با خطا مواجه شده باشد، آن را نادیده می‌گیریم
             if 'error' in analysis:
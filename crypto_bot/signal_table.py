@@ -0,0 +1,402 @@
+"""
+جدول سیگنال‌های از پیش محاسبه شده (Signal Table)
+
+یک ترد پس‌زمینه به صورت دوره‌ای سیگنال‌های واقعی همه نمادهای تحت نظر را در
+بازه‌های زمانی تنظیم شده محاسبه کرده و در جدولی با کلید (نماد، بازه زمانی)
+ذخیره می‌کند. درخواست‌های API فقط از همین جدول می‌خوانند، بنابراین زمان پاسخ
+مستقل از زمان دریافت داده‌ها و محاسبه اندیکاتورهاست.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from crypto_bot.candle_store import TIMEFRAME_SECONDS
+from crypto_bot.price_ticker import price_ticker, normalize_symbol
+from crypto_bot.technical_analysis import get_technical_analysis_multi
+
+logger = logging.getLogger(__name__)
+
+# بازه‌های زمانی محاسبه سیگنال
+SIGNAL_TIMEFRAMES = [tf.strip() for tf in os.environ.get("SIGNAL_TIMEFRAMES", "1h,4h,1d").split(",") if tf.strip()]
+
+# فاصله زمانی محاسبه مجدد سیگنال‌ها (ثانیه)
+SIGNAL_REFRESH_INTERVAL = int(os.environ.get("SIGNAL_REFRESH_INTERVAL", "300"))
+
+# مدت محاسبه نمادهای درخواستی خارج از لیست تحت نظر پس از آخرین خواندن (ثانیه)؛
+# نمادی که تحلیل آن ناموفق بوده هم در این مدت دوباره پذیرفته نمی‌شود
+SIGNAL_REQUEST_TTL = int(os.environ.get("SIGNAL_REQUEST_TTL", "3600"))
+
+# بیشترین تعداد نمادهای درخواستی هر بازه زمانی؛ قدیمی‌ترین خواندن کنار گذاشته می‌شود
+SIGNAL_REQUEST_MAX = int(os.environ.get("SIGNAL_REQUEST_MAX", "50"))
+
+# معادل انگلیسی سیگنال‌های تحلیل تکنیکال
+SIGNAL_LABELS = {
+    "خرید قوی": "Strong Buy",
+    "خرید": "Buy",
+    "خنثی": "Neutral",
+    "فروش": "Sell",
+    "فروش قوی": "Strong Sell"
+}
+
+# پیشنهاد معامله نوسانی برای هر سیگنال (انگلیسی، فارسی)
+SWING_RECOMMENDATIONS = {
+    "Strong Buy": ("Good swing entry for long position", "نقطه ورود مناسب برای معامله نوسانی صعودی"),
+    "Buy": ("Consider swing trade (long)", "بررسی معامله نوسانی (صعودی)"),
+    "Neutral": ("Wait for clearer signals", "منتظر سیگنال‌های واضح‌تر بمانید"),
+    "Sell": ("Consider swing trade (short)", "بررسی معامله نوسانی (نزولی)"),
+    "Strong Sell": ("Consider exiting long positions", "خروج از موقعیت‌های خرید را بررسی کنید")
+}
+
+# اندیکاتورهای ذخیره شده در هر ردیف
+INDICATOR_KEYS = ('rsi', 'macd', 'macd_signal', 'ma20', 'ma50', 'ma200', 'bb_upper', 'bb_lower', 'stoch_k', 'stoch_d')
+
+# بیشترین قدرت سیگنال در تحلیل تکنیکال (RSI: 2، MACD: 1، میانگین‌ها: 2)
+MAX_SIGNAL_STRENGTH = 5
+
+
+def _clip(value: Optional[float], limit: float = 0.5) -> float:
+    """محدود کردن مقدار به بازه [-limit, limit] (NaN و None صفر می‌شوند)"""
+    if value is None or value != value:
+        return 0.0
+    return round(max(-limit, min(limit, value)), 2)
+
+
+def _factors(analysis: Dict[str, Any]) -> Dict[str, float]:
+    """
+    تبدیل اندیکاتورها به عوامل نرمال شده سیگنال (مثبت: صعودی، منفی: نزولی)
+
+    Args:
+        analysis: نتیجه تحلیل تکنیکال
+
+    Returns:
+        Dict[str, float]: عوامل در بازه [-0.5, 0.5] و نوسان
+    """
+    price = analysis.get('current_price')
+    factors = {}
+
+    # روند: ترتیب قیمت و میانگین‌های متحرک
+    ma20, ma50 = analysis.get('ma20'), analysis.get('ma50')
+    if not price or not ma20 or not ma50 or ma50 != ma50:
+        factors['trend'] = 0.0
+    elif price > ma20 > ma50:
+        factors['trend'] = 0.5
+    elif price < ma20 < ma50:
+        factors['trend'] = -0.5
+    else:
+        factors['trend'] = _clip((price - ma50) / ma50 * 5)
+
+    # RSI: اشباع فروش صعودی و اشباع خرید نزولی است
+    rsi = analysis.get('rsi')
+    factors['rsi'] = _clip((50 - rsi) / 40 if rsi is not None else None)
+
+    # MACD: هیستوگرام نسبت به قیمت
+    histogram = analysis.get('macd_histogram')
+    factors['macd'] = _clip(histogram / price * 100 if price and histogram is not None else None)
+
+    # بولینگر: نزدیکی به باند پایینی صعودی است
+    upper, lower = analysis.get('bb_upper'), analysis.get('bb_lower')
+    if price and upper is not None and lower is not None and upper > lower:
+        factors['bollinger'] = _clip(0.5 - (price - lower) / (upper - lower))
+    else:
+        factors['bollinger'] = 0.0
+
+    # شتاب: تغییر قیمت 10 کندل اخیر
+    trend = analysis.get('price_trend_10d')
+    factors['momentum'] = _clip(trend / 20 if trend is not None else None)
+
+    # نوسان: پهنای باندهای بولینگر
+    factors['volatility'] = _clip(analysis.get('bb_width'), limit=1.0)
+
+    return factors
+
+
+def build_signal_row(analysis: Dict[str, Any], computed_at: float) -> Dict[str, Any]:
+    """
+    ساخت ردیف جدول سیگنال از نتیجه تحلیل تکنیکال
+
+    Args:
+        analysis: نتیجه get_technical_analysis
+        computed_at: زمان محاسبه (ثانیه)
+
+    Returns:
+        Dict[str, Any]: ردیف سیگنال با همان قالب /api/signals
+    """
+    farsi_signal = analysis.get('signal', 'خنثی')
+    signal = SIGNAL_LABELS.get(farsi_signal, 'Neutral')
+    direction = 1 if 'Buy' in signal else -1 if 'Sell' in signal else 0
+    strength = round(direction * analysis.get('signal_strength', 0) / MAX_SIGNAL_STRENGTH, 2)
+    factors = _factors(analysis)
+    recommendation, farsi_recommendation = SWING_RECOMMENDATIONS[signal]
+
+    return {
+        'symbol': analysis['symbol'],
+        'timeframe': analysis['timeframe'],
+        'price': analysis.get('current_price'),
+        'signal': signal,
+        'farsi_signal': farsi_signal,
+        'strength': strength,
+        'factors': factors,
+        # NaN در JSON معتبر نیست
+        'indicators': {key: value if value == value else None
+                       for key, value in ((key, analysis.get(key)) for key in INDICATOR_KEYS)},
+        'swing_recommendation': recommendation,
+        'farsi_swing_recommendation': farsi_recommendation,
+        'volatility': factors['volatility'],
+        'computed_at': computed_at,
+        'timestamp': datetime.fromtimestamp(computed_at).isoformat(),
+        'is_sample_data': False
+    }
+
+
+class SignalTable:
+    """محاسبه دوره‌ای و نگهداری سیگنال‌ها با کلید (نماد، بازه زمانی)"""
+
+    def __init__(self, timeframes: Iterable[str] = SIGNAL_TIMEFRAMES,
+                 interval: int = SIGNAL_REFRESH_INTERVAL):
+        """
+        راه‌اندازی جدول
+
+        Args:
+            timeframes: بازه‌های زمانی محاسبه
+            interval: فاصله زمانی محاسبه مجدد (ثانیه)
+        """
+        self.timeframes = list(timeframes)
+        self.interval = interval
+        self._rows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # بازه زمانی: {نماد درخواست شده خارج از لیست تحت نظر: زمان آخرین خواندن}
+        self._requested: Dict[str, Dict[str, float]] = {}
+        # (نماد، بازه زمانی): (زمان رد شدن، پیام خطا) برای نمادهای درخواستی با تحلیل ناموفق
+        self._rejected: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.running = False
+        self.last_run: Optional[float] = None
+        self.last_duration: Optional[float] = None
+
+    def get(self, symbol: str, timeframe: str = "1d") -> Optional[Dict[str, Any]]:
+        """
+        دریافت سیگنال یک نماد از جدول
+
+        Args:
+            symbol: نماد ارز
+            timeframe: بازه زمانی
+
+        Returns:
+            Optional[Dict[str, Any]]: ردیف سیگنال یا None اگر هنوز محاسبه نشده است
+        """
+        return self._rows.get((normalize_symbol(symbol), timeframe))
+
+    def get_many(self, symbols: Iterable[str], timeframe: str = "1d") -> Tuple[Dict[str, Dict[str, Any]], List[str],
+                                                                            Dict[str, str]]:
+        """
+        دریافت سیگنال چند نماد؛ نمادهای محاسبه نشده برای دور بعدی ثبت می‌شوند
+
+        Args:
+            symbols: نمادهای ارز (با همان فرمت ورودی در نتیجه برگردانده می‌شوند)
+            timeframe: بازه زمانی
+
+        Returns:
+            سیگنال‌ها به تفکیک نماد، لیست نمادهای در انتظار محاسبه و خطای نمادهای رد شده
+        """
+        found = {}
+        pending = []
+        failed = {}
+        now = time.time()
+        for symbol in symbols:
+            row = self.get(symbol, timeframe)
+            rejected = self._rejected.get((normalize_symbol(symbol), timeframe))
+            if row is not None:
+                found[symbol] = row
+            elif rejected is not None and now - rejected[0] < SIGNAL_REQUEST_TTL:
+                failed[symbol] = rejected[1]
+            else:
+                pending.append(symbol)
+
+        # خواندن نمادهای درخواستی، محاسبه آن‌ها را تمدید می‌کند
+        if found or pending:
+            self.request(list(found) + pending, timeframe)
+        return found, pending, failed
+
+    def request(self, symbols: Iterable[str], timeframe: str) -> None:
+        """
+        ثبت نمادها برای محاسبه در دور بعدی (و بیدار کردن ترد محاسبه)
+
+        نمادهای درخواستی تا SIGNAL_REQUEST_TTL ثانیه پس از آخرین خواندن محاسبه می‌شوند.
+
+        Args:
+            symbols: نمادهای ارز
+            timeframe: بازه زمانی
+        """
+        if timeframe not in TIMEFRAME_SECONDS:
+            return
+        now = time.time()
+        normalized = {normalize_symbol(s) for s in symbols if s}
+        with self._lock:
+            requested = self._requested.setdefault(timeframe, {})
+            new_symbols = normalized - set(requested)
+            for symbol in normalized:
+                rejected = self._rejected.get((symbol, timeframe))
+                if rejected is not None and now - rejected[0] < SIGNAL_REQUEST_TTL:
+                    new_symbols.discard(symbol)
+                    continue
+                requested[symbol] = now
+            if len(requested) > SIGNAL_REQUEST_MAX:
+                for symbol in sorted(requested, key=requested.get)[:len(requested) - SIGNAL_REQUEST_MAX]:
+                    del requested[symbol]
+                    new_symbols.discard(symbol)
+        if new_symbols and self.running:
+            self._wakeup.set()
+
+    def _expire_locked(self, now: float) -> None:
+        """حذف نمادهای درخواستی که مدتی خوانده نشده‌اند و ردیف‌های آن‌ها (با نگه داشتن قفل)"""
+        expired_before = now - SIGNAL_REQUEST_TTL
+        for timeframe, requested in self._requested.items():
+            for symbol in [s for s, read_at in requested.items() if read_at < expired_before]:
+                del requested[symbol]
+                self._rows.pop((symbol, timeframe), None)
+        # بازه زمانی خارج از تنظیمات بدون نماد درخواستی دیگر محاسبه نمی‌شود
+        for timeframe in [tf for tf, requested in self._requested.items() if not requested]:
+            del self._requested[timeframe]
+            if timeframe not in self.timeframes:
+                for key in [k for k in self._rows if k[1] == timeframe]:
+                    del self._rows[key]
+        for key in [k for k, (rejected_at, _) in self._rejected.items() if rejected_at < expired_before]:
+            del self._rejected[key]
+
+    def refresh(self) -> int:
+        """
+        محاسبه سیگنال همه نمادهای تحت نظر در همه بازه‌های زمانی
+
+        Returns:
+            int: تعداد ردیف‌های بروز شده
+        """
+        started = time.monotonic()
+        watched = set(price_ticker.watched_symbols())
+        with self._lock:
+            self._expire_locked(time.time())
+            plan = {tf: watched | set(self._requested.get(tf, ()))
+                    for tf in set(self.timeframes) | set(self._requested)}
+
+        updated = 0
+        symbols = set().union(*plan.values()) if plan else set()
+        if symbols:
+            # همه بازه‌های یک نماد از یک سری پایه مشترک ساخته می‌شوند؛ نماد بدون کندل واقعی
+            # (مثلاً در Binance فهرست نشده یا رد شده توسط سهمیه) به جای داده تست، خطا برمی‌گرداند
+            results = get_technical_analysis_multi(sorted(symbols), sorted(plan, key=lambda tf: TIMEFRAME_SECONDS.get(tf, 0)),
+                                                   sample_fallback=False)
+            computed_at = time.time()
+            rows = {}
+            rejected = {}
+            for timeframe in plan:
+                analyses = results.get(timeframe, {})
+                for symbol in plan[timeframe]:
+                    analysis = analyses.get(symbol) or {'error': 'تحلیل انجام نشد'}
+                    if 'error' not in analysis and 'rsi' in analysis:
+                        rows[(symbol, timeframe)] = build_signal_row(analysis, computed_at)
+                    elif symbol not in watched and (symbol, timeframe) not in self._rows:
+                        # نماد درخواستی که هیچ‌گاه تحلیل نشده به جای محاسبه دوباره در هر دور، رد می‌شود
+                        rejected[(symbol, timeframe)] = (computed_at, analysis.get('error', 'تحلیل انجام نشد'))
+                    # تحلیل ناموفق نماد تحت نظر جایگزین سیگنال معتبر قبلی نمی‌شود
+            with self._lock:
+                self._rows.update(rows)
+                self._rejected.update(rejected)
+                for symbol, timeframe in rejected:
+                    self._requested.get(timeframe, {}).pop(symbol, None)
+            updated = len(rows)
+            if rejected:
+                logger.warning(f"Signal table rejected {len(rejected)} requested symbol/timeframe pairs after failed analysis")
+
+        self.last_run = time.time()
+        self.last_duration = time.monotonic() - started
+        logger.info(f"Signal table refreshed: {updated} rows in {self.last_duration:.1f} seconds")
+        return updated
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        دریافت وضعیت جدول
+
+        Returns:
+            Dict[str, Any]: تعداد ردیف‌ها و زمان آخرین محاسبه
+        """
+        return {
+            'running': self.running,
+            'rows': len(self._rows),
+            'requested': sum(len(requested) for requested in self._requested.values()),
+            'rejected': len(self._rejected),
+            'timeframes': self.timeframes,
+            'interval': self.interval,
+            'last_run': self.last_run,
+            'last_duration': self.last_duration
+        }
+
+    def start(self) -> bool:
+        """
+        شروع محاسبه دوره‌ای
+
+        Returns:
+            bool: وضعیت شروع
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self.running = True
+            self._thread = threading.Thread(target=self._loop, name="signal-table", daemon=True)
+            self._thread.start()
+        logger.info(f"Signal table started for timeframes {', '.join(self.timeframes)}")
+        return True
+
+    def stop(self) -> bool:
+        """
+        توقف محاسبه دوره‌ای
+
+        Returns:
+            bool: وضعیت توقف
+        """
+        if not self.running:
+            return False
+        self.running = False
+        self._wakeup.set()
+        logger.info("Signal table stopped")
+        return True
+
+    def _loop(self) -> None:
+        """حلقه اصلی محاسبه دوره‌ای"""
+        while self.running:
+            started = time.monotonic()
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing signal table: {str(e)}")
+
+            # نماد درخواست شده جدید باعث بیدار شدن زودتر می‌شود
+            self._wakeup.wait(max(self.interval - (time.monotonic() - started), 0))
+            self._wakeup.clear()
+
+
+# نمونه مشترک جدول سیگنال برای کل برنامه
+signal_table = SignalTable()
+
+
+def start_signal_table() -> bool:
+    """
+    شروع محاسبه دوره‌ای سیگنال‌ها
+
+    Returns:
+        bool: وضعیت شروع
+    """
+    return signal_table.start()
+
+
+def stop_signal_table() -> bool:
+    """
+    توقف محاسبه دوره‌ای سیگنال‌ها
+
+    Returns:
+        bool: وضعیت توقف
+    """
+    return signal_table.stop()
@@ -46,7 +46,7 @@ except Exception as e:
     logger.error(f"خطا در بارگذاری ماژول تحلیل تکنیکال: {str(e)}")
 
 try:
-    from crypto_bot.chart_generator import generate_candlestick_chart
+    from crypto_bot.chart_generator import generate_chart_for_telegram
     logger.info("ماژول تولید نمودار با موفقیت بارگذاری شد")
 except Exception as e:
     logger.error(f"خطا در بارگذاری ماژول تولید نمودار: {str(e)}")
@@ -66,13 +66,13 @@ def send_formatted_report():
         
         logger = logging.getLogger(__name__)
         
-        # تلاش برای ایجاد نمودار کندل‌استیک
-        chart_path = None
+        # تلاش برای ایجاد نمودار کندل‌استیک (در حافظه، بدون فایل موقت)
+        chart_image = None
         try:
-            from crypto_bot.chart_generator import generate_candlestick_chart
-            chart_path = generate_candlestick_chart("BTC/USDT", timeframe="1d")
-            if chart_path:
-                logger.info(f"نمودار کندل‌استیک با موفقیت در مسیر {chart_path} ایجاد شد")
+            from crypto_bot.chart_generator import generate_chart_for_telegram
+            chart_image = generate_chart_for_telegram("BTC/USDT", timeframe="1d")
+            if chart_image:
+                logger.info(f"نمودار کندل‌استیک با موفقیت ایجاد شد ({len(chart_image)} بایت)")
         except Exception as e:
             logger.error(f"خطا در ایجاد نمودار کندل‌استیک: {str(e)}")
             
@@ -280,10 +280,10 @@ def send_formatted_report():
         message_sent = send_telegram_message(chat_id, message)
         
         # اگر نمودار کندل‌استیک تولید شده، آن را نیز ارسال می‌کنیم
-        if message_sent and chart_path:
+        if message_sent and chart_image:
             try:
                 caption = "📊 نمودار کندل‌استیک بیت‌کوین (BTC/USDT)"
-                photo_sent = send_telegram_photo(chat_id, chart_path, caption=caption)
+                photo_sent = send_telegram_photo(chat_id, chart_image, caption=caption)
                 if photo_sent:
                     logger.info(f"نمودار کندل‌استیک با موفقیت ارسال شد")
                 else:
@@ -11,13 +11,29 @@ import numpy as np
 import matplotlib.pyplot as plt
 # import talib - Not currently available in the environment
 
-from typing import Dict, List, Any, Union, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from typing import Dict, List, Any, Union, Optional, Tuple
 from datetime import datetime, timedelta
 
-from crypto_bot.market_data import get_historical_data
+from crypto_bot.market_data import get_historical_data, get_historical_data_multi, generate_sample_data
+from crypto_bot.indicator_engine import (calculate_indicators_batch, calculate_indicators_for_arrays, prepare_ohlcv,
+                                         table_row, history_required)
+from crypto_bot.incremental_indicators import indicator_states
 
 logger = logging.getLogger(__name__)
 
+# تعداد کندل لازم برای همه اندیکاتورها (MA200 بیشترین دوره گرم شدن را دارد)
+DEFAULT_HISTORY = history_required()
+
+# تعداد درخواست‌های همزمان داده‌های تاریخی در پویش چند نماد
+SCAN_CONCURRENCY = int(os.environ.get("SIGNAL_SCAN_CONCURRENCY", "16"))
+
+# مهلت کل پویش چند نماد (ثانیه)؛ نمادهای باقی‌مانده پس از آن کنار گذاشته می‌شوند
+SCAN_TIMEOUT = float(os.environ.get("SIGNAL_SCAN_TIMEOUT", "20"))
+
+# ترد پول مشترک برای دریافت همزمان داده‌های تاریخی
+_scan_executor = ThreadPoolExecutor(max_workers=SCAN_CONCURRENCY, thread_name_prefix="history-scan")
+
 def calculate_technical_indicators(historical_data: Union[pd.DataFrame, list], symbol: str) -> Dict[str, Any]:
     """
     محاسبه اندیکاتورهای تکنیکال برای یک ارز
@@ -72,67 +88,14 @@ def calculate_technical_indicators(historical_data: Union[pd.DataFrame, list], s
             logger.warning(f"داده‌های تاریخی برای {symbol} کافی نیست (نیاز به حداقل 14 روز)")
             return {}
 
-        # محاسبه اندیکاتورها
-        indicators = {}
-
-        # به دلیل عدم دسترسی به talib، از محاسبات ساده برای اندیکاتورها استفاده می‌کنیم
-        
-        # RSI (محاسبه ساده)
-        close_diff = df['close'].diff().dropna()
-        gains = close_diff.mask(close_diff < 0, 0)
-        losses = -close_diff.mask(close_diff > 0, 0)
-        avg_gain = gains.rolling(window=14).mean().iloc[-1]
-        avg_loss = losses.rolling(window=14).mean().iloc[-1]
-        if avg_loss == 0:
-            rs = 100
-        else:
-            rs = avg_gain / avg_loss
-        indicators['rsi'] = 100 - (100 / (1 + rs))
-
-        # میانگین‌های متحرک
-        indicators['ma20'] = df['close'].rolling(window=20).mean().iloc[-1]
-        indicators['ma50'] = df['close'].rolling(window=50).mean().iloc[-1]
-        indicators['ma200'] = df['close'].rolling(window=200).mean().iloc[-1]
-
-        # MACD (محاسبه ساده)
-        ema12 = df['close'].ewm(span=12, adjust=False).mean()
-        ema26 = df['close'].ewm(span=26, adjust=False).mean()
-        macd_line = ema12 - ema26
-        signal_line = macd_line.ewm(span=9, adjust=False).mean()
-        
-        indicators['macd'] = macd_line.iloc[-1]
-        indicators['macd_signal'] = signal_line.iloc[-1]
-        indicators['macd_histogram'] = macd_line.iloc[-1] - signal_line.iloc[-1]
-
-        # باندهای بولینگر
-        ma20 = df['close'].rolling(window=20).mean()
-        std20 = df['close'].rolling(window=20).std()
-        
-        upper_band = ma20 + (std20 * 2)
-        lower_band = ma20 - (std20 * 2)
-        
-        indicators['bb_upper'] = upper_band.iloc[-1]
-        indicators['bb_middle'] = ma20.iloc[-1]
-        indicators['bb_lower'] = lower_band.iloc[-1]
-        indicators['bb_width'] = (upper_band.iloc[-1] - lower_band.iloc[-1]) / ma20.iloc[-1]
-
-        # استوکاستیک (محاسبه ساده)
-        low_min = df['low'].rolling(window=14).min()
-        high_max = df['high'].rolling(window=14).max()
-        
-        k = 100 * ((df['close'] - low_min) / (high_max - low_min))
-        k_3 = k.rolling(window=3).mean()
-        d_3 = k_3.rolling(window=3).mean()
-        
-        indicators['stoch_k'] = k_3.iloc[-1]
-        indicators['stoch_d'] = d_3.iloc[-1]
-
-        # حجم میانگین معاملات
-        indicators['volume_ema'] = df['volume'].ewm(span=20, adjust=False).mean().iloc[-1]
-        
-        # روند قیمت
-        price_change = (df['close'].iloc[-1] - df['close'].iloc[-10]) / df['close'].iloc[-10] * 100
-        indicators['price_trend_10d'] = price_change
+        # محاسبه اندیکاتورها با موتور برداری (یک ردیف)
+        table = calculate_indicators_batch(
+            df['close'].to_numpy(dtype=float)[None, :],
+            df['high'].to_numpy(dtype=float)[None, :],
+            df['low'].to_numpy(dtype=float)[None, :],
+            df['volume'].to_numpy(dtype=float)[None, :]
+        )
+        indicators = table_row(table, 0)
         
         return indicators
     
@@ -140,102 +103,137 @@ def calculate_technical_indicators(historical_data: Union[pd.DataFrame, list], s
         logger.error(f"خطا در محاسبه اندیکاتورهای تکنیکال برای {symbol}: {str(e)}")
         return {}
 
-def get_technical_analysis(symbol: str, timeframe: str = "1d") -> Dict[str, Any]:
+def _get_current_price(historical_data: Union[pd.DataFrame, list, None]) -> Optional[float]:
+    """استخراج آخرین قیمت بسته شدن از داده‌های تاریخی"""
+    if isinstance(historical_data, pd.DataFrame) and not historical_data.empty and 'close' in historical_data.columns:
+        return historical_data['close'].iloc[-1]
+    elif isinstance(historical_data, list) and historical_data and 'close' in historical_data[-1]:
+        return historical_data[-1]['close']
+    return None
+
+def _build_analysis(symbol: str, timeframe: str, current_price: Optional[float],
+                    indicators: Dict[str, Any]) -> Dict[str, Any]:
     """
-    تحلیل تکنیکال یک ارز
+    ساخت نتیجه تحلیل و محاسبه سیگنال از روی اندیکاتورها
 
     Args:
         symbol: نماد ارز
         timeframe: بازه زمانی
+        current_price: آخرین قیمت (در صورت وجود)
+        indicators: اندیکاتورهای تکنیکال
 
     Returns:
         Dict[str, Any]: نتایج تحلیل تکنیکال
     """
-    try:
-        # دریافت داده‌های تاریخی
-        historical_data = get_historical_data(symbol, timeframe=timeframe, limit=100)
-        
-        # آماده‌سازی نتیجه
-        analysis = {
-            'symbol': symbol,
-            'timeframe': timeframe,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        }
-        
-        # Get current price if possible
-        current_price = None
-        if isinstance(historical_data, pd.DataFrame) and not historical_data.empty and 'close' in historical_data.columns:
-            current_price = historical_data['close'].iloc[-1]
-        elif isinstance(historical_data, list) and historical_data and 'close' in historical_data[-1]:
-            current_price = historical_data[-1]['close']
-        
-        # If we have a current price, add it to the analysis
-        if current_price is not None:
-            analysis['current_price'] = current_price
-        
-        # محاسبه اندیکاتورها
-        indicators = calculate_technical_indicators(historical_data, symbol)
-        
-        # ترکیب با اندیکاتورها
-        analysis.update(indicators)
-        
-        # محاسبه سیگنال
-        signal = "خنثی"
-        signal_strength = 0
-        
-        if 'rsi' in indicators:
-            rsi = indicators['rsi']
-            if rsi < 30:
+    # آماده‌سازی نتیجه
+    analysis = {
+        'symbol': symbol,
+        'timeframe': timeframe,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    
+    # If we have a current price, add it to the analysis
+    if current_price is not None:
+        analysis['current_price'] = current_price
+    
+    # ترکیب با اندیکاتورها
+    analysis.update(indicators)
+    
+    # محاسبه سیگنال
+    signal = "خنثی"
+    signal_strength = 0
+    
+    if 'rsi' in indicators:
+        rsi = indicators['rsi']
+        if rsi < 30:
+            signal = "خرید"
+            signal_strength += 2
+        elif rsi > 70:
+            signal = "فروش"
+            signal_strength -= 2
+            
+    if 'macd' in indicators and 'macd_signal' in indicators:
+        macd = indicators['macd']
+        macd_signal = indicators['macd_signal']
+        if macd > macd_signal:
+            if signal != "فروش":
                 signal = "خرید"
-                signal_strength += 2
-            elif rsi > 70:
+            signal_strength += 1
+        elif macd < macd_signal:
+            if signal != "خرید":
                 signal = "فروش"
-                signal_strength -= 2
-                
-        if 'macd' in indicators and 'macd_signal' in indicators:
-            macd = indicators['macd']
-            macd_signal = indicators['macd_signal']
-            if macd > macd_signal:
+            signal_strength -= 1
+            
+    if 'ma20' in indicators and 'ma50' in indicators and 'ma200' in indicators:
+        ma20 = indicators['ma20']
+        ma50 = indicators['ma50']
+        ma200 = indicators['ma200']
+        
+        # Use safely retrieved current_price or indicators['current_price'] if it exists
+        if current_price is not None:
+            if current_price > ma20 > ma50 > ma200:
                 if signal != "فروش":
                     signal = "خرید"
-                signal_strength += 1
-            elif macd < macd_signal:
+                signal_strength += 2
+            elif current_price < ma20 < ma50 < ma200:
                 if signal != "خرید":
                     signal = "فروش"
-                signal_strength -= 1
-                
-        if 'ma20' in indicators and 'ma50' in indicators and 'ma200' in indicators:
-            ma20 = indicators['ma20']
-            ma50 = indicators['ma50']
-            ma200 = indicators['ma200']
-            
-            # Use safely retrieved current_price or indicators['current_price'] if it exists
-            if current_price is not None:
-                if current_price > ma20 > ma50 > ma200:
-                    if signal != "فروش":
-                        signal = "خرید"
-                    signal_strength += 2
-                elif current_price < ma20 < ma50 < ma200:
-                    if signal != "خرید":
-                        signal = "فروش"
-                    signal_strength -= 2
+                signal_strength -= 2
+    
+    # تعیین قدرت سیگنال
+    if signal_strength >= 3:
+        final_signal = "خرید قوی"
+    elif signal_strength > 0:
+        final_signal = "خرید"
+    elif signal_strength <= -3:
+        final_signal = "فروش قوی"
+    elif signal_strength < 0:
+        final_signal = "فروش"
+    else:
+        final_signal = "خنثی"
         
-        # تعیین قدرت سیگنال
-        if signal_strength >= 3:
-            final_signal = "خرید قوی"
-        elif signal_strength > 0:
-            final_signal = "خرید"
-        elif signal_strength <= -3:
-            final_signal = "فروش قوی"
-        elif signal_strength < 0:
-            final_signal = "فروش"
-        else:
-            final_signal = "خنثی"
-            
-        analysis['signal'] = final_signal
-        analysis['signal_strength'] = abs(signal_strength)
-            
-        return analysis
+    analysis['signal'] = final_signal
+    analysis['signal_strength'] = abs(signal_strength)
+        
+    return analysis
+
+def _get_indicators(symbol: str, timeframe: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    دریافت داده‌های تاریخی و اندیکاتورهای یک نماد
+
+    برای کندل‌های واقعی فقط کندل‌های جدید (و کندل در حال تشکیل) به وضعیت افزایشی
+    اعمال می‌شوند؛ اگر کندلی در دسترس نباشد مانند قبل از داده تست استفاده می‌شود
+    که وارد وضعیت ذخیره شده نمی‌شود.
+
+    Args:
+        symbol: نماد ارز
+        timeframe: بازه زمانی
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Dict[str, Any]]: داده‌های تاریخی و اندیکاتورها
+    """
+    historical_data = get_historical_data(symbol, timeframe=timeframe, limit=DEFAULT_HISTORY, sample_fallback=False)
+    if historical_data:
+        return historical_data, indicator_states.sync(symbol, timeframe, historical_data)
+    historical_data = generate_sample_data(DEFAULT_HISTORY)
+    return historical_data, calculate_technical_indicators(historical_data, symbol)
+
+def get_technical_analysis(symbol: str, timeframe: str = "1d") -> Dict[str, Any]:
+    """
+    تحلیل تکنیکال یک ارز
+
+    Args:
+        symbol: نماد ارز
+        timeframe: بازه زمانی
+
+    Returns:
+        Dict[str, Any]: نتایج تحلیل تکنیکال
+    """
+    try:
+        # دریافت داده‌های تاریخی و محاسبه اندیکاتورها
+        historical_data, indicators = _get_indicators(symbol, timeframe)
+        
+        return _build_analysis(symbol, timeframe, _get_current_price(historical_data), indicators)
     
     except Exception as e:
         logger.error(f"خطا در تحلیل تکنیکال {symbol}: {str(e)}")
@@ -246,6 +244,155 @@ def get_technical_analysis(symbol: str, timeframe: str = "1d") -> Dict[str, Any]
             'error': str(e)
         }
 
+def _scan_histories(symbols: List[str], timeframe: str, limit: int,
+                    timeout: Optional[float] = None) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    دریافت همزمان داده‌های تاریخی چند نماد
+
+    هر نماد به محض رسیدن داده‌اش برای موتور برداری آماده می‌شود، در حالی که
+    دریافت بقیه نمادها ادامه دارد. پس از پایان مهلت، نتایج جزئی برگردانده می‌شوند.
+
+    Args:
+        symbols: نمادهای ارز
+        timeframe: بازه زمانی
+        limit: تعداد کندل‌ها
+        timeout: مهلت کل پویش (ثانیه)
+
+    Returns:
+        داده‌های تاریخی دریافت شده و آرایه‌های OHLCV آماده به تفکیک نماد
+    """
+    return _scan_histories_multi(symbols, [timeframe], limit, timeout)[timeframe]
+
+def _scan_histories_multi(symbols: List[str], timeframes: List[str], limit: int,
+                          timeout: Optional[float] = None,
+                          sample_fallback: bool = True) -> Dict[str, Tuple[Dict[str, Any], Dict[str, np.ndarray]]]:
+    """
+    دریافت همزمان داده‌های تاریخی چند نماد در چند بازه زمانی
+
+    برای هر نماد ریزترین بازه یک بار دریافت و بازه‌های بزرگ‌تر از آن ساخته
+    می‌شوند، بنابراین همه بازه‌های یک نماد از یک snapshot یکسان هستند.
+
+    Args:
+        symbols: نمادهای ارز
+        timeframes: بازه‌های زمانی
+        limit: تعداد کندل‌های هر بازه
+        timeout: مهلت کل پویش (ثانیه)
+        sample_fallback: جایگزینی داده تست برای نمادهای بدون کندل (در غیر این صورت داده آن‌ها None است)
+
+    Returns:
+        به تفکیک بازه زمانی: داده‌های تاریخی دریافت شده و آرایه‌های OHLCV آماده
+    """
+    timeframes = list(dict.fromkeys(timeframes))
+    if len(timeframes) == 1:
+        timeframe = timeframes[0]
+        fetch = lambda symbol: {timeframe: get_historical_data(symbol, timeframe=timeframe, limit=limit,
+                                                               sample_fallback=sample_fallback)}
+    else:
+        fetch = lambda symbol: get_historical_data_multi(symbol, timeframes, limit=limit,
+                                                         sample_fallback=sample_fallback)
+
+    futures = {_scan_executor.submit(fetch, symbol): symbol for symbol in dict.fromkeys(symbols)}
+    scans = {timeframe: ({}, {}) for timeframe in timeframes}
+    
+    try:
+        for future in as_completed(futures, timeout=timeout if timeout is not None else SCAN_TIMEOUT):
+            symbol = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                logger.error(f"خطا در دریافت داده‌های تاریخی {symbol}: {str(e)}")
+                continue
+            
+            for timeframe, (histories, arrays) in scans.items():
+                histories[symbol] = data.get(timeframe)
+                values = prepare_ohlcv(histories[symbol], symbol)
+                if values is not None:
+                    arrays[symbol] = values
+    except FuturesTimeoutError:
+        pending = [symbol for future, symbol in futures.items() if not future.done()]
+        for future in futures:
+            future.cancel()
+        logger.warning(f"پایان مهلت پویش داده‌های تاریخی؛ {len(pending)} نماد کنار گذاشته شد: {', '.join(pending)}")
+    
+    return scans
+
+def _analyze_scan(symbols: List[str], timeframe: str, histories: Dict[str, Any],
+                  arrays: Dict[str, np.ndarray]) -> Dict[str, Dict[str, Any]]:
+    """
+    ساخت نتایج تحلیل تکنیکال از داده‌های پویش شده با یک محاسبه برداری اندیکاتورها
+
+    Args:
+        symbols: نمادهای ارز
+        timeframe: بازه زمانی
+        histories: داده‌های تاریخی دریافت شده به تفکیک نماد
+        arrays: آرایه‌های OHLCV آماده به تفکیک نماد
+
+    Returns:
+        Dict[str, Dict[str, Any]]: نتایج تحلیل تکنیکال به تفکیک نماد
+    """
+    try:
+        indicators = calculate_indicators_for_arrays(arrays)
+    except Exception as e:
+        logger.error(f"خطا در محاسبه دسته‌ای اندیکاتورها: {str(e)}")
+        indicators = {}
+    
+    results = {}
+    for symbol in symbols:
+        if symbol not in histories:
+            results[symbol] = {
+                'symbol': symbol,
+                'timeframe': timeframe,
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'error': 'داده‌های تاریخی در مهلت مقرر دریافت نشد'
+            }
+            continue
+        if histories[symbol] is None:
+            results[symbol] = {
+                'symbol': symbol,
+                'timeframe': timeframe,
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'error': 'داده‌های تاریخی در دسترس نیست'
+            }
+            continue
+        results[symbol] = _build_analysis(symbol, timeframe, _get_current_price(histories[symbol]),
+                                          indicators.get(symbol, {}))
+    return results
+
+def get_technical_analysis_batch(symbols: List[str], timeframe: str = "1d",
+                                 timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    تحلیل تکنیکال چند ارز با دریافت همزمان داده‌ها و یک محاسبه برداری اندیکاتورها
+
+    Args:
+        symbols: نمادهای ارز
+        timeframe: بازه زمانی
+        timeout: مهلت کل پویش (ثانیه، پیش‌فرض: SCAN_TIMEOUT)
+
+    Returns:
+        Dict[str, Dict[str, Any]]: نتایج تحلیل تکنیکال به تفکیک نماد؛ نمادهایی که
+        در مهلت دریافت نشدند کلید error دارند
+    """
+    histories, arrays = _scan_histories(symbols, timeframe, DEFAULT_HISTORY, timeout)
+    return _analyze_scan(symbols, timeframe, histories, arrays)
+
+def get_technical_analysis_multi(symbols: List[str], timeframes: List[str], timeout: Optional[float] = None,
+                                 sample_fallback: bool = True) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    تحلیل تکنیکال چند ارز در چند بازه زمانی با یک دریافت داده برای هر ارز
+
+    Args:
+        symbols: نمادهای ارز
+        timeframes: بازه‌های زمانی
+        timeout: مهلت کل پویش (ثانیه، پیش‌فرض: SCAN_TIMEOUT)
+        sample_fallback: تحلیل داده تست برای نمادهای بدون کندل (در غیر این صورت نتیجه آن‌ها کلید error دارد)
+
+    Returns:
+        Dict[str, Dict[str, Dict[str, Any]]]: نتایج تحلیل به تفکیک بازه زمانی و نماد
+    """
+    scans = _scan_histories_multi(symbols, timeframes, DEFAULT_HISTORY, timeout, sample_fallback)
+    return {timeframe: _analyze_scan(symbols, timeframe, histories, arrays)
+            for timeframe, (histories, arrays) in scans.items()}
+
 def analyze_symbol(symbol: str, timeframe: str = "1d") -> Dict[str, Any]:
     """
     تابع تحلیل نماد با استفاده از ماژول تحلیل تکنیکال
@@ -275,14 +422,64 @@ def get_technical_indicators(symbol: str, timeframe: str = "1d") -> Dict[str, An
         Dict[str, Any]: اندیکاتورهای تکنیکال
     """
     try:
-        # دریافت داده‌های تاریخی
-        historical_data = get_historical_data(symbol, timeframe=timeframe, limit=100)
-        
-        # محاسبه اندیکاتورها
-        indicators = calculate_technical_indicators(historical_data, symbol)
-        
-        return indicators
+        return _get_indicators(symbol, timeframe)[1]
     
     except Exception as e:
         logger.error(f"خطا در دریافت اندیکاتورهای تکنیکال برای {symbol}: {str(e)}")
-        return {}
\ No newline at end of file
+        return {}
+
+
+def get_technical_indicators_batch(symbols: List[str], timeframe: str = "1d", limit: Optional[int] = None,
+                                   indicators: Optional[List[str]] = None,
+                                   timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    دریافت اندیکاتورهای تکنیکال چند ارز با یک محاسبه برداری
+    
+    Args:
+        symbols: نمادهای ارز
+        timeframe: بازه زمانی
+        limit: تعداد کندل‌های تاریخی (پیش‌فرض: دوره گرم شدن اندیکاتورهای خواسته شده)
+        indicators: اندیکاتورهای مورد نیاز برای تعیین تعداد کندل (پیش‌فرض: همه)
+        timeout: مهلت کل پویش (ثانیه، پیش‌فرض: SCAN_TIMEOUT)
+    
+    Returns:
+        Dict[str, Dict[str, Any]]: اندیکاتورها به تفکیک نماد (برای نمادهای فاقد داده، دیکشنری خالی)
+    """
+    if limit is None:
+        limit = history_required(indicators)
+    
+    try:
+        _, arrays = _scan_histories(symbols, timeframe, limit, timeout)
+        results = calculate_indicators_for_arrays(arrays)
+    except Exception as e:
+        logger.error(f"خطا در محاسبه دسته‌ای اندیکاتورها: {str(e)}")
+        results = {}
+    
+    return {symbol: results.get(symbol, {}) for symbol in symbols}
+
+
+def get_incremental_indicators(symbol: str, timeframe: str = "1d", limit: int = DEFAULT_HISTORY) -> Dict[str, Any]:
+    """
+    دریافت اندیکاتورهای تکنیکال از وضعیت افزایشی
+    
+    فقط کندل‌های جدید (و کندل در حال تشکیل) به وضعیت ذخیره شده اعمال می‌شوند و
+    محاسبه کامل از نو انجام نمی‌شود.
+    
+    Args:
+        symbol: نماد ارز
+        timeframe: بازه زمانی
+        limit: تعداد کندل‌های تاریخی برای مقداردهی اولیه
+    
+    Returns:
+        Dict[str, Any]: اندیکاتورهای تکنیکال
+    """
+    try:
+        # داده تست هرگز وارد وضعیت ذخیره شده نمی‌شود
+        historical_data = get_historical_data(symbol, timeframe=timeframe, limit=limit, sample_fallback=False)
+        if not historical_data or not isinstance(historical_data, list):
+            return {}
+        return indicator_states.sync(symbol, timeframe, historical_data)
+    
+    except Exception as e:
+        logger.error(f"خطا در بروزرسانی افزایشی اندیکاتورها برای {symbol}: {str(e)}")
+        return {}
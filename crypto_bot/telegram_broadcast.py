@@ -0,0 +1,382 @@
+"""
+ثبت مشترکین گزارش‌های تلگرام و ارسال همگانی گزارش‌ها
+
+هر مشترک (چت) زبان، قالب پیام (html یا text) و موضوعات دلخواهش را دارد. هر گزارش
+فقط یک بار برای هر ترکیب زبان و قالب (variant) ساخته می‌شود و همان متن از طریق صندوق
+خروجی و صف ارسال تلگرام برای همه مشترکین آن variant قرار می‌گیرد؛ بنابراین هزینه ساخت گزارش
+به تعداد variant ها وابسته است، نه تعداد مشترکین. وضعیت ارسال برای هر گیرنده
+جداگانه ثبت می‌شود.
+"""
+
+import hashlib
+import html
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple, Union
+
+from crypto_bot.language_manager import DEFAULT_LANGUAGE
+from crypto_bot.telegram_outbox import telegram_outbox, is_permanent_failure
+
+logger = logging.getLogger(__name__)
+
+# فایل ذخیره مشترکین
+SUBSCRIPTIONS_FILE = os.path.join("data", "telegram_subscriptions.json")
+
+# موضوعات گزارش قابل اشتراک
+TOPICS = ('price_report', 'system_report', 'technical_analysis', 'trading_signals', 'crypto_news')
+
+# قالب‌های پیام: html (با قالب‌بندی تلگرام) یا text (متن ساده)
+FORMATS = ('html', 'text')
+
+# تعداد ارسال‌های همگانی اخیر نگه‌داری شده برای گزارش وضعیت
+BROADCAST_HISTORY = 20
+
+# کد خطای تلگرام برای چتی که بات را مسدود کرده یا از گروه حذف شده است
+BLOCKED_STATUS = 403
+
+# بازه زمانی کلید یکتای پیام‌ها؛ یک گزارش یکسان در این مدت فقط یک بار به هر چت ارسال می‌شود (ثانیه)
+BROADCAST_DEDUP_WINDOW = 60
+
+
+def _to_plain_text(text: str, parse_mode: Optional[str]) -> str:
+    """
+    حذف قالب‌بندی HTML یا Markdown تلگرام
+
+    Args:
+        text: متن پیام
+        parse_mode: حالت پارس متن
+
+    Returns:
+        str: متن ساده
+    """
+    if parse_mode == 'HTML':
+        text = re.sub(r'<a\s+href="([^"]*)"[^>]*>(.*?)</a>', r'\2 (\1)', text, flags=re.S)
+        return html.unescape(re.sub(r'<[^>]+>', '', text))
+    if parse_mode and parse_mode.startswith('Markdown'):
+        text = re.sub(r'\[([^\]]*)\]\(([^)]*)\)', r'\1 (\2)', text)
+        return re.sub(r'(?<!\\)[*_`]', '', text).replace('\\', '')
+    return text
+
+
+class SubscriptionRegistry:
+    """
+    ثبت مشترکین گزارش‌ها (ذخیره شده در فایل JSON)
+    """
+
+    def __init__(self, path: str = SUBSCRIPTIONS_FILE):
+        """
+        مقداردهی اولیه
+
+        Args:
+            path: مسیر فایل ذخیره مشترکین
+        """
+        self.path = path
+        self._subscribers: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._loaded = self._load()
+
+    def _load(self) -> bool:
+        """بارگذاری مشترکین از فایل"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._subscribers = json.load(f)
+            logger.info(f"Loaded {len(self._subscribers)} Telegram subscribers from {self.path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading Telegram subscribers from {self.path}: {str(e)}")
+            return False
+
+    def _save_locked(self) -> None:
+        """ذخیره اتمیک مشترکین در فایل"""
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._subscribers, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving Telegram subscribers: {str(e)}")
+
+    def seed(self, chat_ids: Iterable) -> None:
+        """
+        ثبت مشترکین پیش‌فرض، فقط اگر هنوز فایل مشترکین وجود نداشته باشد
+
+        Args:
+            chat_ids: شناسه چت‌های پیش‌فرض
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        for chat_id in chat_ids:
+            if chat_id:
+                self.subscribe(chat_id)
+
+    def subscribe(self, chat_id, language: Optional[str] = None, fmt: str = 'html',
+                  topics: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        ثبت یا بروزرسانی اشتراک یک چت
+
+        Args:
+            chat_id: شناسه چت
+            language: زبان گزارش‌ها (پیش‌فرض: زبان پیش‌فرض برنامه)
+            fmt: قالب پیام ("html" یا "text")
+            topics: موضوعات گزارش (None یعنی همه موضوعات)
+
+        Returns:
+            Dict[str, Any]: اطلاعات اشتراک
+
+        Raises:
+            ValueError: اگر قالب یا موضوع نامعتبر باشد
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Format must be one of {FORMATS}")
+        if topics is not None and (not isinstance(topics, (list, tuple, set))
+                                   or not all(isinstance(topic, str) for topic in topics)):
+            raise ValueError("Topics must be a list of topic names")
+        topics = sorted(set(topics)) if topics else []
+        unknown = set(topics) - set(TOPICS)
+        if unknown:
+            raise ValueError(f"Unknown topics: {', '.join(sorted(unknown))}")
+
+        key = str(chat_id)
+        with self._lock:
+            subscriber = self._subscribers.get(key, {'chat_id': chat_id, 'created_at': time.time()})
+            subscriber.update({
+                'language': language or subscriber.get('language') or DEFAULT_LANGUAGE,
+                'format': fmt,
+                'topics': topics,
+                'active': True
+            })
+            self._subscribers[key] = subscriber
+            self._save_locked()
+            return dict(subscriber)
+
+    def ensure_subscribed(self, chat_id) -> Dict[str, Any]:
+        """
+        ثبت اشتراک پیش‌فرض برای چت جدید، یا فعال کردن دوباره اشتراک موجود با حفظ تنظیمات آن
+
+        Args:
+            chat_id: شناسه چت
+
+        Returns:
+            Dict[str, Any]: اطلاعات اشتراک
+        """
+        with self._lock:
+            subscriber = self._subscribers.get(str(chat_id))
+            if subscriber is not None:
+                if not subscriber.get('active', True):
+                    subscriber['active'] = True
+                    subscriber.pop('deactivated_reason', None)
+                    self._save_locked()
+                return dict(subscriber)
+        return self.subscribe(chat_id)
+
+    def unsubscribe(self, chat_id) -> bool:
+        """
+        حذف اشتراک یک چت
+
+        Args:
+            chat_id: شناسه چت
+
+        Returns:
+            bool: اگر اشتراک وجود داشته باشد
+        """
+        with self._lock:
+            if self._subscribers.pop(str(chat_id), None) is None:
+                return False
+            self._save_locked()
+            return True
+
+    def deactivate(self, chat_id, reason: str) -> None:
+        """
+        غیرفعال کردن اشتراک (مثلاً پس از مسدود شدن بات)
+
+        Args:
+            chat_id: شناسه چت
+            reason: دلیل غیرفعال شدن
+        """
+        with self._lock:
+            subscriber = self._subscribers.get(str(chat_id))
+            if subscriber is None or not subscriber.get('active', True):
+                return
+            subscriber['active'] = False
+            subscriber['deactivated_reason'] = reason
+            self._save_locked()
+        logger.warning(f"Telegram subscription for {chat_id} deactivated: {reason}")
+
+    def get_subscribers(self, topic: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        دریافت مشترکین فعال
+
+        Args:
+            topic: موضوع گزارش برای فیلتر (اختیاری)
+
+        Returns:
+            List[Dict[str, Any]]: اطلاعات مشترکین
+        """
+        with self._lock:
+            return [
+                dict(subscriber) for subscriber in self._subscribers.values()
+                if subscriber.get('active', True)
+                and (topic is None or not subscriber.get('topics') or topic in subscriber['topics'])
+            ]
+
+    def variants(self, topic: str) -> Dict[Tuple[str, str], List[Any]]:
+        """
+        گروه‌بندی مشترکین یک موضوع بر اساس زبان و قالب
+
+        Args:
+            topic: موضوع گزارش
+
+        Returns:
+            Dict[Tuple[str, str], List[Any]]: (زبان، قالب) -> شناسه چت‌ها
+        """
+        groups: Dict[Tuple[str, str], List[Any]] = {}
+        for subscriber in self.get_subscribers(topic):
+            variant = (subscriber.get('language') or DEFAULT_LANGUAGE, subscriber.get('format', 'html'))
+            groups.setdefault(variant, []).append(subscriber['chat_id'])
+        return groups
+
+
+class BroadcastResult:
+    """
+    وضعیت یک ارسال همگانی به تفکیک گیرنده
+    """
+
+    def __init__(self, broadcast_id: int, topic: str):
+        self.id = broadcast_id
+        self.topic = topic
+        self.created_at = time.time()
+        self.variants = 0
+        self.recipients: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def set_status(self, chat_id, status: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.recipients[str(chat_id)] = {'status': status, 'error': error}
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            recipients = {chat_id: dict(state) for chat_id, state in self.recipients.items()}
+        counts: Dict[str, int] = {}
+        for state in recipients.values():
+            counts[state['status']] = counts.get(state['status'], 0) + 1
+        return {
+            'id': self.id,
+            'topic': self.topic,
+            'created_at': self.created_at,
+            'variants': self.variants,
+            'counts': counts,
+            'recipients': recipients
+        }
+
+
+class ReportBroadcaster:
+    """
+    ساخت یک‌باره هر variant گزارش و ارسال آن به همه مشترکین
+    """
+
+    def __init__(self, registry: SubscriptionRegistry):
+        """
+        مقداردهی اولیه
+
+        Args:
+            registry: ثبت مشترکین
+        """
+        self.registry = registry
+        self._ids = itertools.count(1)
+        self._history: deque = deque(maxlen=BROADCAST_HISTORY)
+        self._lock = threading.Lock()
+
+    def broadcast(self, topic: str, render: Union[str, Callable[[str], str]], parse_mode: Optional[str] = None,
+                  disable_web_page_preview: bool = True,
+                  on_done: Optional[Callable[[bool, Optional[str]], None]] = None) -> BroadcastResult:
+        """
+        ارسال گزارش به همه مشترکین یک موضوع
+
+        Args:
+            topic: موضوع گزارش
+            render: متن گزارش، یا تابعی که متن را برای یک زبان می‌سازد
+            parse_mode: حالت پارس متن ساخته شده ("HTML" یا "Markdown")
+            disable_web_page_preview: غیرفعال کردن پیش‌نمایش لینک‌ها
+            on_done: تابعی که پس از نتیجه نهایی هر گیرنده با (موفقیت، پیام خطا) فراخوانی می‌شود
+
+        Returns:
+            BroadcastResult: وضعیت ارسال به تفکیک گیرنده
+        """
+        result = BroadcastResult(next(self._ids), topic)
+        with self._lock:
+            self._history.append(result)
+
+        rendered: Dict[str, str] = {}
+        for (language, fmt), chat_ids in self.registry.variants(topic).items():
+            try:
+                if language not in rendered:
+                    rendered[language] = render(language) if callable(render) else render
+                text = rendered[language]
+                variant_mode = parse_mode
+                if fmt == 'text':
+                    text = _to_plain_text(text, parse_mode)
+                    variant_mode = None
+            except Exception as e:
+                logger.error(f"Error rendering {topic} for {language}/{fmt}: {str(e)}")
+                for chat_id in chat_ids:
+                    result.set_status(chat_id, 'failed', f"render error: {str(e)}")
+                continue
+
+            result.variants += 1
+            digest = hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+            window = int(result.created_at // BROADCAST_DEDUP_WINDOW)
+            for chat_id in chat_ids:
+                result.set_status(chat_id, 'queued')
+                # گزارش یکسانی که در بازه قبلی و کمتر از BROADCAST_DEDUP_WINDOW ثانیه پیش ثبت شده
+                # (مثلاً 12:00:59 و 12:01:01) هم تکراری است
+                future = telegram_outbox.send_message(chat_id, text, parse_mode=variant_mode,
+                                                      disable_web_page_preview=disable_web_page_preview,
+                                                      key=f"{topic}:{chat_id}:{digest}:{window}",
+                                                      recent_key=f"{topic}:{chat_id}:{digest}:{window - 1}",
+                                                      recent_window=BROADCAST_DEDUP_WINDOW,
+                                                      on_done=on_done)
+                future.add_done_callback(lambda f, chat_id=chat_id: self._record(result, chat_id, f))
+
+        logger.info(f"Broadcast {result.id} ({topic}) queued for {len(result.recipients)} recipients "
+                    f"in {result.variants} variants")
+        return result
+
+    def _record(self, result: BroadcastResult, chat_id, future) -> None:
+        """ثبت نتیجه ارسال به یک گیرنده"""
+        error = future.exception()
+        if error is None:
+            result.set_status(chat_id, 'sent')
+            return
+        if not is_permanent_failure(error):
+            # پیام در صندوق خروجی می‌ماند و بعداً دوباره ارسال می‌شود
+            result.set_status(chat_id, 'deferred', str(error))
+            return
+        result.set_status(chat_id, 'failed', str(error))
+        if getattr(error, 'status_code', None) == BLOCKED_STATUS:
+            self.registry.deactivate(chat_id, str(error))
+
+    def get_history(self) -> List[Dict[str, Any]]:
+        """
+        دریافت وضعیت ارسال‌های همگانی اخیر
+
+        Returns:
+            List[Dict[str, Any]]: وضعیت ارسال‌ها (جدیدترین در ابتدا)
+        """
+        with self._lock:
+            history = list(self._history)
+        return [result.to_dict() for result in reversed(history)]
+
+
+# ثبت مشترک مشترکین و ارسال‌کننده همگانی برای کل برنامه
+subscription_registry = SubscriptionRegistry()
+report_broadcaster = ReportBroadcaster(subscription_registry)
@@ -0,0 +1,468 @@
+"""
+صندوق خروجی ماندگار پیام‌های تلگرام (Outbox)
+
+هر پیام قبل از قرار گرفتن در صف ارسال، در یک پایگاه داده SQLite (حالت WAL) با یک
+کلید یکتا (idempotency key) ثبت می‌شود. پس از تایید تلگرام، محتوای پیام پاک شده و
+فقط کلید آن برای جلوگیری از ارسال تکراری نگه داشته می‌شود؛ کلیدهای قدیمی و پیام‌های
+منقضی در فشرده‌سازی دوره‌ای حذف می‌شوند.
+
+اگر برنامه در میانه ارسال متوقف شود، پیام‌های تایید نشده هنگام راه‌اندازی دوباره در
+صف قرار می‌گیرند. اگر تلگرام پس از همه تلاش‌های صف در دسترس نباشد، پیام دور ریخته
+نمی‌شود و با تاخیر نمایی در دسته‌های محدود دوباره ارسال می‌شود؛ بنابراین ارسال حداقل
+یک بار (at-least-once) تضمین می‌شود، بدون اینکه تلاش‌های مجدد ترد زمان‌بند را مسدود
+کنند یا در زمان قطعی تلگرام سیل درخواست ایجاد شود.
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, Optional, Set, Tuple
+
+from crypto_bot.telegram_queue import telegram_queue, TELEGRAM_MAX_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+# مسیر پایگاه داده صندوق خروجی
+OUTBOX_DB_FILE = os.environ.get("TELEGRAM_OUTBOX_DB_FILE", "data/telegram_outbox.db")
+
+# فاصله بررسی پیام‌های معوق و فشرده‌سازی (ثانیه)
+OUTBOX_REPLAY_INTERVAL = 30
+
+# بیشترین تعداد پیام معوق که در هر دور دوباره در صف قرار می‌گیرد
+OUTBOX_REPLAY_BATCH = 50
+
+# تاخیر پایه و بیشینه ارسال دوباره پیام‌های معوق (ثانیه)
+OUTBOX_RETRY_BASE = 60
+OUTBOX_RETRY_MAX = 1800
+
+# مهلت در اختیار بودن پیام در صف ارسال؛ پس از آن پیام تایید نشده (مثلاً به دلیل توقف
+# برنامه یا پردازه دیگر) دوباره ارسال می‌شود (ثانیه)
+OUTBOX_LEASE = 300
+
+# عمر پیام‌های ارسال نشده؛ پس از آن پیام منقضی می‌شود (ثانیه)
+OUTBOX_MAX_AGE = int(os.environ.get("TELEGRAM_OUTBOX_MAX_AGE", str(24 * 3600)))
+
+# مدت نگهداری کلید پیام‌های ارسال شده برای جلوگیری از ارسال تکراری (ثانیه)
+OUTBOX_DEDUP_TTL = 24 * 3600
+
+# وضعیت‌های پیام در صندوق خروجی
+PENDING = 'pending'
+SENT = 'sent'
+FAILED = 'failed'
+
+
+def is_permanent_failure(error: BaseException) -> bool:
+    """
+    بررسی اینکه آیا خطای ارسال دائمی است (تلاش دوباره فایده‌ای ندارد)
+
+    Args:
+        error: خطای ارسال
+
+    Returns:
+        bool: True برای خطاهای 4xx به جز 429
+    """
+    status_code = getattr(error, 'status_code', None)
+    return status_code is not None and 400 <= status_code < 500 and status_code != 429
+
+
+class TelegramOutbox:
+    """
+    صندوق خروجی ماندگار در جلوی صف ارسال تلگرام
+    """
+
+    def __init__(self, db_path: str = OUTBOX_DB_FILE, delivery_queue=telegram_queue):
+        """
+        مقداردهی اولیه
+
+        Args:
+            db_path: مسیر فایل SQLite (یا :memory:)
+            delivery_queue: صف ارسال پیام‌ها
+        """
+        self.db_path = db_path
+        self.delivery_queue = delivery_queue
+        self._lock = threading.Lock()
+        self._dispatched: Set[int] = set()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.running = False
+        self.stats = {'stored': 0, 'duplicates': 0, 'acked': 0, 'failed': 0, 'deferred': 0,
+                      'replayed': 0, 'expired': 0}
+
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                method TEXT NOT NULL,
+                chat_id TEXT NOT NULL,
+                params TEXT,
+                files BLOB,
+                max_attempts INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                replays INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (status, next_attempt_at);
+        """)
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # چرخه حیات
+    # ------------------------------------------------------------------
+
+    def start(self) -> bool:
+        """
+        ارسال دوباره پیام‌های تایید نشده و شروع ترد بررسی پیام‌های معوق
+
+        Returns:
+            bool: وضعیت شروع
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self.running = True
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="telegram-outbox", daemon=True)
+        self._thread.start()
+        logger.info(f"Telegram outbox started ({self.db_path})")
+        return True
+
+    def stop(self) -> bool:
+        """
+        توقف ترد بررسی؛ پیام‌های تایید نشده در پایگاه داده باقی می‌مانند
+
+        Returns:
+            bool: وضعیت توقف
+        """
+        with self._lock:
+            if not self.running:
+                return False
+            self.running = False
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        logger.info("Telegram outbox stopped")
+        return True
+
+    def _run(self) -> None:
+        """حلقه ترد بررسی: ابتدا پیام‌های باقی‌مانده از اجرای قبلی، سپس پیام‌های معوق"""
+        while not self._stop_event.is_set():
+            try:
+                self.replay()
+                self.compact()
+            except Exception as e:
+                logger.error(f"Error in Telegram outbox loop: {str(e)}")
+            self._stop_event.wait(OUTBOX_REPLAY_INTERVAL)
+
+    # ------------------------------------------------------------------
+    # افزودن پیام
+    # ------------------------------------------------------------------
+
+    def enqueue(self, method: str, chat_id, params: Dict[str, Any], files: Optional[Dict[str, Tuple]] = None,
+                key: Optional[str] = None, max_attempts: int = TELEGRAM_MAX_ATTEMPTS,
+                on_done: Optional[Callable[[bool, Optional[str]], None]] = None,
+                recent_key: Optional[str] = None, recent_window: float = 0) -> Future:
+        """
+        ثبت پیام در صندوق خروجی و قرار دادن آن در صف ارسال
+
+        Args:
+            method: متد Bot API (مثلاً sendMessage)
+            chat_id: شناسه چت
+            params: پارامترهای درخواست (بدون chat_id)
+            files: فایل‌های ارسالی به صورت {نام: (نام فایل، محتوا)}
+            key: کلید یکتای پیام؛ پیامی با کلید تکراری دوباره ارسال نمی‌شود (پیش‌فرض: کلید تصادفی)
+            max_attempts: بیشترین تعداد تلاش صف در هر دور ارسال
+            on_done: تابعی که پس از نتیجه هر دور ارسال با (موفقیت، پیام خطا) فراخوانی می‌شود
+            recent_key: کلید دیگری که اگر در recent_window ثانیه اخیر ثبت شده باشد، این پیام تکراری است
+            recent_window: بازه زمانی بررسی recent_key (ثانیه)
+
+        Returns:
+            Future: نتیجه ارسال (پاسخ Bot API یا DeliveryError)
+        """
+        if not self.running:
+            self.start()
+
+        key = key or uuid.uuid4().hex
+        now = time.time()
+        stored_params: Dict[str, Any] = params
+        blob = None
+        if files:
+            # محتوای فایل‌ها پشت سر هم به صورت باینری و نام و اندازه آن‌ها همراه پارامترها ذخیره می‌شود
+            stored_params = {
+                'params': params,
+                'files': [[name, filename, len(content)] for name, (filename, content) in files.items()]
+            }
+            blob = b''.join(content for _, content in files.values())
+        with self._lock:
+            if recent_key is not None and self._conn.execute(
+                    "SELECT 1 FROM outbox WHERE idempotency_key = ? AND created_at > ?",
+                    (recent_key, now - recent_window)).fetchone():
+                cursor = None
+            else:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO outbox (idempotency_key, method, chat_id, params, files, max_attempts, "
+                    "status, next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, method, json.dumps(chat_id), json.dumps(stored_params), blob, max_attempts, PENDING,
+                     now + OUTBOX_LEASE, now, now)
+                )
+                self._conn.commit()
+            if cursor is None or cursor.rowcount == 0:
+                self.stats['duplicates'] += 1
+                logger.info(f"Skipping duplicate Telegram {method} to {chat_id} (key {key})")
+                future: Future = Future()
+                future.set_result(None)
+                return future
+            row_id = cursor.lastrowid
+            self.stats['stored'] += 1
+            self._dispatched.add(row_id)
+
+        return self._dispatch(row_id, method, chat_id, params, files, max_attempts, on_done)
+
+    def send_message(self, chat_id, text: str, parse_mode: Optional[str] = None,
+                     disable_web_page_preview: bool = True, **kwargs) -> Future:
+        """
+        ثبت و ارسال پیام متنی
+
+        Args:
+            chat_id: شناسه چت
+            text: متن پیام
+            parse_mode: حالت پارس ("HTML"، "Markdown" یا "MarkdownV2")
+            disable_web_page_preview: غیرفعال کردن پیش‌نمایش لینک‌ها
+            **kwargs: پارامترهای enqueue (key، max_attempts، on_done، recent_key، recent_window)
+
+        Returns:
+            Future: نتیجه ارسال
+        """
+        params = {'text': text, 'disable_web_page_preview': disable_web_page_preview}
+        if parse_mode:
+            params['parse_mode'] = parse_mode
+        return self.enqueue('sendMessage', chat_id, params, **kwargs)
+
+    def send_photo(self, chat_id, photo: bytes, caption: Optional[str] = None, parse_mode: Optional[str] = None,
+                   filename: str = "chart.png", **kwargs) -> Future:
+        """
+        ثبت و ارسال تصویر
+
+        Args:
+            chat_id: شناسه چت
+            photo: محتوای تصویر
+            caption: توضیحات تصویر
+            parse_mode: حالت پارس توضیحات
+            filename: نام فایل ارسالی
+            **kwargs: پارامترهای enqueue (key، max_attempts، on_done، recent_key، recent_window)
+
+        Returns:
+            Future: نتیجه ارسال
+        """
+        params = {}
+        if caption:
+            params['caption'] = caption
+            if parse_mode:
+                params['parse_mode'] = parse_mode
+        return self.enqueue('sendPhoto', chat_id, params, files={'photo': (filename, bytes(photo))}, **kwargs)
+
+    # ------------------------------------------------------------------
+    # ارسال و تایید
+    # ------------------------------------------------------------------
+
+    def _dispatch(self, row_id: int, method: str, chat_id, params: Dict[str, Any],
+                  files: Optional[Dict[str, Tuple]], max_attempts: int,
+                  on_done: Optional[Callable[[bool, Optional[str]], None]] = None) -> Future:
+        """قرار دادن پیام ثبت شده در صف ارسال"""
+        future = self.delivery_queue.enqueue(method, chat_id, params, files=files,
+                                             max_attempts=max_attempts, on_done=on_done)
+        future.add_done_callback(lambda f: self._settle(row_id, f))
+        return future
+
+    def _settle(self, row_id: int, future: Future) -> None:
+        """ثبت نتیجه دور ارسال: تایید، شکست دائمی یا تعویق"""
+        error = future.exception()
+        now = time.time()
+        with self._lock:
+            self._dispatched.discard(row_id)
+            try:
+                if error is None:
+                    # پس از تایید فقط کلید پیام نگه داشته می‌شود
+                    self._conn.execute(
+                        "UPDATE outbox SET status = ?, params = NULL, files = NULL, last_error = NULL, "
+                        "updated_at = ? WHERE id = ?", (SENT, now, row_id)
+                    )
+                    self.stats['acked'] += 1
+                elif is_permanent_failure(error):
+                    self._conn.execute(
+                        "UPDATE outbox SET status = ?, params = NULL, files = NULL, last_error = ?, "
+                        "updated_at = ? WHERE id = ?", (FAILED, str(error), now, row_id)
+                    )
+                    self.stats['failed'] += 1
+                else:
+                    row = self._conn.execute("SELECT replays FROM outbox WHERE id = ?", (row_id,)).fetchone()
+                    replays = row[0] if row else 0
+                    delay = min(OUTBOX_RETRY_BASE * 2 ** replays, OUTBOX_RETRY_MAX)
+                    self._conn.execute(
+                        "UPDATE outbox SET replays = replays + 1, next_attempt_at = ?, last_error = ?, "
+                        "updated_at = ? WHERE id = ?", (now + delay, str(error), now, row_id)
+                    )
+                    self.stats['deferred'] += 1
+                    logger.warning(f"Telegram message {row_id} deferred for {delay} seconds: {error}")
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error updating Telegram outbox entry {row_id}: {str(e)}")
+
+    def _decode(self, params_json: str, blob: Optional[bytes]) -> Tuple[Dict[str, Any], Optional[Dict[str, Tuple]]]:
+        """بازسازی پارامترها و فایل‌های یک پیام ذخیره شده"""
+        params = json.loads(params_json)
+        if blob is None:
+            return params, None
+        files = {}
+        offset = 0
+        for name, filename, size in params['files']:
+            files[name] = (filename, blob[offset:offset + size])
+            offset += size
+        return params['params'], files
+
+    def replay(self, limit: int = OUTBOX_REPLAY_BATCH) -> int:
+        """
+        قرار دادن دوباره پیام‌های تایید نشده‌ای که زمان ارسال آن‌ها رسیده است در صف
+
+        Args:
+            limit: بیشترین تعداد پیام در این دور
+
+        Returns:
+            int: تعداد پیام‌های قرار گرفته در صف
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, method, chat_id, params, files, max_attempts FROM outbox "
+                "WHERE status = ? AND next_attempt_at <= ? ORDER BY id",
+                (PENDING, now)
+            ).fetchall()
+            due = [row for row in rows if row[0] not in self._dispatched][:limit]
+            self._dispatched.update(row[0] for row in due)
+            # پیام‌های برداشته شده تا پایان مهلت در اختیار این پردازه می‌مانند
+            self._conn.executemany(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id = ?",
+                [(now + OUTBOX_LEASE, row[0]) for row in due]
+            )
+            self._conn.commit()
+
+        for row_id, method, chat_id, params_json, blob, max_attempts in due:
+            try:
+                params, files = self._decode(params_json, blob)
+                self._dispatch(row_id, method, json.loads(chat_id), params, files, max_attempts)
+            except Exception as e:
+                logger.error(f"Error replaying Telegram outbox entry {row_id}: {str(e)}")
+                with self._lock:
+                    self._dispatched.discard(row_id)
+        if due:
+            with self._lock:
+                self.stats['replayed'] += len(due)
+            logger.info(f"Replayed {len(due)} pending Telegram messages from outbox")
+        return len(due)
+
+    def compact(self) -> int:
+        """
+        حذف کلید پیام‌های قدیمی ارسال شده و پیام‌های منقضی
+
+        Returns:
+            int: تعداد ردیف‌های حذف شده
+        """
+        now = time.time()
+        with self._lock:
+            expired = self._conn.execute(
+                "UPDATE outbox SET status = ?, params = NULL, files = NULL, last_error = 'expired', updated_at = ? "
+                "WHERE status = ? AND created_at < ?",
+                (FAILED, now, PENDING, now - OUTBOX_MAX_AGE)
+            ).rowcount
+            removed = self._conn.execute(
+                "DELETE FROM outbox WHERE status != ? AND updated_at < ?",
+                (PENDING, now - OUTBOX_DEDUP_TTL)
+            ).rowcount
+            self._conn.commit()
+            if removed:
+                # کوچک کردن فایل WAL پس از حذف ردیف‌ها
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.stats['expired'] += expired
+        if expired:
+            logger.warning(f"Expired {expired} undelivered Telegram messages older than {OUTBOX_MAX_AGE} seconds")
+        return removed
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        دریافت وضعیت صندوق خروجی
+
+        Returns:
+            Dict[str, Any]: تعداد پیام‌ها به تفکیک وضعیت و آمار
+        """
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+            oldest = self._conn.execute(
+                "SELECT MIN(created_at) FROM outbox WHERE status = ?", (PENDING,)
+            ).fetchone()[0]
+            return {
+                'running': self.running,
+                'pending': counts.get(PENDING, 0),
+                'sent': counts.get(SENT, 0),
+                'failed': counts.get(FAILED, 0),
+                'in_queue': len(self._dispatched),
+                'oldest_pending_seconds': round(time.time() - oldest, 1) if oldest else 0.0,
+                **self.stats
+            }
+
+    def close(self) -> None:
+        """بستن اتصال پایگاه داده"""
+        self.stop()
+        with self._lock:
+            self._conn.close()
+
+
+def create_telegram_outbox(db_path: str = OUTBOX_DB_FILE) -> TelegramOutbox:
+    """
+    ساخت صندوق خروجی و ثبت توقف آن هنگام خروج برنامه
+
+    Args:
+        db_path: مسیر فایل SQLite
+
+    Returns:
+        TelegramOutbox: صندوق خروجی
+    """
+    outbox = TelegramOutbox(db_path)
+    atexit.register(outbox.stop)
+    return outbox
+
+
+# صندوق خروجی مشترک پیام‌های تلگرام برای کل برنامه
+telegram_outbox = create_telegram_outbox()
+
+
+def start_telegram_outbox() -> bool:
+    """
+    شروع صندوق خروجی و ارسال دوباره پیام‌های باقی‌مانده از اجرای قبلی
+
+    Returns:
+        bool: وضعیت شروع
+    """
+    return telegram_outbox.start()
+
+
+def stop_telegram_outbox() -> bool:
+    """
+    توقف صندوق خروجی
+
+    Returns:
+        bool: وضعیت توقف
+    """
+    return telegram_outbox.stop()
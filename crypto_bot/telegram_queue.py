@@ -0,0 +1,442 @@
+"""
+صف ارسال پیام‌های تلگرام
+
+ارسال‌کننده‌ها پیام را در صف قرار داده و بلافاصله برمی‌گردند؛ چند ترد کارگر پیام‌ها
+را از طریق Bot API و نشست HTTP مشترک (اتصال keep-alive) ارسال می‌کنند. محدودیت‌های
+تلگرام با token bucket اعمال می‌شود: یک bucket سراسری (حدود ۳۰ پیام در ثانیه) و
+یک bucket برای هر چت (یک پیام در ثانیه برای چت خصوصی و ۲۰ پیام در دقیقه برای
+گروه‌ها). پیامی که هنوز نوبتش نرسیده به جای مسدود کردن کارگر، برای زمان مناسب
+دوباره زمان‌بندی می‌شود. خطاهای گذرا با تاخیر نمایی و پاسخ 429 با مقدار
+retry_after تلگرام دوباره تلاش می‌شوند.
+"""
+
+import atexit
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from crypto_bot.http_client import http_client, redact_secrets
+from crypto_bot.quota_manager import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# تعداد ترد‌های کارگر ارسال
+TELEGRAM_WORKERS = int(os.environ.get("TELEGRAM_WORKERS", "4"))
+
+# بیشترین تعداد تلاش برای هر پیام
+TELEGRAM_MAX_ATTEMPTS = int(os.environ.get("TELEGRAM_MAX_ATTEMPTS", "5"))
+
+# تاخیر پایه و بیشینه تلاش مجدد (ثانیه)
+TELEGRAM_BACKOFF = 1.0
+TELEGRAM_MAX_BACKOFF = 60.0
+
+# محدودیت‌های تلگرام: (توکن در ثانیه، ظرفیت)
+GLOBAL_RATE = (30.0, 30)
+PRIVATE_CHAT_RATE = (1.0, 3)
+GROUP_CHAT_RATE = (20 / 60, 3)
+
+# بیشترین تعداد پیام در انتظار؛ پس از آن پیام جدید رد می‌شود
+TELEGRAM_QUEUE_SIZE = 10000
+
+# مهلت ارسال پیام‌های باقی‌مانده هنگام خروج برنامه (ثانیه)
+SHUTDOWN_TIMEOUT = 10
+
+API_URL = "https://api.telegram.org/bot{token}/{method}"
+
+
+class DeliveryError(Exception):
+    """ارسال پیام پس از همه تلاش‌ها ناموفق بود"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class DeliveryJob:
+    """
+    یک پیام در صف ارسال
+    """
+
+    def __init__(self, method: str, chat_id, params: Dict[str, Any], files: Optional[Dict[str, Tuple]] = None,
+                 max_attempts: int = TELEGRAM_MAX_ATTEMPTS, on_done: Optional[Callable[[bool, Optional[str]], None]] = None):
+        self.method = method
+        self.chat_id = chat_id
+        self.params = params
+        self.files = files
+        self.max_attempts = max_attempts
+        self.on_done = on_done
+        self.attempts = 0
+        self.not_before = 0.0
+        # توکن bucket چت برای این پیام قبلاً رزرو شده است
+        self.chat_reserved = False
+        self.created_at = time.time()
+        self.future: Future = Future()
+
+
+def _is_group(chat_id) -> bool:
+    """شناسه گروه‌ها و کانال‌ها در تلگرام منفی است"""
+    try:
+        return int(chat_id) < 0
+    except (TypeError, ValueError):
+        # نام کاربری کانال (@channel)
+        return True
+
+
+class TelegramDeliveryQueue:
+    """
+    صف ارسال پیام‌های تلگرام با ترد‌های کارگر و محدودیت نرخ
+    """
+
+    def __init__(self, workers: int = TELEGRAM_WORKERS, max_size: int = TELEGRAM_QUEUE_SIZE):
+        """
+        مقداردهی اولیه
+
+        Args:
+            workers: تعداد ترد‌های کارگر
+            max_size: بیشترین تعداد پیام در انتظار
+        """
+        self.workers = workers
+        self.max_size = max_size
+        self._heap: List[Tuple[float, int, DeliveryJob]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._global_bucket = TokenBucket(*GLOBAL_RATE)
+        self._chat_buckets: Dict[Any, TokenBucket] = {}
+        self._bucket_lock = threading.Lock()
+        self._in_flight = 0
+        self.running = False
+        self.stats = {'enqueued': 0, 'sent': 0, 'failed': 0, 'retried': 0, 'rate_limited': 0, 'rejected': 0}
+
+    # ------------------------------------------------------------------
+    # چرخه حیات
+    # ------------------------------------------------------------------
+
+    def start(self) -> bool:
+        """
+        شروع ترد‌های کارگر
+
+        Returns:
+            bool: وضعیت شروع
+        """
+        with self._cond:
+            if self.running:
+                return False
+            self.running = True
+            self._threads = [
+                threading.Thread(target=self._worker, name=f"telegram-sender-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Telegram delivery queue started with {self.workers} workers")
+        return True
+
+    def stop(self, timeout: float = SHUTDOWN_TIMEOUT) -> bool:
+        """
+        توقف کارگرها پس از ارسال پیام‌های آماده (حداکثر تا timeout)
+
+        Args:
+            timeout: مهلت ارسال پیام‌های باقی‌مانده (ثانیه)
+
+        Returns:
+            bool: وضعیت توقف
+        """
+        if not self.running:
+            return False
+        self.flush(timeout)
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        logger.info("Telegram delivery queue stopped")
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        انتظار تا خالی شدن صف
+
+        Args:
+            timeout: بیشترین زمان انتظار (ثانیه)
+
+        Returns:
+            bool: اگر همه پیام‌ها پردازش شده باشند
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._heap or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # ------------------------------------------------------------------
+    # افزودن پیام
+    # ------------------------------------------------------------------
+
+    def enqueue(self, method: str, chat_id, params: Dict[str, Any], files: Optional[Dict[str, Tuple]] = None,
+                max_attempts: int = TELEGRAM_MAX_ATTEMPTS,
+                on_done: Optional[Callable[[bool, Optional[str]], None]] = None) -> Future:
+        """
+        افزودن یک درخواست Bot API به صف
+
+        Args:
+            method: متد Bot API (مثلاً sendMessage)
+            chat_id: شناسه چت
+            params: پارامترهای درخواست (بدون chat_id)
+            files: فایل‌های ارسالی به صورت {نام: (نام فایل، محتوا)}
+            max_attempts: بیشترین تعداد تلاش
+            on_done: تابعی که پس از ارسال یا شکست نهایی با (موفقیت، پیام خطا) فراخوانی می‌شود
+
+        Returns:
+            Future: نتیجه ارسال (پاسخ Bot API یا DeliveryError)
+        """
+        job = DeliveryJob(method, chat_id, dict(params, chat_id=chat_id), files, max_attempts, on_done)
+        if not self.running:
+            self.start()
+
+        with self._cond:
+            if len(self._heap) >= self.max_size:
+                self.stats['rejected'] += 1
+                rejected = True
+            else:
+                rejected = False
+                self.stats['enqueued'] += 1
+                heapq.heappush(self._heap, (job.not_before, next(self._seq), job))
+                self._cond.notify()
+
+        if rejected:
+            self._finish(job, False, "Telegram delivery queue is full")
+        return job.future
+
+    def send_message(self, chat_id, text: str, parse_mode: Optional[str] = None,
+                     disable_web_page_preview: bool = True, **kwargs) -> Future:
+        """
+        افزودن پیام متنی به صف
+
+        Args:
+            chat_id: شناسه چت
+            text: متن پیام
+            parse_mode: حالت پارس ("HTML"، "Markdown" یا "MarkdownV2")
+            disable_web_page_preview: غیرفعال کردن پیش‌نمایش لینک‌ها
+            **kwargs: پارامترهای enqueue (max_attempts، on_done)
+
+        Returns:
+            Future: نتیجه ارسال
+        """
+        params = {'text': text, 'disable_web_page_preview': disable_web_page_preview}
+        if parse_mode:
+            params['parse_mode'] = parse_mode
+        return self.enqueue('sendMessage', chat_id, params, **kwargs)
+
+    def send_photo(self, chat_id, photo: bytes, caption: Optional[str] = None, parse_mode: Optional[str] = None,
+                   filename: str = "chart.png", **kwargs) -> Future:
+        """
+        افزودن تصویر به صف
+
+        Args:
+            chat_id: شناسه چت
+            photo: محتوای تصویر
+            caption: توضیحات تصویر
+            parse_mode: حالت پارس توضیحات
+            filename: نام فایل ارسالی
+            **kwargs: پارامترهای enqueue (max_attempts، on_done)
+
+        Returns:
+            Future: نتیجه ارسال
+        """
+        params = {}
+        if caption:
+            params['caption'] = caption
+            if parse_mode:
+                params['parse_mode'] = parse_mode
+        return self.enqueue('sendPhoto', chat_id, params, files={'photo': (filename, bytes(photo))}, **kwargs)
+
+    # ------------------------------------------------------------------
+    # کارگرها
+    # ------------------------------------------------------------------
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        with self._bucket_lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = TokenBucket(*(GROUP_CHAT_RATE if _is_group(chat_id) else PRIVATE_CHAT_RATE))
+                self._chat_buckets[chat_id] = bucket
+            return bucket
+
+    def _schedule(self, job: DeliveryJob, delay: float) -> None:
+        """زمان‌بندی دوباره پیام برای delay ثانیه بعد"""
+        job.not_before = time.monotonic() + delay
+        with self._cond:
+            heapq.heappush(self._heap, (job.not_before, next(self._seq), job))
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _next_job(self) -> Optional[DeliveryJob]:
+        with self._cond:
+            while self.running:
+                now = time.monotonic()
+                if self._heap and self._heap[0][0] <= now:
+                    _, _, job = heapq.heappop(self._heap)
+                    self._in_flight += 1
+                    return job
+                self._cond.wait(self._heap[0][0] - now if self._heap else None)
+        return None
+
+    def _worker(self) -> None:
+        """حلقه ترد کارگر"""
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                self._process(job)
+            except Exception as e:
+                error = redact_secrets(str(e))
+                logger.error(f"Unexpected error delivering Telegram message: {error}")
+                self._finish(job, False, error)
+                self._done_in_flight()
+
+    def _done_in_flight(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _process(self, job: DeliveryJob) -> None:
+        """ارسال یک پیام با رعایت محدودیت نرخ و زمان‌بندی تلاش مجدد"""
+        # سهمیه چت رزرو می‌شود؛ اگر نوبت پیام نرسیده باشد، کارگر آزاد می‌ماند
+        if not job.chat_reserved:
+            bucket = self._chat_bucket(job.chat_id)
+            with self._bucket_lock:
+                wait = bucket.reserve(max_wait=float('inf'))
+            job.chat_reserved = True
+            if wait > 0:
+                self._schedule(job, wait)
+                return
+
+        with self._bucket_lock:
+            wait = self._global_bucket.reserve(max_wait=float('inf'))
+        if wait > 0:
+            time.sleep(wait)
+
+        job.attempts += 1
+        token = os.environ.get("TELEGRAM_BOT_TOKEN")
+        if not token:
+            self._finish(job, False, "TELEGRAM_BOT_TOKEN not found")
+            self._done_in_flight()
+            return
+
+        url = API_URL.format(token=token, method=job.method)
+        status_code = None
+        retry_after = None
+        try:
+            if job.files:
+                response = http_client.post(url, data=job.params, files=job.files, timeout=30)
+            else:
+                response = http_client.post(url, json=job.params, timeout=10)
+            status_code = response.status_code
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            if status_code == 200 and body.get('ok', True):
+                self._finish(job, True, None, body.get('result'))
+                self._done_in_flight()
+                return
+            error = f"HTTP {status_code}: {body.get('description') or response.text[:200]}"
+            retry_after = (body.get('parameters') or {}).get('retry_after')
+        except Exception as e:
+            # پیام خطای اتصال شامل آدرس درخواست و در نتیجه توکن بات است
+            error = f"{type(e).__name__}: {redact_secrets(str(e))}"
+
+        if status_code == 429:
+            # محدودیت flood control: چت تا پایان retry_after متوقف می‌شود
+            delay = float(retry_after or TELEGRAM_BACKOFF * 2 ** job.attempts)
+            bucket = self._chat_bucket(job.chat_id)
+            with self._bucket_lock:
+                bucket.pause(delay)
+            with self._cond:
+                self.stats['rate_limited'] += 1
+        elif status_code is not None and 400 <= status_code < 500:
+            # خطاهای دائمی (مثلاً چت پیدا نشد یا بات مسدود شده است)
+            logger.error(f"Telegram rejected {job.method} to {job.chat_id}: {error}")
+            self._finish(job, False, error, status_code=status_code)
+            self._done_in_flight()
+            return
+        else:
+            delay = min(TELEGRAM_BACKOFF * 2 ** (job.attempts - 1), TELEGRAM_MAX_BACKOFF) * random.uniform(0.5, 1.5)
+
+        if job.attempts >= job.max_attempts:
+            logger.error(f"Giving up {job.method} to {job.chat_id} after {job.attempts} attempts: {error}")
+            self._finish(job, False, error, status_code=status_code)
+            self._done_in_flight()
+            return
+
+        logger.warning(f"Telegram {job.method} to {job.chat_id} failed ({error}), "
+                       f"retrying in {delay:.1f} seconds (attempt {job.attempts}/{job.max_attempts})")
+        with self._cond:
+            self.stats['retried'] += 1
+        # پیام پس از تاخیر دوباره سهمیه چت را رزرو می‌کند
+        job.chat_reserved = False
+        self._schedule(job, delay)
+
+    def _finish(self, job: DeliveryJob, success: bool, error: Optional[str], result: Any = None,
+                status_code: Optional[int] = None) -> None:
+        """ثبت نتیجه نهایی پیام"""
+        with self._cond:
+            self.stats['sent' if success else 'failed'] += 1
+        if success:
+            job.future.set_result(result)
+        else:
+            job.future.set_exception(DeliveryError(error or "unknown error", status_code))
+        if job.on_done is not None:
+            try:
+                job.on_done(success, error)
+            except Exception as e:
+                logger.error(f"Error in Telegram delivery callback: {str(e)}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        دریافت وضعیت صف
+
+        Returns:
+            Dict[str, Any]: تعداد پیام‌های در انتظار و آمار ارسال
+        """
+        with self._cond:
+            return {
+                'running': self.running,
+                'workers': self.workers,
+                'queued': len(self._heap),
+                'in_flight': self._in_flight,
+                'oldest_wait_seconds': round(time.time() - min(job.created_at for _, _, job in self._heap), 1)
+                if self._heap else 0.0,
+                'chats': len(self._chat_buckets),
+                **self.stats
+            }
+
+
+def create_telegram_queue(workers: int = TELEGRAM_WORKERS) -> TelegramDeliveryQueue:
+    """
+    ساخت صف ارسال و ثبت ارسال پیام‌های باقی‌مانده هنگام خروج برنامه
+
+    Args:
+        workers: تعداد ترد‌های کارگر
+
+    Returns:
+        TelegramDeliveryQueue: صف ارسال
+    """
+    delivery_queue = TelegramDeliveryQueue(workers)
+    atexit.register(delivery_queue.stop)
+    return delivery_queue
+
+
+# صف مشترک ارسال پیام‌های تلگرام برای کل برنامه
+telegram_queue = create_telegram_queue()
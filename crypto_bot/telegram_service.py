@@ -8,6 +8,9 @@ import asyncio
 from datetime import datetime
 import pathlib
 
+from crypto_bot.telegram_outbox import telegram_outbox
+from crypto_bot.telegram_broadcast import subscription_registry
+
 # Setting up logger
 logger = logging.getLogger(__name__)
 
@@ -69,19 +72,32 @@ def initialize_bot():
         return None
 
 
-def send_telegram_message(chat_id, message, parse_mode=None, max_retries=3, retry_delay=1):
+def _api_parse_mode(parse_mode):
+    """Map parse mode names used in this module to Bot API values"""
+    if parse_mode == 'Markdown':
+        return 'MarkdownV2'
+    return parse_mode
+
+
+def send_telegram_message(chat_id, message, parse_mode=None, max_retries=3, retry_delay=1, wait=False,
+                          wait_timeout=30):
     """
     Send a text message to a user via Telegram
 
+    The message is put on the shared delivery queue and the function returns immediately
+    unless wait is set.
+
     Args:
         chat_id (int or str): User's chat ID
         message (str): Message text
         parse_mode (str): Parse mode ('HTML' or 'Markdown') or None for no parsing
         max_retries (int): Maximum number of retry attempts in case of error
-        retry_delay (int): Delay in seconds between retry attempts
+        retry_delay (int): Unused; retry delays are chosen by the delivery queue
+        wait (bool): Wait for the final delivery result instead of returning once queued
+        wait_timeout (int): Maximum time to wait for the result in seconds
 
     Returns:
-        bool: Whether the message was sent successfully
+        bool: Whether the message was queued (or, with wait, sent) successfully
     """
     # Use default chat ID if input value is not specified
     if not chat_id:
@@ -92,10 +108,6 @@ def send_telegram_message(chat_id, message, parse_mode=None, max_retries=3, retr
         else:
             logger.error("Chat ID not specified and default chat ID not found.")
             return False
-    if not TELEGRAM_AVAILABLE or _telegram is None:
-        logger.error("Telegram library is not installed")
-        return False
-        
     # Check Telegram token from environment variables again
     token = os.environ.get("TELEGRAM_BOT_TOKEN") or TELEGRAM_BOT_TOKEN
     if not token:
@@ -110,65 +122,21 @@ def send_telegram_message(chat_id, message, parse_mode=None, max_retries=3, retr
         logger.warning(f"Error converting chat ID to number: {str(e)}")
         # Continue without conversion
 
-    # Convert ParseMode to the appropriate type
-    if parse_mode == 'HTML':
-        parse_mode_enum = 'HTML'
-    elif parse_mode == 'Markdown':
-        parse_mode_enum = 'MarkdownV2' 
-    else:
-        parse_mode_enum = parse_mode
-    
-    # Add debug information
-    logger.info(f"Attempting to send message to chat ID: {chat_id} (type: {type(chat_id).__name__})")
-    
-    # Create an async loop to run async code
-    async def send_message_async():
-        # Create bot inside async function
-        bot = _telegram.Bot(token=token)
-        # Send message
-        await bot.send_message(chat_id=chat_id, text=message, parse_mode=parse_mode_enum)
-    
-    # Retry with delay
-    retries = 0
-    last_error = None
-    
-    while retries <= max_retries:
-        try:
-            # Check for event loop and run async function
-            try:
-                # If event loop is running
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    # Create a new task in the existing loop
-                    future = asyncio.run_coroutine_threadsafe(send_message_async(), loop)
-                    # Wait for task to complete
-                    future.result(timeout=10)  # 10 second timeout
-                else:
-                    # Run in current loop
-                    loop.run_until_complete(send_message_async())
-            except RuntimeError:
-                # If event loop doesn't exist, create a new one
-                asyncio.run(send_message_async())
-            
-            logger.info(f"Message successfully sent to chat {chat_id}")
-            return True
-            
-        except Exception as e:
-            last_error = e
-            retries += 1
-            logger.warning(f"Error sending Telegram message (attempt {retries}/{max_retries}): {str(e)}")
-            
-            if retries <= max_retries:
-                logger.info(f"Retrying after {retry_delay} seconds...")
-                import time
-                time.sleep(retry_delay)  # Delay before retrying
-            else:
-                logger.error(f"All attempts to send message to {chat_id} failed")
-                return False
-    
-    # If we get here, all attempts have failed
-    logger.error(f"Error sending Telegram message after {max_retries} attempts: {str(last_error)}")
-    return False
+    # Store the message in the durable outbox and enqueue it; rate limiting and retries with backoff
+    # happen in the delivery queue workers, and undelivered messages are replayed from the outbox
+    logger.info(f"Queueing message for chat ID: {chat_id} (type: {type(chat_id).__name__})")
+    future = telegram_outbox.send_message(chat_id, message, parse_mode=_api_parse_mode(parse_mode),
+                                          max_attempts=max_retries + 1)
+    if not wait:
+        return True
+
+    try:
+        future.result(timeout=wait_timeout)
+        logger.info(f"Message successfully sent to chat {chat_id}")
+        return True
+    except Exception as e:
+        logger.error(f"Error sending Telegram message to {chat_id}: {str(e)}")
+        return False
 
 
 def register_user(chat_id, user_info=None):
@@ -197,8 +165,10 @@ def register_user(chat_id, user_info=None):
         if user_info is None:
             user_info = {"registered_at": get_current_persian_time()}
             
-        # Register user in dictionary
+        # Register user in dictionary and subscribe the chat to report broadcasts,
+        # keeping the format and topics of an existing subscription
         CHAT_IDS[key] = chat_id
+        subscription_registry.ensure_subscribed(chat_id)
         logger.info(f"User with chat ID {chat_id} registered successfully")
         return True
     except Exception as e:
@@ -316,7 +286,7 @@ def send_test_notification(chat_id=None):
     logger.info(f"Sending test message to chat ID: {chat_id} (type: {type(chat_id).__name__})")
 
     try:
-        result = send_telegram_message(chat_id, message)
+        result = send_telegram_message(chat_id, message, wait=True)
         if result:
             return {
                 "success": True,
@@ -505,25 +475,24 @@ def get_chat_debug_info(chat_id=None, max_retries=2, retry_delay=1):
     return debug_info
 
 
-def send_telegram_photo(chat_id, photo_path, caption=None, parse_mode='HTML', max_retries=3, retry_delay=1):
+def send_telegram_photo(chat_id, photo_path, caption=None, parse_mode='HTML', max_retries=3, retry_delay=1,
+                        wait=False, wait_timeout=60):
     """
-    ارسال عکس به کاربر از طریق تلگرام
+    ارسال عکس به کاربر از طریق تلگرام (از طریق صف ارسال)
 
     Args:
         chat_id (int or str): شناسه چت کاربر
-        photo_path (str): مسیر فایل عکس
+        photo_path (str or bytes): مسیر فایل عکس یا محتوای تصویر در حافظه
         caption (str, optional): توضیحات عکس
         parse_mode (str): نوع پارس پیام ('HTML' یا 'Markdown')
         max_retries (int): حداکثر تعداد تلاش‌های مجدد در صورت خطا
-        retry_delay (int): تاخیر به ثانیه بین تلاش‌های مجدد
+        retry_delay (int): استفاده نمی‌شود؛ تاخیر تلاش مجدد توسط صف ارسال تعیین می‌شود
+        wait (bool): انتظار برای نتیجه نهایی ارسال به جای بازگشت پس از قرار گرفتن در صف
+        wait_timeout (int): بیشترین زمان انتظار برای نتیجه (ثانیه)
 
     Returns:
-        bool: آیا ارسال موفقیت‌آمیز بود
+        bool: آیا پیام در صف قرار گرفت (یا در صورت wait، ارسال موفقیت‌آمیز بود)
     """
-    if not TELEGRAM_AVAILABLE or _telegram is None:
-        logger.error("Telegram library is not installed")
-        return False
-        
     # Check Telegram token from environment variables
     token = os.environ.get("TELEGRAM_BOT_TOKEN") or TELEGRAM_BOT_TOKEN
     if not token:
@@ -538,78 +507,40 @@ def send_telegram_photo(chat_id, photo_path, caption=None, parse_mode='HTML', ma
         logger.warning(f"Error converting chat ID to number: {str(e)}")
         # Continue without conversion
         
-    # Check if the file exists
-    photo_file = pathlib.Path(photo_path)
-    if not photo_file.exists():
-        logger.error(f"Image file not found at path {photo_path}.")
-        return False
-        
-    # Convert ParseMode to appropriate type
-    if parse_mode == 'HTML':
-        parse_mode_enum = 'HTML'
-    elif parse_mode == 'Markdown':
-        parse_mode_enum = 'MARKDOWN_V2'
+    # Images rendered in memory are uploaded directly, without a temporary file
+    in_memory = isinstance(photo_path, (bytes, bytearray))
+    if in_memory:
+        if not photo_path:
+            logger.error("Image content is empty.")
+            return False
+        photo = bytes(photo_path)
+        filename = "chart.png"
     else:
-        parse_mode_enum = parse_mode
+        # Check if the file exists
+        photo_file = pathlib.Path(photo_path)
+        if not photo_file.exists():
+            logger.error(f"Image file not found at path {photo_path}.")
+            return False
+        # The file is read now, so it may be removed before the queue sends it
+        photo = photo_file.read_bytes()
+        filename = photo_file.name
     
     # Add debug information
-    logger.info(f"Attempting to send image to chat ID: {chat_id} from path {photo_path}")
-    
-    # Create an async loop for executing async code
-    async def send_photo_async():
-        # Create bot inside async function
-        bot = _telegram.Bot(token=token)
-        # Open the image file
-        with open(photo_path, 'rb') as photo:
-            # Send image
-            await bot.send_photo(
-                chat_id=chat_id,
-                photo=photo,
-                caption=caption,
-                parse_mode=parse_mode_enum if caption else None
-            )
+    source = f"memory ({len(photo)} bytes)" if in_memory else f"path {photo_path}"
+    logger.info(f"Queueing image for chat ID: {chat_id} from {source}")
     
-    # Retry with delay
-    retries = 0
-    last_error = None
-    
-    while retries <= max_retries:
-        try:
-            # بررسی وجود لوپ رویداد و اجرای تابع آسنکرون
-            try:
-                # اگر لوپ رویداد در حال اجرا باشد
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    # ایجاد تسک جدید در لوپ موجود
-                    future = asyncio.run_coroutine_threadsafe(send_photo_async(), loop)
-                    # منتظر اتمام تسک می‌مانیم
-                    future.result(timeout=10)  # تایم‌اوت 10 ثانیه
-                else:
-                    # اجرا در لوپ فعلی
-                    loop.run_until_complete(send_photo_async())
-            except RuntimeError:
-                # اگر لوپ رویداد وجود نداشته باشد، یک لوپ جدید ایجاد می‌کنیم
-                asyncio.run(send_photo_async())
-            
-            logger.info(f"تصویر با موفقیت به چت {chat_id} ارسال شد")
-            return True
-            
-        except Exception as e:
-            last_error = e
-            retries += 1
-            logger.warning(f"خطا در ارسال تصویر تلگرام (تلاش {retries}/{max_retries}): {str(e)}")
-            
-            if retries <= max_retries:
-                logger.info(f"تلاش مجدد پس از {retry_delay} ثانیه...")
-                import time
-                time.sleep(retry_delay)  # تاخیر قبل از تلاش مجدد
-            else:
-                logger.error(f"همه تلاش‌ها برای ارسال تصویر به {chat_id} با شکست مواجه شد")
-                return False
+    future = telegram_outbox.send_photo(chat_id, photo, caption=caption, parse_mode=_api_parse_mode(parse_mode),
+                                        filename=filename, max_attempts=max_retries + 1)
+    if not wait:
+        return True
     
-    # اگر به اینجا برسیم، یعنی همه تلاش‌ها ناموفق بوده‌اند
-    logger.error(f"خطا در ارسال تصویر تلگرام پس از {max_retries} تلاش: {str(last_error)}")
-    return False
+    try:
+        future.result(timeout=wait_timeout)
+        logger.info(f"تصویر با موفقیت به چت {chat_id} ارسال شد")
+        return True
+    except Exception as e:
+        logger.error(f"خطا در ارسال تصویر تلگرام به {chat_id}: {str(e)}")
+        return False
 
 
 def get_current_persian_time():
@@ -9,8 +9,8 @@ import random
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Any
 
-from crypto_bot.market_data import get_current_prices, get_historical_data
-from crypto_bot.technical_analysis import calculate_technical_indicators, get_technical_analysis
+from crypto_bot.market_data import get_current_prices
+from crypto_bot.technical_analysis import get_technical_analysis, get_technical_indicators_batch
 
 logger = logging.getLogger(__name__)
 
@@ -26,11 +26,17 @@ def get_trade_recommendations(top_n: int = 5) -> Dict[str, List[Dict[str, Any]]]
     """
     try:
         # دریافت قیمت‌های جاری
-        current_prices = get_current_prices(symbols=["BTC/USDT", "ETH/USDT", "XRP/USDT", "BNB/USDT", "SOL/USDT", "ADA/USDT"])
+        current_prices = get_current_prices(symbols_list=["BTC/USDT", "ETH/USDT", "XRP/USDT", "BNB/USDT", "SOL/USDT", "ADA/USDT"])
         
         # لیست نمادهای قابل بررسی
         symbols = list(current_prices.keys())
         
+        # محاسبه برداری اندیکاتورهای همه نمادها
+        all_indicators = get_technical_indicators_batch(
+            symbols, timeframe="1d",
+            indicators=['rsi', 'macd', 'macd_signal', 'ma20', 'ma50', 'ma200', 'bb_upper', 'bb_lower']
+        )
+        
         # پیشنهادات خرید و فروش
         buy_recommendations = []
         sell_recommendations = []
@@ -40,11 +46,8 @@ def get_trade_recommendations(top_n: int = 5) -> Dict[str, List[Dict[str, Any]]]
             if not isinstance(current_prices[symbol], dict) or "error" in current_prices[symbol]:
                 continue
                 
-            # دریافت داده‌های تاریخی برای محاسبه اندیکاتورها
-            historical_data = get_historical_data(symbol, timeframe="1d", limit=30)
-            
             # تحلیل فنی
-            indicators = calculate_technical_indicators(historical_data, symbol)
+            indicators = all_indicators[symbol]
             
             # قیمت فعلی
             current_price = current_prices[symbol]['price']
@@ -1,6 +1,7 @@
 # Railway Full Application - Updated for deployment - FORCE REBUILD
 import os
 import logging
+import multiprocessing
 import random
 from datetime import datetime
 from crypto_bot.cache_manager import price_cache
@@ -8,11 +9,21 @@ from flask import Flask, render_template, render_template_string, request, redir
 from flask_socketio import SocketIO, emit
 from crypto_bot.config import DEFAULT_CURRENCIES, TIMEFRAMES
 from crypto_bot.market_data import get_current_prices
+from crypto_bot.http_client import http_client
+from crypto_bot.async_client import async_client, start_async_client, get_prices_async
+from crypto_bot.quota_manager import quota_manager
+from crypto_bot.price_ticker import price_ticker, start_price_ticker
+from crypto_bot.exchange_stream import start_exchange_stream
+from crypto_bot.price_hub import price_hub, start_price_hub
+from crypto_bot.telegram_queue import telegram_queue
+from crypto_bot.telegram_outbox import telegram_outbox, start_telegram_outbox
+from crypto_bot.telegram_broadcast import subscription_registry, report_broadcaster
+from crypto_bot.signal_table import signal_table, start_signal_table
 from crypto_bot.scheduler import start_scheduler, stop_scheduler
 from crypto_bot.technical_analysis import get_technical_analysis
 from crypto_bot.news_analyzer import get_latest_news
 from crypto_bot.signal_generator import generate_signals
-from crypto_bot.price_alert_service import set_price_alert, remove_price_alert, get_price_alerts, check_price_alerts
+from crypto_bot.price_alert_service import set_price_alert, remove_price_alert, get_price_alerts, check_price_alerts, init_price_alerts, start_alert_watcher
 from crypto_bot.email_service import send_test_email, update_email_settings, last_email_content, DISABLE_REAL_EMAIL
 from crypto_bot.commodity_data import get_commodity_prices, get_forex_rates, get_economic_indicators
 from crypto_bot.ai_module import get_price_prediction, get_market_sentiment, get_price_patterns, get_trading_strategy
@@ -55,6 +66,12 @@ db.init_app(app)
 with app.app_context():
     db.create_all()
 
+# Load persisted price alerts into the alert engine
+try:
+    init_price_alerts(app)
+except Exception as e:
+    logger.error(f"Error loading price alerts: {str(e)}")
+
 # Register AI analysis routes
 try:
     from crypto_bot.ai_routes import register_routes
@@ -124,6 +141,8 @@ def initialize_session():
         }
     if 'watched_currencies' not in session:
         session['watched_currencies'] = DEFAULT_CURRENCIES[:3]  # Start with BTC, ETH, XRP
+    # Keep the background price ticker warm for this session's watchlist
+    price_ticker.add_symbols('sessions', session['watched_currencies'])
     if 'scheduler_running' not in session:
         session['scheduler_running'] = False
     # Always set English language
@@ -1124,7 +1143,7 @@ def dashboard_classic():
             api_symbols = [symbol, symbol.replace('/', '-') if '/' in symbol else symbol.replace('-', '/')]
             logger.info(f"Trying to get prices for symbols: {api_symbols}")
             
-            price_data = get_current_prices(api_symbols)
+            price_data = price_ticker.get_prices(api_symbols)
             
             # Use either format that returned data
             if symbol in price_data:
@@ -1969,7 +1988,7 @@ def get_default_technical_data(symbol, timeframe):
     current_price = 0
     try:
         # سعی می‌کنیم حداقل قیمت فعلی را دریافت کنیم
-        price_data = get_current_prices([symbol, symbol.replace('/', '-') if '/' in symbol else symbol.replace('-', '/')])
+        price_data = price_ticker.get_prices([symbol, symbol.replace('/', '-') if '/' in symbol else symbol.replace('-', '/')])
         if price_data and len(price_data) > 0:
             for key in price_data:
                 if price_data[key] and 'price' in price_data[key]:
@@ -2019,92 +2038,93 @@ def get_signals():
     currencies = request.args.getlist('currencies')
     if not currencies:
         currencies = session.get('watched_currencies', DEFAULT_CURRENCIES[:3])
+    timeframe = request.args.get('timeframe', '1d')
     
-    # Create direct sample signals without trying to generate real ones
-    # This is a temporary solution to avoid timeouts
-    signals = {}
-    for symbol in currencies:
-        # Get the actual price if possible
-        price = 0
-        recommendation = ""
-        farsi_recommendation = ""
-        
-        # Extract coin name from symbol
-        coin = symbol.split('/')[0] if '/' in symbol else symbol.split('-')[0]
-        
-        # Determine signal type based on coin (just for variety in samples)
-        if coin.lower() in ['btc', 'eth', 'bnb']:
-            signal = 'Buy'
-            farsi_signal = 'Buy'
-            strength = 0.35
-            recommendation = "Consider swing trade (long)"
-            farsi_recommendation = "Consider swing trade (bullish)"
-        elif coin.lower() in ['xrp', 'sol', 'ada']:
-            signal = 'Strong Buy'
-            farsi_signal = 'Strong Buy'
-            strength = 0.65
-            recommendation = "Good swing entry for long position"
-            farsi_recommendation = "Good entry point for bullish swing trade"
-        elif coin.lower() in ['doge', 'shib', 'trx']:
-            signal = 'Sell'
-            farsi_signal = 'Sell'
-            strength = -0.35
-            recommendation = "Consider swing trade (short)"
-            farsi_recommendation = "Consider swing trade (bearish)"
-        else:
-            signal = 'Neutral'
-            farsi_signal = 'Neutral'
-            strength = 0.05
-            recommendation = "Wait for clearer signals"
-            farsi_recommendation = "Wait for clearer signals"
-        
-        # Try to get the real price with a very short timeout
-        try:
-            prices = get_current_prices([symbol], timeout=1)
-            if symbol in prices:
-                price = prices[symbol]['price']
-        except Exception:
-            # Use different sample prices based on the coin
-            if coin.lower() == 'btc':
-                price = 82500
-            elif coin.lower() == 'eth': 
-                price = 3200
-            elif coin.lower() == 'bnb':
-                price = 560
-            elif coin.lower() == 'xrp':
-                price = 0.52
-            elif coin.lower() == 'sol':
-                price = 145
-            elif coin.lower() == 'doge':
-                price = 0.15
-            else:
-                price = 100.0
-                
-        # Create sample signal data with variety
-        signals[symbol] = {
-            'symbol': symbol,
-            'price': price,
-            'signal': signal,
-            'farsi_signal': farsi_signal,
-            'strength': strength,
-            'factors': {
-                'trend': round(random.uniform(-0.5, 0.5), 2),
-                'rsi': round(random.uniform(-0.5, 0.5), 2),
-                'macd': round(random.uniform(-0.5, 0.5), 2),
-                'bollinger': round(random.uniform(-0.5, 0.5), 2),
-                'momentum': round(random.uniform(-0.5, 0.5), 2),
-                'volatility': round(random.uniform(0.1, 0.3), 2),
-                'swing_trade': round(random.uniform(-0.5, 0.5), 2),
-                'news': round(random.uniform(-0.3, 0.3), 2)
-            },
-            'swing_recommendation': recommendation,
-            'farsi_swing_recommendation': farsi_recommendation,
-            'volatility': round(random.uniform(0.1, 0.3), 2),
-            'timestamp': datetime.now().isoformat(),
-            'is_sample_data': True  # Clearly mark as sample data
-        }
+    # سیگنال‌ها از جدول از پیش محاسبه شده خوانده می‌شوند؛ نمادهای جدید در دور بعدی محاسبه می‌شوند
+    signals, pending, failed = signal_table.get_many(currencies, timeframe)
+    
+    # قیمت لحظه‌ای از snapshot سرویس قیمت
+    prices = price_ticker.get_prices(list(signals), fetch_missing=False)
+    for symbol, row in list(signals.items()):
+        if symbol in prices:
+            signals[symbol] = dict(row, price=prices[symbol]['price'])
     
-    return jsonify({'success': True, 'data': signals})
+    return jsonify({
+        'success': True,
+        'data': signals,
+        'pending': pending,
+        'errors': failed,
+        'timeframe': timeframe,
+        'computed_at': signal_table.last_run
+    })
+
+@app.route('/api/http/metrics')
+def api_http_metrics():
+    """آمار تاخیر و خطای درخواست‌های HTTP خروجی به تفکیک میزبان"""
+    return jsonify(http_client.get_metrics())
+
+@app.route('/api/http/quotas')
+def api_http_quotas():
+    """وضعیت سهمیه و circuit breaker ارائه‌دهنده‌های API"""
+    return jsonify(quota_manager.get_status())
+
+@app.route('/api/http/async-metrics')
+def api_http_async_metrics():
+    """آمار تاخیر و خطای درخواست‌های ناهمگام به تفکیک میزبان"""
+    return jsonify(async_client.get_metrics())
+
+@app.route('/api/telegram/queue')
+def api_telegram_queue_status():
+    """وضعیت صف ارسال پیام‌های تلگرام"""
+    return jsonify(telegram_queue.get_status())
+
+@app.route('/api/telegram/outbox')
+def api_telegram_outbox_status():
+    """وضعیت صندوق خروجی ماندگار پیام‌های تلگرام"""
+    return jsonify(telegram_outbox.get_status())
+
+@app.route('/api/telegram/subscribers', methods=['GET'])
+def api_telegram_subscribers():
+    """لیست مشترکین فعال گزارش‌های تلگرام"""
+    return jsonify({
+        "success": True,
+        "subscribers": subscription_registry.get_subscribers(request.args.get('topic'))
+    })
+
+@app.route('/api/telegram/subscribers', methods=['POST'])
+def api_telegram_subscribe():
+    """ثبت یا بروزرسانی اشتراک یک چت"""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict) or not data.get('chat_id'):
+        return jsonify({"success": False, "message": "chat_id is required."}), 400
+    try:
+        # topics باید لیست نام موضوعات باشد (در غیر این صورت ValueError)
+        subscriber = subscription_registry.subscribe(
+            data['chat_id'],
+            language=data.get('language'),
+            fmt=data.get('format', 'html'),
+            topics=data.get('topics')
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify({"success": True, "subscriber": subscriber})
+
+@app.route('/api/telegram/subscribers/<chat_id>', methods=['DELETE'])
+def api_telegram_unsubscribe(chat_id):
+    """حذف اشتراک یک چت"""
+    if not subscription_registry.unsubscribe(chat_id):
+        return jsonify({"success": False, "message": "Subscriber not found."}), 404
+    return jsonify({"success": True})
+
+@app.route('/api/telegram/broadcasts')
+def api_telegram_broadcasts():
+    """وضعیت ارسال‌های همگانی اخیر به تفکیک گیرنده"""
+    return jsonify(report_broadcaster.get_history())
+
+@app.route('/api/price-hub/status')
+def api_price_hub_status():
+    """وضعیت مرکز پخش قیمت‌ها و مشترکین آن"""
+    return jsonify(price_hub.get_status())
 
 @app.route('/api/commodities')
 def get_commodities():
@@ -3597,23 +3617,75 @@ def api_voice_notification_save():
         }), 500
 
 
-# Flask 2.0+ نیاز به رویکرد جدید برای before_first_request دارد
-with app.app_context():
-    # بررسی تنظیمات راه‌اندازی خودکار سرویس زمان‌بندی تلگرام
-    try:
-        logger.info("Checking Telegram scheduling service auto-start settings...")
-        if telegram_scheduler_service.telegram_scheduler.auto_start_on_boot:
-            logger.info("Starting Telegram scheduling service with app_context...")
-            if telegram_scheduler_service.start_scheduler():
-                logger.info("Telegram scheduling service started successfully")
+def start_services():
+    """
+    راه‌اندازی سرویس‌های پس‌زمینه برنامه (قیمت‌ها، هشدارها، تلگرام و ...)
+    """
+    # Flask 2.0+ نیاز به رویکرد جدید برای before_first_request دارد
+    with app.app_context():
+        # event loop مشترک درخواست‌های ناهمگام
+        try:
+            start_async_client()
+        except Exception as e:
+            logger.error(f"Exception while starting async client: {str(e)}")
+    
+        # ارسال دوباره پیام‌های تلگرام باقی‌مانده از اجرای قبلی
+        try:
+            start_telegram_outbox()
+        except Exception as e:
+            logger.error(f"Exception while starting Telegram outbox: {str(e)}")
+    
+        # راه‌اندازی سرویس پس‌زمینه بروزرسانی قیمت‌ها
+        try:
+            start_price_ticker()
+        except Exception as e:
+            logger.error(f"Exception while starting price ticker: {str(e)}")
+    
+        # ارزیابی هشدارهای قیمت با هر بروزرسانی قیمت
+        try:
+            start_alert_watcher()
+        except Exception as e:
+            logger.error(f"Exception while starting price alert watcher: {str(e)}")
+    
+        # پخش یک‌باره تغییرات قیمت برای همه بینندگان داشبورد
+        try:
+            start_price_hub()
+        except Exception as e:
+            logger.error(f"Exception while starting price hub: {str(e)}")
+    
+        # دریافت جریانی قیمت‌ها از صرافی (با PRICE_STREAM_ENABLED=1)
+        try:
+            start_exchange_stream()
+        except Exception as e:
+            logger.error(f"Exception while starting exchange stream: {str(e)}")
+    
+        # محاسبه پس‌زمینه جدول سیگنال‌ها
+        try:
+            start_signal_table()
+        except Exception as e:
+            logger.error(f"Exception while starting signal table: {str(e)}")
+    
+        # بررسی تنظیمات راه‌اندازی خودکار سرویس زمان‌بندی تلگرام
+        try:
+            logger.info("Checking Telegram scheduling service auto-start settings...")
+            if telegram_scheduler_service.telegram_scheduler.auto_start_on_boot:
+                logger.info("Starting Telegram scheduling service with app_context...")
+                if telegram_scheduler_service.start_scheduler():
+                    logger.info("Telegram scheduling service started successfully")
+                else:
+                    logger.error("Error starting Telegram scheduling service")
             else:
-                logger.error("Error starting Telegram scheduling service")
-        else:
-            logger.info("Automatic start of Telegram scheduling service is disabled")
-    except Exception as e:
-        logger.error(f"Exception while starting Telegram scheduling service: {str(e)}")
+                logger.info("Automatic start of Telegram scheduling service is disabled")
+        except Exception as e:
+            logger.error(f"Exception while starting Telegram scheduling service: {str(e)}")
+
 
 
+# پروسس‌های فرزند multiprocessing (مثلاً کارگرهای رسم نمودار که با spawn ساخته می‌شوند) این
+# فایل را دوباره به عنوان __mp_main__ بارگذاری می‌کنند و نباید سرویس‌ها را دوباره راه‌اندازی کنند
+if multiprocessing.current_process().name == 'MainProcess':
+    start_services()
+
 if __name__ == "__main__":
     # راه‌اندازی زمان‌بندی تلگرام قبل از شروع برنامه
     try:
@@ -3644,19 +3716,14 @@ if __name__ == "__main__":
     def handle_price_update_request():
         """Handle real-time price update requests"""
         try:
-            # Get current prices for main cryptocurrencies
-            symbols = ['BTC-USDT', 'ETH-USDT', 'SOL-USDT', 'XRP-USDT']
-            price_data = {}
-            
-            for symbol in symbols:
-                try:
-                    price_info = get_current_prices([symbol])
-                    if price_info and symbol in price_info:
-                        price_data[symbol] = price_info[symbol]
-                except Exception as e:
-                    logger.error(f"Error getting price for {symbol}: {e}")
+            # Full state of the dashboard symbols from the price hub; before the first
+            # ticker snapshot, missing ones are fetched concurrently on the shared event loop
+            message = price_hub.get_full_message()
+            if not message['data']:
+                async_client.run(get_prices_async(price_hub.symbols))
+                message = price_hub.get_full_message()
             
-            emit('price_update', {'data': price_data})
+            emit('price_update', message)
         except Exception as e:
             logger.error(f"Error in price update handler: {e}")
             emit('error', {'message': 'Failed to update prices'})
@@ -3687,32 +3754,7 @@ if __name__ == "__main__":
             logger.error(f"Error in AI advice handler: {e}")
             emit('error', {'message': 'Failed to get AI advice'})
     
-    # Background task for periodic price updates
-    def background_price_updates():
-        """Background task to send periodic price updates to connected clients"""
-        import time
-        while True:
-            try:
-                time.sleep(30)  # Update every 30 seconds
-                symbols = ['BTC-USDT', 'ETH-USDT', 'SOL-USDT', 'XRP-USDT']
-                price_data = {}
-                
-                for symbol in symbols:
-                    try:
-                        price_info = get_current_prices([symbol])
-                        if price_info and symbol in price_info:
-                            price_data[symbol] = price_info[symbol]
-                    except Exception as e:
-                        logger.error(f"Error getting price for {symbol}: {e}")
-                
-                if price_data:
-                    socketio.emit('price_update', {'data': price_data})
-            except Exception as e:
-                logger.error(f"Error in background price updates: {e}")
-    
-    # Start background task
-    import threading
-    price_thread = threading.Thread(target=background_price_updates, daemon=True)
-    price_thread.start()
+    # Price hub pushes one delta per ticker snapshot to every connected client
+    price_hub.add_listener(lambda message: socketio.emit('price_update', message))
     
     socketio.run(app, host="0.0.0.0", port=9000, debug=True, allow_unsafe_werkzeug=True)
@@ -1,11 +1,8 @@
 import logging
 import os
-import random
-import time
 from datetime import datetime
 
 import pytz
-import requests
 
 # تنظیم لاگر
 logging.basicConfig(level=logging.INFO)
@@ -13,6 +10,8 @@ logger = logging.getLogger("replit_telegram")
 
 # وارد کردن تابع get_crypto_price از ماژول market_data
 from crypto_bot.market_data import get_crypto_price
+from crypto_bot.telegram_outbox import telegram_outbox
+from crypto_bot.telegram_broadcast import subscription_registry, report_broadcaster
 
 # وارد کردن ماژول نشانگر قابلیت اطمینان
 # تنظیم متغیرهای پیش‌فرض برای حل مشکل LSP
@@ -68,25 +67,31 @@ TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 # استفاده مستقیم از آیدی گروه به جای متغیر محیطی
 DEFAULT_CHAT_ID = -1002584373095  # آیدی گروه تلگرام
 
+# تا زمانی که مشترکی ثبت نشده، گزارش‌ها برای گروه پیش‌فرض ارسال می‌شوند
+subscription_registry.seed([DEFAULT_CHAT_ID])
+
 # تنظیم منطقه زمانی تهران و تورنتو
 tehran_tz = pytz.timezone('Asia/Tehran')
 toronto_tz = pytz.timezone('America/Toronto')
 
-def send_message(text, chat_id=None, parse_mode=None, disable_web_page_preview=True, retries=3, delay=2, message_type="general"):
+def send_message(text, chat_id=None, parse_mode=None, disable_web_page_preview=True, retries=3, delay=2,
+                 message_type="general", wait=False, wait_timeout=30):
     """
-    ارسال پیام به تلگرام
+    ارسال پیام به تلگرام از طریق صف ارسال
     
     Args:
         text (str): متن پیام
         chat_id (str, optional): شناسه چت. اگر None باشد، از DEFAULT_CHAT_ID استفاده می‌شود.
         parse_mode (str, optional): حالت پارس متن. می‌تواند "Markdown" یا "HTML" باشد.
         disable_web_page_preview (bool, optional): غیرفعال کردن پیش‌نمایش وب‌سایت.
-        retries (int, optional): تعداد تلاش‌های مجدد در صورت خطا.
-        delay (int, optional): تاخیر بین تلاش‌های مجدد بر حسب ثانیه.
+        retries (int, optional): بیشترین تعداد تلاش برای ارسال.
+        delay (int, optional): استفاده نمی‌شود؛ تاخیر تلاش مجدد توسط صف ارسال تعیین می‌شود.
         message_type (str, optional): نوع پیام برای ثبت در نشانگر قابلیت اطمینان.
+        wait (bool, optional): انتظار برای نتیجه نهایی ارسال به جای بازگشت پس از قرار گرفتن در صف.
+        wait_timeout (int, optional): بیشترین زمان انتظار برای نتیجه (ثانیه).
         
     Returns:
-        bool: موفقیت یا شکست ارسال پیام
+        bool: قرار گرفتن پیام در صف (یا در صورت wait، موفقیت ارسال)
     """
     if not TELEGRAM_BOT_TOKEN:
         logger.error("TELEGRAM_BOT_TOKEN not found")
@@ -108,63 +113,65 @@ def send_message(text, chat_id=None, parse_mode=None, disable_web_page_preview=T
             return False
         chat_id = DEFAULT_CHAT_ID
     
-    # آدرس API تلگرام
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+    def on_done(success, error_message):
+        # Record the final delivery result in reliability monitor
+        if RELIABILITY_MONITOR_AVAILABLE:
+            record_message_attempt(message_type, success, error_message)
+    
+    # پیام در صندوق خروجی ماندگار ثبت و در صف ارسال قرار می‌گیرد؛ محدودیت نرخ تلگرام و تلاش مجدد
+    # در کارگرهای صف انجام می‌شود و پیام ارسال نشده پس از قطعی یا راه‌اندازی دوباره ارسال می‌شود
+    future = telegram_outbox.send_message(
+        chat_id, text,
+        parse_mode=parse_mode,
+        disable_web_page_preview=disable_web_page_preview,
+        max_attempts=retries,
+        on_done=on_done
+    )
+    logger.info("Message queued for Telegram")
     
-    # تنظیم پارامترهای درخواست
-    params = {
-        "chat_id": chat_id,
-        "text": text,
-        "disable_web_page_preview": disable_web_page_preview
-    }
+    if not wait:
+        return True
     
-    # اضافه کردن پارامتر پارس مود (مارک‌داون یا HTML) اگر تعیین شده باشد
-    if parse_mode:
-        params["parse_mode"] = parse_mode
+    try:
+        future.result(timeout=wait_timeout)
+        return True
+    except Exception as e:
+        logger.error(f"Error sending message: {str(e)}")
+        return False
+
+
+def broadcast_message(text, topic, parse_mode=None, disable_web_page_preview=True, message_type=None):
+    """
+    ارسال یک گزارش به همه مشترکین یک موضوع
     
-    logger.info("Sending message to Telegram...")
+    Args:
+        text (str or callable): متن گزارش یا تابعی که متن را برای یک زبان می‌سازد
+        topic (str): موضوع گزارش (مثلاً price_report)
+        parse_mode (str, optional): حالت پارس متن. می‌تواند "Markdown" یا "HTML" باشد.
+        disable_web_page_preview (bool, optional): غیرفعال کردن پیش‌نمایش وب‌سایت.
+        message_type (str, optional): نوع پیام برای ثبت در نشانگر قابلیت اطمینان (پیش‌فرض: topic).
+        
+    Returns:
+        bool: اگر پیام برای حداقل یک مشترک در صف قرار گرفته باشد
+    """
+    if not TELEGRAM_BOT_TOKEN:
+        logger.error("TELEGRAM_BOT_TOKEN not found")
+        if RELIABILITY_MONITOR_AVAILABLE:
+            record_message_attempt(message_type or topic, False, "TELEGRAM_BOT_TOKEN not found")
+        return False
     
-    for attempt in range(retries):
-        try:
-            response = requests.post(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                logger.info("Message sent successfully")
-                
-                # Record success in reliability monitor
-                if RELIABILITY_MONITOR_AVAILABLE:
-                    record_message_attempt(message_type, True)
-                    
-                return True
-            else:
-                error_message = f"Error sending message: {response.status_code} - {response.text}"
-                logger.error(error_message)
-                
-                # If this is the last attempt, record the error
-                if attempt == retries - 1:
-                    if RELIABILITY_MONITOR_AVAILABLE:
-                        record_message_attempt(message_type, False, error_message)
-                
-                # If rate limit error (429) was received, increase wait time
-                if response.status_code == 429:
-                    retry_after = int(response.json().get('parameters', {}).get('retry_after', delay * 2))
-                    logger.info(f"Rate limit error. Waiting for {retry_after} seconds...")
-                    time.sleep(retry_after)
-                else:
-                    # برای سایر خطاها، با تاخیر معمولی دوباره تلاش کنید
-                    time.sleep(delay)
-        except Exception as e:
-            error_message = f"Exception in sending message: {str(e)}"
-            logger.error(error_message)
-            time.sleep(delay)
-            
-            # If this is the last attempt, record the error
-            if attempt == retries - 1:
-                if RELIABILITY_MONITOR_AVAILABLE:
-                    record_message_attempt(message_type, False, error_message)
+    def on_done(success, error_message):
+        # Record each recipient's final delivery result in reliability monitor
+        if RELIABILITY_MONITOR_AVAILABLE:
+            record_message_attempt(message_type or topic, success, error_message)
     
-    logger.error(f"After {retries} attempts, message sending failed")
-    return False
+    result = report_broadcaster.broadcast(topic, text, parse_mode=parse_mode,
+                                          disable_web_page_preview=disable_web_page_preview, on_done=on_done)
+    counts = result.to_dict()['counts']
+    queued = counts.get('queued', 0) + counts.get('sent', 0) + counts.get('deferred', 0)
+    if not queued:
+        logger.warning(f"No subscribers received {topic}")
+    return queued > 0
 
 
 def send_price_report():
@@ -271,7 +278,7 @@ def send_price_report():
 """
     
     # ارسال پیام به تلگرام
-    return send_message(message, parse_mode="HTML", message_type="price_report")
+    return broadcast_message(message, "price_report", parse_mode="HTML")
 
 
 def send_test_message():
@@ -304,7 +311,7 @@ def send_test_message():
         except Exception as e:
             logger.warning(f"Error recording service restart: {str(e)}")
     
-    return send_message(message, parse_mode="HTML", message_type="test_message")
+    return send_message(message, parse_mode="HTML", message_type="test_message", wait=True)
 
 
 def send_system_report():
@@ -355,7 +362,7 @@ def send_system_report():
 ⏰ <b>Report Time:</b> {current_time} (Toronto)
 """
     
-    return send_message(message, parse_mode="HTML", message_type="system_report")
+    return broadcast_message(message, "system_report", parse_mode="HTML")
 
 
 def send_technical_analysis(symbol="BTC/USDT"):
@@ -499,7 +506,7 @@ def send_technical_analysis(symbol="BTC/USDT"):
     # نوع پیام برای ثبت در نشانگر قابلیت اطمینان
     message_type = f"technical_analysis_{coin_name}"
     
-    return send_message(message, parse_mode="HTML", message_type=message_type)
+    return broadcast_message(message, "technical_analysis", parse_mode="HTML", message_type=message_type)
 
 
 def send_trading_signals():
@@ -597,7 +604,7 @@ def send_trading_signals():
 ⏰ <b>زمان گزارش:</b> {current_time} (تورنتو)
 """
     
-    return send_message(message, parse_mode="HTML", message_type="trading_signals")
+    return broadcast_message(message, "trading_signals", parse_mode="HTML")
 
 
 def send_crypto_news():
@@ -617,7 +624,7 @@ def send_crypto_news():
         # Create news message
         if not news:
             message = "⚠️ Cryptocurrency news is not available."
-            return send_message(message, message_type="crypto_news")
+            return broadcast_message(message, "crypto_news")
         
         telegram_message = "*📰 Important Cryptocurrency News*\n\n"
         
@@ -674,18 +681,18 @@ def send_crypto_news():
         telegram_message += "\n🤖 *Crypto Barzin* | *More News & Analysis*"
         
         # Send message to Telegram
-        return send_message(telegram_message, parse_mode="Markdown", message_type="crypto_news")
+        return broadcast_message(telegram_message, "crypto_news", parse_mode="Markdown")
         
     except ImportError as e:
         logger.error(f"Error accessing the news scanner module: {str(e)}")
         error_message = "❌ Error accessing the news scanner module. Please try again later."
-        return send_message(error_message, message_type="crypto_news")
+        return broadcast_message(error_message, "crypto_news")
     except Exception as e:
         logger.error(f"Error sending cryptocurrency news: {str(e)}")
         # Send a simpler message in case of error
         try:
             error_message = "*📰 Cryptocurrency News*\n\n⚠️ Due to a technical issue, news is currently unavailable.\n\nPlease try again later."
-            return send_message(error_message, parse_mode="Markdown", message_type="crypto_news")
+            return broadcast_message(error_message, "crypto_news", parse_mode="Markdown")
         except:
             return False
 
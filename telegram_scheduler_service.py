@@ -14,7 +14,8 @@ import pytz
 import replit_telegram_sender
 import os
 import json
-from crypto_bot.price_alert_service import check_price_alerts
+from crypto_bot.price_alert_service import check_price_alerts, is_alert_watcher_running
+from crypto_bot.price_ticker import price_ticker
 
 # Setup logger
 logging.basicConfig(
@@ -63,6 +64,9 @@ class TelegramSchedulerService:
         self.important_coins = ["BTC/USDT", "ETH/USDT", "BNB/USDT", "SOL/USDT", "XRP/USDT"]
         self.current_coin_index = 0
         
+        # Keep important coins warm in the background price ticker
+        price_ticker.watch('telegram_scheduler', self.important_coins)
+        
         # Load settings from file if they exist
         self._load_settings()
     
@@ -188,9 +192,9 @@ class TelegramSchedulerService:
                         logger.info(f"Outside active hours ({self.active_hours_start} AM to {self.active_hours_end} PM), report not sent")
                     counter = 0
                 
-                # Only check price alerts once per hour (to avoid checking too frequently)
-                # This helps prevent spam notifications
-                if counter == 1:
+                # Price alerts are evaluated on every price update by the alert watcher;
+                # poll here only if the watcher is not running
+                if not is_alert_watcher_running():
                     try:
                         self._check_price_alerts()
                     except Exception as e:
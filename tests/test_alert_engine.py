@@ -0,0 +1,228 @@
+"""
+آزمون‌های موتور نمایه‌شده هشدارهای قیمت (بدون پایگاه داده)
+"""
+
+import pytest
+from flask import Flask
+
+from crypto_bot.alert_engine import AlertEngine
+from models import db, PriceAlert
+
+SYMBOL = 'BTC/USDT'
+
+
+@pytest.fixture
+def engine():
+    return AlertEngine(rearm_margin=0.01, debounce=2, cooldown=300)
+
+
+def fired_targets(fired):
+    return [(alert['alert_type'], alert['target_price']) for alert in fired]
+
+
+def test_due_alert_fires_without_a_new_price(engine):
+    engine.add_alert(SYMBOL, 90, 'below')
+    assert engine.evaluate({SYMBOL: 95}, now=0) == []
+
+    # عبور در یک نمونه قیمت؛ هشدار تا پایان debounce منتظر می‌ماند
+    assert engine.evaluate({SYMBOL: 85}, now=30) == []
+    assert engine.next_due() == 32
+    assert engine.evaluate_due(now=31) == []
+
+    fired = engine.evaluate_due(now=32)
+    assert fired_targets(fired) == [('below', 90)]
+    assert fired[0]['current_price'] == 85
+    assert engine.next_due() is None
+
+    # برگشت قیمت پس از فعال شدن هشدار را دوباره فعال نمی‌کند
+    assert engine.evaluate({SYMBOL: 92}, now=60) == []
+
+
+@pytest.fixture
+def instant():
+    # بدون debounce؛ هشدار با اولین عبور فعال می‌شود
+    return AlertEngine(rearm_margin=0.01, debounce=0, cooldown=0)
+
+
+def test_above_fires_on_upward_crossing_including_exact_target(instant):
+    instant.add_alert(SYMBOL, 100, 'above')
+    instant.add_alert(SYMBOL, 105, 'above')
+    assert instant.evaluate({SYMBOL: 95}, now=0) == []
+    assert instant.evaluate({SYMBOL: 99.99}, now=1) == []
+
+    assert fired_targets(instant.evaluate({SYMBOL: 100}, now=2)) == [('above', 100)]
+    # هشدار فعال شده با ادامه صعود دوباره فعال نمی‌شود
+    assert fired_targets(instant.evaluate({SYMBOL: 110}, now=3)) == [('above', 105)]
+    assert instant.evaluate({SYMBOL: 120}, now=4) == []
+
+
+def test_below_fires_on_downward_crossing_including_exact_target(instant):
+    instant.add_alert(SYMBOL, 100, 'below')
+    instant.add_alert(SYMBOL, 95, 'below')
+    assert instant.evaluate({SYMBOL: 105}, now=0) == []
+    assert instant.evaluate({SYMBOL: 100.01}, now=1) == []
+
+    assert fired_targets(instant.evaluate({SYMBOL: 100}, now=2)) == [('below', 100)]
+    assert fired_targets(instant.evaluate({SYMBOL: 90}, now=3)) == [('below', 95)]
+    assert instant.evaluate({SYMBOL: 80}, now=4) == []
+
+
+def test_crossing_in_the_other_direction_does_not_fire(instant):
+    instant.add_alert(SYMBOL, 100, 'above')
+    instant.add_alert(SYMBOL, 90, 'below')
+    assert instant.evaluate({SYMBOL: 95}, now=0) == []
+    assert instant.evaluate({SYMBOL: 95.5}, now=1) == []
+    assert instant.evaluate({SYMBOL: 94.5}, now=2) == []
+
+
+def test_first_price_evaluates_current_state(instant):
+    instant.add_alert(SYMBOL, 100, 'above')
+    instant.add_alert(SYMBOL, 120, 'below')
+    assert sorted(fired_targets(instant.evaluate({SYMBOL: 110}, now=0))) == [('above', 100), ('below', 120)]
+
+
+def test_above_rearms_only_beyond_the_margin(instant):
+    instant.add_alert(SYMBOL, 100, 'above')
+    instant.evaluate({SYMBOL: 95}, now=0)
+    assert fired_targets(instant.evaluate({SYMBOL: 101}, now=1)) == [('above', 100)]
+
+    # دقیقاً ۱٪ پایین‌تر از هدف هنوز مسلح نمی‌کند
+    instant.evaluate({SYMBOL: 99}, now=2)
+    assert instant.evaluate({SYMBOL: 101}, now=3) == []
+
+    instant.evaluate({SYMBOL: 98.99}, now=4)
+    assert fired_targets(instant.evaluate({SYMBOL: 101}, now=5)) == [('above', 100)]
+
+
+def test_below_rearms_only_beyond_the_margin(instant):
+    instant.add_alert(SYMBOL, 100, 'below')
+    instant.evaluate({SYMBOL: 105}, now=0)
+    assert fired_targets(instant.evaluate({SYMBOL: 99}, now=1)) == [('below', 100)]
+
+    # دقیقاً ۱٪ بالاتر از هدف هنوز مسلح نمی‌کند
+    instant.evaluate({SYMBOL: 101}, now=2)
+    assert instant.evaluate({SYMBOL: 99}, now=3) == []
+
+    instant.evaluate({SYMBOL: 101.01}, now=4)
+    assert fired_targets(instant.evaluate({SYMBOL: 99}, now=5)) == [('below', 100)]
+
+
+def test_duplicate_add_rearms_existing_alert(instant):
+    alert, created = instant.add_alert(SYMBOL, 100, 'above')
+    assert created
+    instant.evaluate({SYMBOL: 95}, now=0)
+    instant.evaluate({SYMBOL: 101}, now=1)
+    assert not alert.armed
+
+    same, created = instant.add_alert(SYMBOL, 100.0005, 'above')
+    assert same is alert and not created
+    assert alert.armed
+    assert instant.get_status()['alerts'] == 1
+
+    # هشدار مسلح شده با وضعیت فعلی قیمت ارزیابی می‌شود
+    assert fired_targets(instant.evaluate({SYMBOL: 101}, now=2)) == [('above', 100)]
+
+
+def test_remove_alert(instant):
+    instant.add_alert(SYMBOL, 100, 'above')
+    instant.add_alert(SYMBOL, 90, 'below')
+    instant.evaluate({SYMBOL: 95}, now=0)
+
+    assert instant.remove_alert(SYMBOL, 100, 'above')
+    assert not instant.remove_alert(SYMBOL, 100, 'above')
+    assert not instant.remove_alert(SYMBOL, 90, 'above')
+    assert instant.evaluate({SYMBOL: 101}, now=1) == []
+
+    assert instant.remove_alert(SYMBOL, 90, 'below')
+    assert instant.symbols() == []
+    assert instant.get_status()['alerts'] == 0
+
+
+def test_remove_waiting_alert(engine):
+    engine.add_alert(SYMBOL, 100, 'above')
+    engine.evaluate({SYMBOL: 95}, now=0)
+    engine.evaluate({SYMBOL: 101}, now=1)
+    assert engine.next_due() == 3
+
+    assert engine.remove_alert(SYMBOL, 100, 'above')
+    assert engine.next_due() is None
+    assert engine.evaluate_due(now=3) == []
+
+
+def test_debounce_drops_transient_crossing(engine):
+    engine.add_alert(SYMBOL, 100, 'above')
+    engine.evaluate({SYMBOL: 95}, now=0)
+    assert engine.evaluate({SYMBOL: 101}, now=1) == []
+    assert engine.get_status()['waiting'] == 1
+
+    # قیمت پیش از پایان debounce برگشت؛ هشدار فعال نمی‌شود
+    assert engine.evaluate({SYMBOL: 99.5}, now=2) == []
+    assert engine.next_due() is None
+    assert engine.evaluate_due(now=3) == []
+
+    # عبور پایدار پس از debounce فعال می‌شود
+    engine.evaluate({SYMBOL: 101}, now=4)
+    assert fired_targets(engine.evaluate({SYMBOL: 102}, now=6)) == [('above', 100)]
+
+
+def test_cooldown_delays_refiring():
+    engine = AlertEngine(rearm_margin=0.01, debounce=0, cooldown=300)
+    engine.add_alert(SYMBOL, 100, 'above')
+    engine.evaluate({SYMBOL: 95}, now=0)
+    assert fired_targets(engine.evaluate({SYMBOL: 101}, now=10)) == [('above', 100)]
+
+    # مسلح شدن و عبور دوباره در مدت cooldown
+    engine.evaluate({SYMBOL: 95}, now=20)
+    assert engine.evaluate({SYMBOL: 101}, now=30) == []
+    assert engine.next_due() == 310
+    assert engine.evaluate({SYMBOL: 102}, now=100) == []
+
+    assert fired_targets(engine.evaluate_due(now=310)) == [('above', 100)]
+
+
+def test_alert_added_while_waiting_alerts_exist(engine):
+    engine.add_alert(SYMBOL, 100, 'above')
+    engine.evaluate({SYMBOL: 95}, now=0)
+    engine.evaluate({SYMBOL: 101}, now=1)
+
+    # هشدار جدیدی که شرط آن از قبل برقرار است در بررسی بعدی منتظر debounce می‌ماند
+    engine.add_alert(SYMBOL, 98, 'above')
+    assert engine.evaluate({SYMBOL: 101}, now=2) == []
+    assert engine.get_status()['waiting'] == 2
+
+    assert fired_targets(engine.evaluate_due(now=3)) == [('above', 100)]
+    assert fired_targets(engine.evaluate_due(now=4)) == [('above', 98)]
+
+
+@pytest.fixture
+def app():
+    flask_app = Flask(__name__)
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    db.init_app(flask_app)
+    with flask_app.app_context():
+        db.create_all()
+    return flask_app
+
+
+def test_init_app_merges_unsaved_alerts(app, instant):
+    with app.app_context():
+        db.session.add(PriceAlert(symbol=SYMBOL, price=100, condition='above', active=False))
+        db.session.add(PriceAlert(symbol=SYMBOL, price=90, condition='below', active=True))
+        db.session.commit()
+
+    # هشدار ثبت شده پیش از اتصال که در جدول هم هست با ردیف آن یکی می‌شود
+    existing, _ = instant.add_alert(SYMBOL, 100, 'above')
+    unsaved, _ = instant.add_alert(SYMBOL, 80, 'below')
+    instant.init_app(app)
+
+    assert instant.get_status()['alerts'] == 3
+    assert existing.db_id is not None and not existing.armed
+    assert unsaved.db_id is not None
+    with app.app_context():
+        rows = {(row.price, row.condition): row.active for row in PriceAlert.query.all()}
+    assert rows == {(100, 'above'): False, (90, 'below'): True, (80, 'below'): True}
+
+    # وضعیت غیرمسلح ردیف ذخیره شده حفظ می‌شود و تغییر وضعیت‌ها ذخیره می‌شود
+    assert fired_targets(instant.evaluate({SYMBOL: 85}, now=0)) == [('below', 90)]
+    with app.app_context():
+        assert PriceAlert.query.filter_by(price=90).one().active is False
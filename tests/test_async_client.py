@@ -0,0 +1,107 @@
+"""
+آزمون‌های دریافت ناهمگام اخبار در برابر سرور HTTP محلی (aiohttp)
+"""
+
+import json
+
+import pytest
+
+from crypto_bot import async_client as async_module
+from crypto_bot import crypto_news
+from crypto_bot.async_client import async_client, fetch_news_async
+
+pytestmark = pytest.mark.skipif(not async_module.AIOHTTP_AVAILABLE, reason="aiohttp is not installed")
+
+CRYPTOCOMPARE_RESPONSE = {
+    'Type': 100,
+    'Data': [{'title': f'CryptoCompare {i}', 'url': f'https://example.com/cc/{i}', 'published_on': 1700000000 + i}
+             for i in range(5)]
+}
+
+COINDESK_HTML = """
+<html><body>
+<article><a href="/markets/btc"><h6>Bitcoin holds support</h6></a></article>
+<article><a href="https://www.coindesk.com/markets/eth"><h5>Ether rallies</h5></a></article>
+</body></html>
+"""
+
+COINTELEGRAPH_HTML = """
+<html><body>
+<div class="post-card"><a class="post-card__link" href="/news/sol"><span class="post-card__title">Solana upgrade</span></a></div>
+</body></html>
+"""
+
+
+@pytest.fixture
+def news_server(monkeypatch):
+    from aiohttp import web
+
+    # پاسخ هر منبع: (کد وضعیت، بدنه)؛ آزمون‌ها می‌توانند آن را تغییر دهند
+    responses = {
+        'cryptocompare': (200, json.dumps(CRYPTOCOMPARE_RESPONSE)),
+        'coindesk': (200, COINDESK_HTML),
+        'cointelegraph': (503, ''),
+    }
+    requests = []
+
+    async def handle(request):
+        name = request.match_info['source']
+        requests.append((name, dict(request.query)))
+        status, body = responses[name]
+        return web.Response(status=status, text=body)
+
+    async def start():
+        app = web.Application()
+        app.router.add_get('/{source}/', handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        return runner, runner.addresses[0][1]
+
+    # سرور روی همان event loop کلاینت ناهمگام اجرا می‌شود
+    runner, port = async_client.run(start())
+    base = f"http://127.0.0.1:{port}"
+    monkeypatch.setattr(crypto_news, 'CRYPTOCOMPARE_NEWS_URL', f"{base}/cryptocompare/")
+    monkeypatch.setattr(crypto_news, 'COINDESK_URL', f"{base}/coindesk/")
+    monkeypatch.setattr(crypto_news, 'COINTELEGRAPH_URL', f"{base}/cointelegraph/")
+    yield responses, requests
+    async_client.run(runner.cleanup())
+
+
+def test_fetch_news_async_parses_every_source(news_server):
+    _, requests = news_server
+    news = async_client.run(fetch_news_async(limit=3))
+
+    titles = [item['title'] for item in news]
+    assert titles == ['CryptoCompare 0', 'CryptoCompare 1', 'CryptoCompare 2', 'Bitcoin holds support', 'Ether rallies']
+    assert news[3]['url'] == 'https://www.coindesk.com/markets/btc'
+    assert news[3]['source'] == 'CoinDesk'
+
+    # منبع ناموفق (503) نادیده گرفته می‌شود
+    assert sorted(name for name, _ in requests) == ['coindesk', 'cointelegraph', 'cryptocompare']
+    query = dict(requests)['cryptocompare']
+    assert query['limit'] == '3' and query['lang'] == 'EN'
+
+
+def test_fetch_news_async_cointelegraph(news_server):
+    responses, _ = news_server
+    responses['cryptocompare'] = (500, '')
+    responses['coindesk'] = (404, '')
+    responses['cointelegraph'] = (200, COINTELEGRAPH_HTML)
+
+    news = async_client.run(fetch_news_async(limit=3))
+    assert [(item['title'], item['source']) for item in news] == [('Solana upgrade', 'CoinTelegraph')]
+    assert news[0]['url'] == 'https://cointelegraph.com/news/sol'
+
+
+def test_get_crypto_news_uses_async_sources(news_server, monkeypatch):
+    _, requests = news_server
+    monkeypatch.setattr(crypto_news, 'HAS_NEWS_API', False)
+    news = crypto_news.get_crypto_news(limit=6, translate=False, include_canada=False)
+
+    # سه خبر از هر منبع (6 // 3 + 1)؛ CoinTelegraph در دسترس نیست
+    assert [item['title'] for item in news] == ['Bitcoin holds support', 'Ether rallies',
+                                                'CryptoCompare 2', 'CryptoCompare 1', 'CryptoCompare 0']
+    assert all(item['title_fa'] == item['title'] for item in news)
+    assert sorted(name for name, _ in requests) == ['coindesk', 'cointelegraph', 'cryptocompare']
@@ -0,0 +1,104 @@
+"""
+آزمون‌های دریافت جریانی قیمت‌ها در برابر سرور WebSocket محلی (LocalTickerServer)
+"""
+
+import time
+
+import pytest
+
+from crypto_bot import exchange_stream as stream_module
+from crypto_bot.exchange_stream import ExchangeStream, LocalTickerServer, parse_ticker_message
+from crypto_bot.price_ticker import PriceTicker
+
+pytestmark = pytest.mark.skipif(not stream_module.WEBSOCKET_AVAILABLE, reason="websocket-client is not installed")
+
+SYMBOLS = ['BTC/USDT', 'ETH/USDT']
+
+
+def wait_for(condition, timeout=10.0, interval=0.05):
+    """انتظار تا برقرار شدن شرط یا پایان مهلت"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(interval)
+    return False
+
+
+@pytest.fixture
+def server():
+    local_server = LocalTickerServer(interval=0.05)
+    local_server.start()
+    yield local_server
+    local_server.stop()
+
+
+@pytest.fixture
+def ticker():
+    return PriceTicker()
+
+
+@pytest.fixture
+def stream(server, ticker):
+    exchange_stream = ExchangeStream(url=server.url, symbols_provider=lambda: SYMBOLS,
+                                     publish=ticker.publish_prices, publish_interval=0.05)
+    yield exchange_stream
+    exchange_stream.stop()
+
+
+def test_parse_ticker_message():
+    message = {
+        'stream': 'btcusdt@ticker',
+        'data': {'e': '24hrTicker', 'E': 1700000000000, 's': 'BTCUSDT', 'c': '50000.5', 'o': '49000',
+                 'h': '51000', 'l': '48000', 'P': '2.041', 'v': '10', 'q': '500000'}
+    }
+    parsed = parse_ticker_message(message)
+    assert parsed['exchange_symbol'] == 'BTCUSDT'
+    assert parsed['price'] == 50000.5
+    assert parsed['change_24h'] == 2.041
+    assert parsed['event_time'] == 1700000000.0
+
+    assert parse_ticker_message({'data': {'e': 'trade'}}) is None
+    assert parse_ticker_message({'data': {'e': '24hrTicker', 's': 'BTCUSDT'}}) is None
+
+
+def test_stream_publishes_snapshot_updates(stream, ticker):
+    assert stream.start()
+    assert wait_for(lambda: all(symbol in ticker.get_snapshot()['prices'] for symbol in SYMBOLS))
+
+    prices = ticker.get_snapshot()['prices']
+    for symbol in SYMBOLS:
+        assert prices[symbol]['price'] > 0
+        assert prices[symbol]['source'] == 'Binance Stream'
+    assert stream.get_status()['connected']
+
+    # بروزرسانی‌های بعدی قیمت‌های snapshot را تغییر می‌دهند
+    first = {symbol: prices[symbol]['updated_at'] for symbol in SYMBOLS}
+    assert wait_for(lambda: all(ticker.get_snapshot()['prices'][symbol]['updated_at'] > first[symbol]
+                                for symbol in SYMBOLS))
+
+
+def test_stream_reconnects_after_disconnect(stream, server):
+    assert stream.start()
+    assert wait_for(lambda: stream.connected and stream.messages > 0)
+
+    server.disconnect_all()
+    assert wait_for(lambda: stream.reconnects >= 1)
+    messages = stream.messages
+    assert wait_for(lambda: stream.connected and stream.messages > messages)
+
+
+def test_stream_stop(stream):
+    assert stream.start()
+    assert wait_for(lambda: stream.messages > 0)
+
+    assert stream.stop()
+    assert not stream.stop()
+    stream._thread.join(timeout=5)
+    assert not stream._thread.is_alive()
+    assert not stream.get_status()['running']
+    assert not stream.get_status()['connected']
+
+    messages = stream.messages
+    time.sleep(0.3)
+    assert stream.messages == messages